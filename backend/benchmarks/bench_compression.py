@@ -0,0 +1,102 @@
+"""
+Response compression cost benchmark.
+
+Compresses a storefront-sized JSON payload (a business with N products, as
+returned by /api/public/sites and /api/businesses/{id}/products) with each
+encoding and level, and reports compressed size, median CPU time and bytes
+saved per CPU millisecond. Also shows the time to transfer each body over a
+slow mobile link, to weigh CPU against bytes on the wire.
+
+    python benchmarks/bench_compression.py --products 500 --link-kbps 1500
+"""
+import argparse
+import gzip
+import json
+import random
+import statistics
+import time
+import uuid
+
+import brotli
+import zstandard
+
+CATEGORIES = ["Shirts", "Trousers", "Kurtas", "Sarees", "Footwear", "Accessories", "Kids", None]
+WORDS = ("cotton soft breathable classic slim fit handwoven festive printed premium casual "
+         "comfortable everyday durable lightweight traditional modern stylish").split()
+
+LEVELS = {
+    "gzip": [1, 6, 9],
+    "br": [1, 4, 5, 8, 11],
+    "zstd": [1, 3, 9, 19],
+}
+
+
+def compress(encoding: str, level: int, body: bytes) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    return zstandard.ZstdCompressor(level=level).compress(body)
+
+
+def build_payload(products: int, seed: int = 7) -> bytes:
+    rng = random.Random(seed)
+    items = []
+    for i in range(products):
+        mrp = rng.choice([299, 499, 799, 999, 1499, 2499])
+        sale_price = round(mrp * rng.uniform(0.6, 1.0))
+        items.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "business_id": "3f1c2b7e-7d1a-4c51-9a4e-5f0d2c9b8a11",
+            "name": f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}",
+            "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 30))),
+            "mrp": mrp,
+            "sale_price": sale_price,
+            "discount_percentage": round((mrp - sale_price) / mrp * 100, 2),
+            "bulk_pricing": [],
+            "image_url": f"https://images.example.com/{uuid.UUID(int=rng.getrandbits(128)).hex}.jpg",
+            "category": rng.choice(CATEGORIES),
+            "product_type": "clothing",
+            "is_veg": None,
+            "sizes": ["S", "M", "L", "XL"],
+            "colors": rng.sample(["Red", "Blue", "Green", "Black", "White"], 2),
+            "variants": [],
+            "stock_quantity": rng.randint(0, 50),
+            "is_available": True,
+            "created_at": "2025-01-15T10:30:00Z",
+        })
+    return json.dumps(items).encode()
+
+
+def measure(encoding: str, level: int, body: bytes, repeat: int) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        compressed = compress(encoding, level, body)
+        timings.append(time.perf_counter() - started)
+    return len(compressed), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compression CPU cost vs bytes saved")
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--link-kbps", type=float, default=1500, help="Link speed for transfer time estimates")
+    args = parser.parse_args()
+
+    body = build_payload(args.products)
+    bytes_per_ms = args.link_kbps * 1000 / 8 / 1000
+    print(f"Payload: {args.products} products, {len(body):,} bytes "
+          f"({len(body) / bytes_per_ms:.0f} ms at {args.link_kbps:g} kbps)\n")
+    print(f"{'encoding':<10}{'level':>6}{'bytes':>10}{'ratio':>8}{'cpu ms':>9}{'saved/cpu ms':>14}{'transfer ms':>13}")
+
+    for encoding, levels in LEVELS.items():
+        for level in levels:
+            size, seconds = measure(encoding, level, body, args.repeat)
+            cpu_ms = seconds * 1000
+            print(f"{encoding:<10}{level:>6}{size:>10,}{size / len(body):>8.3f}{cpu_ms:>9.2f}"
+                  f"{(len(body) - size) / cpu_ms:>14,.0f}{size / bytes_per_ms:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Hot-path microbenchmarks (pytest-benchmark) with a regression gate.
+
+Covers the per-request building blocks:
+- delivery distance (haversine_distance)
+- password hashing and checking
+- JWT creation and verification
+- discount calculation
+- construction and JSON dumping of Business, Product and Order models
+- list serialization (fast_json.dump_rows) at 10, 100 and 500 rows
+
+The file is collected only when named, so the regular test run skips it:
+
+    cd backend
+    python -m pytest benchmarks/bench_hot_paths.py --benchmark-json=/tmp/bench.json
+    python benchmarks/compare.py /tmp/bench.json
+
+compare.py fails when a benchmark is slower than benchmarks/baseline.json by
+more than its threshold. Refresh the baseline on the machine that runs the
+gate with --update.
+"""
+import os
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'bench')
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from bench_serialization import MODELS, _id  # noqa: E402
+from fast_json import dump_rows  # noqa: E402
+from server import (  # noqa: E402
+    calculate_discount_percentage, create_token, hash_password, haversine_distance, verify_password, verify_token
+)
+
+# bcrypt takes a few hundred milliseconds per call; a handful of rounds is enough
+BCRYPT_ROUNDS = 5
+
+
+def _rows(name: str, count: int) -> list:
+    rng = random.Random(7)
+    make_row = MODELS[name][1]
+    return [make_row(rng, _id(rng)) for _ in range(count)]
+
+
+def test_haversine_distance(benchmark):
+    distance = benchmark(haversine_distance, 19.0760, 72.8777, 19.2183, 72.9781)
+    assert 18 < distance < 20
+
+
+def test_hash_password(benchmark):
+    hashed = benchmark.pedantic(hash_password, args=("correct horse battery",), rounds=BCRYPT_ROUNDS)
+    assert hashed.startswith("$2")
+
+
+def test_verify_password(benchmark):
+    hashed = hash_password("correct horse battery")
+    assert benchmark.pedantic(verify_password, args=("correct horse battery", hashed), rounds=BCRYPT_ROUNDS)
+
+
+def test_create_token(benchmark):
+    token = benchmark(create_token, "3f1c2a9e-0000-4000-8000-000000000001", "owner@example.com")
+    assert token.count(".") == 2
+
+
+def test_verify_token(benchmark):
+    token = create_token("3f1c2a9e-0000-4000-8000-000000000001", "owner@example.com")
+    assert benchmark(verify_token, token)["email"] == "owner@example.com"
+
+
+def test_discount_calculation(benchmark):
+    assert benchmark(calculate_discount_percentage, 1499.0, 999.0) == 33.36
+
+
+@pytest.mark.parametrize("name", ["Business", "Product", "Order"])
+def test_model_construct(benchmark, name):
+    model, row = MODELS[name][0], _rows(name, 1)[0]
+    assert benchmark(lambda: model(**row)).id == row["id"]
+
+
+@pytest.mark.parametrize("name", ["Business", "Product", "Order"])
+def test_model_dump_json(benchmark, name):
+    instance = MODELS[name][0](**_rows(name, 1)[0])
+    assert benchmark(instance.model_dump_json).startswith("{")
+
+
+@pytest.mark.parametrize("rows", [10, 100, 500])
+@pytest.mark.parametrize("name", ["Product", "Order"])
+def test_list_serialization(benchmark, name, rows):
+    model, data = MODELS[name][0], _rows(name, rows)
+    assert benchmark(dump_rows, model, data, mode="validate").startswith(b"[")
@@ -0,0 +1,75 @@
+"""
+MessagePack vs JSON benchmark for order list responses.
+
+Encodes an orders response (default 500 orders with nested items, as
+returned by /api/businesses/{id}/orders) and reports body size, gzip'd size,
+and median encode and decode time for:
+
+- json: stdlib json, as most clients decode
+- orjson: the server's JSON encoder (fast_json trusted mode)
+- msgpack: msgpack.packb / unpackb
+- fast_json validate: the server's default path, TypeAdapter(List[Order])
+  dumping to JSON or MessagePack
+
+    python benchmarks/bench_msgpack.py --orders 500
+"""
+import argparse
+import gzip
+import json
+import random
+import statistics
+import time
+
+import msgpack
+import orjson
+
+# bench_serialization puts the backend on sys.path and configures the server import
+from bench_serialization import _id, order_row
+from fast_json import dump_rows  # noqa: E402
+from msgpack_negotiation import JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE  # noqa: E402
+from server import Order  # noqa: E402
+
+
+def median_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MessagePack vs JSON for order list responses")
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    business_id = _id(rng)
+    rows = [order_row(rng, business_id) for _ in range(args.orders)]
+
+    codecs = {
+        "json": (lambda: json.dumps(rows).encode(), json.loads),
+        "orjson": (lambda: orjson.dumps(rows), orjson.loads),
+        "msgpack": (lambda: msgpack.packb(rows, use_bin_type=True), lambda body: msgpack.unpackb(body, raw=False)),
+        "validate/json": (lambda: dump_rows(Order, rows, mode="validate", media_type=JSON_MEDIA_TYPE), orjson.loads),
+        "validate/msgpack": (
+            lambda: dump_rows(Order, rows, mode="validate", media_type=MSGPACK_MEDIA_TYPE),
+            lambda body: msgpack.unpackb(body, raw=False),
+        ),
+    }
+
+    print(f"{args.orders} orders, median of {args.repeat} runs\n")
+    print(f"{'codec':<18}{'bytes':>10}{'gzip bytes':>12}{'encode ms':>11}{'decode ms':>11}")
+    for name, (encode, decode) in codecs.items():
+        body = encode()
+        assert decode(body) is not None
+        encode_ms = median_ms(encode, args.repeat)
+        decode_ms = median_ms(lambda: decode(body), args.repeat)
+        compressed = len(gzip.compress(body, compresslevel=6, mtime=0))
+        print(f"{name:<18}{len(body):>10,}{compressed:>12,}{encode_ms:>11.2f}{decode_ms:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
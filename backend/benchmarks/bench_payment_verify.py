@@ -0,0 +1,115 @@
+"""
+Payment verification latency benchmark.
+
+Compares the database work behind a successful verify call:
+
+- legacy: update_one transaction, find_one transaction, update_one order
+- atomic: find_one_and_update transaction (returns order_id), update_one order
+
+and checks that concurrent verify calls for the same payment settle it once.
+
+Runs against a scratch database on a real mongod:
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_payment_verify.py --payments 2000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from payment_gateways import settle_transaction  # noqa: E402
+
+
+async def seed(db, count: int) -> list:
+    now = datetime.now(timezone.utc)
+    transactions, orders = [], []
+    for _ in range(count):
+        order_id = str(uuid.uuid4())
+        gateway_order_id = f"order_{uuid.uuid4().hex[:14]}"
+        orders.append({"id": order_id, "business_id": "bench", "status": "pending", "total_amount": 499.0})
+        transactions.append({
+            "id": str(uuid.uuid4()), "business_id": "bench", "order_id": order_id,
+            "amount": 499.0, "currency": "INR", "gateway": "razorpay",
+            "gateway_order_id": gateway_order_id, "status": "pending",
+            "created_at": now, "updated_at": now,
+        })
+    await db.orders.insert_many(orders)
+    await db.payment_transactions.insert_many(transactions)
+    return [t['gateway_order_id'] for t in transactions]
+
+
+async def verify_legacy(db, gateway_order_id: str, payment_id: str):
+    await db.payment_transactions.update_one(
+        {"gateway_order_id": gateway_order_id},
+        {"$set": {"status": "success", "gateway_payment_id": payment_id, "updated_at": datetime.now(timezone.utc)}}
+    )
+    transaction = await db.payment_transactions.find_one({"gateway_order_id": gateway_order_id}, {"_id": 0})
+    if transaction:
+        await db.orders.update_one({"id": transaction['order_id']}, {"$set": {"status": "paid", "payment_id": payment_id}})
+
+
+async def verify_atomic(db, gateway_order_id: str, payment_id: str):
+    transaction = await settle_transaction(db, "bench", "razorpay", gateway_order_id, "success", payment_id)
+    if transaction:
+        await db.orders.update_one(
+            {"id": transaction['order_id'], "business_id": "bench"}, {"$set": {"status": "paid", "payment_id": payment_id}}
+        )
+
+
+async def measure(db, verify, gateway_order_ids: list) -> list:
+    timings = []
+    for gateway_order_id in gateway_order_ids:
+        start = time.perf_counter()
+        await verify(db, gateway_order_id, f"pay_{gateway_order_id[-8:]}")
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(name: str, timings: list):
+    timings = sorted(timings)
+    p50 = statistics.median(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{name:<8} n={len(timings):<6} p50={p50:.3f}ms  p99={p99:.3f}ms  mean={statistics.fmean(timings):.3f}ms")
+
+
+async def check_idempotent(db, concurrency: int):
+    gateway_order_id = (await seed(db, 1))[0]
+    results = await asyncio.gather(*(
+        settle_transaction(db, "bench", "razorpay", gateway_order_id, "success", "pay_race") for _ in range(concurrency)
+    ))
+    winners = [r for r in results if r]
+    status = "OK" if len(winners) == 1 else "FAILED"
+    print(f"idempotency: {concurrency} concurrent verifies -> {len(winners)} settlement(s) [{status}]")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payments", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    db_name = f"bench_verify_{uuid.uuid4().hex[:8]}"
+    db = client[db_name]
+    try:
+        await db.payment_transactions.create_index("gateway_order_id")
+        legacy_ids = await seed(db, args.payments)
+        atomic_ids = await seed(db, args.payments)
+
+        report("legacy", await measure(db, verify_legacy, legacy_ids))
+        report("atomic", await measure(db, verify_atomic, atomic_ids))
+        await check_idempotent(db, args.concurrency)
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,151 @@
+"""
+List response serialization benchmark.
+
+Measures per-row cost of turning stored rows into a JSON response body for
+each list model, three ways:
+
+- response_model: the old handler path, a datetime.fromisoformat loop, then
+  FastAPI's response_model validation/serialization and JSONResponse rendering
+- validate: fast_json with a cached TypeAdapter(List[Model]) (the default)
+- trusted: fast_json with FAST_JSON_MODE=trusted, defaults merged and orjson
+
+Rows are synthetic and shaped like the documents the handlers project, so no
+database is needed:
+    python benchmarks/bench_serialization.py --rows 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'bench')
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from fast_json import dump_rows  # noqa: E402
+from server import Booking, Business, Order, Product  # noqa: E402
+
+WORDS = ("cotton soft breathable classic slim fit handwoven festive printed premium casual "
+         "comfortable everyday durable lightweight traditional modern stylish").split()
+
+
+def _id(rng) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128)))
+
+
+def _created_at(rng) -> str:
+    moment = datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=rng.randint(0, 30_000_000))
+    return moment.isoformat()
+
+
+def product_row(rng, business_id):
+    mrp = rng.choice([299, 499, 799, 999, 1499])
+    sale_price = round(mrp * rng.uniform(0.6, 1.0))
+    return {
+        "id": _id(rng), "business_id": business_id,
+        "name": f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}",
+        "description": " ".join(rng.choice(WORDS) for _ in range(20)),
+        "mrp": float(mrp), "sale_price": float(sale_price),
+        "discount_percentage": round((mrp - sale_price) / mrp * 100, 2),
+        "bulk_pricing": [], "image_url": None, "category": rng.choice(["Shirts", "Kurtas", None]),
+        "product_type": "clothing", "is_veg": None, "sizes": ["S", "M", "L"], "colors": ["Red", "Blue"],
+        "variants": [], "stock_quantity": rng.randint(0, 50), "is_available": True,
+        "created_at": _created_at(rng),
+    }
+
+
+def order_row(rng, business_id):
+    items = [
+        {"product_id": _id(rng), "product_name": rng.choice(WORDS).title(), "quantity": rng.randint(1, 4),
+         "mrp": 999.0, "sale_price": 799.0, "discount_percentage": 20.02}
+        for _ in range(rng.randint(1, 5))
+    ]
+    return {
+        "id": _id(rng), "business_id": business_id, "customer_name": "Asha", "customer_phone": "9876543210",
+        "customer_address": "12 MG Road", "items": items,
+        "total_amount": sum(item["sale_price"] * item["quantity"] for item in items),
+        "notes": None, "status": "pending", "created_at": _created_at(rng),
+    }
+
+
+def booking_row(rng, business_id):
+    return {
+        "id": _id(rng), "business_id": business_id, "customer_name": "Asha", "customer_phone": "9876543210",
+        "customer_email": None, "service_type": "Haircut", "preferred_date": "2025-03-01",
+        "preferred_time": "10:30", "notes": None, "status": "pending", "created_at": _created_at(rng),
+    }
+
+
+def business_row(rng, business_id):
+    return {
+        "id": business_id, "user_id": _id(rng), "name": "Demo Fashion", "description": "Clothing store",
+        "subdomain": f"shop{rng.getrandbits(32)}", "whatsapp_number": "9876543210", "category": "fashion",
+        "template_type": "retail", "gallery_images": [], "reviews": [], "delivery_charges": 40.0,
+        "tax_percentage": 5.0, "configured_secrets": [], "content_version": 3,
+        "created_at": _created_at(rng), "is_active": True,
+    }
+
+
+MODELS = {
+    "Product": (Product, product_row),
+    "Order": (Order, order_row),
+    "Booking": (Booking, booking_row),
+    "Business": (Business, business_row),
+}
+
+
+def response_model_path(model, field, rows) -> bytes:
+    """What the handlers did before: parse dates, then let FastAPI validate and serialize"""
+    for row in rows:
+        if isinstance(row.get('created_at'), str):
+            row['created_at'] = datetime.fromisoformat(row['created_at'])
+    content = asyncio.run(serialize_response(field=field, response_content=rows))
+    return JSONResponse(content).body
+
+
+def measure(fn, make_rows, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        rows = make_rows()
+        started = time.perf_counter()
+        fn(rows)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-row list serialization cost by model")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"{args.rows} rows per response, median of {args.repeat} runs, µs per row\n")
+    print(f"{'model':<10}{'response_model':>16}{'validate':>10}{'trusted':>10}{'speedup':>9}")
+    for name, (model, make_row) in MODELS.items():
+        rng = random.Random(7)
+        template = [make_row(rng, _id(rng)) for _ in range(args.rows)]
+        make_rows = lambda: [dict(row) for row in template]  # noqa: E731
+        field = create_response_field(name=f"bench_{name}", type_=List[model])
+
+        legacy = measure(lambda rows: response_model_path(model, field, rows), make_rows, args.repeat)
+        validate = measure(lambda rows: dump_rows(model, rows, mode="validate"), make_rows, args.repeat)
+        trusted = measure(lambda rows: dump_rows(model, rows, mode="trusted"), make_rows, args.repeat)
+
+        per_row = lambda seconds: seconds / args.rows * 1e6  # noqa: E731
+        print(f"{name:<10}{per_row(legacy):>16.2f}{per_row(validate):>10.2f}{per_row(trusted):>10.2f}"
+              f"{legacy / trusted:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Stored document size with and without sparse storage.
+
+Builds synthetic businesses, products, orders and bookings shaped like the
+ones the API creates and compares the BSON size of the full model_dump()
+(what was written before) with storage_document(). Uncompressed BSON is also
+what documents occupy in the WiredTiger cache, so the totals approximate the
+cache footprint at --target documents per collection.
+
+    python benchmarks/bench_sparse_storage.py --rows 2000 --target 1000000
+"""
+import argparse
+import random
+import statistics
+
+import bson
+
+# bench_serialization puts the backend on sys.path and configures the server import
+from bench_serialization import MODELS, _id
+from sparse_storage import storage_document  # noqa: E402
+
+
+def _mb(size: float) -> str:
+    return f"{size / 1024 / 1024:,.1f} MB"
+
+
+def stored_size(doc: dict) -> int:
+    doc = dict(doc)
+    doc['created_at'] = doc['created_at'].isoformat()
+    return len(bson.encode(doc))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full vs sparse stored document size")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--target", type=int, default=1_000_000, help="Documents per collection to scale to")
+    args = parser.parse_args()
+
+    print(f"{'model':<10}{'fields':>14}{'bytes/doc':>16}{'saved':>8}{f'at {args.target:,}':>26}")
+    for name, (model, make_row) in MODELS.items():
+        rng = random.Random(7)
+        instances = [model.model_validate(make_row(rng, _id(rng))) for _ in range(args.rows)]
+        full = [instance.model_dump() for instance in instances]
+        sparse = [storage_document(instance) for instance in instances]
+        full_size = statistics.mean(stored_size(doc) for doc in full)
+        sparse_size = statistics.mean(stored_size(doc) for doc in sparse)
+        fields = f"{statistics.mean(len(d) for d in full):.0f} -> {statistics.mean(len(d) for d in sparse):.0f}"
+        print(f"{name:<10}{fields:>14}{full_size:>8.0f} -> {sparse_size:<5.0f}"
+              f"{(1 - sparse_size / full_size) * 100:>7.0f}%"
+              f"{_mb(full_size * args.target):>13} -> {_mb(sparse_size * args.target)}")
+
+
+if __name__ == "__main__":
+    main()
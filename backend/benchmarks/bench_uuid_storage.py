@@ -0,0 +1,99 @@
+"""
+Order storage size with string vs binary UUID ids.
+
+Encodes synthetic orders (nested items included) both ways and reports BSON
+document size and raw key bytes for the id and business_id indexes, scaled to
+--target orders (default 10M).
+
+With --mongo, the orders are also inserted into two scratch collections on a
+real mongod, indexed like production, and collStats gives the actual data,
+storage and index sizes (WiredTiger compression and index prefix compression
+included), scaled the same way. Use --orders 10000000 to measure the full
+dataset instead of extrapolating:
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_uuid_storage.py --orders 200000 --mongo
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+
+import bson
+
+# bench_serialization puts the backend on sys.path and configures the server import
+from bench_serialization import _id, order_row
+from id_codec import encode_document  # noqa: E402
+
+INDEXES = ("id", "business_id")
+
+
+def _mb(size: float) -> str:
+    return f"{size / 1024 / 1024:,.1f} MB"
+
+
+def build_orders(count: int, businesses: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    business_ids = [_id(rng) for _ in range(businesses)]
+    return [order_row(rng, rng.choice(business_ids)) for _ in range(count)]
+
+
+def bson_report(orders: list, target: int):
+    string_sizes = [len(bson.encode(order)) for order in orders]
+    binary_sizes = [len(bson.encode(encode_document(order))) for order in orders]
+    scale = target / len(orders)
+
+    print(f"BSON per order: {statistics.mean(string_sizes):.0f} -> {statistics.mean(binary_sizes):.0f} bytes")
+    print(f"Documents at {target:,} orders: {_mb(sum(string_sizes) * scale)} -> {_mb(sum(binary_sizes) * scale)}")
+    for field in INDEXES:
+        string_key = len(bson.encode({"": orders[0][field]}))
+        binary_key = len(bson.encode({"": encode_document(orders[0])[field]}))
+        print(f"Index {field}: {string_key} -> {binary_key} key bytes, "
+              f"{_mb(string_key * target)} -> {_mb(binary_key * target)} before prefix compression")
+
+
+async def mongo_report(orders: list, target: int, batch_size: int = 5000):
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ.get('BENCH_DB_NAME', 'bench_uuid_storage')]
+    scale = target / len(orders)
+    print(f"\n{'storage':<8}{'data':>14}{'on disk':>14}{'indexes':>14}{'working set':>16}  (scaled to {target:,})")
+
+    results = {}
+    for storage, convert in (("string", dict), ("binary", encode_document)):
+        collection = db[f"orders_{storage}"]
+        await collection.drop()
+        for start in range(0, len(orders), batch_size):
+            await collection.insert_many([convert(order) for order in orders[start:start + batch_size]])
+        for field in INDEXES:
+            await collection.create_index(field)
+        stats = await db.command("collStats", collection.name)
+        results[storage] = stats["size"] + stats["totalIndexSize"]
+        print(f"{storage:<8}{_mb(stats['size'] * scale):>14}{_mb(stats['storageSize'] * scale):>14}"
+              f"{_mb(stats['totalIndexSize'] * scale):>14}{_mb(results[storage] * scale):>16}")
+        for name, size in stats["indexSizes"].items():
+            print(f"  {name:<20}{_mb(size * scale):>14}")
+        await collection.drop()
+
+    saved = results["string"] - results["binary"]
+    print(f"\nWorking set reduction: {_mb(saved * scale)} ({saved / results['string'] * 100:.1f}%)")
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="String vs binary UUID storage for orders")
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--businesses", type=int, default=2000)
+    parser.add_argument("--target", type=int, default=10_000_000, help="Dataset size to scale results to")
+    parser.add_argument("--mongo", action="store_true", help="Measure collStats on MONGO_URL")
+    args = parser.parse_args()
+
+    orders = build_orders(args.orders, args.businesses)
+    bson_report(orders, args.target)
+    if args.mongo:
+        asyncio.run(mongo_report(orders, args.target))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Regression gate for the hot-path microbenchmarks.
+
+Compares a pytest-benchmark JSON run (bench_hot_paths.py --benchmark-json)
+with benchmarks/baseline.json and exits non-zero when any benchmark's --stat
+(default: min, the least noisy) is slower than its baseline by more than
+--threshold. Benchmarks missing from either side are listed, not failed.
+
+    python benchmarks/compare.py /tmp/bench.json [--threshold 0.15]
+    python benchmarks/compare.py /tmp/bench.json --update   # accept the run as the new baseline
+
+Timings only compare on the same machine; the baseline records the CPU and
+Python it was taken on and a mismatch is printed as a warning.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+STATS = ("min", "median", "mean")
+
+
+def machine(run: dict) -> dict:
+    info = run.get("machine_info", {})
+    return {"cpu": info.get("cpu", {}).get("brand_raw"), "python": info.get("python_version")}
+
+
+def summarize(run: dict) -> dict:
+    """The parts of a pytest-benchmark run worth keeping as a baseline (seconds)"""
+    return {
+        "machine": machine(run),
+        "benchmarks": {
+            bench["name"]: {stat: bench["stats"][stat] for stat in (*STATS, "rounds")}
+            for bench in sorted(run["benchmarks"], key=lambda bench: bench["name"])
+        },
+    }
+
+
+def compare(baseline: dict, current: dict, stat: str, threshold: float) -> Tuple[List[tuple], List[str]]:
+    """Rows of (name, baseline, current, change, status) and the regressed names"""
+    rows, regressed = [], []
+    base, now = baseline["benchmarks"], current["benchmarks"]
+    for name in sorted(set(base) | set(now)):
+        if name not in now:
+            rows.append((name, base[name][stat], None, None, "missing"))
+            continue
+        if name not in base:
+            rows.append((name, None, now[name][stat], None, "new"))
+            continue
+        change = now[name][stat] / base[name][stat] - 1
+        if change > threshold:
+            status = "REGRESSED"
+            regressed.append(name)
+        else:
+            status = "faster" if change < -threshold else "ok"
+        rows.append((name, base[name][stat], now[name][stat], change, status))
+    return rows, regressed
+
+
+def _time(seconds) -> str:
+    if seconds is None:
+        return "-"
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def format_report(rows: List[tuple], stat: str) -> str:
+    lines = [f"{'benchmark':<42} {'baseline ' + stat:>16} {'current':>12} {'change':>8}  status"]
+    for name, base, now, change, status in rows:
+        change = f"{change:+.1%}" if change is not None else "-"
+        lines.append(f"{name:<42} {_time(base):>16} {_time(now):>12} {change:>8}  {status}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("run", type=Path, help="pytest-benchmark --benchmark-json output")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--stat", choices=STATS, default="min")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown (0.15 = 15%%)")
+    parser.add_argument("--update", action="store_true", help="Write the run as the new baseline")
+    args = parser.parse_args(argv)
+
+    current = summarize(json.loads(args.run.read_text()))
+    if args.update:
+        args.baseline.write_text(json.dumps(current, indent=2) + "\n")
+        print(f"Baseline of {len(current['benchmarks'])} benchmarks written to {args.baseline}")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline["machine"] != current["machine"]:
+        print(f"Warning: baseline taken on {baseline['machine']}, this run on {current['machine']}\n")
+    rows, regressed = compare(baseline, current, args.stat, args.threshold)
+    print(format_report(rows, args.stat))
+    if regressed:
+        print(f"\n{len(regressed)} benchmark(s) slower than baseline by more than {args.threshold:.0%}: "
+              f"{', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Negotiated response compression.
+
+CompressionMiddleware compresses JSON and text responses of at least
+COMPRESSION_MIN_SIZE bytes. It picks brotli, zstd or gzip from the client's
+Accept-Encoding (honouring q-values, server preference breaking ties).
+Responses that carry a strong ETag (the versioned storefront routes) are
+compressed once: the encoded body is kept in a byte-bounded LRU keyed by
+(ETag, encoding), and the ETag gets an encoding suffix so each variant has its
+own strong validator.
+
+Per-encoding counters record compression time against bytes saved, so the CPU
+cost of each level can be weighed (see benchmarks/bench_compression.py).
+"""
+import gzip
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import brotli
+import zstandard
+from starlette.datastructures import Headers, MutableHeaders
+
+from http_cache import CONTENT_CODINGS, base_etag, encoded_etag
+
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_CACHE_BYTES = int(os.environ.get('COMPRESSION_CACHE_BYTES', str(32 * 1024 * 1024)))
+# Levels tuned for per-request work; snapshots use the maximum levels offline
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+ZSTD_LEVEL = int(os.environ.get('ZSTD_LEVEL', '3'))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "text/", "application/javascript", "image/svg+xml")
+
+_zstd = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+
+COMPRESSORS = {
+    "br": lambda body: brotli.compress(body, quality=BROTLI_QUALITY),
+    "zstd": _zstd.compress,
+    "gzip": lambda body: gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0),
+}
+
+
+def negotiate(accept_encoding: str, available=CONTENT_CODINGS) -> Optional[str]:
+    """Best encoding the client accepts, or None for identity"""
+    weights = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            weights[name.strip()] = q
+
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressedBodyCache:
+    """LRU of encoded bodies bounded by total size"""
+
+    def __init__(self, max_bytes: int = COMPRESSION_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+
+    def get(self, key: Tuple[str, str]) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+        return body
+
+    def put(self, key: Tuple[str, str], body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self._entries[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _new_stats() -> Dict[str, float]:
+    return {"responses": 0, "cache_hits": 0, "bytes_in": 0, "bytes_out": 0, "compress_seconds": 0.0}
+
+
+class Compressor:
+    """Compresses bodies, reusing cached results for strong ETags, and keeps per-encoding stats"""
+
+    def __init__(self, cache_bytes: int = COMPRESSION_CACHE_BYTES):
+        self.cache = CompressedBodyCache(cache_bytes)
+        self.stats = {encoding: _new_stats() for encoding in COMPRESSORS}
+
+    def compress(self, body: bytes, encoding: str, etag: Optional[str] = None) -> bytes:
+        stats = self.stats[encoding]
+        key = (etag, encoding) if etag and not etag.startswith('W/') else None
+        compressed = self.cache.get(key) if key else None
+        if compressed is not None:
+            stats["cache_hits"] += 1
+        else:
+            started = time.perf_counter()
+            compressed = COMPRESSORS[encoding](body)
+            stats["compress_seconds"] += time.perf_counter() - started
+            if key:
+                self.cache.put(key, compressed)
+        stats["responses"] += 1
+        stats["bytes_in"] += len(body)
+        stats["bytes_out"] += len(compressed)
+        return compressed
+
+    def summary(self) -> dict:
+        """Per-encoding totals with ratio and bytes saved per CPU millisecond"""
+        result = {"cache_entries": len(self.cache), "cache_bytes": self.cache.size, "encodings": {}}
+        for encoding, stats in self.stats.items():
+            saved = stats["bytes_in"] - stats["bytes_out"]
+            result["encodings"][encoding] = {
+                **stats,
+                "compress_seconds": round(stats["compress_seconds"], 4),
+                "bytes_saved": saved,
+                "ratio": round(stats["bytes_out"] / stats["bytes_in"], 3) if stats["bytes_in"] else None,
+                "bytes_saved_per_cpu_ms": (
+                    round(saved / (stats["compress_seconds"] * 1000)) if stats["compress_seconds"] else None
+                ),
+            }
+        return result
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing eligible buffered responses"""
+
+    def __init__(self, app, compressor: Optional[Compressor] = None, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.compressor = compressor or Compressor()
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        start_message = None
+        chunks = []
+
+        async def send_buffered(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            await self._send(start_message, b"".join(chunks), request_headers, send)
+
+        await self.app(scope, receive, send_buffered)
+
+    async def _send(self, start_message, body: bytes, request_headers: Headers, send):
+        headers = MutableHeaders(raw=list(start_message["headers"]))
+        start_message["headers"] = headers.raw
+        status = start_message["status"]
+
+        if status == 304 and headers.get("etag"):
+            # Echo the encoded variant the client revalidated with
+            for tag in request_headers.get("if-none-match", "").split(','):
+                if tag.strip() and base_etag(tag) == base_etag(headers["etag"]):
+                    headers["etag"] = tag.strip()
+                    break
+
+        content_type = headers.get("content-type", "")
+        eligible = (
+            status == 200
+            and "content-encoding" not in headers
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+            and len(body) >= self.minimum_size
+        )
+        if eligible:
+            headers.add_vary_header("Accept-Encoding")
+            encoding = negotiate(request_headers.get("accept-encoding", ""))
+            if encoding:
+                etag = headers.get("etag")
+                compressed = self.compressor.compress(body, encoding, etag)
+                if len(compressed) < len(body):
+                    body = compressed
+                    headers["content-encoding"] = encoding
+                    headers["content-length"] = str(len(body))
+                    if etag and not etag.startswith('W/'):
+                        headers["etag"] = encoded_etag(etag, encoding)
+
+        await send(start_message)
+        await send({"type": "http.response.body", "body": body})
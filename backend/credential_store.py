@@ -0,0 +1,138 @@
+"""
+Encrypted store for business secrets.
+
+Gateway secrets (and the WhatsApp API key) live in the business_credentials
+collection, one Fernet-encrypted blob per business, instead of on the
+business document. Storefront reads never touch them, so business documents
+stay small and are safe to cache or publish. Only the payment routes load
+credentials, through a short-TTL in-memory cache of decrypted values.
+
+The key is CREDENTIALS_ENCRYPTION_KEY (Fernet.generate_key()). Without it the
+key is derived from JWT_SECRET, but never from a missing or shipped-default
+JWT_SECRET: anyone with the source could decrypt every stored secret, so
+building a CredentialStore (and so starting the server) fails instead.
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from cryptography.fernet import Fernet, InvalidToken
+
+logger = logging.getLogger(__name__)
+
+# Fields moved off the business document
+SECRET_FIELDS = (
+    'razorpay_key_secret',
+    'stripe_secret_key',
+    'payu_merchant_salt',
+    'phonepe_salt_key',
+    'whatsapp_api_key',
+)
+
+CREDENTIALS_CACHE_TTL = float(os.environ.get('CREDENTIALS_CACHE_TTL', '60'))
+
+
+# JWT_SECRET's fallback in server.py; public, so never a key source
+DEFAULT_JWT_SECRET = 'your-secret-key-change-in-production'
+
+
+def _load_fernet() -> Fernet:
+    key = os.environ.get('CREDENTIALS_ENCRYPTION_KEY')
+    if key:
+        return Fernet(key.encode())
+    secret = os.environ.get('JWT_SECRET')
+    if not secret or secret == DEFAULT_JWT_SECRET:
+        raise RuntimeError(
+            "CREDENTIALS_ENCRYPTION_KEY is not set and JWT_SECRET is missing or the shipped default; "
+            "set CREDENTIALS_ENCRYPTION_KEY to a key from Fernet.generate_key()"
+        )
+    logger.warning("CREDENTIALS_ENCRYPTION_KEY not set; deriving the credential key from JWT_SECRET")
+    return Fernet(base64.urlsafe_b64encode(hashlib.sha256(secret.encode()).digest()))
+
+
+def split_secrets(data: dict) -> Tuple[dict, dict]:
+    """Split a business payload into (document fields, secret fields)"""
+    secrets = {k: data[k] for k in SECRET_FIELDS if k in data}
+    fields = {k: v for k, v in data.items() if k not in SECRET_FIELDS}
+    return fields, secrets
+
+
+class CredentialStore:
+    """Encrypted per-business secrets with a short-lived decrypted cache"""
+
+    def __init__(self, db, ttl: float = CREDENTIALS_CACHE_TTL):
+        self.db = db
+        self.ttl = ttl
+        self._fernet = _load_fernet()
+        self._cache: Dict[str, Tuple[float, dict]] = {}
+
+    async def ensure_indexes(self):
+        await self.db.business_credentials.create_index("business_id", unique=True)
+
+    def encrypt(self, secrets: dict) -> str:
+        """The stored form of a business's secrets (the "encrypted" field)"""
+        return self._fernet.encrypt(json.dumps(secrets).encode()).decode()
+
+    def _decrypt(self, doc: Optional[dict]) -> dict:
+        if not doc:
+            return {}
+        try:
+            return json.loads(self._fernet.decrypt(doc['encrypted'].encode()))
+        except InvalidToken:
+            logger.error("Could not decrypt credentials for business %s", doc.get('business_id'))
+            return {}
+
+    async def _fetch(self, business_id: str) -> dict:
+        doc = await self.db.business_credentials.find_one({"business_id": business_id}, {"_id": 0, "encrypted": 1})
+        return self._decrypt(doc)
+
+    async def get(self, business_id: str) -> dict:
+        """Decrypted secrets for a business ({} if none are stored)"""
+        cached = self._cache.get(business_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        secrets = await self._fetch(business_id)
+        self._cache[business_id] = (time.monotonic() + self.ttl, secrets)
+        return secrets
+
+    async def get_many(self, business_ids: list) -> Dict[str, dict]:
+        """Decrypted secrets for several businesses in one query (bypasses the cache)"""
+        docs = await self.db.business_credentials.find(
+            {"business_id": {"$in": business_ids}}, {"_id": 0, "business_id": 1, "encrypted": 1}
+        ).to_list(None)
+        return {doc['business_id']: self._decrypt(doc) for doc in docs}
+
+    async def update(self, business_id: str, changes: dict) -> list:
+        """Merge changes into a business's secrets (None or "" removes a secret).
+
+        Returns the names of the secrets configured afterwards.
+        """
+        secrets = await self._fetch(business_id)
+        for field, value in changes.items():
+            if not value:
+                secrets.pop(field, None)
+            else:
+                secrets[field] = value
+
+        encrypted = self.encrypt(secrets)
+        await self.db.business_credentials.update_one(
+            {"business_id": business_id},
+            {"$set": {"encrypted": encrypted, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        self.invalidate(business_id)
+        return sorted(secrets)
+
+    async def load_business(self, business: dict) -> dict:
+        """Business document with its secrets merged in, for payment routes only"""
+        secrets = await self.get(business['id'])
+        return {**business, **secrets}
+
+    def invalidate(self, business_id: str):
+        self._cache.pop(business_id, None)
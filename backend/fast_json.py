@@ -0,0 +1,96 @@
+"""
+Fast JSON path for list responses.
+
+Returning rows through response_model=List[Model] makes FastAPI validate every
+row, dump it to Python primitives and then run json.dumps over the result.
+Handlers that opt in return rows_response(Model, rows) (or row_response for a
+single document) instead; the route keeps its response_model, so the OpenAPI
+schema is unchanged.
+
+FAST_JSON_MODE picks how rows are encoded:
+
+- "validate" (default): one cached TypeAdapter(List[Model]) validates the rows
+  and dumps JSON bytes in pydantic-core. Output is identical to the
+  response_model path, ISO date strings included, so handlers can skip their
+  datetime.fromisoformat loops.
+- "trusted": rows fetched with the model's projection are trusted as stored.
+  Missing fields get the model's static defaults and orjson writes the
+  bytes. No validation happens, and stored date strings are sent unchanged.
+
+Clients that negotiated MessagePack get the same rows packed with msgpack
+instead of JSON bytes.
+"""
+import os
+from functools import lru_cache
+from typing import Iterable, List, Optional, Type
+
+import orjson
+from fastapi import Response
+from opentelemetry import trace
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import PydanticUndefined
+
+from msgpack_negotiation import JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, packb, response_media_type
+
+FAST_JSON_MODE = os.environ.get('FAST_JSON_MODE', 'validate')
+
+tracer = trace.get_tracer(__name__)
+
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """TypeAdapter(List[model]), built once per model"""
+    return TypeAdapter(List[model])
+
+
+@lru_cache(maxsize=None)
+def row_defaults(model: Type[BaseModel]) -> dict:
+    """Static field defaults, used to fill fields missing from sparse rows"""
+    # Factory defaults (ids, timestamps) are per-instance and never filled in
+    return {
+        name: field.default
+        for name, field in model.model_fields.items()
+        if field.default is not PydanticUndefined
+    }
+
+
+def dump_rows(
+    model: Type[BaseModel], rows: Iterable[dict], mode: Optional[str] = None, media_type: str = JSON_MEDIA_TYPE
+) -> bytes:
+    """Encode DB rows as an array shaped like List[model], in JSON or MessagePack"""
+    as_msgpack = media_type == MSGPACK_MEDIA_TYPE
+    if (mode or FAST_JSON_MODE) == "trusted":
+        defaults = row_defaults(model)
+        rows = [{**defaults, **row} for row in rows]
+        return packb(rows) if as_msgpack else orjson.dumps(rows, option=ORJSON_OPTIONS)
+    adapter = list_adapter(model)
+    validated = adapter.validate_python(rows)
+    return packb(adapter.dump_python(validated, mode="json")) if as_msgpack else adapter.dump_json(validated)
+
+
+def dump_row(
+    model: Type[BaseModel], row: dict, mode: Optional[str] = None, media_type: str = JSON_MEDIA_TYPE
+) -> bytes:
+    """Encode one DB row shaped like model, in JSON or MessagePack"""
+    as_msgpack = media_type == MSGPACK_MEDIA_TYPE
+    if (mode or FAST_JSON_MODE) == "trusted":
+        row = {**row_defaults(model), **row}
+        return packb(row) if as_msgpack else orjson.dumps(row, option=ORJSON_OPTIONS)
+    validated = model.model_validate(row)
+    return packb(validated.model_dump(mode="json")) if as_msgpack else validated.model_dump_json().encode()
+
+
+def rows_response(model: Type[BaseModel], rows: Iterable[dict], headers: Optional[dict] = None) -> Response:
+    media_type = response_media_type.get()
+    with tracer.start_as_current_span(f"serialize {model.__name__}"):
+        content = dump_rows(model, rows, media_type=media_type)
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+def row_response(model: Type[BaseModel], row: dict, headers: Optional[dict] = None) -> Response:
+    media_type = response_media_type.get()
+    with tracer.start_as_current_span(f"serialize {model.__name__}"):
+        content = dump_row(model, row, media_type=media_type)
+    return Response(content=content, media_type=media_type, headers=headers)
@@ -0,0 +1,74 @@
+"""
+Sparse field selection for list and detail routes.
+
+Routes that accept ?fields=id,customer_name,total_amount,status fetch only
+those fields from MongoDB and encode them through a trimmed copy of the
+response model, so both the DB transfer and the JSON body shrink. Field names
+are checked against the response model; unknown names are a 400. "id" is
+always returned so clients can still address the rows they get back.
+
+Without ?fields= the selection covers every model field, so routes use the
+same projection and model either way.
+"""
+import hashlib
+from functools import lru_cache
+from typing import Optional, Tuple, Type
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel, create_model
+
+ALWAYS_SELECTED = ("id",)
+
+
+@lru_cache(maxsize=256)
+def partial_model(model: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """Copy of model restricted to fields, keeping their types and defaults"""
+    return create_model(
+        f"{model.__name__}Fields",
+        **{name: (model.model_fields[name].annotation, model.model_fields[name]) for name in fields}
+    )
+
+
+class FieldSelection:
+    """Fields a request asked for, with the matching projection and response model"""
+
+    def __init__(self, model: Type[BaseModel], fields: Optional[Tuple[str, ...]] = None):
+        self.partial = fields is not None
+        self.fields = fields if self.partial else tuple(model.model_fields)
+        self.model = partial_model(model, self.fields) if self.partial else model
+        self.projection = {"_id": 0, **{name: 1 for name in self.fields}}
+        # Distinguishes representations of one resource (ETags, compressed body cache)
+        self.tag = hashlib.blake2s(",".join(self.fields).encode(), digest_size=4).hexdigest() if self.partial else None
+
+    def etag_kind(self, kind: str) -> str:
+        return f"{kind}-{self.tag}" if self.partial else kind
+
+
+@lru_cache(maxsize=None)
+def full_selection(model: Type[BaseModel]) -> FieldSelection:
+    return FieldSelection(model)
+
+
+def parse_fields(model: Type[BaseModel], fields: Optional[str]) -> FieldSelection:
+    if not fields:
+        return full_selection(model)
+    requested = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = sorted(set(requested) - set(model.model_fields))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(model.model_fields)}"
+        )
+    # Model order, so equivalent requests share one trimmed model and tag
+    selected = set(requested) | set(ALWAYS_SELECTED)
+    return FieldSelection(model, tuple(name for name in model.model_fields if name in selected))
+
+
+def select_fields(model: Type[BaseModel]):
+    """Dependency parsing ?fields= against model"""
+    description = f"Comma-separated {model.__name__} fields to return. Allowed: {', '.join(model.model_fields)}"
+
+    def dependency(fields: Optional[str] = Query(None, description=description)) -> FieldSelection:
+        return parse_fields(model, fields)
+
+    return dependency
@@ -0,0 +1,76 @@
+"""
+HTTP caching helpers for public storefront routes.
+
+Every business carries a content_version that business and product writes
+increment. Public GET routes derive a strong ETag from it, so a revalidation
+only needs the business's version (never the product documents) to answer
+304 Not Modified. The Surrogate-Key header names the business, letting a CDN
+purge all of its cached responses after an update.
+"""
+import os
+
+from fastapi import Request, Response
+
+# Browsers revalidate every time; shared caches may serve for a short while
+PUBLIC_MAX_AGE = int(os.environ.get('PUBLIC_MAX_AGE', '0'))
+PUBLIC_SHARED_MAX_AGE = int(os.environ.get('PUBLIC_SHARED_MAX_AGE', '60'))
+
+# Content codings the compression middleware may apply
+CONTENT_CODINGS = ("br", "zstd", "gzip")
+# Alternative media types negotiated from Accept (see msgpack_negotiation)
+MEDIA_VARIANTS = ("msgpack",)
+
+
+def content_etag(kind: str, business_id: str, version: int) -> str:
+    """Strong ETag for one representation of a business's public content"""
+    return f'"{kind}-{business_id}-v{version}"'
+
+
+def surrogate_key(business_id: str) -> str:
+    return f"business-{business_id}"
+
+
+def cache_headers(etag: str, business_id: str) -> dict:
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={PUBLIC_MAX_AGE}, s-maxage={PUBLIC_SHARED_MAX_AGE}, must-revalidate",
+        "Surrogate-Key": surrogate_key(business_id),
+    }
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """ETag of a content-coded variant; strong validators must differ per encoding"""
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def media_etag(etag: str, variant: str) -> str:
+    """ETag of the same content in another media type"""
+    return f'{etag[:-1]}-{variant}"'
+
+
+def _strip_suffix(tag: str, suffixes) -> str:
+    for name in suffixes:
+        suffix = f'-{name}"'
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)] + '"'
+    return tag
+
+
+def base_etag(tag: str) -> str:
+    """Strip the weak prefix and any content-coding and media suffixes"""
+    tag = tag.strip().removeprefix('W/')
+    return _strip_suffix(_strip_suffix(tag, CONTENT_CODINGS), MEDIA_VARIANTS)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether If-None-Match lists the ETag or one of its encoded variants (weak comparison)"""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return any(base_etag(tag) == etag for tag in header.split(','))
+
+
+def not_modified(etag: str, business_id: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag, business_id))
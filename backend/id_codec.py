@@ -0,0 +1,237 @@
+"""
+Binary UUID storage for entity ids.
+
+Entity ids are uuid4 strings: 36 bytes in every document and index entry,
+repeated as foreign keys (business_id, product_id, ...) across products,
+orders and transactions. With UUID_STORAGE=binary the id fields in ID_FIELDS
+are stored as BSON binary UUIDs (subtype 4, 16 bytes) instead.
+
+The API keeps string ids. storage_database() wraps the Motor database so
+filters, inserted documents and updates have their UUID strings encoded on
+the way in, and binary UUIDs are decoded back to strings on the way out.
+Values that are not canonical lowercase UUID strings (legacy or gateway ids)
+are stored unchanged.
+
+Existing data is converted with scripts/migrate_uuid_ids.py; switch
+UUID_STORAGE once the migration has run.
+"""
+import copy
+import os
+import uuid
+from typing import Any
+
+from bson.binary import Binary, UuidRepresentation, UUID_SUBTYPE
+
+UUID_STORAGE = os.environ.get('UUID_STORAGE', 'string')
+
+# Fields holding entity ids, at any depth (e.g. orders.items.product_id)
+ID_FIELDS = frozenset({"id", "business_id", "user_id", "product_id", "order_id", "transaction_id"})
+
+_LOGICAL_OPERATORS = ("$and", "$or", "$nor")
+_VALUE_OPERATORS = ("$eq", "$ne", "$in", "$nin")
+_DOCUMENT_UPDATES = ("$set", "$setOnInsert", "$push", "$addToSet")
+
+
+def _is_id_key(key: str) -> bool:
+    return key.rsplit('.', 1)[-1] in ID_FIELDS
+
+
+def encode_id(value: Any) -> Any:
+    """Binary UUID for a canonical UUID string, anything else unchanged"""
+    if isinstance(value, str) and len(value) == 36:
+        try:
+            parsed = uuid.UUID(value)
+        except ValueError:
+            return value
+        if str(parsed) == value:
+            return Binary.from_uuid(parsed, UuidRepresentation.STANDARD)
+    elif isinstance(value, list):
+        return [encode_id(item) for item in value]
+    return value
+
+
+def encode_document(doc: dict) -> dict:
+    """Copy of a document (or $set payload) with id fields encoded"""
+    encoded = {}
+    for key, value in doc.items():
+        if _is_id_key(key):
+            encoded[key] = encode_id(value)
+        elif isinstance(value, dict):
+            encoded[key] = encode_document(value)
+        elif isinstance(value, list):
+            encoded[key] = [encode_document(item) if isinstance(item, dict) else item for item in value]
+        else:
+            encoded[key] = value
+    return encoded
+
+
+def _encode_condition(condition: Any) -> Any:
+    if isinstance(condition, dict) and any(key.startswith('$') for key in condition):
+        return {
+            op: encode_id(value) if op in _VALUE_OPERATORS else value
+            for op, value in condition.items()
+        }
+    return encode_id(condition)
+
+
+def encode_filter(query: dict) -> dict:
+    encoded = {}
+    for key, value in query.items():
+        if key in _LOGICAL_OPERATORS:
+            encoded[key] = [encode_filter(clause) for clause in value]
+        elif _is_id_key(key):
+            encoded[key] = _encode_condition(value)
+        elif isinstance(value, dict) and "$elemMatch" in value:
+            encoded[key] = {**value, "$elemMatch": encode_filter(value["$elemMatch"])}
+        else:
+            encoded[key] = value
+    return encoded
+
+
+def encode_update(update: dict) -> dict:
+    if not any(key.startswith('$') for key in update):
+        return encode_document(update)
+    return {
+        op: encode_document(fields) if op in _DOCUMENT_UPDATES else fields
+        for op, fields in update.items()
+    }
+
+
+def decode_value(value: Any) -> Any:
+    if isinstance(value, Binary) and value.subtype == UUID_SUBTYPE:
+        return str(value.as_uuid(UuidRepresentation.STANDARD))
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, dict):
+        return decode_document(value)
+    if isinstance(value, list):
+        return [decode_value(item) for item in value]
+    return value
+
+
+def decode_document(doc):
+    """Document with binary UUIDs turned back into strings"""
+    if doc is None:
+        return None
+    return {key: decode_value(value) for key, value in doc.items()}
+
+
+def _encode_request(request):
+    """Copy of a bulk_write operation with its filter and document encoded"""
+    request = copy.copy(request)
+    if getattr(request, '_filter', None) is not None:
+        request._filter = encode_filter(request._filter)
+    if getattr(request, '_doc', None) is not None:
+        request._doc = encode_update(request._doc)
+    return request
+
+
+class IdCodecCursor:
+    """Cursor decoding binary UUIDs in the documents it returns"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, count: int):
+        self._cursor.skip(count)
+        return self
+
+    def limit(self, count: int):
+        self._cursor.limit(count)
+        return self
+
+    async def to_list(self, length):
+        return [decode_document(doc) for doc in await self._cursor.to_list(length)]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return decode_document(await self._cursor.__anext__())
+
+
+class IdCodecCollection:
+    """Motor collection storing id fields as binary UUIDs"""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        # Index management and anything id-agnostic goes straight through
+        return getattr(self._collection, name)
+
+    def find(self, filter=None, *args, **kwargs):
+        return IdCodecCursor(self._collection.find(encode_filter(filter or {}), *args, **kwargs))
+
+    async def find_one(self, filter=None, *args, **kwargs):
+        return decode_document(await self._collection.find_one(encode_filter(filter or {}), *args, **kwargs))
+
+    async def find_one_and_update(self, filter, update, *args, **kwargs):
+        return decode_document(
+            await self._collection.find_one_and_update(encode_filter(filter), encode_update(update), *args, **kwargs)
+        )
+
+    async def count_documents(self, filter, *args, **kwargs):
+        return await self._collection.count_documents(encode_filter(filter), *args, **kwargs)
+
+    async def insert_one(self, document, *args, **kwargs):
+        encoded = encode_document(document)
+        result = await self._collection.insert_one(encoded, *args, **kwargs)
+        document['_id'] = encoded['_id']
+        return result
+
+    async def insert_many(self, documents, *args, **kwargs):
+        documents = list(documents)
+        encoded = [encode_document(document) for document in documents]
+        result = await self._collection.insert_many(encoded, *args, **kwargs)
+        for document, stored in zip(documents, encoded):
+            document['_id'] = stored['_id']
+        return result
+
+    async def update_one(self, filter, update, *args, **kwargs):
+        return await self._collection.update_one(encode_filter(filter), encode_update(update), *args, **kwargs)
+
+    async def update_many(self, filter, update, *args, **kwargs):
+        return await self._collection.update_many(encode_filter(filter), encode_update(update), *args, **kwargs)
+
+    async def replace_one(self, filter, replacement, *args, **kwargs):
+        return await self._collection.replace_one(encode_filter(filter), encode_document(replacement), *args, **kwargs)
+
+    async def delete_one(self, filter, *args, **kwargs):
+        return await self._collection.delete_one(encode_filter(filter), *args, **kwargs)
+
+    async def delete_many(self, filter, *args, **kwargs):
+        return await self._collection.delete_many(encode_filter(filter), *args, **kwargs)
+
+    async def bulk_write(self, requests, *args, **kwargs):
+        return await self._collection.bulk_write([_encode_request(request) for request in requests], *args, **kwargs)
+
+
+class IdCodecDatabase:
+    """Motor database whose collections store id fields as binary UUIDs"""
+
+    def __init__(self, db):
+        self._db = db
+        self._collections = {}
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        # Database methods (command, list_collection_names, ...) go straight through
+        if hasattr(type(self._db), name):
+            return getattr(self._db, name)
+        return self[name]
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = IdCodecCollection(self._db[name])
+        return self._collections[name]
+
+
+def storage_database(db):
+    """The database as handlers should use it under the configured UUID_STORAGE"""
+    return IdCodecDatabase(db) if UUID_STORAGE == "binary" else db
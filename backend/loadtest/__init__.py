@@ -0,0 +1,5 @@
+"""
+Load tests: seed synthetic tenants into a local stack, then drive the API
+with concurrent virtual users and report throughput and latency per
+endpoint. See loadtest/run.py.
+"""
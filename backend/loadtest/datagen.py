@@ -0,0 +1,433 @@
+"""
+Synthetic data generator for scale tests.
+
+Bulk-loads a multi-tenant dataset straight into Mongo:
+- users
+- businesses, with their gateway secrets in business_credentials
+- products, orders, bookings and payment transactions
+
+Documents are built with the server's models and stored the way handlers
+store them: sparse, schema-versioned, and with binary UUIDs under
+UUID_STORAGE=binary. The API reads them like real data.
+
+- Tenant sizes follow a Zipf distribution. Tenant i gets a share of --orders
+  proportional to 1 / (i + 1) ** --zipf, so a handful of tenants hold most
+  orders and the long tail has a few each. Catalogues shrink with rank too.
+- Product attributes follow the tenant's template_type: food with is_veg,
+  clothing with sizes and colours, service packages, and so on.
+- Service templates take bookings as well as orders.
+- Orders and bookings spread over the --days before --end, weighted towards
+  recent days and evening hours.
+- Payment transactions cover every state:
+  - success: the order is paid
+  - failed: some abandoned
+  - pending: some older than the reconciliation window
+
+The work is split into tasks: one tenant's catalogue, or one chunk of
+--chunk-size orders. --workers processes run them, each inserting unordered
+insert_many batches over its own connection. Every task draws from its own
+random stream derived from --seed, so the data does not depend on the worker
+count: the same --seed and --end give the same dataset.
+
+All users share the load-test password (loadtest/seed.py). --fixture writes a
+load-test fixture for the largest tenants, so loadtest/run.py can drive the
+generated data. Indexes are left to the server's startup hook; start it after
+loading.
+
+    cd backend && python -m loadtest.datagen --businesses 10000 --orders 10000000 --workers 8 --drop
+"""
+import argparse
+import json
+import math
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from pymongo import MongoClient
+
+from credential_store import CredentialStore
+from id_codec import UUID_STORAGE, encode_document
+from loadtest.seed import CATALOGUES, CITIES, PASSWORD, RAZORPAY_KEY_SECRET, product_payload
+from schema_migrations import versioned
+from server import (
+    Booking, Business, Order, OrderItem, Product, User, calculate_discount_percentage, create_token, hash_password
+)
+from sparse_storage import storage_document
+from templates_config import BUSINESS_TEMPLATES
+
+COLLECTIONS = ("users", "businesses", "business_credentials", "products", "orders", "bookings", "payment_transactions")
+
+TEMPLATES = {template["id"]: template for template in BUSINESS_TEMPLATES}
+# Shops and restaurants are most tenants; every other template is a long tail
+TEMPLATE_WEIGHTS = {"retail": 20, "restaurant": 18, "grocery": 12, "salon": 10, "clinic": 6}
+
+# Gateway per tenant, and the secret and public fields it configures
+GATEWAY_WEIGHTS = {"razorpay": 50, "phonepe": 15, "stripe": 10, "payu": 10, None: 15}
+GATEWAY_FIELDS = {
+    "razorpay": ("razorpay_key_id", "razorpay_key_secret"),
+    "stripe": ("stripe_publishable_key", "stripe_secret_key"),
+    "payu": ("payu_merchant_key", "payu_merchant_salt"),
+    "phonepe": ("phonepe_merchant_id", "phonepe_salt_key"),
+}
+
+# Share of orders paid online, and how their transactions end up
+ONLINE_PAYMENT_SHARE = 0.8
+TRANSACTION_STATES = {"success": 72, "failed": 12, "pending": 16}
+ABANDONED_SHARE = 0.5
+
+# Bookings per order for templates that take appointments
+BOOKING_RATIO = {"salon": 1.5, "clinic": 2.0, "restaurant": 0.1}
+SERVICE_BOOKING_RATIO = 1.0
+
+# Orders by UTC hour; Indian evenings (19:30-21:30 IST) peak at 14:00-16:00 UTC
+HOUR_WEIGHTS = [2, 2, 3, 4, 5, 6, 6, 6, 6, 6, 7, 8, 9, 10, 12, 12, 10, 7, 4, 2, 1, 1, 1, 1]
+
+FIRST_NAMES = ["Aarav", "Priya", "Rohan", "Ananya", "Vikram", "Sneha", "Arjun", "Kavya", "Rahul", "Meera"]
+LAST_NAMES = ["Sharma", "Patel", "Reddy", "Iyer", "Singh", "Gupta", "Nair", "Das", "Khan", "Joshi"]
+
+
+def zipf_sizes(total: int, count: int, exponent: float) -> List[int]:
+    """Split total across count tenants in proportion to 1 / rank ** exponent"""
+    weights = [1 / (rank + 1) ** exponent for rank in range(count)]
+    scale = total / sum(weights)
+    sizes = [int(weight * scale) for weight in weights]
+    for rank in range(total - sum(sizes)):
+        sizes[rank] += 1
+    return sizes
+
+
+def catalogue_size(rank: int, max_products: int, exponent: float) -> int:
+    return max(3, round(max_products / (rank + 1) ** (exponent / 2)))
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _hex(rng: random.Random, length: int) -> str:
+    return f"{rng.getrandbits(4 * length):0{length}x}"
+
+
+def _phone(rng: random.Random) -> str:
+    return f"+91{rng.randint(7000000000, 9999999999)}"
+
+
+def _timestamp(rng: random.Random, end: datetime, days: int) -> datetime:
+    """A moment in the days before end, denser towards end and in busy hours"""
+    age = int(days * (1 - math.sqrt(rng.random())))
+    day = end - timedelta(days=age + 1)
+    hour = rng.choices(range(24), HOUR_WEIGHTS)[0]
+    return day + timedelta(hours=hour, seconds=rng.randrange(3600))
+
+
+def _catalogue(template_type: str) -> Tuple[str, List[str]]:
+    if template_type in CATALOGUES:
+        return CATALOGUES[template_type]
+    name = TEMPLATES[template_type]["name"].split(" /")[0]
+    return "service", [f"{tier} {name} Package" for tier in ("Basic", "Standard", "Premium", "Express", "Annual")]
+
+
+def tenant_profile(seed: int, rank: int, options: dict) -> dict:
+    """Everything about a tenant that its catalogue and order tasks share"""
+    rng = random.Random(f"{seed}-tenant-{rank}")
+    template_ids = list(TEMPLATES)
+    template_type = rng.choices(template_ids, [TEMPLATE_WEIGHTS.get(t, 1) for t in template_ids])[0]
+    gateway = rng.choices(list(GATEWAY_WEIGHTS), list(GATEWAY_WEIGHTS.values()))[0]
+    latitude, longitude = rng.choice(CITIES)
+    label = f"gen{seed}t{rank}"
+    profile = {
+        "rank": rank,
+        "label": label,
+        "user_id": _uuid(rng),
+        "business_id": _uuid(rng),
+        "email": f"{label}@datagen.example.com",
+        "template_type": template_type,
+        "gateway": gateway,
+        "latitude": round(latitude + rng.uniform(-0.2, 0.2), 6),
+        "longitude": round(longitude + rng.uniform(-0.2, 0.2), 6),
+        "created_at": options["end"] - timedelta(days=options["days"] + rng.randint(0, 365)),
+    }
+
+    product_type, _ = _catalogue(template_type)
+    product_rng = random.Random(f"{seed}-products-{rank}")
+    products = []
+    for index in range(catalogue_size(rank, options["max_products"], options["zipf"])):
+        payload = product_payload(product_rng, template_type, index)
+        payload["product_type"], payload["category"] = product_type, product_type.title()
+        if product_type == "service":
+            payload["name"] = f"{_catalogue(template_type)[1][index % 5]} {index // 5 + 1}"
+            payload.pop("stock_quantity")
+        products.append(Product(
+            id=_uuid(product_rng), business_id=profile["business_id"],
+            discount_percentage=calculate_discount_percentage(payload["mrp"], payload["sale_price"]),
+            is_available=product_rng.random() < 0.95, created_at=profile["created_at"], **payload,
+        ))
+    profile["products"] = products
+    return profile
+
+
+def catalogue_documents(profile: dict, options: dict) -> Iterator[Tuple[str, dict]]:
+    """The tenant's owner, business, credentials and products"""
+    rng = random.Random(f"{profile['label']}-business")
+    template = TEMPLATES[profile["template_type"]]
+    user = User(id=profile["user_id"], name=f"Owner {profile['label']}", email=profile["email"],
+                created_at=profile["created_at"])
+    user_doc = versioned("users", storage_document(user))
+    user_doc["password"] = options["password_hash"]
+    yield "users", user_doc
+
+    gateway_fields, secrets = {}, {}
+    if profile["gateway"]:
+        public_field, secret_field = GATEWAY_FIELDS[profile["gateway"]]
+        gateway_fields = {"payment_gateway": profile["gateway"], public_field: f"test_{profile['label']}"}
+        # The checkout load-test scenario signs Razorpay verify calls with the known secret
+        secrets = {secret_field: RAZORPAY_KEY_SECRET if profile["gateway"] == "razorpay" else _hex(rng, 32)}
+        if profile["gateway"] == "phonepe":
+            gateway_fields["phonepe_salt_index"] = 1
+
+    business = Business(
+        id=profile["business_id"],
+        user_id=profile["user_id"],
+        name=f"{template['name'].split(' /')[0]} {profile['rank']}",
+        description=f"Synthetic {template['name']} tenant",
+        subdomain=profile["label"],
+        whatsapp_number=_phone(rng),
+        category=template["name"],
+        template_type=profile["template_type"],
+        delivery_charges=rng.choice([0.0, 30.0, 50.0]),
+        tax_percentage=rng.choice([0.0, 5.0, 18.0]),
+        business_latitude=profile["latitude"],
+        business_longitude=profile["longitude"],
+        max_delivery_radius_km=rng.choice([None, 10.0, 25.0]),
+        configured_secrets=sorted(secrets),
+        content_version=len(profile["products"]),
+        created_at=profile["created_at"],
+        **gateway_fields,
+    )
+    yield "businesses", versioned("businesses", storage_document(business))
+    if secrets:
+        yield "business_credentials", {
+            "business_id": profile["business_id"],
+            "encrypted": options["credential_store"].encrypt(secrets),
+            "updated_at": profile["created_at"],
+        }
+    for product in profile["products"]:
+        yield "products", versioned("products", storage_document(product))
+
+
+def _transaction(rng: random.Random, profile: dict, order: Order, options: dict) -> dict:
+    gateway = profile["gateway"]
+    gateway_order_id = {
+        "razorpay": lambda: f"order_{_hex(rng, 14)}",
+        "stripe": lambda: f"cs_test_{_hex(rng, 24)}",
+        "payu": lambda: _uuid(rng)[:20],
+        "phonepe": lambda: _uuid(rng)[:35],
+    }[gateway]()
+    status = rng.choices(list(TRANSACTION_STATES), list(TRANSACTION_STATES.values()))[0]
+    transaction = {
+        "id": _uuid(rng),
+        "business_id": profile["business_id"],
+        "order_id": order.id,
+        "amount": order.total_amount,
+        "currency": "INR",
+        "gateway": gateway,
+        "gateway_order_id": gateway_order_id,
+        "status": status,
+        "customer_name": order.customer_name,
+        "customer_email": f"customer{rng.randrange(10 ** 6)}@example.com",
+        "customer_phone": order.customer_phone,
+        "created_at": order.created_at,
+        "updated_at": order.created_at,
+    }
+    if status == "success":
+        transaction["gateway_payment_id"] = f"pay_{_hex(rng, 14)}"
+        transaction["updated_at"] = order.created_at + timedelta(seconds=rng.randint(20, 300))
+    elif status == "failed":
+        transaction["updated_at"] = order.created_at + timedelta(minutes=rng.randint(1, 60))
+        if rng.random() < ABANDONED_SHARE:
+            transaction["failure_reason"] = "abandoned"
+    return transaction
+
+
+def activity_documents(profile: dict, chunk: int, start: int, stop: int, options: dict) -> Iterator[Tuple[str, dict]]:
+    """Orders start..stop of the tenant, their transactions, and the bookings that go with them"""
+    rng = random.Random(f"{options['seed']}-orders-{profile['rank']}-{chunk}")
+    products = [product for product in profile["products"] if product.is_available] or profile["products"]
+    end, days = options["end"], options["days"]
+
+    for _ in range(start, stop):
+        lines = rng.sample(products, min(len(products), rng.choices([1, 2, 3, 4, 5], [50, 25, 12, 8, 5])[0]))
+        items = [
+            OrderItem(
+                product_id=product.id, product_name=product.name, quantity=rng.choices([1, 2, 3, 5], [70, 18, 8, 4])[0],
+                mrp=product.mrp, sale_price=product.sale_price, discount_percentage=product.discount_percentage,
+            )
+            for product in lines
+        ]
+        order = Order(
+            id=_uuid(rng),
+            business_id=profile["business_id"],
+            customer_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            customer_phone=_phone(rng),
+            customer_address=f"{rng.randint(1, 500)}, Sector {rng.randint(1, 60)}" if rng.random() < 0.7 else None,
+            items=items,
+            total_amount=sum(item.sale_price * item.quantity for item in items),
+            created_at=_timestamp(rng, end, days),
+        )
+        order_doc = versioned("orders", storage_document(order))
+        if profile["gateway"] and rng.random() < ONLINE_PAYMENT_SHARE:
+            transaction = _transaction(rng, profile, order, options)
+            if transaction["status"] == "success":
+                order_doc["status"] = "paid"
+                order_doc["payment_id"] = transaction["gateway_payment_id"]
+            yield "payment_transactions", transaction
+        yield "orders", order_doc
+
+    ratio = BOOKING_RATIO.get(profile["template_type"], 0.0 if profile["template_type"] in CATALOGUES else SERVICE_BOOKING_RATIO)
+    _, services = _catalogue(profile["template_type"])
+    for _ in range(round(stop * ratio) - round(start * ratio)):
+        created_at = _timestamp(rng, end, days)
+        preferred = created_at + timedelta(days=rng.randint(0, 14))
+        booking = Booking(
+            id=_uuid(rng),
+            business_id=profile["business_id"],
+            customer_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            customer_phone=_phone(rng),
+            service_type=rng.choice(services),
+            preferred_date=preferred.date().isoformat(),
+            preferred_time=f"{rng.randint(9, 19):02d}:{rng.choice(['00', '30'])}",
+            # Past appointments have been handled one way or the other
+            status="pending" if preferred >= end else rng.choices(["confirmed", "cancelled"], [85, 15])[0],
+            created_at=created_at,
+        )
+        yield "bookings", versioned("bookings", storage_document(booking))
+
+
+def plan_tasks(options: dict) -> List[tuple]:
+    """(rank, chunk, start, stop) per task; chunk -1 is the tenant's catalogue"""
+    tasks = []
+    sizes = zipf_sizes(options["orders"], options["businesses"], options["zipf"])
+    for rank, orders in enumerate(sizes):
+        tasks.append((rank, -1, 0, 0))
+        for chunk, start in enumerate(range(0, orders, options["chunk_size"])):
+            tasks.append((rank, chunk, start, min(orders, start + options["chunk_size"])))
+    return tasks
+
+
+def task_documents(task: tuple, options: dict) -> Iterator[Tuple[str, dict]]:
+    rank, chunk, start, stop = task
+    profile = tenant_profile(options["seed"], rank, options)
+    if chunk < 0:
+        return catalogue_documents(profile, options)
+    return activity_documents(profile, chunk, start, stop, options)
+
+
+def insert_batched(db, documents: Iterator[Tuple[str, dict]], batch_size: int) -> Counter:
+    """insert_many each collection's documents in unordered batches"""
+    counts, batches = Counter(), {}
+    for collection, doc in documents:
+        batch = batches.setdefault(collection, [])
+        batch.append(encode_document(doc) if UUID_STORAGE == "binary" else doc)
+        if len(batch) >= batch_size:
+            db[collection].insert_many(batch, ordered=False)
+            counts[collection] += len(batch)
+            batch.clear()
+    for collection, batch in batches.items():
+        if batch:
+            db[collection].insert_many(batch, ordered=False)
+            counts[collection] += len(batch)
+    return counts
+
+
+_worker = {}
+
+
+def _init_worker(options: dict):
+    # One connection per process, opened after the fork
+    _worker["db"] = MongoClient(os.environ['MONGO_URL'])[os.environ['DB_NAME']]
+    _worker["options"] = {**options, "credential_store": CredentialStore(None)}
+
+
+def _run_task(task: tuple) -> Counter:
+    options = _worker["options"]
+    return insert_batched(_worker["db"], task_documents(task, options), options["batch_size"])
+
+
+def write_fixture(path: Path, options: dict, tenants: int, admin: User):
+    """Load-test fixture (loadtest/run.py) for the largest tenants"""
+    fixture = {"seed": options["seed"], "admin_token": create_token(admin.id, admin.email), "tenants": []}
+    for rank in range(min(tenants, options["businesses"])):
+        profile = tenant_profile(options["seed"], rank, options)
+        fixture["tenants"].append({
+            "subdomain": profile["label"],
+            "business_id": profile["business_id"],
+            "token": create_token(profile["user_id"], profile["email"]),
+            "email": profile["email"],
+            "template_type": profile["template_type"],
+            "latitude": profile["latitude"],
+            "longitude": profile["longitude"],
+            "product_ids": [product.id for product in profile["products"] if product.is_available],
+            "razorpay_key_secret": RAZORPAY_KEY_SECRET if profile["gateway"] == "razorpay" else None,
+        })
+    path.write_text(json.dumps(fixture, indent=2))
+
+
+def generate(args):
+    end = datetime.combine(args.end, datetime.min.time(), tzinfo=timezone.utc)
+    options = {
+        "seed": args.seed, "businesses": args.businesses, "orders": args.orders, "zipf": args.zipf,
+        "max_products": args.max_products, "days": args.days, "end": end,
+        "chunk_size": args.chunk_size, "batch_size": args.batch_size,
+        "password_hash": hash_password(PASSWORD),
+    }
+    db = MongoClient(os.environ['MONGO_URL'])[os.environ['DB_NAME']]
+    if args.drop:
+        for collection in COLLECTIONS:
+            db.drop_collection(collection)
+
+    admin_rng = random.Random(f"{args.seed}-admin")
+    admin = User(id=_uuid(admin_rng), name="Datagen Admin", email=f"gen{args.seed}admin@datagen.example.com",
+                 role="super_admin", created_at=end)
+    insert_batched(db, [("users", {**versioned("users", storage_document(admin)),
+                                   "password": options["password_hash"]})], 1)
+
+    tasks = plan_tasks(options)
+    totals, started = Counter(), time.perf_counter()
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(options,)) as pool:
+        for done, counts in enumerate(pool.map(_run_task, tasks, chunksize=8), 1):
+            totals.update(counts)
+            if done % 500 == 0 or done == len(tasks):
+                elapsed = time.perf_counter() - started
+                print(f"{done}/{len(tasks)} tasks, {sum(totals.values()):,} documents "
+                      f"({sum(totals.values()) / elapsed:,.0f}/s)", flush=True)
+
+    for collection in COLLECTIONS:
+        print(f"{collection}: {totals[collection]:,}")
+    if args.fixture:
+        write_fixture(args.fixture, options, args.fixture_tenants, admin)
+        print(f"Fixture for {args.fixture_tenants} largest tenants -> {args.fixture}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--businesses", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=100000, help="Orders across all tenants")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Tenant size skew (0 = equal sizes)")
+    parser.add_argument("--max-products", type=int, default=500, help="Catalogue of the largest tenant")
+    parser.add_argument("--days", type=int, default=365, help="Days of order history")
+    parser.add_argument("--end", type=lambda value: datetime.strptime(value, "%Y-%m-%d").date(),
+                        default=datetime.now(timezone.utc).date(), help="Last day of history (default today)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=20000, help="Orders per task")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Documents per insert_many")
+    parser.add_argument("--drop", action="store_true", help="Drop the generated collections first")
+    parser.add_argument("--fixture", type=Path, help="Write a load-test fixture here")
+    parser.add_argument("--fixture-tenants", type=int, default=100)
+    generate(parser.parse_args())
@@ -0,0 +1,453 @@
+"""
+Replay recorded production traffic against a server and compare builds.
+
+traffic_recorder.py samples live /api requests into rotating NDJSON logs.
+`replay run` re-issues them against a local server seeded by loadtest/seed.py
+or loadtest/datagen.py, keeping the recorded mix of routes and their timing:
+
+- requests start at their recorded offsets divided by --speed (1, 5, 10, ...),
+  open loop: a slow server does not slow the arrivals down. --max-in-flight
+  bounds the concurrent requests; the report shows how far behind schedule
+  the sender fell
+- recorded tenants (hashed subdomain / business_id) are ranked by how often
+  they appear and mapped onto the fixture's tenants in order, so the busiest
+  recorded tenant hits the biggest seeded one. Hashed product ids map onto
+  the tenant's products
+- bodies are rebuilt from their recorded shape: routes whose payloads must
+  be valid (orders, bookings, payments, login, ...) get realistic values of
+  that shape, others get placeholder values. Payment creates use orders and
+  payment verifies use gateway orders created earlier in the replay
+- requests whose parameters cannot be mapped (user ids, Stripe sessions) and
+  routes that would destroy fixture data (REPLAY_SKIPPED) are skipped and
+  counted
+
+Logs are sampled, so a log recorded at TRAFFIC_SAMPLE_RATE=0.1 and replayed
+at --speed 10 arrives at about the full production rate.
+
+`replay compare` lines up two result files (or loadtest/run.py results) per
+endpoint and exits 1 when an endpoint's p95 grew by more than --threshold:
+
+    python -m loadtest.replay run /var/log/waconnect/traffic.ndjson* --speed 5 --json loadtest/replay-main.json
+    git checkout my-branch && <restart the server>
+    python -m loadtest.replay run /var/log/waconnect/traffic.ndjson* --speed 5 --json loadtest/replay-branch.json
+    python -m loadtest.replay compare loadtest/replay-main.json loadtest/replay-branch.json
+
+Both runs should start from the same database (reseed, or restore a dump):
+replayed writes add orders and bookings.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from loadtest.run import Recorder, Session, format_report
+from loadtest.seed import CATALOGUES, PASSWORD, product_payload
+from msgpack_negotiation import MSGPACK_TYPES, unpackb
+
+# Routes never replayed: they delete or reassign fixture data, or need
+# gateway-signed callbacks a replay cannot produce
+REPLAY_SKIPPED = frozenset({
+    "DELETE /api/businesses/{business_id}/products/{product_id}",
+    "PUT /api/admin/users/{user_id}/role",
+    "POST /api/admin/payments/webhooks/replay",
+    "POST /api/admin/payments/reconciliation/run",
+    "POST /api/webhook/stripe",
+    "POST /api/webhook/phonepe/{subdomain}",
+})
+
+# Query flags that would change what the request does rather than what it reads
+DROPPED_QUERY = frozenset({"profile"})
+
+
+def load_traffic(paths: Iterable[Path], start: Optional[float] = None, end: Optional[float] = None) -> List[dict]:
+    """Traffic lines from the logs (rotated files included), oldest first"""
+    entries = []
+    for path in paths:
+        with open(path, encoding='utf-8') as log:
+            for line in log:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash or a copy taken mid-write
+                if (start is None or entry["ts"] >= start) and (end is None or entry["ts"] < end):
+                    entries.append(entry)
+    entries.sort(key=lambda entry: entry["ts"])
+    return entries
+
+
+class TenantMap:
+    """Hashed path parameters of recorded traffic mapped onto fixture data"""
+
+    def __init__(self, entries: List[dict], fixture: dict):
+        self.tenants = fixture["tenants"]
+        self.by_hash: Dict[str, Dict[str, dict]] = {}
+        for param in ("subdomain", "business_id"):
+            counts = Counter(entry["params"][param] for entry in entries if param in entry.get("params", {}))
+            self.by_hash[param] = {
+                hashed: self.tenants[rank % len(self.tenants)]
+                for rank, (hashed, _) in enumerate(counts.most_common())
+            }
+
+    def tenant(self, params: Dict[str, str]) -> dict:
+        for param in ("business_id", "subdomain"):
+            if param in params:
+                return self.by_hash[param][params[param]]
+        return self.tenants[0]
+
+    @staticmethod
+    def product(tenant: dict, hashed: str) -> Optional[str]:
+        products = tenant["product_ids"]
+        return products[int(hashed, 16) % len(products)] if products else None
+
+
+class ReplayState:
+    """What earlier replayed responses created, for the requests that refer to it"""
+
+    def __init__(self):
+        self.orders: Dict[str, deque] = defaultdict(lambda: deque(maxlen=100))
+        self.gateway_orders: Dict[str, deque] = defaultdict(lambda: deque(maxlen=100))
+        self.etags: Dict[str, str] = {}
+        # Successful responses whose body could not be read, by endpoint
+        self.unreadable: Counter = Counter()
+
+
+def fill_shape(shape, rng: random.Random):
+    """Placeholder values with the recorded shape"""
+    if isinstance(shape, dict):
+        return {key: fill_shape(value, rng) for key, value in shape.items()}
+    if isinstance(shape, list):
+        return [fill_shape(shape[1], rng) for _ in range(shape[0])] if shape else []
+    return {"string": "replay", "number": rng.randint(1, 10), "bool": False, "null": None}.get(shape)
+
+
+def _phone(rng: random.Random) -> str:
+    return f"+91{rng.randint(7000000000, 9999999999)}"
+
+
+def _items(shape, rng: random.Random, tenant: dict) -> list:
+    count = shape.get("items", [1])[0] if isinstance(shape, dict) and shape.get("items") else 1
+    products = tenant["product_ids"]
+    return [{"product_id": rng.choice(products), "quantity": rng.randint(1, 3)} for _ in range(max(1, count))]
+
+
+def _payment_body(rng, tenant, shape, state):
+    orders = state.orders[tenant["subdomain"]]
+    if not orders:
+        return None
+    order = rng.choice(orders)
+    return {
+        "order_id": order["id"], "amount": order["total_amount"], "customer_name": order["customer_name"],
+        "customer_email": "replay@example.com", "customer_phone": order["customer_phone"],
+    }
+
+
+def _verify_body(rng, tenant, shape, state):
+    gateway_orders = state.gateway_orders[tenant["subdomain"]]
+    if not gateway_orders or not tenant.get("razorpay_key_secret"):
+        return None
+    gateway_order_id = gateway_orders.popleft()
+    payment_id = f"pay_{uuid.UUID(int=rng.getrandbits(128)).hex[:14]}"
+    signature = hmac.new(
+        tenant["razorpay_key_secret"].encode(), f"{gateway_order_id}|{payment_id}".encode(), hashlib.sha256
+    ).hexdigest()
+    return {"razorpay_order_id": gateway_order_id, "razorpay_payment_id": payment_id, "razorpay_signature": signature}
+
+
+def _business_body(rng, tenant, shape, state):
+    label = f"replay{rng.getrandbits(40):x}"
+    return {
+        "name": f"Replay {label}", "description": "Replayed business", "subdomain": label,
+        "whatsapp_number": _phone(rng), "category": "Retail", "template_type": tenant["template_type"],
+    }
+
+
+# Bodies that must validate, by route: (rng, tenant, recorded shape, state) -> body, or None to skip
+BODY_BUILDERS = {
+    "POST /api/auth/signup": lambda rng, tenant, shape, state: {
+        "name": "Replay User", "email": f"replay{rng.getrandbits(48):x}@replay.example.com", "password": PASSWORD,
+    },
+    "POST /api/auth/login": lambda rng, tenant, shape, state: (
+        {"email": tenant["email"], "password": PASSWORD} if tenant.get("email") else None
+    ),
+    "POST /api/businesses": _business_body,
+    "PUT /api/businesses/{business_id}": lambda rng, tenant, shape, state: {
+        "description": f"Replayed update {rng.randint(1, 10 ** 6)}",
+    },
+    "POST /api/businesses/{business_id}/products": lambda rng, tenant, shape, state: product_payload(
+        rng, tenant["template_type"], rng.randint(0, 10 ** 4)
+    ),
+    "PUT /api/businesses/{business_id}/products/{product_id}": lambda rng, tenant, shape, state: {
+        "stock_quantity": rng.randint(0, 500),
+    },
+    "POST /api/businesses/{business_id}/orders": lambda rng, tenant, shape, state: (
+        {
+            "customer_name": f"Replay Customer {rng.randint(1, 10 ** 5)}",
+            "customer_phone": _phone(rng),
+            "items": _items(shape, rng, tenant),
+        } if tenant["product_ids"] else None
+    ),
+    "POST /api/businesses/{business_id}/bookings": lambda rng, tenant, shape, state: {
+        "customer_name": f"Replay Customer {rng.randint(1, 10 ** 5)}",
+        "customer_phone": _phone(rng),
+        "service_type": CATALOGUES.get(tenant["template_type"], ("", ["Consultation"]))[1][0],
+        "preferred_date": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "preferred_time": f"{rng.randint(9, 18):02d}:00",
+    },
+    "POST /api/public/businesses/{subdomain}/calculate-delivery": lambda rng, tenant, shape, state: {
+        "customer_latitude": tenant["latitude"] + rng.uniform(-0.1, 0.1),
+        "customer_longitude": tenant["longitude"] + rng.uniform(-0.1, 0.1),
+    },
+    "POST /api/public/businesses/{subdomain}/payments/razorpay/create": _payment_body,
+    "POST /api/public/businesses/{subdomain}/payments/stripe/create": _payment_body,
+    "POST /api/public/businesses/{subdomain}/payments/payu/create": _payment_body,
+    "POST /api/public/businesses/{subdomain}/payments/phonepe/create": _payment_body,
+    "POST /api/public/businesses/{subdomain}/payments/razorpay/verify": _verify_body,
+}
+
+
+def build_request(
+    entry: dict, tenants: TenantMap, state: ReplayState, rng: random.Random, admin_token: str
+) -> Tuple[Optional[tuple], Optional[str]]:
+    """(method, route, url, kwargs) for a traffic line, or None and why it is skipped"""
+    endpoint = f"{entry['method']} {entry['route']}"
+    if endpoint in REPLAY_SKIPPED:
+        return None, "unsafe"
+
+    params = entry.get("params", {})
+    tenant = tenants.tenant(params)
+    values = {}
+    for name, hashed in params.items():
+        if name == "subdomain":
+            values[name] = tenant["subdomain"]
+        elif name == "business_id":
+            values[name] = tenant["business_id"]
+        elif name == "product_id":
+            values[name] = tenants.product(tenant, hashed)
+        elif name == "transaction_id" and state.gateway_orders[tenant["subdomain"]]:
+            values[name] = state.gateway_orders[tenant["subdomain"]][-1]
+        else:
+            values[name] = None
+        if values[name] is None:
+            return None, f"no {name}"
+    url = entry["route"].format(**values)
+
+    kwargs = {"headers": {}}
+    query = {key: value for key, value in entry.get("query", {}).items() if value is not None and key not in DROPPED_QUERY}
+    if query:
+        kwargs["params"] = query
+    if entry.get("auth"):
+        admin = entry["route"].startswith(("/api/admin/", "/api/reseller/"))
+        kwargs["headers"]["Authorization"] = f"Bearer {admin_token if admin else tenant['token']}"
+    if entry.get("msgpack"):
+        kwargs["headers"]["Accept"] = "application/msgpack"
+    if entry.get("conditional") and url in state.etags:
+        kwargs["headers"]["If-None-Match"] = state.etags[url]
+
+    if entry["method"] in ("POST", "PUT", "PATCH"):
+        builder = BODY_BUILDERS.get(endpoint)
+        shape = entry.get("body")
+        if builder is not None:
+            body = builder(rng, tenant, shape, state)
+            if body is None:
+                return None, "nothing earlier to refer to"
+        else:
+            body = fill_shape(shape, rng) if isinstance(shape, (dict, list)) else None
+        if body is not None:
+            kwargs["json"] = body
+    return (entry["method"], entry["route"], url, kwargs), None
+
+
+def response_body(response: httpx.Response):
+    """Decoded JSON or MessagePack body, whichever the response negotiated"""
+    media_type = response.headers.get("content-type", "").split(';', 1)[0].strip().lower()
+    return unpackb(response.content) if media_type in MSGPACK_TYPES else response.json()
+
+
+def remember(state: ReplayState, endpoint: str, url: str, tenant: dict, response: httpx.Response):
+    """Keep what later requests of the replay refer to"""
+    if "etag" in response.headers:
+        state.etags[url] = response.headers["etag"]
+    try:
+        if endpoint == "POST /api/businesses/{business_id}/orders":
+            state.orders[tenant["subdomain"]].append(response_body(response))
+        elif endpoint.endswith("/payments/razorpay/create"):
+            state.gateway_orders[tenant["subdomain"]].append(response_body(response)["order_id"])
+    except Exception:
+        # One unexpected body must not end the replay; later requests just have less to refer to
+        state.unreadable[endpoint] += 1
+
+
+async def replay(
+    client: httpx.AsyncClient,
+    entries: List[dict],
+    fixture: dict,
+    speed: float = 1.0,
+    max_in_flight: int = 200,
+    seed: int = 1,
+) -> dict:
+    """Re-issue the traffic on its recorded schedule, sped up; returns the results"""
+    rng = random.Random(seed)
+    recorder = Recorder()
+    session = Session(client, fixture, rng, recorder)
+    tenants = TenantMap(entries, fixture)
+    state = ReplayState()
+    skipped = Counter()
+    in_flight = asyncio.Semaphore(max_in_flight)
+    max_lag = 0.0
+
+    async def issue(request, tenant):
+        method, route, url, kwargs = request
+        try:
+            response = await session.request(method, route, url, **kwargs)
+            if response is not None:
+                remember(state, f"{method} {route}", url, tenant, response)
+        finally:
+            in_flight.release()
+
+    tasks = []
+    started = time.perf_counter()
+    first = entries[0]["ts"] if entries else 0.0
+    for entry in entries:
+        delay = (entry["ts"] - first) / speed - (time.perf_counter() - started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            max_lag = max(max_lag, -delay)
+        request, reason = build_request(entry, tenants, state, rng, fixture.get("admin_token", ""))
+        if request is None:
+            skipped[f"{entry['method']} {entry['route']} ({reason})"] += 1
+            continue
+        await in_flight.acquire()
+        tasks.append(asyncio.create_task(issue(request, tenants.tenant(entry.get("params", {})))))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    recorded = Recorder()
+    for entry in entries:
+        recorded.record(f"{entry['method']} {entry['route']}", entry["duration_ms"] / 1000, entry["status"] < 400)
+    span = (entries[-1]["ts"] - first) if entries else 0.0
+    return {
+        "speed": speed,
+        "replayed": len(tasks),
+        "skipped": dict(skipped.most_common()),
+        "unreadable": dict(state.unreadable.most_common()),
+        "max_lag_s": round(max_lag, 3),
+        "endpoints": recorder.summary(elapsed),
+        # As served in production, at the sampled rate
+        "recorded": recorded.summary(span or elapsed),
+    }
+
+
+def compare(baseline: dict, current: dict, stat: str, threshold: float, min_requests: int) -> Tuple[List[tuple], List[str]]:
+    """Rows of (endpoint, baseline ms, current ms, change, status) and the regressed endpoints"""
+    base = {row["endpoint"]: row for row in baseline["endpoints"]}
+    now = {row["endpoint"]: row for row in current["endpoints"]}
+    rows, regressed = [], []
+    for endpoint in sorted(set(base) | set(now), key=lambda name: (name == "TOTAL", name)):
+        if endpoint not in now or endpoint not in base:
+            rows.append((endpoint, base.get(endpoint, {}).get(stat), now.get(endpoint, {}).get(stat), None,
+                         "missing" if endpoint not in now else "new"))
+            continue
+        before, after = base[endpoint][stat], now[endpoint][stat]
+        change = after / before - 1 if before else 0.0
+        if min(base[endpoint]["requests"], now[endpoint]["requests"]) < min_requests:
+            status = "few requests"
+        elif change > threshold:
+            status = "REGRESSED"
+            regressed.append(endpoint)
+        else:
+            status = "faster" if change < -threshold else "ok"
+        rows.append((endpoint, before, after, change, status))
+    return rows, regressed
+
+
+def format_comparison(rows: List[tuple], stat: str) -> str:
+    header = f"{'endpoint':<66} {'baseline ' + stat:>16} {'current':>10} {'change':>8}  status"
+    lines = [header, "-" * len(header)]
+    for endpoint, before, after, change, status in rows:
+        before = f"{before:.1f}" if before is not None else "-"
+        after = f"{after:.1f}" if after is not None else "-"
+        change = f"{change:+.1%}" if change is not None else "-"
+        lines.append(f"{endpoint:<66} {before:>16} {after:>10} {change:>8}  {status}")
+    return "\n".join(lines)
+
+
+def _timestamp(value: str) -> float:
+    return datetime.fromisoformat(value).timestamp()
+
+
+async def run(args):
+    entries = load_traffic(args.logs, args.start, args.end)
+    if not entries:
+        sys.exit("No traffic in the logs for that window")
+    fixture = json.loads(args.fixture.read_text())
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        results = await replay(client, entries, fixture, args.speed, args.max_in_flight, args.seed)
+
+    print(f"Replayed {results['replayed']} of {len(entries)} requests at {args.speed:g}x; "
+          f"sender fell up to {results['max_lag_s']:.2f}s behind schedule\n")
+    print(format_report(results["endpoints"]))
+    if results["skipped"]:
+        print("\nSkipped:")
+        for reason, count in results["skipped"].items():
+            print(f"  {count:>7}  {reason}")
+    if results["unreadable"]:
+        print("\nResponses that could not be decoded:")
+        for endpoint, count in results["unreadable"].items():
+            print(f"  {count:>7}  {endpoint}")
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Replay traffic logs against a server")
+    run_parser.add_argument("logs", type=Path, nargs="+", help="traffic.ndjson and its rotated files")
+    run_parser.add_argument("--base-url", default="http://127.0.0.1:8001")
+    run_parser.add_argument("--fixture", type=Path, default=Path("loadtest/fixture.json"))
+    run_parser.add_argument("--speed", type=float, default=1.0, help="Time compression: 5 replays 5x faster")
+    run_parser.add_argument("--start", type=_timestamp, help="Replay traffic from this ISO time")
+    run_parser.add_argument("--end", type=_timestamp, help="... until this ISO time")
+    run_parser.add_argument("--max-in-flight", type=int, default=200)
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--timeout", type=float, default=30)
+    run_parser.add_argument("--json", type=Path, help="Write the results here")
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files endpoint by endpoint")
+    compare_parser.add_argument("baseline", type=Path)
+    compare_parser.add_argument("current", type=Path)
+    compare_parser.add_argument("--stat", choices=("p50_ms", "p95_ms", "p99_ms"), default="p95_ms")
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown (0.2 = 20%%)")
+    compare_parser.add_argument("--min-requests", type=int, default=20, help="Ignore endpoints with fewer requests")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        asyncio.run(run(args))
+        return 0
+
+    baseline, current = (json.loads(path.read_text()) for path in (args.baseline, args.current))
+    rows, regressed = compare(baseline, current, args.stat, args.threshold, args.min_requests)
+    print(format_comparison(rows, args.stat))
+    if regressed:
+        print(f"\n{len(regressed)} endpoint(s) slower by more than {args.threshold:.0%} at {args.stat}: "
+              f"{', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Load-test driver.
+
+Runs --users concurrent virtual users against a server for --duration
+seconds. Each user repeatedly picks a scenario by weight (loadtest/scenarios.py)
+and a tenant from the fixture loadtest/seed.py wrote, with popular tenants
+picked more often (weight 1 / rank). Users start staggered over --ramp
+seconds; only requests finished after the ramp are measured.
+
+The report lists, per endpoint (route template): requests, requests per
+second, p50/p95/p99 latency and the error rate (responses >= 400 and
+transport errors). --json writes the same numbers for comparing runs.
+
+A local run, each in its own shell:
+
+    mongod --dbpath /tmp/loadtest-db
+    python tests/fake_gateway.py --port 9100 --latency 0.2
+    RAZORPAY_API_BASE=http://127.0.0.1:9100/v1 uvicorn server:app --port 8001 --workers 4
+    python -m loadtest.seed --tenants 50 --seed 1
+    python -m loadtest.run --users 50 --duration 60 --json loadtest/results.json
+
+All commands run from backend/ with the same MONGO_URL and DB_NAME.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from loadtest.scenarios import DEFAULT_WEIGHTS, SCENARIOS
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    """Latencies and errors per endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.measuring = True
+
+    def record(self, endpoint: str, seconds: float, ok: bool):
+        if not self.measuring:
+            return
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def reset(self):
+        self.latencies.clear()
+        self.errors.clear()
+
+    def summary(self, elapsed: float) -> List[dict]:
+        rows = []
+        for endpoint in sorted(self.latencies):
+            latencies = sorted(self.latencies[endpoint])
+            rows.append(self._row(endpoint, latencies, self.errors[endpoint], elapsed))
+        everything = sorted(latency for values in self.latencies.values() for latency in values)
+        rows.append(self._row("TOTAL", everything, sum(self.errors.values()), elapsed))
+        return rows
+
+    @staticmethod
+    def _row(endpoint: str, latencies: List[float], errors: int, elapsed: float) -> dict:
+        count = len(latencies)
+        return {
+            "endpoint": endpoint,
+            "requests": count,
+            "rps": round(count / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "errors": errors,
+            "error_rate": round(errors / count, 4) if count else 0.0,
+        }
+
+
+class Session:
+    """One virtual user's view: HTTP client, fixture, random stream and recorder"""
+
+    def __init__(self, client: httpx.AsyncClient, fixture: dict, rng: random.Random, recorder: Recorder):
+        self.client = client
+        self.fixture = fixture
+        self.rng = rng
+        self.recorder = recorder
+        tenants = fixture.get("tenants", [])
+        self._tenant_weights = [1 / (rank + 1) for rank in range(len(tenants))]
+
+    def tenant(self) -> dict:
+        return self.rng.choices(self.fixture["tenants"], self._tenant_weights)[0]
+
+    async def request(self, method: str, endpoint: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """Issue and time one request; returns None when it failed"""
+        name = f"{method} {endpoint}"
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(name, time.perf_counter() - started, ok=False)
+            return None
+        ok = response.status_code < 400
+        self.recorder.record(name, time.perf_counter() - started, ok=ok)
+        return response if ok else None
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    fixture: dict,
+    users: int,
+    duration: float,
+    weights: Dict[str, float] = DEFAULT_WEIGHTS,
+    scenarios: dict = SCENARIOS,
+    ramp: float = 0.0,
+    think_time: float = 0.0,
+    seed: int = 1,
+) -> List[dict]:
+    """Drive the client with virtual users and return the per-endpoint summary"""
+    recorder = Recorder()
+    recorder.measuring = not ramp
+    names = [name for name in weights if weights[name] > 0]
+    deadline = time.perf_counter() + ramp + duration
+
+    async def user(index: int):
+        rng = random.Random(f"{seed}-{index}")
+        session = Session(client, fixture, rng, recorder)
+        if ramp:
+            await asyncio.sleep(ramp * index / users)
+        while time.perf_counter() < deadline:
+            scenario = scenarios[rng.choices(names, [weights[name] for name in names])[0]]
+            await scenario(session)
+            if think_time:
+                await asyncio.sleep(rng.expovariate(1 / think_time))
+
+    async def end_ramp():
+        await asyncio.sleep(ramp)
+        recorder.reset()
+        recorder.measuring = True
+
+    tasks = [asyncio.create_task(user(index)) for index in range(users)]
+    if ramp:
+        tasks.append(asyncio.create_task(end_ramp()))
+    await asyncio.gather(*tasks)
+    return recorder.summary(duration)
+
+
+def format_report(rows: List[dict]) -> str:
+    header = f"{'endpoint':<66} {'reqs':>7} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        lines.append(
+            f"{row['endpoint']:<66} {row['requests']:>7} {row['rps']:>8.1f} {row['p50_ms']:>8.1f} "
+            f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['error_rate']:>6.1%}"
+        )
+    return "\n".join(lines)
+
+
+def parse_weights(values: List[str]) -> Dict[str, float]:
+    """["storefront=80", "admin=0"] over DEFAULT_WEIGHTS"""
+    weights = dict(DEFAULT_WEIGHTS)
+    for value in values:
+        name, _, weight = value.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight)
+    return weights
+
+
+async def main(args):
+    fixture = json.loads(args.fixture.read_text())
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        rows = await run_load(
+            client, fixture, args.users, args.duration, parse_weights(args.weight),
+            ramp=args.ramp, think_time=args.think_time, seed=args.seed,
+        )
+    print(format_report(rows))
+    if args.json:
+        args.json.write_text(json.dumps({"users": args.users, "duration": args.duration, "endpoints": rows}, indent=2))
+    if rows[-1]["error_rate"] > args.max_error_rate:
+        sys.exit(f"Error rate {rows[-1]['error_rate']:.1%} above {args.max_error_rate:.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8001")
+    parser.add_argument("--fixture", type=Path, default=Path("loadtest/fixture.json"))
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds, after the ramp")
+    parser.add_argument("--ramp", type=float, default=5, help="Seconds to start all users over")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between scenarios (seconds)")
+    parser.add_argument("--weight", action="append", default=[], metavar="SCENARIO=WEIGHT")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--json", type=Path, help="Write the results here")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,114 @@
+"""
+Load-test scenarios.
+
+Each scenario is one user journey, run repeatedly by virtual users. It calls
+session.request() with the route template as the endpoint name, so the report
+groups requests by route rather than by URL.
+
+- storefront: a shopper opens a site, browses products, checks delivery and
+  payment options
+- checkout: a shopper places an order, starts a Razorpay payment and verifies
+  it (needs the fake gateway, see run.py)
+- dashboard: a business owner opens the dashboard: businesses, orders,
+  bookings, analytics
+- admin: a super admin opens the admin listings
+"""
+import hashlib
+import hmac
+import uuid
+
+
+async def storefront(session):
+    tenant = session.tenant()
+    subdomain = tenant["subdomain"]
+    await session.request("GET", "/api/public/sites/{subdomain}", f"/api/public/sites/{subdomain}")
+    await session.request(
+        "GET", "/api/businesses/{business_id}/products", f"/api/businesses/{tenant['business_id']}/products"
+    )
+    await session.request(
+        "POST", "/api/public/businesses/{subdomain}/calculate-delivery",
+        f"/api/public/businesses/{subdomain}/calculate-delivery",
+        json={
+            "customer_latitude": tenant["latitude"] + session.rng.uniform(-0.1, 0.1),
+            "customer_longitude": tenant["longitude"] + session.rng.uniform(-0.1, 0.1),
+        },
+    )
+    await session.request(
+        "GET", "/api/public/businesses/{subdomain}/payment-info", f"/api/public/businesses/{subdomain}/payment-info"
+    )
+
+
+async def checkout(session):
+    tenant = session.tenant()
+    subdomain = tenant["subdomain"]
+    products = session.rng.sample(tenant["product_ids"], min(len(tenant["product_ids"]), session.rng.randint(1, 4)))
+    customer = f"Load Customer {session.rng.randint(1, 100000)}"
+
+    order = await session.request(
+        "POST", "/api/businesses/{business_id}/orders", f"/api/businesses/{tenant['business_id']}/orders",
+        json={
+            "customer_name": customer,
+            "customer_phone": f"+91{session.rng.randint(7000000000, 9999999999)}",
+            "items": [{"product_id": product_id, "quantity": session.rng.randint(1, 3)} for product_id in products],
+        },
+    )
+    if order is None or not tenant.get("razorpay_key_secret"):
+        return
+    order = order.json()
+
+    payment = await session.request(
+        "POST", "/api/public/businesses/{subdomain}/payments/razorpay/create",
+        f"/api/public/businesses/{subdomain}/payments/razorpay/create",
+        json={
+            "order_id": order["id"], "amount": order["total_amount"], "customer_name": customer,
+            "customer_email": "load@example.com", "customer_phone": order["customer_phone"],
+        },
+    )
+    if payment is None:
+        return
+
+    gateway_order_id = payment.json()["order_id"]
+    payment_id = f"pay_{uuid.UUID(int=session.rng.getrandbits(128)).hex[:14]}"
+    signature = hmac.new(
+        tenant["razorpay_key_secret"].encode(), f"{gateway_order_id}|{payment_id}".encode(), hashlib.sha256
+    ).hexdigest()
+    await session.request(
+        "POST", "/api/public/businesses/{subdomain}/payments/razorpay/verify",
+        f"/api/public/businesses/{subdomain}/payments/razorpay/verify",
+        json={"razorpay_order_id": gateway_order_id, "razorpay_payment_id": payment_id, "razorpay_signature": signature},
+    )
+
+
+async def dashboard(session):
+    tenant = session.tenant()
+    headers = {"Authorization": f"Bearer {tenant['token']}"}
+    business_id = tenant["business_id"]
+    await session.request("GET", "/api/auth/me", "/api/auth/me", headers=headers)
+    await session.request("GET", "/api/businesses", "/api/businesses", headers=headers)
+    await session.request(
+        "GET", "/api/businesses/{business_id}/orders", f"/api/businesses/{business_id}/orders", headers=headers
+    )
+    await session.request(
+        "GET", "/api/businesses/{business_id}/bookings", f"/api/businesses/{business_id}/bookings", headers=headers
+    )
+    await session.request(
+        "GET", "/api/businesses/{business_id}/analytics", f"/api/businesses/{business_id}/analytics", headers=headers
+    )
+
+
+async def admin(session):
+    headers = {"Authorization": f"Bearer {session.fixture['admin_token']}"}
+    await session.request("GET", "/api/admin/stats", "/api/admin/stats", headers=headers)
+    await session.request("GET", "/api/admin/users", "/api/admin/users", headers=headers)
+    await session.request("GET", "/api/admin/businesses", "/api/admin/businesses", headers=headers)
+
+
+SCENARIOS = {
+    "storefront": storefront,
+    "checkout": checkout,
+    "dashboard": dashboard,
+    "admin": admin,
+}
+
+# Storefront traffic dominates; owners and admins are a small share
+DEFAULT_WEIGHTS = {"storefront": 70, "checkout": 15, "dashboard": 12, "admin": 3}
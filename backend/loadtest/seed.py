@@ -0,0 +1,182 @@
+"""
+Seed synthetic tenants for load tests and write the fixture run.py reads.
+
+Tenants are created through the API (signup, business, products, bookings),
+so every document goes through the same models, hashing and storage code as
+real traffic. Everything is derived from --seed: the same seed against an
+empty database produces the same tenants, and re-running it reuses the
+tenants that already exist.
+
+Tenant sizes are skewed: tenant i gets about max_products / (i + 1)
+products, so a few large catalogues sit next to many small ones. Every
+tenant uses Razorpay with a known test secret, so the checkout scenario can
+sign its verify calls; point the server at tests/fake_gateway.py.
+
+The admin user is promoted to super_admin directly in Mongo (MONGO_URL,
+DB_NAME), since only an existing super admin can do it through the API.
+
+    cd backend && python -m loadtest.seed --base-url http://127.0.0.1:8001 --tenants 50 --seed 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+from pathlib import Path
+
+import httpx
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+load_dotenv(ROOT_DIR / '.env')
+
+PASSWORD = "loadtest-password"
+RAZORPAY_KEY_SECRET = "loadtest_secret"
+
+# What a product looks like for each template_type
+CATALOGUES = {
+    "restaurant": ("food", ["Paneer Tikka", "Masala Dosa", "Veg Biryani", "Cold Coffee", "Gulab Jamun"]),
+    "salon": ("service", ["Haircut", "Hair Spa", "Facial", "Manicure", "Beard Trim"]),
+    "retail": ("clothing", ["Cotton Kurta", "Denim Jacket", "Silk Saree", "Linen Shirt", "Chinos"]),
+    "grocery": ("grocery", ["Basmati Rice 5kg", "Toor Dal 1kg", "Sunflower Oil 1L", "Atta 10kg", "Tea 500g"]),
+    "clinic": ("service", ["General Consultation", "Blood Test", "Dental Cleaning", "Eye Checkup", "X-Ray"]),
+}
+
+# Tenant locations spread around a few Indian cities
+CITIES = [(19.076, 72.8777), (28.6139, 77.209), (12.9716, 77.5946), (22.5726, 88.3639), (17.385, 78.4867)]
+
+
+def product_payload(rng: random.Random, template_type: str, index: int) -> dict:
+    product_type, names = CATALOGUES.get(template_type, ("general", ["Item"]))
+    mrp = round(rng.uniform(50, 5000), 0)
+    payload = {
+        "name": f"{names[index % len(names)]} {index // len(names) + 1}",
+        "description": f"Synthetic {product_type} product",
+        "mrp": mrp,
+        "sale_price": round(mrp * rng.uniform(0.6, 1.0), 0),
+        "category": product_type.title(),
+        "product_type": product_type,
+        "stock_quantity": rng.randint(0, 500),
+    }
+    if product_type == "food":
+        payload["is_veg"] = rng.random() < 0.7
+    if product_type == "clothing":
+        payload["sizes"] = rng.sample(["S", "M", "L", "XL", "XXL"], rng.randint(2, 5))
+        payload["colors"] = rng.sample(["Red", "Blue", "Green", "Black", "White"], rng.randint(1, 3))
+    if rng.random() < 0.2:
+        payload["bulk_pricing"] = [{"min_quantity": 10, "price_per_unit": round(payload["sale_price"] * 0.9, 0)}]
+    return payload
+
+
+async def auth(client: httpx.AsyncClient, name: str, email: str) -> dict:
+    """Sign up, or log in when the user exists from an earlier run"""
+    response = await client.post("/api/auth/signup", json={"name": name, "email": email, "password": PASSWORD})
+    if response.status_code == 400:
+        response = await client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+    response.raise_for_status()
+    return response.json()
+
+
+async def seed_tenant(client: httpx.AsyncClient, seed: int, index: int, max_products: int) -> dict:
+    rng = random.Random(f"{seed}-{index}")
+    template_type = rng.choice(list(CATALOGUES))
+    label = f"load{seed}t{index}"
+    email = f"{label}@loadtest.example.com"
+    session = await auth(client, f"Load Owner {index}", email)
+    headers = {"Authorization": f"Bearer {session['token']}"}
+    latitude, longitude = rng.choice(CITIES)
+
+    businesses = (await client.get("/api/businesses", headers=headers)).json()
+    if businesses:
+        business = businesses[0]
+    else:
+        response = await client.post("/api/businesses", headers=headers, json={
+            "name": f"Load {template_type.title()} {index}",
+            "description": f"Synthetic {template_type} tenant",
+            "subdomain": label,
+            "whatsapp_number": f"+91{rng.randint(7000000000, 9999999999)}",
+            "category": template_type.title(),
+            "template_type": template_type,
+            "delivery_charges": rng.choice([0, 30, 50]),
+            "tax_percentage": rng.choice([0, 5, 18]),
+            "business_latitude": latitude + rng.uniform(-0.05, 0.05),
+            "business_longitude": longitude + rng.uniform(-0.05, 0.05),
+            "max_delivery_radius_km": rng.choice([None, 10, 25]),
+            "payment_gateway": "razorpay",
+            "razorpay_key_id": f"rzp_test_{label}",
+            "razorpay_key_secret": RAZORPAY_KEY_SECRET,
+        })
+        response.raise_for_status()
+        business = response.json()
+
+    products_url = f"/api/businesses/{business['id']}/products"
+    product_ids = [p["id"] for p in (await client.get(products_url, params={"fields": "id"})).json()]
+    for product_index in range(len(product_ids), max(1, max_products // (index + 1))):
+        response = await client.post(
+            products_url, headers=headers, json=product_payload(rng, template_type, product_index)
+        )
+        response.raise_for_status()
+        product_ids.append(response.json()["id"])
+
+    if template_type in ("salon", "clinic") and not businesses:
+        for booking_index in range(rng.randint(1, 5)):
+            await client.post(f"/api/businesses/{business['id']}/bookings", json={
+                "customer_name": f"Load Customer {booking_index}",
+                "customer_phone": f"+91{rng.randint(7000000000, 9999999999)}",
+                "service_type": CATALOGUES[template_type][1][booking_index % 5],
+                "preferred_date": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                "preferred_time": f"{rng.randint(9, 18):02d}:00",
+            })
+
+    return {
+        "subdomain": business["subdomain"],
+        "business_id": business["id"],
+        "token": session["token"],
+        "email": email,
+        "template_type": template_type,
+        "latitude": latitude,
+        "longitude": longitude,
+        "product_ids": product_ids,
+        "razorpay_key_secret": RAZORPAY_KEY_SECRET,
+    }
+
+
+async def seed_admin(client: httpx.AsyncClient, seed: int) -> str:
+    email = f"load{seed}admin@loadtest.example.com"
+    session = await auth(client, "Load Admin", email)
+    mongo = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    await mongo[os.environ['DB_NAME']].users.update_one(
+        {"id": session["user"]["id"]}, {"$set": {"role": "super_admin"}}
+    )
+    mongo.close()
+    return session["token"]
+
+
+async def seed(base_url: str, tenants: int, max_products: int, seed_value: int, concurrency: int) -> dict:
+    limit = asyncio.Semaphore(concurrency)
+
+    async def bounded(index):
+        async with limit:
+            return await seed_tenant(client, seed_value, index, max_products)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        admin_token = await seed_admin(client, seed_value)
+        seeded = await asyncio.gather(*(bounded(index) for index in range(tenants)))
+    return {"seed": seed_value, "admin_token": admin_token, "tenants": list(seeded)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8001")
+    parser.add_argument("--tenants", type=int, default=50)
+    parser.add_argument("--max-products", type=int, default=200, help="Products of the largest tenant")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--out", type=Path, default=Path("loadtest/fixture.json"))
+    args = parser.parse_args()
+
+    fixture = asyncio.run(seed(args.base_url, args.tenants, args.max_products, args.seed, args.concurrency))
+    args.out.write_text(json.dumps(fixture, indent=2))
+    products = sum(len(tenant["product_ids"]) for tenant in fixture["tenants"])
+    print(f"Seeded {len(fixture['tenants'])} tenants, {products} products -> {args.out}")
@@ -0,0 +1,304 @@
+"""
+Prometheus metrics.
+
+GET /metrics serves the text exposition format (version 0.0.4):
+
+- http_request_duration_seconds: histogram by method, route template and status
+- http_requests_in_flight: requests being handled right now
+- mongodb_command_duration_seconds: histogram by collection and command, fed
+  by a pymongo CommandListener (MongoCommandMetrics) on the Motor client
+- mongodb_command_failures_total: failed commands by collection and command
+- cache, executor and payment reconciliation metrics, read from the
+  components' own stats at scrape time (REGISTRY.add_collector)
+
+Labels never carry raw paths or subdomains: requests are labelled with the
+matched route's template (/api/public/sites/{subdomain}), or "unmatched".
+Each metric also caps its series at METRICS_MAX_SERIES; label combinations
+past the cap are counted under "other".
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+METRICS_MAX_SERIES = int(os.environ.get('METRICS_MAX_SERIES', '500'))
+# Bearer token required on /metrics when set
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+HTTP_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+OVERFLOW = "other"
+
+# (label values, value) pairs making up one metric
+Samples = List[Tuple[Tuple[str, ...], float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def render_family(name: str, kind: str, help_text: str, labelnames: Sequence[str], samples: Samples) -> str:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for values, value in samples:
+        lines.append(f"{name}{_labels(labelnames, values)} {_format_value(value)}")
+    return "\n".join(lines)
+
+
+class Metric:
+    """One metric family with a bounded number of label combinations"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), max_series: int = METRICS_MAX_SERIES):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.max_series = max_series
+        self._series: Dict[Tuple[str, ...], object] = {}
+        # Mongo command events arrive on driver threads
+        self._lock = threading.Lock()
+
+    def _key(self, values: Sequence[str]) -> Tuple[str, ...]:
+        key = tuple(str(value) for value in values)
+        if key not in self._series and len(self._series) >= self.max_series:
+            return (OVERFLOW,) * len(self.labelnames)
+        return key
+
+    def render(self) -> str:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def render(self) -> str:
+        with self._lock:
+            samples = list(self._series.items())
+        return render_family(self.name, self.kind, self.help, self.labelnames, samples)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> str:
+        with self._lock:
+            samples = list(self._series.items()) or ([((), 0.0)] if not self.labelnames else [])
+        return render_family(self.name, self.kind, self.help, self.labelnames, samples)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS, max_series: int = METRICS_MAX_SERIES):
+        super().__init__(name, help_text, labelnames, max_series)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            key = self._key(labels)
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts, then sum and count
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> str:
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(names, key + (_format_value(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return "\n".join(lines)
+
+
+class Registry:
+    """Metrics updated as things happen, plus collectors read at scrape time"""
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        self.collectors: List[Callable[[], Iterable[str]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[str]]):
+        """collector() returns rendered families (see render_family)"""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        parts = [metric.render() for metric in self.metrics]
+        for collector in self.collectors:
+            parts.extend(collector())
+        return "\n".join(parts) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")
+))
+REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled"
+))
+MONGO_COMMAND_DURATION = REGISTRY.register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by collection and command",
+    ("collection", "command"), buckets=MONGO_BUCKETS
+))
+MONGO_COMMAND_FAILURES = REGISTRY.register(Counter(
+    "mongodb_command_failures_total", "Failed MongoDB commands by collection and command", ("collection", "command")
+))
+
+
+def stats_families(prefix: str, help_text: str, stats: Dict[str, float], counters: Iterable[str] = ()) -> List[str]:
+    """Families for a component's flat stats dict; keys in counters are exposed as *_total counters"""
+    counters = set(counters)
+    families = []
+    for key, value in stats.items():
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            continue
+        if key in counters:
+            families.append(render_family(f"{prefix}_{key}_total", "counter", f"{help_text}: {key}", (), [((), value)]))
+        else:
+            families.append(render_family(f"{prefix}_{key}", "gauge", f"{help_text}: {key}", (), [((), value)]))
+    return families
+
+
+def route_label(scope) -> str:
+    """Template of the route the router matched, never the raw path"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing requests by method, route template and status"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            method = scope["method"] if scope["method"] in HTTP_METHODS else OVERFLOW
+            REQUEST_DURATION.observe(time.perf_counter() - started, method, route_label(scope), str(status))
+
+
+def command_collection(command_name: str, command) -> str:
+    if command_name == "getMore":
+        return str(command.get("collection", ""))
+    target = command.get(command_name)
+    return target if isinstance(target, str) else ""
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Command latency and failures, for AsyncIOMotorClient(event_listeners=[...])"""
+
+    def __init__(self):
+        self._started: Dict[Tuple, Tuple[str, str]] = {}
+
+    def started(self, event):
+        self._started[(event.connection_id, event.request_id)] = (
+            command_collection(event.command_name, event.command), event.command_name
+        )
+
+    def _finish(self, event) -> Optional[Tuple[str, str]]:
+        labels = self._started.pop((event.connection_id, event.request_id), None)
+        if labels is not None:
+            MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, *labels)
+        return labels
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        labels = self._finish(event)
+        if labels is not None:
+            MONGO_COMMAND_FAILURES.inc(*labels)
+
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor counting queued, running and completed work"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = {"max_workers": self._max_workers, "queued": 0, "running": 0, "completed": 0, "wait_seconds": 0.0}
+        self._stats_lock = threading.Lock()
+
+    def submit(self, fn, /, *args, **kwargs):
+        submitted = time.perf_counter()
+        with self._stats_lock:
+            self.stats["queued"] += 1
+
+        def run():
+            with self._stats_lock:
+                self.stats["queued"] -= 1
+                self.stats["running"] += 1
+                self.stats["wait_seconds"] += time.perf_counter() - submitted
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._stats_lock:
+                    self.stats["running"] -= 1
+                    self.stats["completed"] += 1
+
+        return super().submit(run)
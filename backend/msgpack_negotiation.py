@@ -0,0 +1,174 @@
+"""
+MessagePack content negotiation for /api routes.
+
+Clients that send Accept: application/msgpack (preferred at least as much as
+application/json) get MessagePack responses, and request bodies sent as
+Content-Type: application/msgpack are accepted everywhere JSON is. Handlers
+and models are shared with JSON clients:
+
+- Requests: MsgpackMiddleware decodes the body and hands FastAPI the
+  equivalent JSON, so the usual request models validate it.
+- Responses: fast_json routes read response_media_type and encode MessagePack
+  directly. Other JSON responses are transcoded by the middleware.
+
+Dates stay ISO 8601 strings, as in JSON. MessagePack responses carry their own
+ETag variant (see http_cache.media_etag) and Vary: Accept.
+"""
+from contextvars import ContextVar
+from datetime import date, datetime
+
+import msgpack
+import orjson
+from starlette.datastructures import Headers, MutableHeaders
+
+from http_cache import media_etag
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+# Media type the current request negotiated, read by fast_json
+response_media_type: ContextVar[str] = ContextVar("response_media_type", default=JSON_MEDIA_TYPE)
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__} to MessagePack")
+
+
+def packb(value) -> bytes:
+    return msgpack.packb(value, default=_default, use_bin_type=True)
+
+
+def unpackb(body: bytes):
+    return msgpack.unpackb(body, raw=False)
+
+
+def accepts_msgpack(accept: str) -> bool:
+    """Whether Accept prefers MessagePack at least as much as JSON"""
+    weights = {}
+    for part in accept.lower().split(','):
+        media_type, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type:
+            weights[media_type.strip()] = q
+
+    msgpack_q = max(weights.get(media_type, 0.0) for media_type in MSGPACK_TYPES)
+    json_q = weights.get(JSON_MEDIA_TYPE, weights.get("application/*", weights.get("*/*", 0.0)))
+    return msgpack_q > 0 and msgpack_q >= json_q
+
+
+def _is_msgpack(content_type: str) -> bool:
+    return content_type.split(';')[0].strip().lower() in MSGPACK_TYPES
+
+
+class MsgpackMiddleware:
+    """ASGI middleware translating MessagePack requests and responses under a path prefix"""
+
+    def __init__(self, app, prefix: str = "/api"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        if _is_msgpack(request_headers.get("content-type", "")):
+            try:
+                scope, receive = await self._json_request(scope, receive)
+            except (ValueError, TypeError, msgpack.UnpackException, orjson.JSONEncodeError):
+                await self._bad_request(send)
+                return
+
+        wants_msgpack = accepts_msgpack(request_headers.get("accept", ""))
+        token = response_media_type.set(MSGPACK_MEDIA_TYPE if wants_msgpack else JSON_MEDIA_TYPE)
+        try:
+            await self.app(scope, receive, self._sender(send, wants_msgpack))
+        finally:
+            response_media_type.reset(token)
+
+    async def _json_request(self, scope, receive):
+        """Read the MessagePack body and replay it to the app as JSON"""
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = orjson.dumps(unpackb(b"".join(chunks)))
+
+        headers = MutableHeaders(raw=[
+            (name, value) for name, value in scope["headers"] if name not in (b"content-type", b"content-length")
+        ])
+        headers["content-type"] = JSON_MEDIA_TYPE
+        headers["content-length"] = str(len(body))
+        sent = False
+
+        async def receive_json():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        # Updated in place, so outer middleware still sees the route the router matches
+        scope["headers"] = headers.raw
+        return scope, receive_json
+
+    async def _bad_request(self, send):
+        body = orjson.dumps({"detail": "Invalid MessagePack body"})
+        await send({"type": "http.response.start", "status": 400, "headers": [
+            (b"content-type", JSON_MEDIA_TYPE.encode()), (b"content-length", str(len(body)).encode())
+        ]})
+        await send({"type": "http.response.body", "body": body})
+
+    def _sender(self, send, wants_msgpack: bool):
+        start_message = None
+        chunks = []
+        transcode = False
+
+        async def send_negotiated(message):
+            nonlocal start_message, transcode
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=list(message["headers"]))
+                message["headers"] = headers.raw
+                content_type = headers.get("content-type", "")
+                if content_type.startswith(JSON_MEDIA_TYPE) or _is_msgpack(content_type) or message["status"] == 304:
+                    headers.add_vary_header("Accept")
+                    if wants_msgpack:
+                        if headers.get("etag"):
+                            headers["etag"] = media_etag(headers["etag"], "msgpack")
+                        transcode = content_type.startswith(JSON_MEDIA_TYPE)
+                if not transcode:
+                    await send(message)
+                    return
+                start_message = message
+                return
+
+            if not transcode or message["type"] != "http.response.body":
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            if body:
+                body = packb(orjson.loads(body))
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers["content-type"] = MSGPACK_MEDIA_TYPE
+            headers["content-length"] = str(len(body))
+            start_message["headers"] = headers.raw
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        return send_negotiated
@@ -0,0 +1,641 @@
+"""
+Async payment gateway adapters.
+
+Each supported provider (Razorpay, Stripe, PayU, PhonePe) is a registered
+PaymentGateway adapter. Adapters reuse long-lived clients, and every outbound
+call goes through the adapter's guard:
+
+- a per-gateway timeout,
+- a bulkhead semaphore so a slow PSP cannot tie up every in-flight request,
+- a circuit breaker that fails fast while the provider is degraded.
+
+Gateway HTTP calls are made through pooled httpx clients cached per credential
+pair, so TLS connections are kept alive between checkouts.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from opentelemetry import trace
+from pymongo import UpdateOne
+
+RAZORPAY_API_BASE = os.environ.get('RAZORPAY_API_BASE', 'https://api.razorpay.com/v1')
+PAYU_PAYMENT_URL = os.environ.get('PAYU_PAYMENT_URL', 'https://secure.payu.in/_payment')
+PHONEPE_PAY_URL = os.environ.get('PHONEPE_PAY_URL', 'https://api-preprod.phonepe.com/apis/pg-sandbox/pg/v1/pay')
+PAYU_POSTSERVICE_URL = os.environ.get('PAYU_POSTSERVICE_URL', 'https://info.payu.in/merchant/postservice.php?form=2')
+PHONEPE_API_BASE = os.environ.get('PHONEPE_API_BASE', 'https://api-preprod.phonepe.com/apis/pg-sandbox')
+
+# Public URLs and platform keys, read once at import
+PUBLIC_BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'http://localhost:8001')
+SITE_BASE_URL = PUBLIC_BASE_URL.replace('/api', '')
+STRIPE_API_KEY = os.environ.get('STRIPE_API_KEY', 'sk_test_emergent')
+
+tracer = trace.get_tracer(__name__)
+
+# Timeouts (seconds) applied to every outbound gateway call
+GATEWAY_CONNECT_TIMEOUT = float(os.environ.get('GATEWAY_CONNECT_TIMEOUT', '3'))
+GATEWAY_READ_TIMEOUT = float(os.environ.get('GATEWAY_READ_TIMEOUT', '10'))
+
+# Connection pool sizing per cached client
+GATEWAY_MAX_CONNECTIONS = int(os.environ.get('GATEWAY_MAX_CONNECTIONS', '20'))
+GATEWAY_MAX_KEEPALIVE = int(os.environ.get('GATEWAY_MAX_KEEPALIVE', '5'))
+GATEWAY_KEEPALIVE_EXPIRY = float(os.environ.get('GATEWAY_KEEPALIVE_EXPIRY', '60'))
+
+# Upper bound on cached clients (one per business credential pair)
+GATEWAY_CLIENT_CACHE_SIZE = int(os.environ.get('GATEWAY_CLIENT_CACHE_SIZE', '256'))
+
+# Bulkhead: concurrent calls allowed per gateway, and how long to wait for a slot
+GATEWAY_MAX_CONCURRENCY = int(os.environ.get('GATEWAY_MAX_CONCURRENCY', '50'))
+GATEWAY_QUEUE_TIMEOUT = float(os.environ.get('GATEWAY_QUEUE_TIMEOUT', '1'))
+
+# Circuit breaker
+GATEWAY_FAILURE_THRESHOLD = int(os.environ.get('GATEWAY_FAILURE_THRESHOLD', '5'))
+GATEWAY_RESET_TIMEOUT = float(os.environ.get('GATEWAY_RESET_TIMEOUT', '30'))
+
+
+class GatewayError(Exception):
+    """Raised when a payment gateway call fails or times out"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def is_provider_failure(self) -> bool:
+        """Timeouts, connection errors and 5xx count against the provider; 4xx do not"""
+        return self.status_code is None or self.status_code >= 500
+
+
+class GatewayUnavailableError(GatewayError):
+    """Raised without calling the provider (circuit open or bulkhead full)"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open trial call"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = None, reset_timeout: float = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or GATEWAY_FAILURE_THRESHOLD
+        self.reset_timeout = GATEWAY_RESET_TIMEOUT if reset_timeout is None else reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def before_call(self):
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise GatewayUnavailableError(f"{self.name} is temporarily unavailable")
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                raise GatewayUnavailableError(f"{self.name} is temporarily unavailable")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._trial_in_flight = False
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Call finished without a verdict on provider health (e.g. a 4xx)"""
+        self._trial_in_flight = False
+
+
+def build_http_client(base_url: str, auth: Optional[Tuple[str, str]] = None,
+                      connect_timeout: float = None, read_timeout: float = None) -> httpx.AsyncClient:
+    """Create a keep-alive httpx client with explicit connect and read timeouts"""
+    connect_timeout = GATEWAY_CONNECT_TIMEOUT if connect_timeout is None else connect_timeout
+    read_timeout = GATEWAY_READ_TIMEOUT if read_timeout is None else read_timeout
+    return httpx.AsyncClient(
+        base_url=base_url,
+        auth=auth,
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        limits=httpx.Limits(
+            max_connections=GATEWAY_MAX_CONNECTIONS,
+            max_keepalive_connections=GATEWAY_MAX_KEEPALIVE,
+            keepalive_expiry=GATEWAY_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+class ClientCache:
+    """LRU cache of long-lived gateway clients keyed by credentials"""
+
+    def __init__(self, factory: Callable[..., Any], max_size: int = None):
+        self._factory = factory
+        self._max_size = max_size or GATEWAY_CLIENT_CACHE_SIZE
+        self._clients: "OrderedDict[tuple, Any]" = OrderedDict()
+
+    def get(self, *key):
+        client = self._clients.get(key)
+        if client is not None:
+            self._clients.move_to_end(key)
+            return client
+
+        client = self._factory(*key)
+        self._clients[key] = client
+        if len(self._clients) > self._max_size:
+            _, evicted = self._clients.popitem(last=False)
+            if hasattr(evicted, 'aclose'):
+                asyncio.get_running_loop().create_task(evicted.aclose())
+        return client
+
+    def __len__(self):
+        return len(self._clients)
+
+    async def close(self):
+        clients = list(self._clients.values())
+        self._clients.clear()
+        await asyncio.gather(*(c.aclose() for c in clients if hasattr(c, 'aclose')), return_exceptions=True)
+
+
+async def request_json(http: httpx.AsyncClient, provider: str, method: str, url: str, **kwargs) -> dict:
+    """Issue a gateway request, mapping transport and HTTP errors to GatewayError"""
+    try:
+        response = await http.request(method, url, **kwargs)
+    except httpx.TimeoutException as e:
+        raise GatewayError(f"{provider} request timed out: {e.__class__.__name__}")
+    except httpx.HTTPError as e:
+        raise GatewayError(f"{provider} request failed: {e}")
+
+    if response.status_code >= 400:
+        raise GatewayError(f"{provider} error: {response.text[:200]}", status_code=response.status_code)
+    try:
+        return response.json()
+    except ValueError:
+        raise GatewayError(f"{provider} returned invalid JSON", status_code=response.status_code)
+
+
+class RazorpayClient:
+    """Minimal async client for the Razorpay Orders API"""
+
+    def __init__(self, key_id: str, key_secret: str, base_url: str = None,
+                 connect_timeout: float = None, read_timeout: float = None):
+        self.key_id = key_id
+        self._http = build_http_client(
+            base_url or RAZORPAY_API_BASE,
+            auth=(key_id, key_secret),
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+        )
+
+    async def _request(self, method: str, path: str, **kwargs) -> dict:
+        try:
+            response = await self._http.request(method, path, **kwargs)
+        except httpx.TimeoutException as e:
+            raise GatewayError(f"Razorpay request timed out: {e.__class__.__name__}")
+        except httpx.HTTPError as e:
+            raise GatewayError(f"Razorpay request failed: {e}")
+
+        if response.status_code >= 400:
+            try:
+                message = response.json().get('error', {}).get('description') or response.text
+            except ValueError:
+                message = response.text
+            raise GatewayError(f"Razorpay error: {message}", status_code=response.status_code)
+        return response.json()
+
+    async def create_order(self, amount: int, currency: str, receipt: str) -> dict:
+        """Create an order (amount in paise)"""
+        return await self._request('POST', '/orders', json={
+            "amount": amount,
+            "currency": currency,
+            "receipt": receipt,
+            "payment_capture": 1
+        })
+
+    async def fetch_order(self, order_id: str) -> dict:
+        return await self._request('GET', f'/orders/{order_id}')
+
+    async def aclose(self):
+        await self._http.aclose()
+
+
+_razorpay_clients = ClientCache(RazorpayClient)
+
+
+def get_razorpay_client(key_id: str, key_secret: str) -> RazorpayClient:
+    """Return the pooled client for a credential pair, creating it on first use"""
+    return _razorpay_clients.get(key_id, key_secret)
+
+
+# ============ Gateway Adapters ============
+
+class PaymentGateway:
+    """Base adapter. Subclasses implement create_payment for one provider."""
+
+    name: str = ""
+    display_name: str = ""
+    credential_fields: Tuple[str, ...] = ()
+    default_timeout: float = 10.0
+
+    def __init__(self):
+        self.timeout = float(os.environ.get(f'{self.name.upper()}_TIMEOUT', self.default_timeout))
+        self.breaker = CircuitBreaker(self.display_name)
+        self._slots = asyncio.Semaphore(GATEWAY_MAX_CONCURRENCY)
+
+    def has_credentials(self, business: dict) -> bool:
+        return all(business.get(field) for field in self.credential_fields)
+
+    async def call(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Run an outbound provider call under the breaker, bulkhead and timeout"""
+        # One span per provider call, queueing included; httpx spans nest under it
+        with tracer.start_as_current_span(
+            f"{self.name}.{getattr(fn, '__name__', 'call')}",
+            kind=trace.SpanKind.CLIENT,
+            attributes={"payment.gateway": self.name},
+        ):
+            return await self._call(fn, *args, **kwargs)
+
+    async def _call(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        self.breaker.before_call()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), GATEWAY_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.breaker.release()
+            raise GatewayUnavailableError(f"{self.display_name} is busy, please retry")
+        except BaseException:
+            # Cancelled while queueing; let the next caller take the half-open trial
+            self.breaker.release()
+            raise
+
+        try:
+            result = await asyncio.wait_for(fn(*args, **kwargs), self.timeout)
+        except asyncio.TimeoutError:
+            self.breaker.record_failure()
+            raise GatewayError(f"{self.display_name} did not respond within {self.timeout}s")
+        except GatewayError as e:
+            if e.is_provider_failure:
+                self.breaker.record_failure()
+            else:
+                self.breaker.release()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled (client gone, shutdown): no verdict on the provider, but
+            # a half-open trial left in flight would keep the circuit shut for good
+            self.breaker.release()
+            raise
+        finally:
+            self._slots.release()
+
+        self.breaker.record_success()
+        return result
+
+    async def create_payment(self, business: dict, request, subdomain: str) -> Tuple[str, dict]:
+        """Start a payment. Returns (gateway_order_id, response for the client)."""
+        raise NotImplementedError
+
+    async def fetch_status(self, business: dict, gateway_order_id: str) -> Optional[dict]:
+        """Ask the provider for a payment's outcome.
+
+        Returns {"status": "success" | "failed", "gateway_payment_id": ...} once
+        final, or None while the payment is still pending.
+        """
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+
+GATEWAYS: Dict[str, PaymentGateway] = {}
+
+
+def register_gateway(cls):
+    """Class decorator registering a single adapter instance under cls.name"""
+    GATEWAYS[cls.name] = cls()
+    return cls
+
+
+def get_gateway(name: str) -> Optional[PaymentGateway]:
+    return GATEWAYS.get(name)
+
+
+@register_gateway
+class RazorpayGateway(PaymentGateway):
+    name = "razorpay"
+    display_name = "Razorpay"
+    credential_fields = ('razorpay_key_id', 'razorpay_key_secret')
+
+    async def create_payment(self, business, request, subdomain):
+        client = get_razorpay_client(business['razorpay_key_id'], business['razorpay_key_secret'])
+
+        # Create Razorpay order (amount in paise)
+        razorpay_order = await self.call(
+            client.create_order,
+            amount=int(request.amount * 100),
+            currency="INR",
+            receipt=request.order_id
+        )
+        return razorpay_order['id'], {
+            "order_id": razorpay_order['id'],
+            "amount": razorpay_order['amount'],
+            "currency": razorpay_order['currency'],
+            "key_id": business['razorpay_key_id'],
+            "business_name": business['name'],
+            "customer_name": request.customer_name,
+            "customer_email": request.customer_email,
+            "customer_phone": request.customer_phone
+        }
+
+    async def fetch_status(self, business, gateway_order_id):
+        client = get_razorpay_client(business['razorpay_key_id'], business['razorpay_key_secret'])
+        order = await self.call(client.fetch_order, gateway_order_id)
+        if order.get('status') == 'paid':
+            return {"status": "success", "gateway_payment_id": None}
+        return None
+
+    async def aclose(self):
+        await _razorpay_clients.close()
+
+
+@register_gateway
+class StripeGateway(PaymentGateway):
+    name = "stripe"
+    display_name = "Stripe"
+    webhook_url = f"{PUBLIC_BASE_URL}/api/webhook/stripe"
+
+    def __init__(self):
+        super().__init__()
+        self._checkouts = ClientCache(self._build_checkout)
+
+    def _build_checkout(self, api_key: str):
+        from emergentintegrations.payments.stripe.checkout import StripeCheckout
+        return StripeCheckout(api_key=api_key, webhook_url=self.webhook_url)
+
+    def has_credentials(self, business):
+        # Falls back to the platform key when the business has none
+        return True
+
+    def checkout_for(self, business: dict):
+        return self._checkouts.get(business.get('stripe_secret_key') or STRIPE_API_KEY)
+
+    async def create_payment(self, business, request, subdomain):
+        from emergentintegrations.payments.stripe.checkout import CheckoutSessionRequest
+
+        checkout_request = CheckoutSessionRequest(
+            amount=request.amount,
+            currency="inr",
+            success_url=f"{SITE_BASE_URL}/site/{subdomain}/payment-success?session_id={{CHECKOUT_SESSION_ID}}",
+            cancel_url=f"{SITE_BASE_URL}/site/{subdomain}/payment-cancel",
+            metadata={
+                "order_id": request.order_id,
+                "business_id": business['id'],
+                "customer_email": request.customer_email
+            }
+        )
+        session = await self.call(self.checkout_for(business).create_checkout_session, checkout_request)
+        return session.session_id, {
+            "checkout_url": session.url,
+            "session_id": session.session_id
+        }
+
+    async def checkout_status(self, business: dict, session_id: str):
+        return await self.call(self.checkout_for(business).get_checkout_status, session_id)
+
+    async def fetch_status(self, business, gateway_order_id):
+        status = await self.checkout_status(business, gateway_order_id)
+        if status.payment_status == 'paid':
+            return {"status": "success", "gateway_payment_id": None}
+        if status.status == 'expired':
+            return {"status": "failed", "gateway_payment_id": None}
+        return None
+
+
+@register_gateway
+class PayUGateway(PaymentGateway):
+    name = "payu"
+    display_name = "PayU"
+    credential_fields = ('payu_merchant_key', 'payu_merchant_salt')
+
+    def __init__(self):
+        super().__init__()
+        self._http = None
+
+    async def create_payment(self, business, request, subdomain):
+        txnid = str(uuid.uuid4())[:20]
+
+        # Generate hash
+        hash_string = f"{business['payu_merchant_key']}|{txnid}|{request.amount}|{request.order_id}|{request.customer_name}|{request.customer_email}|||||||||||{business['payu_merchant_salt']}"
+        hash_value = hashlib.sha512(hash_string.encode('utf-8')).hexdigest()
+
+        return txnid, {
+            "payu_url": PAYU_PAYMENT_URL,
+            "key": business['payu_merchant_key'],
+            "txnid": txnid,
+            "amount": request.amount,
+            "productinfo": request.order_id,
+            "firstname": request.customer_name,
+            "email": request.customer_email,
+            "phone": request.customer_phone,
+            "surl": f"{SITE_BASE_URL}/site/{subdomain}/payment-success",
+            "furl": f"{SITE_BASE_URL}/site/{subdomain}/payment-failed",
+            "hash": hash_value
+        }
+
+    async def fetch_status(self, business, gateway_order_id):
+        if self._http is None:
+            self._http = build_http_client("")
+
+        key = business['payu_merchant_key']
+        command = "verify_payment"
+        hash_value = hashlib.sha512(
+            f"{key}|{command}|{gateway_order_id}|{business['payu_merchant_salt']}".encode('utf-8')
+        ).hexdigest()
+        result = await self.call(
+            request_json, self._http, self.display_name, 'POST', PAYU_POSTSERVICE_URL,
+            data={"key": key, "command": command, "var1": gateway_order_id, "hash": hash_value}
+        )
+
+        details = (result.get('transaction_details') or {}).get(gateway_order_id) or {}
+        if details.get('status') == 'success':
+            return {"status": "success", "gateway_payment_id": details.get('mihpayid')}
+        if details.get('status') in ('failure', 'failed', 'dropped', 'bounced'):
+            return {"status": "failed", "gateway_payment_id": details.get('mihpayid')}
+        return None
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+
+
+@register_gateway
+class PhonePeGateway(PaymentGateway):
+    name = "phonepe"
+    display_name = "PhonePe"
+    credential_fields = ('phonepe_merchant_id', 'phonepe_salt_key')
+
+    def __init__(self):
+        super().__init__()
+        self._http = None
+
+    async def create_payment(self, business, request, subdomain):
+        merchant_transaction_id = str(uuid.uuid4())[:35]
+
+        payload = {
+            "merchantId": business['phonepe_merchant_id'],
+            "merchantTransactionId": merchant_transaction_id,
+            "merchantUserId": request.customer_email,
+            "amount": int(request.amount * 100),  # Amount in paise
+            "redirectUrl": f"{SITE_BASE_URL}/site/{subdomain}/payment-success?txnId={merchant_transaction_id}",
+            "redirectMode": "REDIRECT",
+            "callbackUrl": f"{SITE_BASE_URL}/api/webhook/phonepe/{subdomain}",
+            "paymentInstrument": {"type": "PAY_PAGE"}
+        }
+        payload_base64 = base64.b64encode(json.dumps(payload).encode()).decode()
+
+        # Generate checksum
+        salt_index = business.get('phonepe_salt_index', 1)
+        string_to_hash = payload_base64 + "/pg/v1/pay" + business['phonepe_salt_key']
+        checksum = hashlib.sha256(string_to_hash.encode()).hexdigest() + "###" + str(salt_index)
+
+        return merchant_transaction_id, {
+            "phonepe_url": PHONEPE_PAY_URL,
+            "payload": payload_base64,
+            "checksum": checksum,
+            "merchant_transaction_id": merchant_transaction_id
+        }
+
+    async def fetch_status(self, business, gateway_order_id):
+        if self._http is None:
+            self._http = build_http_client(PHONEPE_API_BASE)
+
+        merchant_id = business['phonepe_merchant_id']
+        path = f"/pg/v1/status/{merchant_id}/{gateway_order_id}"
+        salt_index = business.get('phonepe_salt_index', 1)
+        checksum = hashlib.sha256((path + business['phonepe_salt_key']).encode()).hexdigest() + "###" + str(salt_index)
+        result = await self.call(
+            request_json, self._http, self.display_name, 'GET', path,
+            headers={"X-VERIFY": checksum, "X-MERCHANT-ID": merchant_id}
+        )
+
+        transaction_id = (result.get('data') or {}).get('transactionId')
+        if result.get('code') == 'PAYMENT_SUCCESS':
+            return {"status": "success", "gateway_payment_id": transaction_id}
+        if result.get('code') in ('PAYMENT_ERROR', 'PAYMENT_DECLINED', 'TIMED_OUT'):
+            return {"status": "failed", "gateway_payment_id": transaction_id}
+        return None
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+
+
+# ============ Transactions ============
+
+async def record_transaction(db, business: dict, gateway: str, gateway_order_id: str, request) -> dict:
+    """Insert the pending payment_transactions row shared by every gateway"""
+    now = datetime.now(timezone.utc)
+    transaction = {
+        "id": str(uuid.uuid4()),
+        "business_id": business['id'],
+        "order_id": request.order_id,
+        "amount": request.amount,
+        "currency": "INR",
+        "gateway": gateway,
+        "gateway_order_id": gateway_order_id,
+        "status": "pending",
+        "customer_name": request.customer_name,
+        "customer_email": request.customer_email,
+        "customer_phone": request.customer_phone,
+        "created_at": now,
+        "updated_at": now
+    }
+    await db.payment_transactions.insert_one(transaction)
+    return transaction
+
+
+# Statuses a transaction may be settled from. "success" is terminal; a verified
+# success still overrides an earlier failure (late payment, forged verify call).
+SETTLEABLE_FROM = {
+    "success": ["pending", "failed"],
+    "failed": ["pending"],
+}
+
+
+def can_settle(current_status: str, new_status: str) -> bool:
+    return current_status in SETTLEABLE_FROM[new_status]
+
+
+async def settle_transaction(db, business_id: str, gateway: str, gateway_order_id: str, status: str,
+                             gateway_payment_id: Optional[str] = None) -> Optional[dict]:
+    """Move one of a business's transactions to a final status in a single round trip.
+
+    The status guard makes each transition happen once, so concurrent or
+    repeated calls get None, as do calls naming another business's transaction.
+    Returns the transaction's order_id.
+    """
+    update = {"status": status, "updated_at": datetime.now(timezone.utc)}
+    if gateway_payment_id:
+        update["gateway_payment_id"] = gateway_payment_id
+    return await db.payment_transactions.find_one_and_update(
+        {"business_id": business_id, "gateway": gateway, "gateway_order_id": gateway_order_id,
+         "status": {"$in": SETTLEABLE_FROM[status]}},
+        {"$set": update},
+        projection={"_id": 0, "order_id": 1}
+    )
+
+
+async def settle_transactions(db, settlements: List[dict]) -> int:
+    """Bulk-apply final statuses to transactions and mark paid orders.
+
+    Each settlement carries business_id, gateway, gateway_order_id, order_id and
+    status, plus optional gateway_payment_id and failure_reason. Writes are
+    scoped to business_id and use the same guard as settle_transaction. Returns
+    the number of transactions settled.
+    """
+    now = datetime.now(timezone.utc)
+    transaction_ops = []
+    order_ops = []
+    for settlement in settlements:
+        update = {"status": settlement['status'], "updated_at": now}
+        for field in ('gateway_payment_id', 'failure_reason'):
+            if settlement.get(field):
+                update[field] = settlement[field]
+        transaction_ops.append(UpdateOne(
+            {"business_id": settlement['business_id'], "gateway": settlement['gateway'],
+             "gateway_order_id": settlement['gateway_order_id'],
+             "status": {"$in": SETTLEABLE_FROM[settlement['status']]}},
+            {"$set": update}
+        ))
+        if settlement['status'] == "success":
+            order_update = {"status": "paid"}
+            if settlement.get('gateway_payment_id'):
+                order_update["payment_id"] = settlement['gateway_payment_id']
+            order_ops.append(UpdateOne(
+                {"id": settlement['order_id'], "business_id": settlement['business_id']}, {"$set": order_update}
+            ))
+
+    if not transaction_ops:
+        return 0
+    result = await db.payment_transactions.bulk_write(transaction_ops, ordered=False)
+    if order_ops:
+        await db.orders.bulk_write(order_ops, ordered=False)
+    return result.modified_count
+
+
+async def close_gateway_clients():
+    """Close every pooled gateway client (called on app shutdown)"""
+    await asyncio.gather(*(g.aclose() for g in GATEWAYS.values()), return_exceptions=True)
@@ -0,0 +1,226 @@
+"""
+Background payment reconciliation.
+
+Transactions can stay "pending" when a customer abandons checkout or a
+gateway callback never arrives. The reconciler periodically scans pending
+payment_transactions older than RECONCILE_MIN_AGE (through the
+(status, updated_at) index), asks each gateway for the outcome in
+rate-limited concurrent batches, and settles transactions and orders in bulk.
+
+Transactions still pending at the gateway get their updated_at bumped so the
+next scan moves on to older rows; once older than RECONCILE_ABANDON_AFTER they
+are marked failed as abandoned. So are transactions that can no longer be
+checked at all (gateway not registered, or the business's credentials
+removed); failed gateway calls are retried on the next scan instead, since the
+gateway may yet report a payment.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING
+
+from payment_gateways import GatewayError, get_gateway, settle_transactions
+
+logger = logging.getLogger(__name__)
+
+# Disable on all but one app instance when running several workers
+RECONCILE_ENABLED = os.environ.get('RECONCILE_ENABLED', 'true').lower() == 'true'
+RECONCILE_INTERVAL = float(os.environ.get('RECONCILE_INTERVAL', '300'))
+RECONCILE_MIN_AGE = float(os.environ.get('RECONCILE_MIN_AGE', '900'))
+RECONCILE_ABANDON_AFTER = float(os.environ.get('RECONCILE_ABANDON_AFTER', '86400'))
+RECONCILE_BATCH_SIZE = int(os.environ.get('RECONCILE_BATCH_SIZE', '500'))
+RECONCILE_CONCURRENCY = int(os.environ.get('RECONCILE_CONCURRENCY', '10'))
+RECONCILE_RATE_PER_SECOND = float(os.environ.get('RECONCILE_RATE_PER_SECOND', '5'))
+
+# stats keys that only ever grow, exported as *_total counters on /metrics
+RECONCILE_COUNTERS = ("runs", "checked", "settled", "abandoned", "errors", "rate_limited")
+
+# Business fields the gateway adapters need besides the stored secrets
+GATEWAY_CREDENTIAL_PROJECTION = {
+    "_id": 0, "id": 1,
+    "razorpay_key_id": 1,
+    "payu_merchant_key": 1,
+    "phonepe_merchant_id": 1, "phonepe_salt_index": 1,
+}
+
+
+class UncheckableError(GatewayError):
+    """The transaction's gateway is unknown or the business has no credentials for it"""
+
+
+class RateLimiter:
+    """Token bucket limiting calls per second (burst of one second's worth)"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> bool:
+        """Take a token, waiting for one if needed. Returns whether it had to wait."""
+        waited = False
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                waited = True
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+async def ensure_reconciliation_indexes(db):
+    await db.payment_transactions.create_index([("status", ASCENDING), ("updated_at", ASCENDING)])
+
+
+class PaymentReconciler:
+    """Periodic worker settling stale pending transactions against the gateways"""
+
+    def __init__(self, db, credential_store, interval: float = RECONCILE_INTERVAL):
+        self.db = db
+        self.credential_store = credential_store
+        self.interval = interval
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "runs": 0,
+            "checked": 0,
+            "settled": 0,
+            "abandoned": 0,
+            "errors": 0,
+            "rate_limited": 0,
+            "last_run_at": None,
+            "last_run_seconds": 0.0,
+            "last_run_checks_per_second": 0.0,
+            "lag_seconds": 0.0,
+        }
+
+    def _limiter(self, gateway: str) -> RateLimiter:
+        if gateway not in self._limiters:
+            self._limiters[gateway] = RateLimiter(RECONCILE_RATE_PER_SECOND)
+        return self._limiters[gateway]
+
+    async def run_once(self) -> dict:
+        """Reconcile one batch of stale pending transactions. Returns this run's counts."""
+        started = time.monotonic()
+        now = datetime.now(timezone.utc)
+
+        transactions = await self.db.payment_transactions.find(
+            {"status": "pending", "updated_at": {"$lt": now - timedelta(seconds=RECONCILE_MIN_AGE)}},
+            {"_id": 0, "id": 1, "business_id": 1, "order_id": 1, "gateway": 1,
+             "gateway_order_id": 1, "created_at": 1, "updated_at": 1}
+        ).sort("updated_at", 1).to_list(RECONCILE_BATCH_SIZE)
+
+        run = {"checked": 0, "settled": 0, "abandoned": 0, "errors": 0}
+        if transactions:
+            oldest = _as_utc(transactions[0]['updated_at'])
+            self.stats["lag_seconds"] = (now - oldest).total_seconds()
+
+            business_ids = list({t['business_id'] for t in transactions})
+            businesses = await self.db.businesses.find(
+                {"id": {"$in": business_ids}}, GATEWAY_CREDENTIAL_PROJECTION
+            ).to_list(None)
+            secrets = await self.credential_store.get_many(business_ids)
+            businesses = {b['id']: {**b, **secrets.get(b['id'], {})} for b in businesses}
+
+            semaphore = asyncio.Semaphore(RECONCILE_CONCURRENCY)
+            results = await asyncio.gather(*(
+                self._check(semaphore, t, businesses.get(t['business_id'])) for t in transactions
+            ))
+            await self._apply(transactions, results, now, run)
+        else:
+            self.stats["lag_seconds"] = 0.0
+
+        elapsed = time.monotonic() - started
+        self.stats["runs"] += 1
+        for key in run:
+            self.stats[key] += run[key]
+        self.stats["last_run_at"] = now.isoformat()
+        self.stats["last_run_seconds"] = round(elapsed, 3)
+        self.stats["last_run_checks_per_second"] = round(run["checked"] / elapsed, 2) if elapsed else 0.0
+        return run
+
+    async def _check(self, semaphore: asyncio.Semaphore, transaction: dict, business: Optional[dict]):
+        """Ask the gateway for one transaction. Returns a status dict, None if pending, or an exception."""
+        gateway = get_gateway(transaction['gateway'])
+        if gateway is None or business is None or not gateway.has_credentials(business):
+            return UncheckableError("Gateway or credentials unavailable")
+
+        async with semaphore:
+            if await self._limiter(gateway.name).acquire():
+                self.stats["rate_limited"] += 1
+            try:
+                return await gateway.fetch_status(business, transaction['gateway_order_id'])
+            except Exception as e:
+                return e
+
+    async def _apply(self, transactions: List[dict], results: list, now: datetime, run: dict):
+        settlements = []
+        still_pending = []
+        abandon_before = now - timedelta(seconds=RECONCILE_ABANDON_AFTER)
+
+        for transaction, result in zip(transactions, results):
+            if isinstance(result, Exception):
+                run["errors"] += 1
+                logger.warning("Reconciliation check failed for transaction %s: %s", transaction['id'], result)
+                if isinstance(result, UncheckableError) and _as_utc(transaction['created_at']) < abandon_before:
+                    settlements.append({**transaction, "status": "failed", "failure_reason": "abandoned"})
+                    run["abandoned"] += 1
+                else:
+                    still_pending.append(transaction['id'])
+                continue
+
+            run["checked"] += 1
+            if result is not None:
+                settlements.append({**transaction, **result})
+            elif _as_utc(transaction['created_at']) < abandon_before:
+                settlements.append({**transaction, "status": "failed", "failure_reason": "abandoned"})
+                run["abandoned"] += 1
+            else:
+                still_pending.append(transaction['id'])
+
+        if settlements:
+            run["settled"] += await settle_transactions(self.db, settlements)
+        if still_pending:
+            # Push to the back of the scan order until the next check
+            await self.db.payment_transactions.update_many(
+                {"id": {"$in": still_pending}, "status": "pending"},
+                {"$set": {"updated_at": now}}
+            )
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Payment reconciliation run failed")
+                self.stats["errors"] += 1
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def _as_utc(value) -> datetime:
+    """Mongo returns naive UTC datetimes unless the client is tz_aware"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
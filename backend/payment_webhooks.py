@@ -0,0 +1,326 @@
+"""
+Payment webhook ingestion.
+
+Webhook routes only verify the signature and persist the raw event to
+payment_webhook_events, which is unique on (gateway, event_id) so provider
+retries are dropped at insert time. A background worker then applies pending
+events in batches to payment_transactions and orders.
+
+Settlement writes are guarded on the current transaction status, so applying an
+event twice (replay, several app workers, or a race with the verify routes)
+has no effect.
+
+Events received on a business's own endpoint (PhonePe, verified with that
+business's salt key) are stored with its business_id, and only ever settle that
+business's transactions: an event naming another business's transaction is
+rejected. Stripe events come from the platform account and are scoped to the
+business of the transaction they name.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+from payment_gateways import can_settle, settle_transactions
+
+logger = logging.getLogger(__name__)
+
+STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
+STRIPE_SIGNATURE_TOLERANCE = int(os.environ.get('STRIPE_SIGNATURE_TOLERANCE', '300'))
+
+WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE', '200'))
+WEBHOOK_POLL_INTERVAL = float(os.environ.get('WEBHOOK_POLL_INTERVAL', '5'))
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', '10'))
+
+# Stripe checkout events we act on, mapped to the transaction status they settle to
+STRIPE_EVENT_STATUS = {
+    "checkout.session.async_payment_succeeded": "success",
+    "checkout.session.async_payment_failed": "failed",
+    "checkout.session.expired": "failed",
+}
+
+# PhonePe callback codes mapped to transaction status (anything else is ignored)
+PHONEPE_CODE_STATUS = {
+    "PAYMENT_SUCCESS": "success",
+    "PAYMENT_ERROR": "failed",
+    "PAYMENT_DECLINED": "failed",
+    "TIMED_OUT": "failed",
+}
+
+
+class WebhookSignatureError(Exception):
+    """Raised when a webhook payload fails signature verification"""
+
+
+# ============ Signature Verification ============
+
+def verify_stripe_signature(payload: bytes, header: Optional[str], secret: Optional[str],
+                            tolerance: int = STRIPE_SIGNATURE_TOLERANCE) -> None:
+    """Check a Stripe-Signature header (t=...,v1=...) against the endpoint secret"""
+    if not secret:
+        raise WebhookSignatureError("Stripe webhook secret not configured")
+    if not header:
+        raise WebhookSignatureError("Missing Stripe-Signature header")
+
+    timestamp = None
+    signatures = []
+    for part in header.split(','):
+        key, _, value = part.strip().partition('=')
+        if key == 't':
+            timestamp = value
+        elif key == 'v1':
+            signatures.append(value)
+    if not timestamp or not signatures:
+        raise WebhookSignatureError("Malformed Stripe-Signature header")
+
+    try:
+        age = time.time() - int(timestamp)
+    except ValueError:
+        raise WebhookSignatureError("Malformed Stripe-Signature header")
+    if tolerance and age > tolerance:
+        raise WebhookSignatureError("Stripe webhook timestamp outside tolerance")
+
+    expected = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    if not any(hmac.compare_digest(expected, sig) for sig in signatures):
+        raise WebhookSignatureError("Invalid Stripe signature")
+
+
+def verify_phonepe_signature(response_b64: str, x_verify: Optional[str], salt_key: str) -> None:
+    """Check a PhonePe X-VERIFY header: sha256(response + salt_key) + '###' + salt_index"""
+    if not x_verify:
+        raise WebhookSignatureError("Missing X-VERIFY header")
+    checksum = x_verify.split('###', 1)[0]
+    expected = hashlib.sha256((response_b64 + salt_key).encode()).hexdigest()
+    if not hmac.compare_digest(expected, checksum):
+        raise WebhookSignatureError("Invalid PhonePe checksum")
+
+
+# ============ Event Parsing ============
+
+def parse_stripe_event(payload: bytes) -> dict:
+    """Normalize a Stripe event into the fields the worker applies"""
+    event = json.loads(payload)
+    obj = event.get('data', {}).get('object', {})
+    event_type = event.get('type')
+
+    status = STRIPE_EVENT_STATUS.get(event_type)
+    if event_type == "checkout.session.completed" and obj.get('payment_status') == 'paid':
+        status = "success"
+
+    return {
+        "event_id": event['id'],
+        "event_type": event_type,
+        "gateway_order_id": obj.get('id'),
+        "gateway_payment_id": obj.get('payment_intent'),
+        "status": status,
+    }
+
+
+def parse_phonepe_event(response_b64: str) -> dict:
+    """Normalize a decoded PhonePe server-to-server callback"""
+    callback = json.loads(base64.b64decode(response_b64))
+    data = callback.get('data', {})
+    code = callback.get('code')
+    merchant_transaction_id = data.get('merchantTransactionId')
+
+    return {
+        # PhonePe has no event id; a transaction reaches each code at most once
+        "event_id": f"{merchant_transaction_id}:{code}",
+        "event_type": code,
+        "gateway_order_id": merchant_transaction_id,
+        "gateway_payment_id": data.get('transactionId'),
+        "status": PHONEPE_CODE_STATUS.get(code),
+    }
+
+
+# ============ Ingestion Worker ============
+
+async def ensure_webhook_indexes(db):
+    await db.payment_webhook_events.create_index(
+        [("gateway", ASCENDING), ("event_id", ASCENDING)], unique=True
+    )
+    await db.payment_webhook_events.create_index([("processed_at", ASCENDING), ("received_at", ASCENDING)])
+    await db.payment_transactions.create_index("gateway_order_id")
+
+
+class WebhookWorker:
+    """Persists verified webhook events and applies them in the background"""
+
+    def __init__(self, db, batch_size: int = WEBHOOK_BATCH_SIZE, poll_interval: float = WEBHOOK_POLL_INTERVAL):
+        self.db = db
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def ingest(self, gateway: str, event: dict, raw_payload: bytes,
+                     business_id: Optional[str] = None) -> bool:
+        """Store a verified event. Returns False if it was already received.
+
+        business_id is the business whose credentials verified the event, if any.
+        """
+        doc = {
+            "id": str(uuid.uuid4()),
+            "gateway": gateway,
+            "business_id": business_id,
+            **event,
+            "payload": raw_payload.decode('utf-8', errors='replace'),
+            "received_at": datetime.now(timezone.utc),
+            "processed_at": None,
+            "attempts": 0,
+        }
+        try:
+            await self.db.payment_webhook_events.insert_one(doc)
+        except DuplicateKeyError:
+            return False
+        self._wake.set()
+        return True
+
+    async def replay(self, gateway: Optional[str] = None, event_ids: Optional[List[str]] = None,
+                     since: Optional[datetime] = None) -> int:
+        """Mark stored events unprocessed so the worker applies them again"""
+        query = {}
+        if gateway:
+            query["gateway"] = gateway
+        if event_ids:
+            query["event_id"] = {"$in": event_ids}
+        if since:
+            query["received_at"] = {"$gte": since}
+
+        result = await self.db.payment_webhook_events.update_many(
+            query, {"$set": {"processed_at": None, "attempts": 0}, "$unset": {"last_error": ""}}
+        )
+        self._wake.set()
+        return result.modified_count
+
+    async def process_batch(self) -> int:
+        """Apply one batch of pending events. Returns the number marked processed."""
+        events = await self.db.payment_webhook_events.find(
+            {"processed_at": None, "attempts": {"$lt": WEBHOOK_MAX_ATTEMPTS}},
+            {"_id": 0, "payload": 0}
+        ).sort("received_at", 1).to_list(self.batch_size)
+        if not events:
+            return 0
+
+        event_ids = [e['id'] for e in events]
+        try:
+            deferred, rejected = await self._apply(events)
+        except Exception as e:
+            logger.exception("Failed to apply payment webhook batch")
+            await self.db.payment_webhook_events.update_many(
+                {"id": {"$in": event_ids}},
+                {"$inc": {"attempts": 1}, "$set": {"last_error": str(e)}}
+            )
+            raise
+
+        processed = [event_id for event_id in event_ids if event_id not in deferred]
+        await self.db.payment_webhook_events.update_many(
+            {"id": {"$in": processed}},
+            {"$set": {"processed_at": datetime.now(timezone.utc)}}
+        )
+        if deferred:
+            await self.db.payment_webhook_events.update_many(
+                {"id": {"$in": list(deferred)}},
+                {"$inc": {"attempts": 1}, "$set": {"last_error": "Transaction not found"}}
+            )
+        if rejected:
+            await self.db.payment_webhook_events.update_many(
+                {"id": {"$in": list(rejected)}},
+                {"$set": {"last_error": "Transaction belongs to another business"}}
+            )
+        return len(processed)
+
+    async def _apply(self, events: List[dict]) -> Tuple[set, set]:
+        """Settle transactions and orders for a batch.
+
+        Returns ids of events to retry later, and of events rejected for naming
+        a transaction of another business (or several businesses').
+        """
+        # Last actionable event per transaction wins within a batch
+        settlements = {}
+        for event in events:
+            if event.get('status') and event.get('gateway_order_id'):
+                settlements[(event['gateway'], event['gateway_order_id'], event.get('business_id'))] = event
+        if not settlements:
+            return set(), set()
+
+        transactions = await self.db.payment_transactions.find(
+            {"gateway_order_id": {"$in": list({key[1] for key in settlements})}},
+            {"_id": 0, "business_id": 1, "gateway": 1, "gateway_order_id": 1, "order_id": 1, "status": 1}
+        ).to_list(None)
+        known = {}
+        for transaction in transactions:
+            known.setdefault((transaction['gateway'], transaction['gateway_order_id']), []).append(transaction)
+
+        deferred = set()
+        rejected = set()
+        to_settle = []
+        for (gateway, gateway_order_id, business_id), event in settlements.items():
+            candidates = known.get((gateway, gateway_order_id))
+            if not candidates:
+                # Callbacks can race the insert in _create_gateway_payment; retry those
+                deferred.add(event['id'])
+                continue
+            if business_id:
+                candidates = [t for t in candidates if t['business_id'] == business_id]
+            if len(candidates) != 1:
+                logger.warning("Rejected %s webhook event %s: transaction %s is not its business's",
+                               gateway, event['event_id'], gateway_order_id)
+                rejected.add(event['id'])
+                continue
+
+            transaction = candidates[0]
+            # A success already recorded is applied again: the transaction write is a
+            # no-op, and the order update finishes a batch that crashed in between
+            repeat_success = transaction['status'] == event['status'] == "success"
+            if not can_settle(transaction['status'], event['status']) and not repeat_success:
+                continue
+            to_settle.append({
+                "business_id": transaction['business_id'],
+                "gateway": gateway,
+                "gateway_order_id": gateway_order_id,
+                "order_id": transaction['order_id'],
+                "status": event['status'],
+                "gateway_payment_id": event.get('gateway_payment_id'),
+            })
+
+        await settle_transactions(self.db, to_settle)
+        return deferred, rejected
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            try:
+                while await self.process_batch() == self.batch_size:
+                    pass
+            except Exception:
+                # Already logged and recorded on the events; retry next round
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
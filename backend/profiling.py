@@ -0,0 +1,199 @@
+"""
+On-demand request profiling with pyinstrument.
+
+An admin can run a single request under the sampling profiler by adding the
+X-Profile header or a ?profile= query flag to it:
+
+- html (or 1): the response is replaced by pyinstrument's HTML report (call
+  tree and timeline flame graph) for the request
+- speedscope: the response is replaced by a speedscope JSON profile, for
+  https://www.speedscope.app
+- store: the request is answered normally; the HTML report is written to
+  PROFILE_DIR and named in the X-Profile-Id response header, for
+  GET /api/admin/profiles/{profile_id}
+
+The flag is honoured only when the authorize callback accepts the request
+(server.py checks for a super_admin bearer token); otherwise it is ignored
+and the request runs unprofiled.
+
+PROFILE_SAMPLE_RATE > 0 also profiles that fraction of all requests and
+stores their reports. PROFILE_DIR rotates: only the newest PROFILE_MAX_FILES
+reports are kept.
+
+When neither a flag nor sampling applies, a request costs one header scan
+and pyinstrument is never imported.
+"""
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers
+
+from metrics import route_label
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = Path(os.environ.get('PROFILE_DIR', '/tmp/waconnect-profiles'))
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', '200'))
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', '0.001'))
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_MODES = ("html", "speedscope", "store")
+
+# Stored report names; anything else is never read from PROFILE_DIR
+PROFILE_ID = re.compile(r'^[0-9]+-[A-Z]+-[A-Za-z0-9_.-]+\.html$')
+
+
+def requested_mode(scope) -> Optional[str]:
+    """Profile mode asked for by the X-Profile header or ?profile= flag, if any"""
+    value = None
+    for name, header_value in scope["headers"]:
+        if name == b"x-profile":
+            value = header_value.decode('latin-1')
+            break
+    if value is None and b"profile=" in scope.get("query_string", b""):
+        value = parse_qs(scope["query_string"].decode('latin-1')).get("profile", [None])[0]
+    if value is None:
+        return None
+    value = value.strip().lower()
+    return "html" if value in ("", "1", "true") else value if value in PROFILE_MODES else None
+
+
+def profile_id(scope) -> str:
+    """Report file name: time, method and route template (never the raw path)"""
+    route = re.sub(r'[^A-Za-z0-9_.-]+', '_', route_label(scope).strip('/')) or "root"
+    return f"{time.time_ns()}-{scope['method']}-{route[:100]}.html"
+
+
+def rotate(directory: Path, max_files: int):
+    """Delete the oldest reports beyond max_files"""
+    reports = sorted(directory.glob('*.html'), key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in reports[max_files:]:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def list_profiles(directory: Path = PROFILE_DIR) -> List[dict]:
+    if not directory.is_dir():
+        return []
+    reports = sorted(directory.glob('*.html'), key=lambda path: path.stat().st_mtime, reverse=True)
+    return [{"id": path.name, "bytes": path.stat().st_size} for path in reports if PROFILE_ID.match(path.name)]
+
+
+def read_profile(name: str, directory: Path = PROFILE_DIR) -> Optional[str]:
+    if not PROFILE_ID.match(name):
+        return None
+    path = directory / name
+    return path.read_text(encoding='utf-8') if path.is_file() else None
+
+
+def _write_report(directory: Path, name: str, html: str, max_files: int):
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / name).write_text(html, encoding='utf-8')
+    rotate(directory, max_files)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware running flagged or sampled requests under pyinstrument"""
+
+    def __init__(
+        self, app,
+        authorize: Callable[[Headers], Awaitable[bool]],
+        directory: Path = PROFILE_DIR,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        max_files: int = PROFILE_MAX_FILES,
+        interval: float = PROFILE_INTERVAL,
+    ):
+        self.app = app
+        self.authorize = authorize
+        self.directory = Path(directory)
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = requested_mode(scope)
+        if mode is not None and not await self.authorize(Headers(scope=scope)):
+            mode = None
+        if mode is None and self.sample_rate and random.random() < self.sample_rate:
+            mode = "sampled"
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        if mode in ("html", "speedscope"):
+            await self._replace_response(scope, receive, send, mode)
+        else:
+            await self._store(scope, receive, send, announce=mode == "store")
+
+    def _profiler(self):
+        # Imported on first use, so unprofiled deployments never load it
+        from pyinstrument import Profiler
+        return Profiler(interval=self.interval, async_mode="enabled")
+
+    async def _replace_response(self, scope, receive, send, mode: str):
+        status = None
+
+        async def discard(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        profiler = self._profiler()
+        profiler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            profiler.stop()
+
+        if mode == "speedscope":
+            from pyinstrument.renderers import SpeedscopeRenderer
+            body, content_type = profiler.output(SpeedscopeRenderer()).encode(), b"application/json"
+        else:
+            body, content_type = profiler.output_html().encode(), b"text/html; charset=utf-8"
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", content_type),
+            (b"content-length", str(len(body)).encode()),
+            (b"x-profiled-status", str(status).encode()),
+            (b"cache-control", b"no-store"),
+        ]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _store(self, scope, receive, send, announce: bool):
+        name = None
+
+        async def send_with_id(message):
+            nonlocal name
+            if announce and message["type"] == "http.response.start":
+                # The route is known by now; the report is written under this name once done
+                name = profile_id(scope)
+                message["headers"] = [*message.get("headers", []), (PROFILE_ID_HEADER.lower().encode(), name.encode())]
+            await send(message)
+
+        profiler = self._profiler()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.stop()
+            name = name or profile_id(scope)
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, _write_report, self.directory, name, profiler.output_html(), self.max_files
+                )
+            except Exception:
+                logger.exception("Failed to store request profile %s", name)
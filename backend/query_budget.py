@@ -0,0 +1,165 @@
+"""
+Per-request Mongo query budget.
+
+QueryBudgetMiddleware gives every request a QueryStats, and a pymongo
+CommandListener (QueryCounter) adds each command the request issues to it:
+round trips, plus BSON bytes sent and received. Motor runs driver calls with a
+copy of the caller's context, so the listener finds the request's stats
+through a ContextVar.
+
+After the response, a request over QUERY_BUDGET round trips (or
+QUERY_BYTES_BUDGET bytes, when set) logs a warning with its route template.
+A request repeating one command on one collection QUERY_REPEAT_THRESHOLD
+times or more is logged as a likely N+1 loop, whatever its total.
+
+With QUERY_DEBUG_HEADER=true responses carry the counts in X-Query-Stats:
+
+    X-Query-Stats: queries=3, bytes-sent=412, bytes-received=1870
+
+which tests read through the query_budget fixture (tests/conftest.py) to pin
+each endpoint's exact query count.
+"""
+import logging
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+import bson
+from pymongo import monitoring
+
+from metrics import command_collection, route_label
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET', '10'))
+QUERY_BYTES_BUDGET = int(os.environ.get('QUERY_BYTES_BUDGET', '0'))
+QUERY_REPEAT_THRESHOLD = int(os.environ.get('QUERY_REPEAT_THRESHOLD', '5'))
+QUERY_DEBUG_HEADER = os.environ.get('QUERY_DEBUG_HEADER', 'false').lower() == 'true'
+# Encoding commands and replies to measure them costs CPU on large reads
+QUERY_TRACK_BYTES = os.environ.get('QUERY_TRACK_BYTES', 'true').lower() == 'true'
+
+QUERY_STATS_HEADER = "X-Query-Stats"
+
+
+class QueryStats:
+    """Mongo round trips and bytes for one request"""
+
+    __slots__ = ("queries", "bytes_sent", "bytes_received", "commands", "closed", "lock")
+
+    def __init__(self):
+        self.queries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.commands: Counter = Counter()
+        # Set once the response is sent; background tasks spawned by the request stop counting
+        self.closed = False
+        # Listener callbacks run on Motor's executor threads, concurrently for gathered queries
+        self.lock = threading.Lock()
+
+    def header(self) -> str:
+        return f"queries={self.queries}, bytes-sent={self.bytes_sent}, bytes-received={self.bytes_received}"
+
+    def repeated(self, threshold: int = QUERY_REPEAT_THRESHOLD) -> Dict[str, int]:
+        """Commands issued threshold times or more, as {"collection.command": count}"""
+        return {f"{collection}.{command}": count
+                for (collection, command), count in self.commands.items() if count >= threshold}
+
+
+def parse_query_stats(header: str) -> Dict[str, int]:
+    """X-Query-Stats back to {"queries": ..., "bytes_sent": ..., "bytes_received": ...}"""
+    stats = {}
+    for part in header.split(','):
+        name, _, value = part.strip().partition('=')
+        stats[name.replace('-', '_')] = int(value)
+    return stats
+
+
+request_queries: ContextVar[Optional[QueryStats]] = ContextVar("request_queries", default=None)
+
+
+@contextmanager
+def track_queries():
+    """Count the Mongo commands issued inside the block (and by Motor calls it awaits)"""
+    stats = QueryStats()
+    token = request_queries.set(stats)
+    try:
+        yield stats
+    finally:
+        stats.closed = True
+        request_queries.reset(token)
+
+
+class QueryCounter(monitoring.CommandListener):
+    """Adds each command to the issuing request's QueryStats"""
+
+    def __init__(self, track_bytes: bool = QUERY_TRACK_BYTES):
+        self.track_bytes = track_bytes
+
+    def started(self, event):
+        stats = request_queries.get()
+        if stats is None or stats.closed:
+            return
+        key = (command_collection(event.command_name, event.command), event.command_name)
+        size = len(bson.encode(event.command)) if self.track_bytes else 0
+        with stats.lock:
+            stats.queries += 1
+            stats.commands[key] += 1
+            stats.bytes_sent += size
+
+    def succeeded(self, event):
+        stats = request_queries.get()
+        if stats is not None and not stats.closed and self.track_bytes:
+            size = len(bson.encode(event.reply))
+            with stats.lock:
+                stats.bytes_received += size
+
+    def failed(self, event):
+        pass
+
+
+class QueryBudgetMiddleware:
+    """ASGI middleware tracking each request's queries against the budget"""
+
+    def __init__(
+        self, app,
+        budget: int = QUERY_BUDGET,
+        bytes_budget: int = QUERY_BYTES_BUDGET,
+        debug_header: bool = QUERY_DEBUG_HEADER,
+    ):
+        self.app = app
+        self.budget = budget
+        self.bytes_budget = bytes_budget
+        self.debug_header = debug_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+            async def send_with_stats(message):
+                if message["type"] == "http.response.start" and self.debug_header:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (QUERY_STATS_HEADER.lower().encode(), stats.header().encode()),
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_stats)
+            finally:
+                self._check(scope, stats)
+
+    def _check(self, scope, stats: QueryStats):
+        route = f"{scope['method']} {route_label(scope)}"
+        if stats.queries > self.budget or (self.bytes_budget and stats.bytes_received > self.bytes_budget):
+            logger.warning(
+                "Query budget exceeded on %s: %s (budget %s queries, %s bytes)",
+                route, stats.header(), self.budget, self.bytes_budget or "unlimited"
+            )
+        repeated = stats.repeated()
+        if repeated:
+            logger.warning("Possible N+1 on %s: %s", route, ", ".join(f"{k} x{v}" for k, v in repeated.items()))
@@ -0,0 +1,289 @@
+"""
+Versioned document schemas.
+
+Documents record the shape they were written in as schema_version (missing
+means 1, the shape before versioning). MIGRATIONS lists the upgrade steps per
+collection: step N takes a version N document and returns the changes that
+make it version N + 1, as {field: value}, with None meaning the field is
+removed. SCHEMA_VERSIONS is the current version of each collection.
+
+Documents reach the current version in three ways:
+
+- New documents are written at it (versioned()).
+- Read-modify-write handlers fold the upgrade into their own update
+  (SchemaMigrator.upgrade_ops), so any document they touch is upgraded in the
+  same write.
+- The background migrator walks each collection in _id order, upgrading
+  batches of SCHEMA_MIGRATION_BATCH_SIZE with SCHEMA_MIGRATION_PAUSE seconds
+  between them. Its position is checkpointed in the schema_migrations
+  collection, so a restart resumes where the last run stopped.
+
+Once no document in a collection is below the current version, the migrator
+records it as complete and is_current() turns true. Handlers then read the
+current shape directly; until then they pass documents through
+upgrade_document() first.
+
+Reads whose order depends on a migrated field cannot be fixed up in memory:
+sorting on created_at while some documents hold ISO strings and others BSON
+dates orders by type first. Until the collection is complete, such handlers
+wait for SchemaMigrator.upgrade_matching() to upgrade the documents they are
+about to read (one tenant's orders, say) before querying.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Run the batch migrator on one app instance only; the others pick up completion
+SCHEMA_MIGRATION_ENABLED = os.environ.get('SCHEMA_MIGRATION_ENABLED', 'true').lower() == 'true'
+SCHEMA_MIGRATION_BATCH_SIZE = int(os.environ.get('SCHEMA_MIGRATION_BATCH_SIZE', '500'))
+SCHEMA_MIGRATION_PAUSE = float(os.environ.get('SCHEMA_MIGRATION_PAUSE', '1'))
+SCHEMA_MIGRATION_REFRESH = float(os.environ.get('SCHEMA_MIGRATION_REFRESH', '60'))
+
+
+def _created_at_as_date(doc: dict) -> dict:
+    """created_at stored as a BSON date instead of an ISO string"""
+    value = doc.get('created_at')
+    if not isinstance(value, str):
+        return {}
+    parsed = datetime.fromisoformat(value)
+    return {"created_at": parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)}
+
+
+def _product_prices(doc: dict) -> dict:
+    """Single legacy price split into mrp and sale_price"""
+    changes = _created_at_as_date(doc)
+    if 'price' in doc:
+        price = doc['price'] or 0
+        changes.update({
+            "mrp": doc.get('mrp', price),
+            "sale_price": doc.get('sale_price', price),
+            "price": None,
+        })
+    return changes
+
+
+# Sparse storage briefly left defaults out of embedded documents too; trusted
+# reads only fill top-level defaults, so these are written back in full
+SOCIAL_MEDIA_FIELDS = ("instagram", "facebook", "twitter", "linkedin", "youtube", "pinterest")
+
+
+def _social_links_defaults(doc: dict) -> dict:
+    """Unset social_media_links entries stored as None"""
+    links = doc.get('social_media_links')
+    if not links or all(name in links for name in SOCIAL_MEDIA_FIELDS):
+        return {}
+    return {"social_media_links": {**dict.fromkeys(SOCIAL_MEDIA_FIELDS), **links}}
+
+
+def _variant_defaults(doc: dict) -> dict:
+    """Variants stored without their price_adjustment of 0.0"""
+    variants = doc.get('variants') or []
+    if all('price_adjustment' in variant for variant in variants):
+        return {}
+    return {"variants": [{"price_adjustment": 0.0, **variant} for variant in variants]}
+
+
+MIGRATIONS: Dict[str, Dict[int, Callable[[dict], dict]]] = {
+    "users": {1: _created_at_as_date},
+    "businesses": {1: _created_at_as_date, 2: _social_links_defaults},
+    "products": {1: _product_prices, 2: _variant_defaults},
+    "orders": {1: _created_at_as_date},
+    "bookings": {1: _created_at_as_date},
+}
+
+SCHEMA_VERSIONS = {name: max(steps) + 1 for name, steps in MIGRATIONS.items()}
+
+
+def versioned(collection: str, doc: dict) -> dict:
+    """Stamp a new document with the current schema version"""
+    doc['schema_version'] = SCHEMA_VERSIONS[collection]
+    return doc
+
+
+def outdated_filter(collection: str) -> dict:
+    """Matches documents below the current version, unversioned ones included"""
+    return {"schema_version": {"$not": {"$gte": SCHEMA_VERSIONS[collection]}}}
+
+
+def upgrade_changes(collection: str, doc: dict) -> dict:
+    """Changes taking a document to the current version, {} if it is there already"""
+    current = SCHEMA_VERSIONS[collection]
+    version = doc.get('schema_version', 1)
+    if version >= current:
+        return {}
+    changes = {}
+    working = dict(doc)
+    for step in range(version, current):
+        step_changes = MIGRATIONS[collection][step](working)
+        changes.update(step_changes)
+        working.update(step_changes)
+    changes['schema_version'] = current
+    return changes
+
+
+def upgrade_document(collection: str, doc: Optional[dict]) -> Optional[dict]:
+    """In-memory copy of a document in the current shape"""
+    if doc is None:
+        return None
+    changes = upgrade_changes(collection, doc)
+    if not changes:
+        return doc
+    upgraded = {**doc, **changes}
+    return {key: value for key, value in upgraded.items() if value is not None or key not in changes}
+
+
+def split_changes(changes: dict) -> Tuple[dict, dict]:
+    """($set, $unset) for upgrade changes"""
+    to_set = {field: value for field, value in changes.items() if value is not None}
+    to_unset = {field: "" for field, value in changes.items() if value is None}
+    return to_set, to_unset
+
+
+def _update_ops(changes: dict) -> dict:
+    to_set, to_unset = split_changes(changes)
+    update = {"$set": to_set}
+    if to_unset:
+        update["$unset"] = to_unset
+    return update
+
+
+class SchemaMigrator:
+    """Tracks which collections are fully migrated and upgrades the rest in the background"""
+
+    def __init__(
+        self, db,
+        batch_size: int = SCHEMA_MIGRATION_BATCH_SIZE,
+        pause: float = SCHEMA_MIGRATION_PAUSE,
+        enabled: bool = SCHEMA_MIGRATION_ENABLED,
+    ):
+        self.db = db
+        self.batch_size = batch_size
+        self.pause = pause
+        self.enabled = enabled
+        self.current: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            name: {"version": version, "complete": False, "upgraded": 0, "last_id": None}
+            for name, version in SCHEMA_VERSIONS.items()
+        }
+
+    def is_current(self, collection: str) -> bool:
+        """Whether every stored document in the collection has the current shape"""
+        return collection in self.current
+
+    def _mark_complete(self, collection: str):
+        self.current.add(collection)
+        self.stats[collection]["complete"] = True
+
+    async def refresh(self):
+        """Load completion recorded by any instance's migrator"""
+        states = await self.db.schema_migrations.find(
+            {"_id": {"$in": list(SCHEMA_VERSIONS)}, "complete": True}
+        ).to_list(None)
+        for state in states:
+            if state.get('version') == SCHEMA_VERSIONS[state['_id']]:
+                self._mark_complete(state['_id'])
+
+    async def upgrade_ops(self, collection: str, query: dict, update_ops: dict) -> dict:
+        """A handler's update with the document's pending upgrade folded in
+
+        The handler's own $set/$unset fields win over the upgrade's.
+        """
+        if self.is_current(collection):
+            return update_ops
+        doc = await self.db[collection].find_one({**query, **outdated_filter(collection)}, {"_id": 0})
+        if doc is None:
+            return update_ops
+
+        written = set(update_ops.get("$set", {})) | set(update_ops.get("$unset", {}))
+        to_set, to_unset = split_changes(upgrade_changes(collection, doc))
+        merged = dict(update_ops)
+        merged["$set"] = {**{k: v for k, v in to_set.items() if k not in written}, **update_ops.get("$set", {})}
+        to_unset = {k: v for k, v in to_unset.items() if k not in written}
+        if to_unset or "$unset" in update_ops:
+            merged["$unset"] = {**to_unset, **update_ops.get("$unset", {})}
+        self.stats[collection]["upgraded"] += 1
+        return merged
+
+    async def _upgrade(self, collection: str, docs: list):
+        if not docs:
+            return
+        # Re-checking the version skips documents upgraded meanwhile
+        await self.db[collection].bulk_write([
+            UpdateOne({"_id": doc["_id"], **outdated_filter(collection)},
+                      _update_ops(upgrade_changes(collection, doc)))
+            for doc in docs
+        ], ordered=False)
+        self.stats[collection]["upgraded"] += len(docs)
+
+    async def upgrade_matching(self, collection: str, query: dict) -> int:
+        """Upgrade every outdated document matching query now. Returns the number upgraded.
+
+        No-op once the collection is complete.
+        """
+        if self.is_current(collection):
+            return 0
+        docs = await self.db[collection].find({**query, **outdated_filter(collection)}).to_list(None)
+        await self._upgrade(collection, docs)
+        return len(docs)
+
+    async def migrate_batch(self, collection: str) -> int:
+        """Upgrade the next batch after the checkpoint. Returns the number of documents upgraded."""
+        version = SCHEMA_VERSIONS[collection]
+        state = await self.db.schema_migrations.find_one({"_id": collection}) or {}
+        query = outdated_filter(collection)
+        if state.get('version') == version and state.get('last_id') is not None:
+            query["_id"] = {"$gt": state['last_id']}
+
+        docs = await self.db[collection].find(query).sort("_id", 1).limit(self.batch_size).to_list(self.batch_size)
+        await self._upgrade(collection, docs)
+
+        complete = len(docs) < self.batch_size
+        checkpoint = {"version": version, "complete": complete, "updated_at": datetime.now(timezone.utc)}
+        if docs:
+            checkpoint["last_id"] = docs[-1]["_id"]
+        await self.db.schema_migrations.update_one({"_id": collection}, {"$set": checkpoint}, upsert=True)
+
+        if docs:
+            self.stats[collection]["last_id"] = str(docs[-1]["_id"])
+        if complete:
+            self._mark_complete(collection)
+            logger.info("Schema migration of %s to version %s complete", collection, version)
+        return len(docs)
+
+    async def run_once(self) -> int:
+        """One batch of the first collection still migrating. Returns the number upgraded."""
+        for collection in SCHEMA_VERSIONS:
+            if not self.is_current(collection):
+                return await self.migrate_batch(collection)
+        return 0
+
+    async def _run(self):
+        while len(self.current) < len(SCHEMA_VERSIONS):
+            try:
+                if self.enabled:
+                    await self.run_once()
+                else:
+                    await self.refresh()
+            except Exception:
+                logger.exception("Schema migration batch failed")
+            await asyncio.sleep(self.pause if self.enabled else SCHEMA_MIGRATION_REFRESH)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
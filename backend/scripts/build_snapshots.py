@@ -0,0 +1,38 @@
+"""
+Write storefront snapshots for every active business (or the given subdomains).
+
+The app keeps snapshots current as content changes; run this once after
+enabling SNAPSHOT_DIR, after changing SNAPSHOT_HTML_TEMPLATE (a new frontend
+build), or to repopulate an empty snapshot directory.
+
+    cd backend && SNAPSHOT_DIR=/var/www/snapshots python scripts/build_snapshots.py [subdomain ...]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+
+from server import client, db, snapshot_writer  # noqa: E402
+
+
+async def build(subdomains):
+    if not snapshot_writer.enabled:
+        sys.exit("SNAPSHOT_DIR is not set")
+
+    if not subdomains:
+        businesses = await db.businesses.find({"is_active": True}, {"_id": 0, "subdomain": 1}).to_list(None)
+        subdomains = [b['subdomain'] for b in businesses]
+
+    written = await snapshot_writer.write_all(subdomains)
+    print(f"Wrote {written} of {len(subdomains)} snapshots to {snapshot_writer.directory}")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("subdomains", nargs="*", help="Only these subdomains (default: all active businesses)")
+    args = parser.parse_args()
+    asyncio.run(build(args.subdomains))
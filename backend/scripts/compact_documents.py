@@ -0,0 +1,97 @@
+"""
+Make stored documents sparse.
+
+Documents written before sparse storage carry every model field, mostly None,
+empty lists and default colours. This removes top-level fields that hold
+their model default (sparse_storage.default_fields), including embedded
+documents such as social_media_links with nothing set. Reads fill the defaults
+back in, so API output is unchanged. Safe to re-run.
+
+Prints collStats before and after (document, data and index sizes). Pass
+--compact to also release the freed space on disk. --dry-run reports how
+many documents would change and the BSON bytes saved without writing.
+
+    cd backend && python scripts/compact_documents.py [--dry-run] [--compact]
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import bson
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+
+from server import Booking, Business, Order, Product, User  # noqa: E402
+from sparse_storage import default_fields  # noqa: E402
+from storage_stats import collection_stats, print_report  # noqa: E402
+
+COLLECTION_MODELS = {
+    "users": User,
+    "businesses": Business,
+    "products": Product,
+    "orders": Order,
+    "bookings": Booking,
+}
+
+
+async def compact_collection(db, name: str, model, batch_size: int, dry_run: bool) -> tuple:
+    """Returns (documents changed, BSON bytes saved)"""
+    changed = saved = 0
+    batch = []
+    async for doc in db[name].find({}):
+        changes = default_fields(model, doc)
+        if not changes:
+            continue
+        to_set = {field: value for field, value in changes.items() if value is not None}
+        to_unset = {field: "" for field, value in changes.items() if value is None}
+        sparse = {**{k: v for k, v in doc.items() if k not in to_unset}, **to_set}
+        saved += len(bson.encode(doc)) - len(bson.encode(sparse))
+        changed += 1
+        if dry_run:
+            continue
+
+        update = {"$unset": to_unset} if to_unset else {}
+        if to_set:
+            update["$set"] = to_set
+        batch.append(UpdateOne({"_id": doc["_id"]}, update))
+        if len(batch) >= batch_size:
+            await db[name].bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        await db[name].bulk_write(batch, ordered=False)
+    return changed, saved
+
+
+async def compact(args):
+    # Updates go by _id, so the raw database works whatever UUID_STORAGE is
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    existing = set(await db.list_collection_names())
+    collections = [name for name in (args.collections or COLLECTION_MODELS) if name in existing]
+
+    before, after = {}, {}
+    for name in collections:
+        before[name] = await collection_stats(db, name)
+        changed, saved = await compact_collection(db, name, COLLECTION_MODELS[name], args.batch_size, args.dry_run)
+        print(f"{name}: {'would shrink' if args.dry_run else 'shrank'} {changed} documents by {saved:,} bytes")
+        if args.compact and not args.dry_run:
+            await db.command("compact", name)
+        after[name] = await collection_stats(db, name)
+
+    if not args.dry_run:
+        print_report(before, after)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove default-valued fields from stored documents")
+    parser.add_argument("--dry-run", action="store_true", help="Report savings without writing")
+    parser.add_argument("--compact", action="store_true", help="Compact each collection afterwards")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--collections", nargs="+", choices=list(COLLECTION_MODELS))
+    asyncio.run(compact(parser.parse_args()))
@@ -0,0 +1,61 @@
+"""
+Move business secrets from business documents into the credential store.
+
+For every business that still carries one of credential_store.SECRET_FIELDS,
+the values are merged into its encrypted business_credentials entry, the
+fields are removed from the business document and configured_secrets is set.
+Safe to re-run: businesses without inline secrets are skipped.
+
+    cd backend && python scripts/migrate_credentials.py [--dry-run]
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+load_dotenv(ROOT_DIR / '.env')
+
+from credential_store import SECRET_FIELDS, CredentialStore  # noqa: E402
+from id_codec import storage_database  # noqa: E402
+
+
+async def migrate(dry_run: bool):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = storage_database(client[os.environ['DB_NAME']])
+    store = CredentialStore(db)
+    await store.ensure_indexes()
+
+    query = {"$or": [{field: {"$exists": True}} for field in SECRET_FIELDS]}
+    projection = {"_id": 0, "id": 1, **{field: 1 for field in SECRET_FIELDS}}
+    migrated = 0
+    async for business in db.businesses.find(query, projection):
+        secrets = {field: business[field] for field in SECRET_FIELDS if business.get(field)}
+        print(f"{business['id']}: {', '.join(sorted(secrets)) or '(empty fields only)'}")
+        migrated += 1
+        if dry_run:
+            continue
+
+        if secrets:
+            configured = await store.update(business['id'], secrets)
+        else:
+            configured = sorted(await store.get(business['id']))
+        await db.businesses.update_one(
+            {"id": business['id']},
+            {"$set": {"configured_secrets": configured}, "$unset": {field: "" for field in SECRET_FIELDS}}
+        )
+
+    print(f"{'Would migrate' if dry_run else 'Migrated'} {migrated} businesses")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move business secrets into the credential store")
+    parser.add_argument("--dry-run", action="store_true", help="List affected businesses without writing")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.dry_run))
@@ -0,0 +1,47 @@
+"""
+Bring stored documents to the current schema_version.
+
+Runs the same resumable batch migrator the API runs in the background
+(schema_migrations.SchemaMigrator), to completion and without waiting on the
+API. Useful to finish a migration ahead of a deploy, or with
+SCHEMA_MIGRATION_ENABLED=false on every API instance. Progress is
+checkpointed in the schema_migrations collection, so it can be stopped and
+re-run at any time, alongside a running API.
+
+    cd backend && python scripts/migrate_schema.py [--batch-size 500] [--pause 0.5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+load_dotenv(ROOT_DIR / '.env')
+
+from id_codec import storage_database  # noqa: E402
+from schema_migrations import SCHEMA_VERSIONS, SchemaMigrator  # noqa: E402
+
+
+async def migrate(args):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    migrator = SchemaMigrator(storage_database(client[os.environ['DB_NAME']]), args.batch_size, args.pause)
+    await migrator.refresh()
+
+    for name, version in SCHEMA_VERSIONS.items():
+        while not migrator.is_current(name):
+            await migrator.migrate_batch(name)
+            await asyncio.sleep(args.pause)
+        print(f"{name}: version {version}, {migrator.stats[name]['upgraded']} documents upgraded")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upgrade stored documents to the current schema version")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    asyncio.run(migrate(parser.parse_args()))
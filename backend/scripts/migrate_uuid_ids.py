@@ -0,0 +1,89 @@
+"""
+Convert stored entity ids between UUID strings and binary UUIDs.
+
+Rewrites the id fields (id_codec.ID_FIELDS, nested ones included) of every
+document in the migrated collections to BSON binary UUIDs, or back to strings
+with --reverse. Documents already in the target form are skipped, so the
+migration is safe to re-run or resume. Prints collStats before and after:
+document and index sizes, and data + indexes as the working set.
+
+Run with the API stopped (or read-only), then start it with
+UUID_STORAGE=binary. Index sizes only shrink once indexes are rebuilt, so
+pass --compact to compact each collection after converting it.
+
+    cd backend && python scripts/migrate_uuid_ids.py [--dry-run] [--reverse] [--compact]
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+load_dotenv(ROOT_DIR / '.env')
+
+from id_codec import decode_document, encode_document  # noqa: E402
+from storage_stats import collection_stats, print_report  # noqa: E402
+
+MIGRATED_COLLECTIONS = (
+    "users", "businesses", "business_credentials", "products", "orders", "bookings",
+    "payment_transactions", "payment_webhook_events",
+)
+
+
+async def convert_collection(db, name: str, reverse: bool, batch_size: int, dry_run: bool) -> int:
+    convert = decode_document if reverse else encode_document
+    converted = 0
+    batch = []
+    async for doc in db[name].find({}):
+        target = convert({key: value for key, value in doc.items() if key != "_id"})
+        changes = {key: value for key, value in target.items() if doc.get(key) != value}
+        if not changes:
+            continue
+        converted += 1
+        if dry_run:
+            continue
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+        if len(batch) >= batch_size:
+            await db[name].bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        await db[name].bulk_write(batch, ordered=False)
+    return converted
+
+
+async def migrate(args):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    existing = set(await db.list_collection_names())
+    collections = [name for name in (args.collections or MIGRATED_COLLECTIONS) if name in existing]
+
+    before, after = {}, {}
+    for name in collections:
+        before[name] = await collection_stats(db, name)
+        converted = await convert_collection(db, name, args.reverse, args.batch_size, args.dry_run)
+        print(f"{name}: {'would convert' if args.dry_run else 'converted'} {converted} documents")
+        if args.compact and not args.dry_run:
+            await db.command("compact", name)
+        after[name] = await collection_stats(db, name)
+
+    if not args.dry_run:
+        print_report(before, after)
+        target = "string" if args.reverse else "binary"
+        print(f"\nStart the API with UUID_STORAGE={target}")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert stored ids between UUID strings and binary UUIDs")
+    parser.add_argument("--dry-run", action="store_true", help="Count documents to convert without writing")
+    parser.add_argument("--reverse", action="store_true", help="Convert binary UUIDs back to strings")
+    parser.add_argument("--compact", action="store_true", help="Compact each collection after converting it")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--collections", nargs="+", help=f"Default: {' '.join(MIGRATED_COLLECTIONS)}")
+    asyncio.run(migrate(parser.parse_args()))
@@ -0,0 +1,38 @@
+"""
+collStats helpers shared by the storage migration scripts.
+
+Data size is the uncompressed BSON of the documents, which is also what they
+occupy in the WiredTiger cache; data + indexes approximates the working set.
+"""
+
+
+async def collection_stats(db, name: str) -> dict:
+    stats = await db.command("collStats", name)
+    return {
+        "count": stats.get("count", 0),
+        "size": stats.get("size", 0),
+        "avg_obj_size": stats.get("avgObjSize", 0),
+        "index_size": stats.get("totalIndexSize", 0),
+        "index_sizes": stats.get("indexSizes", {}),
+    }
+
+
+def _mb(size: int) -> str:
+    return f"{size / 1024 / 1024:,.1f} MB"
+
+
+def print_report(before: dict, after: dict):
+    print(f"\n{'collection':<24}{'docs':>10}{'avg doc':>18}{'data':>24}{'indexes':>24}")
+    totals = {"before": 0, "after": 0}
+    for name, old in before.items():
+        new = after[name]
+        totals["before"] += old["size"] + old["index_size"]
+        totals["after"] += new["size"] + new["index_size"]
+        print(f"{name:<24}{new['count']:>10,}"
+              f"{old['avg_obj_size']:>9} -> {new['avg_obj_size']:<6}"
+              f"{_mb(old['size']):>12} -> {_mb(new['size']):<9}"
+              f"{_mb(old['index_size']):>12} -> {_mb(new['index_size']):<9}")
+    saved = totals["before"] - totals["after"]
+    percent = saved / totals["before"] * 100 if totals["before"] else 0
+    print(f"\nWorking set (data + indexes): {_mb(totals['before'])} -> {_mb(totals['after'])} "
+          f"({_mb(saved)} saved, {percent:.1f}%)")
@@ -1,9 +1,10 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
@@ -13,22 +14,67 @@ from datetime import datetime, timezone, timedelta
 import bcrypt
 import jwt
 from templates_config import BUSINESS_TEMPLATES
+from storefront_cache import SiteCache
+from storefront_snapshots import SnapshotWriter
+from http_cache import cache_headers, content_etag, etag_matches, not_modified
+from compression import CompressionMiddleware, Compressor
+from fast_json import row_response, rows_response
+from msgpack_negotiation import MsgpackMiddleware
+from field_selection import FieldSelection, select_fields
+from credential_store import DEFAULT_JWT_SECRET, CredentialStore, split_secrets
+from id_codec import storage_database
+from sparse_storage import sparse_update, storage_document
+from schema_migrations import SchemaMigrator, upgrade_document, versioned
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, METRICS_TOKEN, REGISTRY, InstrumentedExecutor, MetricsMiddleware,
+    MongoCommandMetrics, render_family, stats_families
+)
+from query_budget import QueryBudgetMiddleware, QueryCounter
+from profiling import ProfilingMiddleware, list_profiles, read_profile
+from traffic_recorder import TRAFFIC_SAMPLE_RATE, TrafficLog, TrafficRecorderMiddleware
+from tracing import configure_tracing, instrument_app, shutdown_tracing
+from opentelemetry import trace
+from payment_gateways import (
+    GatewayError, GatewayUnavailableError, get_gateway, record_transaction, settle_transaction,
+    close_gateway_clients
+)
+from payment_reconciliation import (
+    GATEWAY_CREDENTIAL_PROJECTION, RECONCILE_COUNTERS, RECONCILE_ENABLED, PaymentReconciler,
+    ensure_reconciliation_indexes
+)
+from payment_webhooks import (
+    STRIPE_WEBHOOK_SECRET, WebhookSignatureError, WebhookWorker, ensure_webhook_indexes,
+    parse_phonepe_event, parse_stripe_event, verify_phonepe_signature, verify_stripe_signature
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Tracing (TRACING_EXPORTER) is set up before the Mongo client so its commands are traced
+tracer_provider = configure_tracing()
+tracer = trace.get_tracer(__name__)
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# tz_aware: stored dates come back as UTC datetimes, serialized with their offset
+client = AsyncIOMotorClient(mongo_url, tz_aware=True, event_listeners=[MongoCommandMetrics(), QueryCounter()])
+# Wrapped to store ids as binary UUIDs when UUID_STORAGE=binary
+db = storage_database(client[os.environ['DB_NAME']])
+
+# Gateway secrets are kept encrypted outside the business documents
+credential_store = CredentialStore(db)
+
+# Upgrades documents to the current schema_version, lazily and in the background
+schema_migrator = SchemaMigrator(db)
 
 # JWT Configuration
-JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
+JWT_SECRET = os.environ.get('JWT_SECRET', DEFAULT_JWT_SECRET)
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 24 * 7  # 7 days
 
 # Create the main app without a prefix
 app = FastAPI()
+instrument_app(app, tracer_provider)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -60,7 +106,7 @@ def verify_token(token: str) -> dict:
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     payload = verify_token(credentials.credentials)
-    user = await db.users.find_one({"id": payload['user_id']}, {"_id": 0})
+    user = await db.users.find_one({"id": payload['user_id']}, PROJECTIONS["user.session"])
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
@@ -241,7 +287,6 @@ class Business(BaseModel):
     social_media_links: Optional[SocialMediaLinks] = None
     reviews: List[Review] = []
     whatsapp_api_enabled: bool = False
-    whatsapp_api_key: Optional[str] = None
     delivery_charges: float = 0.0
     tax_percentage: float = 0.0
     min_order_for_free_delivery: Optional[float] = None
@@ -257,14 +302,14 @@ class Business(BaseModel):
     # Payment Gateway Configuration
     payment_gateway: Optional[str] = None  # razorpay, stripe, payu, phonepe
     razorpay_key_id: Optional[str] = None
-    razorpay_key_secret: Optional[str] = None
     stripe_publishable_key: Optional[str] = None
-    stripe_secret_key: Optional[str] = None
     payu_merchant_key: Optional[str] = None
-    payu_merchant_salt: Optional[str] = None
     phonepe_merchant_id: Optional[str] = None
-    phonepe_salt_key: Optional[str] = None
     phonepe_salt_index: Optional[int] = None
+    # Names of secrets held in the credential store (values are never returned)
+    configured_secrets: List[str] = []
+    # Incremented by business and product writes; drives ETags and the site cache
+    content_version: int = 0
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     is_active: bool = True
 
@@ -387,20 +432,63 @@ class Order(BaseModel):
     status: str = "pending"
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+# ============ Query Projections ============
+
+def model_projection(model, exclude=()) -> dict:
+    """Projection covering every field of a response model"""
+    return {"_id": 0, **{name: 1 for name in model.model_fields if name not in exclude}}
+
+# What upgrade_document() needs to bring a legacy product to the current pricing shape
+LEGACY_PRICING = {"price": 1, "schema_version": 1}
+
+# Fields each handler reads, so queries never pull whole documents they discard.
+# Model-derived entries follow the response models; secrets left on legacy
+# business documents are never fetched.
+PROJECTIONS = {
+    # Existence and ownership checks
+    "business.exists": {"_id": 0, "id": 1},
+    "business.ref": {"_id": 0, "id": 1, "subdomain": 1},
+    "business.version": {"_id": 0, "id": 1, "content_version": 1},
+    "user.exists": {"_id": 0, "id": 1},
+    # Full response documents
+    "business.public": model_projection(Business),
+    "product.public": model_projection(Product),
+    "booking.public": model_projection(Booking),
+    "order.public": model_projection(Order),
+    "user.session": model_projection(User),
+    "user.login": {**model_projection(User), "password": 1},
+    # Handler-specific subsets
+    # id keeps the result non-empty for sparse documents without delivery settings
+    "business.delivery": {
+        "_id": 0, "id": 1, "business_latitude": 1, "business_longitude": 1, "delivery_charges": 1,
+        "free_delivery_radius_km": 1, "max_delivery_radius_km": 1, "delivery_charge_beyond_radius": 1
+    },
+    "business.payment_info": {
+        "_id": 0, "id": 1, "content_version": 1,
+        "name": 1, "payment_gateway": 1, "razorpay_key_id": 1, "stripe_publishable_key": 1
+    },
+    "business.gateway": {**GATEWAY_CREDENTIAL_PROJECTION, "name": 1, "payment_gateway": 1},
+    "product.pricing": {"_id": 0, "mrp": 1, "sale_price": 1, **LEGACY_PRICING},
+    "product.order_line": {
+        "_id": 0, "id": 1, "name": 1, "mrp": 1, "sale_price": 1, "discount_percentage": 1, **LEGACY_PRICING
+    },
+    "order.revenue": {"_id": 0, "total_amount": 1},
+    "transaction.status": {"_id": 0, "status": 1, "amount": 1, "gateway": 1, "order_id": 1},
+}
+
 # ============ Auth Routes ============
 
 @api_router.post("/auth/signup", response_model=AuthResponse)
 async def signup(user_data: UserSignup):
     # Check if user exists
-    existing_user = await db.users.find_one({"email": user_data.email}, {"_id": 0})
+    existing_user = await db.users.find_one({"email": user_data.email}, PROJECTIONS["user.exists"])
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create user
     user = User(name=user_data.name, email=user_data.email)
-    user_dict = user.model_dump()
+    user_dict = versioned("users", storage_document(user))
     user_dict['password'] = hash_password(user_data.password)
-    user_dict['created_at'] = user_dict['created_at'].isoformat()
     
     await db.users.insert_one(user_dict)
     
@@ -412,7 +500,7 @@ async def signup(user_data: UserSignup):
 @api_router.post("/auth/login", response_model=AuthResponse)
 async def login(login_data: UserLogin):
     # Find user
-    user_doc = await db.users.find_one({"email": login_data.email}, {"_id": 0})
+    user_doc = await db.users.find_one({"email": login_data.email}, PROJECTIONS["user.login"])
     if not user_doc:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
@@ -422,8 +510,6 @@ async def login(login_data: UserLogin):
     
     # Create user object without password
     user_doc.pop('password', None)
-    if isinstance(user_doc['created_at'], str):
-        user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
     user = User(**user_doc)
     
     # Create token
@@ -434,8 +520,6 @@ async def login(login_data: UserLogin):
 @api_router.get("/auth/me", response_model=User)
 async def get_me(current_user: dict = Depends(get_current_user)):
     current_user.pop('password', None)
-    if isinstance(current_user['created_at'], str):
-        current_user['created_at'] = datetime.fromisoformat(current_user['created_at'])
     return User(**current_user)
 
 # ============ Business Routes ============
@@ -443,57 +527,188 @@ async def get_me(current_user: dict = Depends(get_current_user)):
 @api_router.post("/businesses", response_model=Business)
 async def create_business(business_data: BusinessCreate, current_user: dict = Depends(get_current_user)):
     # Check subdomain availability
-    existing = await db.businesses.find_one({"subdomain": business_data.subdomain}, {"_id": 0})
+    existing = await db.businesses.find_one({"subdomain": business_data.subdomain}, PROJECTIONS["business.exists"])
     if existing:
         raise HTTPException(status_code=400, detail="Subdomain already taken")
     
-    business = Business(user_id=current_user['id'], **business_data.model_dump())
-    business_dict = business.model_dump()
-    business_dict['created_at'] = business_dict['created_at'].isoformat()
+    business_fields, secrets = split_secrets(business_data.model_dump())
+    business = Business(user_id=current_user['id'], **business_fields)
+    if any(secrets.values()):
+        business.configured_secrets = await credential_store.update(business.id, secrets)
+    business_dict = versioned("businesses", storage_document(business))
     
     await db.businesses.insert_one(business_dict)
     return business
 
 @api_router.get("/businesses", response_model=List[Business])
-async def get_user_businesses(current_user: dict = Depends(get_current_user)):
-    businesses = await db.businesses.find({"user_id": current_user['id']}, {"_id": 0}).to_list(100)
-    for biz in businesses:
-        if isinstance(biz['created_at'], str):
-            biz['created_at'] = datetime.fromisoformat(biz['created_at'])
-    return businesses
+async def get_user_businesses(
+    current_user: dict = Depends(get_current_user), selection: FieldSelection = Depends(select_fields(Business))
+):
+    businesses = await db.businesses.find({"user_id": current_user['id']}, selection.projection).to_list(100)
+    return rows_response(selection.model, businesses)
 
 @api_router.get("/businesses/{business_id}", response_model=Business)
-async def get_business(business_id: str, current_user: dict = Depends(get_current_user)):
-    business = await db.businesses.find_one({"id": business_id, "user_id": current_user['id']}, {"_id": 0})
+async def get_business(
+    business_id: str,
+    current_user: dict = Depends(get_current_user),
+    selection: FieldSelection = Depends(select_fields(Business))
+):
+    business = await db.businesses.find_one({"id": business_id, "user_id": current_user['id']}, selection.projection)
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
-    if isinstance(business['created_at'], str):
-        business['created_at'] = datetime.fromisoformat(business['created_at'])
-    return business
+    return row_response(selection.model, business)
 
 @api_router.put("/businesses/{business_id}", response_model=Business)
 async def update_business(business_id: str, update_data: BusinessUpdate, current_user: dict = Depends(get_current_user)):
-    business = await db.businesses.find_one({"id": business_id, "user_id": current_user['id']}, {"_id": 0})
+    business = await db.businesses.find_one({"id": business_id, "user_id": current_user['id']}, PROJECTIONS["business.exists"])
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     
-    update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
-    if update_dict:
-        await db.businesses.update_one({"id": business_id}, {"$set": update_dict})
-    
-    updated_business = await db.businesses.find_one({"id": business_id}, {"_id": 0})
-    if isinstance(updated_business['created_at'], str):
-        updated_business['created_at'] = datetime.fromisoformat(updated_business['created_at'])
+    update_dict, secret_changes = split_secrets(update_data.model_dump(exclude_unset=True))
+    # null keeps a saved secret; an empty string removes it (CredentialStore.update)
+    secret_changes = {k: v for k, v in secret_changes.items() if v is not None}
+    if secret_changes:
+        update_dict['configured_secrets'] = await credential_store.update(business_id, secret_changes)
+    to_set, to_unset = sparse_update(Business, update_dict)
+    # Drop any secret copies left on the document from before the credential store
+    to_unset.update({field: "" for field in secret_changes})
+    update_ops = {}
+    if to_set:
+        update_ops["$set"] = to_set
+    if to_unset:
+        update_ops["$unset"] = to_unset
+    if update_ops:
+        update_ops["$inc"] = {"content_version": 1}
+        update_ops = await schema_migrator.upgrade_ops("businesses", {"id": business_id}, update_ops)
+        await db.businesses.update_one({"id": business_id}, update_ops)
+    
+    updated_business = await db.businesses.find_one({"id": business_id}, PROJECTIONS["business.public"])
+    site_content_changed(updated_business['subdomain'])
     return updated_business
 
 @api_router.get("/public/businesses/{subdomain}", response_model=Business)
-async def get_business_by_subdomain(subdomain: str):
-    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, {"_id": 0})
+async def get_business_by_subdomain(
+    subdomain: str, request: Request, selection: FieldSelection = Depends(select_fields(Business))
+):
+    business = await db.businesses.find_one(
+        {"subdomain": subdomain, "is_active": True}, {**selection.projection, "content_version": 1}
+    )
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
-    if isinstance(business['created_at'], str):
-        business['created_at'] = datetime.fromisoformat(business['created_at'])
-    return business
+    
+    version = business.get('content_version', 0) if 'content_version' in selection.fields else business.pop('content_version', 0)
+    etag = content_etag(selection.etag_kind("business"), business['id'], version)
+    if etag_matches(request, etag):
+        return not_modified(etag, business['id'])
+    return row_response(selection.model, business, headers=cache_headers(etag, business['id']))
+
+# ============ Storefront Bootstrap ============
+
+# Encoded /public/sites payloads, keyed by subdomain and checked against content_version
+site_cache = SiteCache()
+
+def site_content_changed(subdomain: str):
+    """Drop the cached bootstrap and schedule a fresh static snapshot"""
+    site_cache.invalidate(subdomain)
+    snapshot_writer.schedule(subdomain)
+
+async def bump_content_version(business: dict):
+    """Record a change to a business's public content (business needs id and subdomain)"""
+    await db.businesses.update_one({"id": business['id']}, {"$inc": {"content_version": 1}})
+    site_content_changed(business['subdomain'])
+
+class PaymentInfo(BaseModel):
+    payment_enabled: bool
+    gateway: Optional[str] = None
+    business_name: str
+    razorpay_key_id: Optional[str] = None
+    stripe_publishable_key: Optional[str] = None
+
+class ProductCategory(BaseModel):
+    name: Optional[str] = None
+    products: List[Product]
+
+class SiteBootstrap(BaseModel):
+    version: int
+    business: Business
+    categories: List[ProductCategory]
+    payment_info: PaymentInfo
+
+# Owner-only fields left out of the public payload
+SITE_PRIVATE_FIELDS = {"business": {"user_id", "configured_secrets"}}
+
+def build_payment_info(business: dict) -> PaymentInfo:
+    """Public checkout details for a business (never includes secrets)"""
+    gateway = business.get('payment_gateway')
+    info = PaymentInfo(payment_enabled=gateway is not None, gateway=gateway, business_name=business['name'])
+    
+    # Include public key for Razorpay (needed for frontend)
+    if gateway == 'razorpay' and business.get('razorpay_key_id'):
+        info.razorpay_key_id = business['razorpay_key_id']
+    
+    # Include publishable key for Stripe
+    if gateway == 'stripe':
+        info.stripe_publishable_key = business.get('stripe_publishable_key')
+    
+    return info
+
+async def build_site(subdomain: str) -> Optional[SiteBootstrap]:
+    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, PROJECTIONS["business.public"])
+    if not business:
+        return None
+    
+    products = await db.products.find(
+        {"business_id": business['id'], "is_available": True}, PROJECTIONS["product.public"]
+    ).to_list(500)
+    
+    # Group in catalog order; products without a category come last
+    categories = {}
+    for product in products:
+        categories.setdefault(product.get('category') or None, []).append(product)
+    uncategorized = categories.pop(None, None)
+    groups = [ProductCategory(name=name, products=items) for name, items in categories.items()]
+    if uncategorized:
+        groups.append(ProductCategory(name=None, products=uncategorized))
+    
+    return SiteBootstrap(
+        version=business.get('content_version', 0),
+        business=business,
+        categories=groups,
+        payment_info=build_payment_info(business)
+    )
+
+def encode_site(site: SiteBootstrap) -> bytes:
+    return site.model_dump_json(exclude=SITE_PRIVATE_FIELDS).encode()
+
+async def render_site(subdomain: str) -> Optional[bytes]:
+    site = await build_site(subdomain)
+    return encode_site(site) if site else None
+
+# Static copies of the bootstrap for file servers (enabled by SNAPSHOT_DIR)
+snapshot_writer = SnapshotWriter(render_site)
+
+@api_router.get("/public/sites/{subdomain}", response_model=SiteBootstrap)
+async def get_site(subdomain: str, request: Request):
+    """Everything a storefront needs for first paint in one response"""
+    # Only the version is read up front, so revalidations never touch products
+    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, PROJECTIONS["business.version"])
+    if not business:
+        raise HTTPException(status_code=404, detail="Business not found")
+    
+    version = business.get('content_version', 0)
+    etag = content_etag("site", business['id'], version)
+    if etag_matches(request, etag):
+        return not_modified(etag, business['id'])
+    
+    cached = site_cache.get(subdomain)
+    if cached is None or cached.version != version:
+        site = await build_site(subdomain)
+        if site is None:
+            raise HTTPException(status_code=404, detail="Business not found")
+        cached = site_cache.put(subdomain, site.version, encode_site(site))
+    
+    headers = cache_headers(content_etag("site", business['id'], cached.version), business['id'])
+    return Response(content=cached.body, media_type="application/json", headers=headers)
 
 # ============ Delivery Charge Calculation ============
 
@@ -527,7 +742,7 @@ class DeliveryChargeResponse(BaseModel):
 @api_router.post("/public/businesses/{subdomain}/calculate-delivery", response_model=DeliveryChargeResponse)
 async def calculate_delivery_charge(subdomain: str, location: DeliveryChargeRequest):
     """Calculate delivery charge based on customer location"""
-    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, {"_id": 0})
+    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, PROJECTIONS["business.delivery"])
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     
@@ -585,74 +800,88 @@ async def calculate_delivery_charge(subdomain: str, location: DeliveryChargeRequ
 
 # ============ Product Routes ============
 
+def calculate_discount_percentage(mrp: float, sale_price: float) -> float:
+    """Discount off the MRP in percent, 0 when the sale price is not below it"""
+    if mrp > 0 and sale_price < mrp:
+        return round(((mrp - sale_price) / mrp) * 100, 2)
+    return 0.0
+
 @api_router.post("/businesses/{business_id}/products", response_model=Product)
 async def create_product(business_id: str, product_data: ProductCreate, current_user: dict = Depends(get_current_user)):
-    business = await db.businesses.find_one({"id": business_id, "user_id": current_user['id']}, {"_id": 0})
+    business = await db.businesses.find_one({"id": business_id, "user_id": current_user['id']}, PROJECTIONS["business.ref"])
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     
-    # Calculate discount percentage
-    discount_pct = 0.0
-    if product_data.mrp > 0 and product_data.sale_price < product_data.mrp:
-        discount_pct = round(((product_data.mrp - product_data.sale_price) / product_data.mrp) * 100, 2)
-    
     product = Product(
         business_id=business_id, 
-        discount_percentage=discount_pct,
+        discount_percentage=calculate_discount_percentage(product_data.mrp, product_data.sale_price),
         **product_data.model_dump()
     )
-    product_dict = product.model_dump()
-    product_dict['created_at'] = product_dict['created_at'].isoformat()
+    product_dict = versioned("products", storage_document(product))
     
     await db.products.insert_one(product_dict)
+    await bump_content_version(business)
     return product
 
 @api_router.get("/businesses/{business_id}/products", response_model=List[Product])
-async def get_business_products(business_id: str):
-    products = await db.products.find({"business_id": business_id}, {"_id": 0}).to_list(500)
-    for prod in products:
-        if isinstance(prod['created_at'], str):
-            prod['created_at'] = datetime.fromisoformat(prod['created_at'])
-    return products
+async def get_business_products(
+    business_id: str, request: Request, selection: FieldSelection = Depends(select_fields(Product))
+):
+    headers = None
+    business = await db.businesses.find_one({"id": business_id}, PROJECTIONS["business.version"])
+    if business:
+        etag = content_etag(selection.etag_kind("products"), business_id, business.get('content_version', 0))
+        if etag_matches(request, etag):
+            return not_modified(etag, business_id)
+        headers = cache_headers(etag, business_id)
+    
+    products = await db.products.find({"business_id": business_id}, selection.projection).to_list(500)
+    return rows_response(selection.model, products, headers=headers)
 
 @api_router.put("/businesses/{business_id}/products/{product_id}", response_model=Product)
 async def update_product(business_id: str, product_id: str, update_data: ProductUpdate, current_user: dict = Depends(get_current_user)):
-    business = await db.businesses.find_one({"id": business_id, "user_id": current_user['id']}, {"_id": 0})
+    business = await db.businesses.find_one({"id": business_id, "user_id": current_user['id']}, PROJECTIONS["business.ref"])
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     
-    product = await db.products.find_one({"id": product_id, "business_id": business_id}, {"_id": 0})
+    product = await db.products.find_one({"id": product_id, "business_id": business_id}, PROJECTIONS["product.pricing"])
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    if not schema_migrator.is_current("products"):
+        product = upgrade_document("products", product)
     
-    update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
+    update_dict = update_data.model_dump(exclude_unset=True)
+    prices = {k: update_dict[k] for k in ('mrp', 'sale_price') if update_dict.get(k) is not None}
     
     # Recalculate discount if MRP or sale price changed
-    if 'mrp' in update_dict or 'sale_price' in update_dict:
-        mrp = update_dict.get('mrp', product.get('mrp', 0))
-        sale_price = update_dict.get('sale_price', product.get('sale_price', 0))
-        if mrp > 0 and sale_price < mrp:
-            update_dict['discount_percentage'] = round(((mrp - sale_price) / mrp) * 100, 2)
-        else:
-            update_dict['discount_percentage'] = 0.0
-    
-    if update_dict:
-        await db.products.update_one({"id": product_id}, {"$set": update_dict})
-    
-    updated_product = await db.products.find_one({"id": product_id}, {"_id": 0})
-    if isinstance(updated_product['created_at'], str):
-        updated_product['created_at'] = datetime.fromisoformat(updated_product['created_at'])
-    return updated_product
+    if prices:
+        update_dict['discount_percentage'] = calculate_discount_percentage(
+            prices.get('mrp', product['mrp']), prices.get('sale_price', product['sale_price'])
+        )
+    
+    to_set, to_unset = sparse_update(Product, update_dict)
+    update_ops = {}
+    if to_set:
+        update_ops["$set"] = to_set
+    if to_unset:
+        update_ops["$unset"] = to_unset
+    if update_ops:
+        update_ops = await schema_migrator.upgrade_ops("products", {"id": product_id}, update_ops)
+        await db.products.update_one({"id": product_id}, update_ops)
+        await bump_content_version(business)
+    
+    return await db.products.find_one({"id": product_id}, PROJECTIONS["product.public"])
 
 @api_router.delete("/businesses/{business_id}/products/{product_id}")
 async def delete_product(business_id: str, product_id: str, current_user: dict = Depends(get_current_user)):
-    business = await db.businesses.find_one({"id": business_id, "user_id": current_user['id']}, {"_id": 0})
+    business = await db.businesses.find_one({"id": business_id, "user_id": current_user['id']}, PROJECTIONS["business.ref"])
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     
     result = await db.products.delete_one({"id": product_id, "business_id": business_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
+    await bump_content_version(business)
     
     return {"message": "Product deleted successfully"}
 
@@ -660,89 +889,103 @@ async def delete_product(business_id: str, product_id: str, current_user: dict =
 
 @api_router.post("/businesses/{business_id}/bookings", response_model=Booking)
 async def create_booking(business_id: str, booking_data: BookingCreate):
-    business = await db.businesses.find_one({"id": business_id}, {"_id": 0})
+    business = await db.businesses.find_one({"id": business_id}, PROJECTIONS["business.exists"])
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     
     booking = Booking(business_id=business_id, **booking_data.model_dump())
-    booking_dict = booking.model_dump()
-    booking_dict['created_at'] = booking_dict['created_at'].isoformat()
+    booking_dict = versioned("bookings", storage_document(booking))
     
     await db.bookings.insert_one(booking_dict)
     return booking
 
 @api_router.get("/businesses/{business_id}/bookings", response_model=List[Booking])
-async def get_business_bookings(business_id: str, current_user: dict = Depends(get_current_user)):
-    business = await db.businesses.find_one({"id": business_id, "user_id": current_user['id']}, {"_id": 0})
+async def get_business_bookings(
+    business_id: str,
+    current_user: dict = Depends(get_current_user),
+    selection: FieldSelection = Depends(select_fields(Booking))
+):
+    business = await db.businesses.find_one({"id": business_id, "user_id": current_user['id']}, PROJECTIONS["business.exists"])
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     
-    bookings = await db.bookings.find({"business_id": business_id}, {"_id": 0}).sort("created_at", -1).to_list(500)
-    for booking in bookings:
-        if isinstance(booking['created_at'], str):
-            booking['created_at'] = datetime.fromisoformat(booking['created_at'])
-    return bookings
+    # Mixed ISO-string and date created_at values would sort by type first
+    await schema_migrator.upgrade_matching("bookings", {"business_id": business_id})
+    bookings = await db.bookings.find({"business_id": business_id}, selection.projection).sort("created_at", -1).to_list(500)
+    return rows_response(selection.model, bookings)
 
 # ============ Order Routes ============
 
 @api_router.post("/businesses/{business_id}/orders", response_model=Order)
 async def create_order(business_id: str, order_data: OrderCreate):
-    business = await db.businesses.find_one({"id": business_id}, {"_id": 0})
+    business = await db.businesses.find_one({"id": business_id}, PROJECTIONS["business.exists"])
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     
-    # Calculate total and get product details
-    order_items = []
-    total_amount = 0.0
-    
-    for item in order_data.items:
-        product = await db.products.find_one({"id": item.product_id, "business_id": business_id}, {"_id": 0})
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
+    # Calculate total and get product details, fetching every ordered product in one query
+    product_ids = list({item.product_id for item in order_data.items})
+    products = await db.products.find(
+        {"id": {"$in": product_ids}, "business_id": business_id}, PROJECTIONS["product.order_line"]
+    ).to_list(None)
+    products = {product['id']: product for product in products}
+    
+    # Model building and validation, told apart from the Mongo spans around it
+    with tracer.start_as_current_span("create_order.build"):
+        order_items = []
+        total_amount = 0.0
         
-        order_items.append(OrderItem(
-            product_id=item.product_id,
-            product_name=product['name'],
-            quantity=item.quantity,
-            mrp=product.get('mrp', product.get('price', 0)),
-            sale_price=product.get('sale_price', product.get('price', 0)),
-            discount_percentage=product.get('discount_percentage', 0)
-        ))
-        total_amount += product.get('sale_price', product.get('price', 0)) * item.quantity
-    
-    order = Order(
-        business_id=business_id,
-        customer_name=order_data.customer_name,
-        customer_phone=order_data.customer_phone,
-        customer_address=order_data.customer_address,
-        items=order_items,
-        total_amount=total_amount,
-        notes=order_data.notes
-    )
-    
-    order_dict = order.model_dump()
-    order_dict['created_at'] = order_dict['created_at'].isoformat()
+        for item in order_data.items:
+            product = products.get(item.product_id)
+            if not product:
+                raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
+            if not schema_migrator.is_current("products"):
+                product = upgrade_document("products", product)
+        
+            order_items.append(OrderItem(
+                product_id=item.product_id,
+                product_name=product['name'],
+                quantity=item.quantity,
+                mrp=product['mrp'],
+                sale_price=product['sale_price'],
+                discount_percentage=product.get('discount_percentage', 0)
+            ))
+            total_amount += product['sale_price'] * item.quantity
+        
+        order = Order(
+            business_id=business_id,
+            customer_name=order_data.customer_name,
+            customer_phone=order_data.customer_phone,
+            customer_address=order_data.customer_address,
+            items=order_items,
+            total_amount=total_amount,
+            notes=order_data.notes
+        )
+        
+        order_dict = versioned("orders", storage_document(order))
     
     await db.orders.insert_one(order_dict)
     return order
 
 @api_router.get("/businesses/{business_id}/orders", response_model=List[Order])
-async def get_business_orders(business_id: str, current_user: dict = Depends(get_current_user)):
-    business = await db.businesses.find_one({"id": business_id, "user_id": current_user['id']}, {"_id": 0})
+async def get_business_orders(
+    business_id: str,
+    current_user: dict = Depends(get_current_user),
+    selection: FieldSelection = Depends(select_fields(Order))
+):
+    business = await db.businesses.find_one({"id": business_id, "user_id": current_user['id']}, PROJECTIONS["business.exists"])
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     
-    orders = await db.orders.find({"business_id": business_id}, {"_id": 0}).sort("created_at", -1).to_list(500)
-    for order in orders:
-        if isinstance(order['created_at'], str):
-            order['created_at'] = datetime.fromisoformat(order['created_at'])
-    return orders
+    # Mixed ISO-string and date created_at values would sort by type first
+    await schema_migrator.upgrade_matching("orders", {"business_id": business_id})
+    orders = await db.orders.find({"business_id": business_id}, selection.projection).sort("created_at", -1).to_list(500)
+    return rows_response(selection.model, orders)
 
 # ============ Analytics Routes ============
 
 @api_router.get("/businesses/{business_id}/analytics")
 async def get_business_analytics(business_id: str, current_user: dict = Depends(get_current_user)):
-    business = await db.businesses.find_one({"id": business_id, "user_id": current_user['id']}, {"_id": 0})
+    business = await db.businesses.find_one({"id": business_id, "user_id": current_user['id']}, PROJECTIONS["business.exists"])
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     
@@ -758,7 +1001,7 @@ async def get_business_analytics(business_id: str, current_user: dict = Depends(
     pending_orders = await db.orders.count_documents({"business_id": business_id, "status": "pending"})
     
     # Calculate total revenue from orders
-    orders = await db.orders.find({"business_id": business_id}, {"_id": 0, "total_amount": 1}).to_list(1000)
+    orders = await db.orders.find({"business_id": business_id}, PROJECTIONS["order.revenue"]).to_list(1000)
     total_revenue = sum(order.get('total_amount', 0) for order in orders)
     
     return {
@@ -772,27 +1015,23 @@ async def get_business_analytics(business_id: str, current_user: dict = Depends(
 
 # ============ Admin Routes ============
 
-@api_router.get("/admin/users")
+@api_router.get("/admin/users", response_model=List[User])
 async def get_all_users(current_user: dict = Depends(get_current_user)):
     if current_user.get('role') != 'super_admin':
         raise HTTPException(status_code=403, detail="Access denied")
     
-    users = await db.users.find({}, {"_id": 0, "password": 0}).to_list(1000)
-    for user in users:
-        if isinstance(user.get('created_at'), str):
-            user['created_at'] = datetime.fromisoformat(user['created_at'])
-    return users
+    users = await db.users.find({}, PROJECTIONS["user.session"]).to_list(1000)
+    return rows_response(User, users)
 
-@api_router.get("/admin/businesses")
-async def get_all_businesses(current_user: dict = Depends(get_current_user)):
+@api_router.get("/admin/businesses", response_model=List[Business])
+async def get_all_businesses(
+    current_user: dict = Depends(get_current_user), selection: FieldSelection = Depends(select_fields(Business))
+):
     if current_user.get('role') not in ['super_admin', 'reseller']:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    businesses = await db.businesses.find({}, {"_id": 0}).to_list(1000)
-    for biz in businesses:
-        if isinstance(biz.get('created_at'), str):
-            biz['created_at'] = datetime.fromisoformat(biz['created_at'])
-    return businesses
+    businesses = await db.businesses.find({}, selection.projection).to_list(1000)
+    return rows_response(selection.model, businesses)
 
 @api_router.get("/admin/stats")
 async def get_admin_stats(current_user: dict = Depends(get_current_user)):
@@ -807,7 +1046,7 @@ async def get_admin_stats(current_user: dict = Depends(get_current_user)):
     total_bookings = await db.bookings.count_documents({})
     
     # Revenue calculation
-    orders = await db.orders.find({}, {"_id": 0, "total_amount": 1}).to_list(10000)
+    orders = await db.orders.find({}, PROJECTIONS["order.revenue"]).to_list(10000)
     total_revenue = sum(order.get('total_amount', 0) for order in orders)
     
     return {
@@ -831,17 +1070,16 @@ async def update_user_role(user_id: str, role: str, current_user: dict = Depends
     await db.users.update_one({"id": user_id}, {"$set": {"role": role}})
     return {"message": "Role updated successfully"}
 
-@api_router.get("/reseller/businesses")
-async def get_reseller_businesses(current_user: dict = Depends(get_current_user)):
+@api_router.get("/reseller/businesses", response_model=List[Business])
+async def get_reseller_businesses(
+    current_user: dict = Depends(get_current_user), selection: FieldSelection = Depends(select_fields(Business))
+):
     if current_user.get('role') != 'reseller':
         raise HTTPException(status_code=403, detail="Access denied")
     
     # For now, resellers can see all businesses they created
-    businesses = await db.businesses.find({"user_id": current_user['id']}, {"_id": 0}).to_list(1000)
-    for biz in businesses:
-        if isinstance(biz.get('created_at'), str):
-            biz['created_at'] = datetime.fromisoformat(biz['created_at'])
-    return businesses
+    businesses = await db.businesses.find({"user_id": current_user['id']}, selection.projection).to_list(1000)
+    return rows_response(selection.model, businesses)
 
 @api_router.get("/reseller/stats")
 async def get_reseller_stats(current_user: dict = Depends(get_current_user)):
@@ -858,10 +1096,9 @@ async def get_reseller_stats(current_user: dict = Depends(get_current_user)):
 
 # ============ Payment Gateway Routes ============
 
-import razorpay
 import hashlib
 import hmac
-import base64
+import json
 
 # Payment Transaction Model
 class PaymentTransaction(BaseModel):
@@ -896,104 +1133,74 @@ class PaymentVerifyRequest(BaseModel):
     payu_txnid: Optional[str] = None
     phonepe_transaction_id: Optional[str] = None
 
-# Razorpay Payment
-@api_router.post("/public/businesses/{subdomain}/payments/razorpay/create")
-async def create_razorpay_payment(subdomain: str, request: CreatePaymentRequest):
-    """Create a Razorpay order for payment"""
-    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, {"_id": 0})
+async def _create_gateway_payment(subdomain: str, gateway_name: str, request: CreatePaymentRequest) -> dict:
+    """Shared flow for starting a payment with any registered gateway"""
+    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, PROJECTIONS["business.gateway"])
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     
-    if business.get('payment_gateway') != 'razorpay':
-        raise HTTPException(status_code=400, detail="Razorpay not configured for this business")
+    gateway = get_gateway(gateway_name)
+    if business.get('payment_gateway') != gateway_name:
+        raise HTTPException(status_code=400, detail=f"{gateway.display_name} not configured for this business")
     
-    if not business.get('razorpay_key_id') or not business.get('razorpay_key_secret'):
-        raise HTTPException(status_code=400, detail="Razorpay credentials not configured")
+    business = await credential_store.load_business(business)
+    if not gateway.has_credentials(business):
+        raise HTTPException(status_code=400, detail=f"{gateway.display_name} credentials not configured")
     
     try:
-        client = razorpay.Client(auth=(business['razorpay_key_id'], business['razorpay_key_secret']))
-        
-        # Create Razorpay order (amount in paise)
-        razorpay_order = client.order.create({
-            "amount": int(request.amount * 100),
-            "currency": "INR",
-            "receipt": request.order_id,
-            "payment_capture": 1
-        })
-        
-        # Store payment transaction
-        transaction = {
-            "id": str(uuid.uuid4()),
-            "business_id": business['id'],
-            "order_id": request.order_id,
-            "amount": request.amount,
-            "currency": "INR",
-            "gateway": "razorpay",
-            "gateway_order_id": razorpay_order['id'],
-            "status": "pending",
-            "customer_name": request.customer_name,
-            "customer_email": request.customer_email,
-            "customer_phone": request.customer_phone,
-            "created_at": datetime.now(timezone.utc),
-            "updated_at": datetime.now(timezone.utc)
-        }
-        await db.payment_transactions.insert_one(transaction)
-        
-        return {
-            "order_id": razorpay_order['id'],
-            "amount": razorpay_order['amount'],
-            "currency": razorpay_order['currency'],
-            "key_id": business['razorpay_key_id'],
-            "business_name": business['name'],
-            "customer_name": request.customer_name,
-            "customer_email": request.customer_email,
-            "customer_phone": request.customer_phone
-        }
+        gateway_order_id, response = await gateway.create_payment(business, request, subdomain)
+        await record_transaction(db, business, gateway_name, gateway_order_id, request)
+        return response
+    except GatewayUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except GatewayError as e:
+        raise HTTPException(status_code=502, detail=f"Failed to create {gateway.display_name} payment: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to create payment: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to create {gateway.display_name} payment: {str(e)}")
+
+# Razorpay Payment
+@api_router.post("/public/businesses/{subdomain}/payments/razorpay/create")
+async def create_razorpay_payment(subdomain: str, request: CreatePaymentRequest):
+    """Create a Razorpay order for payment"""
+    return await _create_gateway_payment(subdomain, "razorpay", request)
 
 @api_router.post("/public/businesses/{subdomain}/payments/razorpay/verify")
 async def verify_razorpay_payment(subdomain: str, request: PaymentVerifyRequest):
     """Verify Razorpay payment signature"""
-    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, {"_id": 0})
+    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, PROJECTIONS["business.gateway"])
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     
     if not request.razorpay_order_id or not request.razorpay_payment_id or not request.razorpay_signature:
         raise HTTPException(status_code=400, detail="Missing payment details")
     
+    business = await credential_store.load_business(business)
+    if not business.get('razorpay_key_secret'):
+        raise HTTPException(status_code=400, detail="Razorpay credentials not configured")
+    
     try:
         # Verify signature
-        msg = f"{request.razorpay_order_id}|{request.razorpay_payment_id}"
-        generated_signature = hmac.new(
-            business['razorpay_key_secret'].encode(),
-            msg.encode(),
-            hashlib.sha256
-        ).hexdigest()
+        with tracer.start_as_current_span("razorpay.verify_signature"):
+            msg = f"{request.razorpay_order_id}|{request.razorpay_payment_id}"
+            generated_signature = hmac.new(
+                business['razorpay_key_secret'].encode(),
+                msg.encode(),
+                hashlib.sha256
+            ).hexdigest()
         
-        if generated_signature != request.razorpay_signature:
+        if not hmac.compare_digest(generated_signature, request.razorpay_signature):
             # Update transaction status to failed
-            await db.payment_transactions.update_one(
-                {"gateway_order_id": request.razorpay_order_id},
-                {"$set": {"status": "failed", "updated_at": datetime.now(timezone.utc)}}
-            )
+            await settle_transaction(db, business['id'], "razorpay", request.razorpay_order_id, "failed")
             raise HTTPException(status_code=400, detail="Payment verification failed")
         
-        # Update transaction status to success
-        await db.payment_transactions.update_one(
-            {"gateway_order_id": request.razorpay_order_id},
-            {"$set": {
-                "status": "success",
-                "gateway_payment_id": request.razorpay_payment_id,
-                "updated_at": datetime.now(timezone.utc)
-            }}
+        # Settle the transaction and get its order in one round trip; repeated
+        # or concurrent verify calls find nothing pending and skip the order update
+        transaction = await settle_transaction(
+            db, business['id'], "razorpay", request.razorpay_order_id, "success", request.razorpay_payment_id
         )
-        
-        # Get transaction to update order
-        transaction = await db.payment_transactions.find_one({"gateway_order_id": request.razorpay_order_id}, {"_id": 0})
         if transaction:
             await db.orders.update_one(
-                {"id": transaction['order_id']},
+                {"id": transaction['order_id'], "business_id": business['id']},
                 {"$set": {"status": "paid", "payment_id": request.razorpay_payment_id}}
             )
         
@@ -1007,98 +1214,27 @@ async def verify_razorpay_payment(subdomain: str, request: PaymentVerifyRequest)
 @api_router.post("/public/businesses/{subdomain}/payments/stripe/create")
 async def create_stripe_payment(subdomain: str, request: CreatePaymentRequest):
     """Create a Stripe checkout session"""
-    from fastapi import Request as FastAPIRequest
-    
-    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, {"_id": 0})
-    if not business:
-        raise HTTPException(status_code=404, detail="Business not found")
-    
-    if business.get('payment_gateway') != 'stripe':
-        raise HTTPException(status_code=400, detail="Stripe not configured for this business")
-    
-    try:
-        from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionRequest
-        
-        # Use Stripe test key from environment or business config
-        stripe_key = business.get('stripe_secret_key') or os.environ.get('STRIPE_API_KEY', 'sk_test_emergent')
-        
-        # Get host URL from environment
-        host_url = os.environ.get('REACT_APP_BACKEND_URL', 'http://localhost:8001')
-        webhook_url = f"{host_url}/api/webhook/stripe"
-        
-        stripe_checkout = StripeCheckout(api_key=stripe_key, webhook_url=webhook_url)
-        
-        # Create checkout session
-        success_url = f"{host_url.replace('/api', '')}/site/{subdomain}/payment-success?session_id={{CHECKOUT_SESSION_ID}}"
-        cancel_url = f"{host_url.replace('/api', '')}/site/{subdomain}/payment-cancel"
-        
-        checkout_request = CheckoutSessionRequest(
-            amount=request.amount,
-            currency="inr",
-            success_url=success_url,
-            cancel_url=cancel_url,
-            metadata={
-                "order_id": request.order_id,
-                "business_id": business['id'],
-                "customer_email": request.customer_email
-            }
-        )
-        
-        session = await stripe_checkout.create_checkout_session(checkout_request)
-        
-        # Store payment transaction
-        transaction = {
-            "id": str(uuid.uuid4()),
-            "business_id": business['id'],
-            "order_id": request.order_id,
-            "amount": request.amount,
-            "currency": "INR",
-            "gateway": "stripe",
-            "gateway_order_id": session.session_id,
-            "status": "pending",
-            "customer_name": request.customer_name,
-            "customer_email": request.customer_email,
-            "customer_phone": request.customer_phone,
-            "created_at": datetime.now(timezone.utc),
-            "updated_at": datetime.now(timezone.utc)
-        }
-        await db.payment_transactions.insert_one(transaction)
-        
-        return {
-            "checkout_url": session.url,
-            "session_id": session.session_id
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to create Stripe session: {str(e)}")
+    return await _create_gateway_payment(subdomain, "stripe", request)
 
 @api_router.get("/public/businesses/{subdomain}/payments/stripe/status/{session_id}")
 async def get_stripe_payment_status(subdomain: str, session_id: str):
     """Check Stripe payment status"""
-    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, {"_id": 0})
+    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, PROJECTIONS["business.gateway"])
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     
+    business = await credential_store.load_business(business)
     try:
-        from emergentintegrations.payments.stripe.checkout import StripeCheckout
-        
-        stripe_key = business.get('stripe_secret_key') or os.environ.get('STRIPE_API_KEY', 'sk_test_emergent')
-        host_url = os.environ.get('REACT_APP_BACKEND_URL', 'http://localhost:8001')
-        
-        stripe_checkout = StripeCheckout(api_key=stripe_key, webhook_url=f"{host_url}/api/webhook/stripe")
-        status = await stripe_checkout.get_checkout_status(session_id)
+        status = await get_gateway("stripe").checkout_status(business, session_id)
         
         # Update transaction if paid
         if status.payment_status == 'paid':
-            await db.payment_transactions.update_one(
-                {"gateway_order_id": session_id},
-                {"$set": {"status": "success", "updated_at": datetime.now(timezone.utc)}}
-            )
+            transaction = await settle_transaction(db, business['id'], "stripe", session_id, "success")
             
             # Update order status
-            transaction = await db.payment_transactions.find_one({"gateway_order_id": session_id}, {"_id": 0})
             if transaction:
                 await db.orders.update_one(
-                    {"id": transaction['order_id']},
+                    {"id": transaction['order_id'], "business_id": business['id']},
                     {"$set": {"status": "paid"}}
                 )
         
@@ -1108,6 +1244,8 @@ async def get_stripe_payment_status(subdomain: str, session_id: str):
             "amount": status.amount_total,
             "currency": status.currency
         }
+    except GatewayUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get status: {str(e)}")
 
@@ -1115,155 +1253,34 @@ async def get_stripe_payment_status(subdomain: str, session_id: str):
 @api_router.post("/public/businesses/{subdomain}/payments/payu/create")
 async def create_payu_payment(subdomain: str, request: CreatePaymentRequest):
     """Create PayU payment hash and form data"""
-    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, {"_id": 0})
-    if not business:
-        raise HTTPException(status_code=404, detail="Business not found")
-    
-    if business.get('payment_gateway') != 'payu':
-        raise HTTPException(status_code=400, detail="PayU not configured for this business")
-    
-    if not business.get('payu_merchant_key') or not business.get('payu_merchant_salt'):
-        raise HTTPException(status_code=400, detail="PayU credentials not configured")
-    
-    try:
-        txnid = str(uuid.uuid4())[:20]
-        host_url = os.environ.get('REACT_APP_BACKEND_URL', 'http://localhost:8001').replace('/api', '')
-        
-        # Generate hash
-        hash_string = f"{business['payu_merchant_key']}|{txnid}|{request.amount}|{request.order_id}|{request.customer_name}|{request.customer_email}|||||||||||{business['payu_merchant_salt']}"
-        hash_value = hashlib.sha512(hash_string.encode('utf-8')).hexdigest()
-        
-        # Store transaction
-        transaction = {
-            "id": str(uuid.uuid4()),
-            "business_id": business['id'],
-            "order_id": request.order_id,
-            "amount": request.amount,
-            "currency": "INR",
-            "gateway": "payu",
-            "gateway_order_id": txnid,
-            "status": "pending",
-            "customer_name": request.customer_name,
-            "customer_email": request.customer_email,
-            "customer_phone": request.customer_phone,
-            "created_at": datetime.now(timezone.utc),
-            "updated_at": datetime.now(timezone.utc)
-        }
-        await db.payment_transactions.insert_one(transaction)
-        
-        return {
-            "payu_url": "https://secure.payu.in/_payment",  # Use test URL for sandbox
-            "key": business['payu_merchant_key'],
-            "txnid": txnid,
-            "amount": request.amount,
-            "productinfo": request.order_id,
-            "firstname": request.customer_name,
-            "email": request.customer_email,
-            "phone": request.customer_phone,
-            "surl": f"{host_url}/site/{subdomain}/payment-success",
-            "furl": f"{host_url}/site/{subdomain}/payment-failed",
-            "hash": hash_value
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to create PayU payment: {str(e)}")
+    return await _create_gateway_payment(subdomain, "payu", request)
 
 # PhonePe Payment
 @api_router.post("/public/businesses/{subdomain}/payments/phonepe/create")
 async def create_phonepe_payment(subdomain: str, request: CreatePaymentRequest):
     """Create PhonePe payment request"""
-    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, {"_id": 0})
-    if not business:
-        raise HTTPException(status_code=404, detail="Business not found")
-    
-    if business.get('payment_gateway') != 'phonepe':
-        raise HTTPException(status_code=400, detail="PhonePe not configured for this business")
-    
-    if not business.get('phonepe_merchant_id') or not business.get('phonepe_salt_key'):
-        raise HTTPException(status_code=400, detail="PhonePe credentials not configured")
-    
-    try:
-        import json
-        
-        merchant_transaction_id = str(uuid.uuid4())[:35]
-        host_url = os.environ.get('REACT_APP_BACKEND_URL', 'http://localhost:8001').replace('/api', '')
-        
-        # Create payload
-        payload = {
-            "merchantId": business['phonepe_merchant_id'],
-            "merchantTransactionId": merchant_transaction_id,
-            "merchantUserId": request.customer_email,
-            "amount": int(request.amount * 100),  # Amount in paise
-            "redirectUrl": f"{host_url}/site/{subdomain}/payment-success?txnId={merchant_transaction_id}",
-            "redirectMode": "REDIRECT",
-            "callbackUrl": f"{host_url}/api/webhook/phonepe/{subdomain}",
-            "paymentInstrument": {"type": "PAY_PAGE"}
-        }
-        
-        payload_base64 = base64.b64encode(json.dumps(payload).encode()).decode()
-        
-        # Generate checksum
-        salt_index = business.get('phonepe_salt_index', 1)
-        string_to_hash = payload_base64 + "/pg/v1/pay" + business['phonepe_salt_key']
-        checksum = hashlib.sha256(string_to_hash.encode()).hexdigest() + "###" + str(salt_index)
-        
-        # Store transaction
-        transaction = {
-            "id": str(uuid.uuid4()),
-            "business_id": business['id'],
-            "order_id": request.order_id,
-            "amount": request.amount,
-            "currency": "INR",
-            "gateway": "phonepe",
-            "gateway_order_id": merchant_transaction_id,
-            "status": "pending",
-            "customer_name": request.customer_name,
-            "customer_email": request.customer_email,
-            "customer_phone": request.customer_phone,
-            "created_at": datetime.now(timezone.utc),
-            "updated_at": datetime.now(timezone.utc)
-        }
-        await db.payment_transactions.insert_one(transaction)
-        
-        return {
-            "phonepe_url": "https://api-preprod.phonepe.com/apis/pg-sandbox/pg/v1/pay",  # Sandbox URL
-            "payload": payload_base64,
-            "checksum": checksum,
-            "merchant_transaction_id": merchant_transaction_id
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to create PhonePe payment: {str(e)}")
+    return await _create_gateway_payment(subdomain, "phonepe", request)
 
 # Get payment gateway info for a business (public)
 @api_router.get("/public/businesses/{subdomain}/payment-info")
-async def get_business_payment_info(subdomain: str):
+async def get_business_payment_info(subdomain: str, request: Request, response: Response):
     """Get payment gateway info for customer checkout"""
-    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, {"_id": 0})
+    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, PROJECTIONS["business.payment_info"])
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     
-    gateway = business.get('payment_gateway')
+    etag = content_etag("payment-info", business['id'], business.get('content_version', 0))
+    if etag_matches(request, etag):
+        return not_modified(etag, business['id'])
+    response.headers.update(cache_headers(etag, business['id']))
     
-    result = {
-        "payment_enabled": gateway is not None,
-        "gateway": gateway,
-        "business_name": business['name']
-    }
-    
-    # Include public key for Razorpay (needed for frontend)
-    if gateway == 'razorpay' and business.get('razorpay_key_id'):
-        result['razorpay_key_id'] = business['razorpay_key_id']
-    
-    # Include publishable key for Stripe
-    if gateway == 'stripe':
-        result['stripe_publishable_key'] = business.get('stripe_publishable_key')
-    
-    return result
+    return build_payment_info(business).model_dump(exclude_none=True)
 
 # Get payment transaction status
 @api_router.get("/public/businesses/{subdomain}/payments/{transaction_id}/status")
 async def get_payment_transaction_status(subdomain: str, transaction_id: str):
     """Get payment transaction status"""
-    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, {"_id": 0})
+    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, PROJECTIONS["business.exists"])
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     
@@ -1273,7 +1290,7 @@ async def get_payment_transaction_status(subdomain: str, transaction_id: str):
             {"id": transaction_id},
             {"gateway_order_id": transaction_id}
         ]
-    }, {"_id": 0})
+    }, PROJECTIONS["transaction.status"])
     
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
@@ -1285,9 +1302,185 @@ async def get_payment_transaction_status(subdomain: str, transaction_id: str):
         "order_id": transaction['order_id']
     }
 
+# ============ Payment Webhook Routes ============
+
+webhook_worker = WebhookWorker(db)
+
+class WebhookReplayRequest(BaseModel):
+    gateway: Optional[str] = None
+    event_ids: Optional[List[str]] = None
+    since: Optional[datetime] = None
+
+@api_router.post("/webhook/stripe")
+async def stripe_webhook(request: Request):
+    """Receive Stripe checkout events; processing happens in the webhook worker"""
+    payload = await request.body()
+    try:
+        verify_stripe_signature(payload, request.headers.get('Stripe-Signature'), STRIPE_WEBHOOK_SECRET)
+        event = parse_stripe_event(payload)
+    except WebhookSignatureError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (ValueError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid webhook payload")
+    
+    await webhook_worker.ingest("stripe", event, payload)
+    return {"received": True}
+
+@api_router.post("/webhook/phonepe/{subdomain}")
+async def phonepe_webhook(subdomain: str, request: Request):
+    """Receive PhonePe server-to-server callbacks; processing happens in the webhook worker"""
+    business = await db.businesses.find_one({"subdomain": subdomain, "is_active": True}, PROJECTIONS["business.exists"])
+    if not business:
+        raise HTTPException(status_code=404, detail="Business not found")
+    
+    business = await credential_store.load_business(business)
+    if not business.get('phonepe_salt_key'):
+        raise HTTPException(status_code=400, detail="PhonePe credentials not configured")
+    
+    payload = await request.body()
+    try:
+        response_b64 = json.loads(payload)['response']
+        verify_phonepe_signature(response_b64, request.headers.get('X-VERIFY'), business['phonepe_salt_key'])
+        event = parse_phonepe_event(response_b64)
+    except WebhookSignatureError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid webhook payload")
+    
+    await webhook_worker.ingest("phonepe", event, payload, business_id=business['id'])
+    return {"success": True}
+
+@api_router.post("/admin/payments/webhooks/replay")
+async def replay_payment_webhooks(replay: WebhookReplayRequest, current_user: dict = Depends(get_current_user)):
+    if current_user.get('role') != 'super_admin':
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    count = await webhook_worker.replay(gateway=replay.gateway, event_ids=replay.event_ids, since=replay.since)
+    return {"message": "Webhook events queued for replay", "count": count}
+
+# ============ Payment Reconciliation Routes ============
+
+payment_reconciler = PaymentReconciler(db, credential_store)
+
+@api_router.get("/admin/payments/reconciliation")
+async def get_reconciliation_stats(current_user: dict = Depends(get_current_user)):
+    if current_user.get('role') != 'super_admin':
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    pending_transactions = await db.payment_transactions.count_documents({"status": "pending"})
+    return {"enabled": RECONCILE_ENABLED, "pending_transactions": pending_transactions, **payment_reconciler.stats}
+
+@api_router.post("/admin/payments/reconciliation/run")
+async def run_reconciliation(current_user: dict = Depends(get_current_user)):
+    if current_user.get('role') != 'super_admin':
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return await payment_reconciler.run_once()
+
+# ============ Schema Migration Routes ============
+
+@api_router.get("/admin/schema-migrations")
+async def get_schema_migration_stats(current_user: dict = Depends(get_current_user)):
+    """Per collection: current schema version, completion and documents upgraded by this instance"""
+    if current_user.get('role') != 'super_admin':
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return {"enabled": schema_migrator.enabled, "collections": schema_migrator.stats}
+
+# ============ Response Compression Stats ============
+
+@api_router.get("/admin/compression")
+async def get_compression_stats(current_user: dict = Depends(get_current_user)):
+    """Compression CPU time against bytes saved, per encoding"""
+    if current_user.get('role') != 'super_admin':
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return response_compressor.summary()
+
+# ============ Metrics ============
+
+# Default executor for run_in_executor(None, ...), installed at startup
+default_executor = InstrumentedExecutor(thread_name_prefix="app-executor")
+
+def cache_metric_families():
+    families = [
+        render_family("site_cache_entries", "gauge", "Cached storefront payloads", (), [((), len(site_cache))]),
+        *stats_families("site_cache", "Storefront payload cache", site_cache.stats, counters=site_cache.stats),
+        render_family("compression_cache_entries", "gauge", "Cached compressed bodies", (),
+                      [((), len(response_compressor.cache))]),
+        render_family("compression_cache_bytes", "gauge", "Bytes held by the compressed body cache", (),
+                      [((), response_compressor.cache.size)]),
+    ]
+    for key in ("responses", "cache_hits", "bytes_in", "bytes_out", "compress_seconds"):
+        families.append(render_family(
+            f"compression_{key}_total", "counter", f"Response compression {key} by encoding", ("encoding",),
+            [((encoding,), stats[key]) for encoding, stats in response_compressor.stats.items()]
+        ))
+    return families
+
+def executor_metric_families():
+    return stats_families(
+        "executor", "Default thread pool executor", default_executor.stats, counters=("completed", "wait_seconds")
+    )
+
+def reconciliation_metric_families():
+    return stats_families(
+        "payment_reconciliation", "Payment reconciliation", payment_reconciler.stats, counters=RECONCILE_COUNTERS
+    )
+
+REGISTRY.add_collector(cache_metric_families)
+REGISTRY.add_collector(executor_metric_families)
+REGISTRY.add_collector(reconciliation_metric_families)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    """Prometheus text exposition"""
+    if METRICS_TOKEN and request.headers.get('authorization') != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(content=REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+# ============ Request Profiling ============
+
+async def authorize_profiling(headers) -> bool:
+    """Only super admins may profile requests (X-Profile header or ?profile= flag)"""
+    scheme, _, token = headers.get('authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return False
+    try:
+        payload = verify_token(token)
+    except HTTPException:
+        return False
+    user = await db.users.find_one({"id": payload['user_id']}, {"_id": 0, "role": 1})
+    return bool(user) and user.get('role') == 'super_admin'
+
+@api_router.get("/admin/profiles")
+async def get_profiles(current_user: dict = Depends(get_current_user)):
+    """Stored request profiles, newest first"""
+    if current_user.get('role') != 'super_admin':
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return {"profiles": list_profiles()}
+
+@api_router.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, current_user: dict = Depends(get_current_user)):
+    if current_user.get('role') != 'super_admin':
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    report = read_profile(profile_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(content=report, media_type="text/html")
+
 # Include the router in the main app
 app.include_router(api_router)
 
+# Accept: application/msgpack and MessagePack request bodies on /api routes
+app.add_middleware(MsgpackMiddleware, prefix=api_router.prefix)
+
+# Compressed once per ETag for versioned storefront responses
+response_compressor = Compressor()
+app.add_middleware(CompressionMiddleware, compressor=response_compressor)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -1296,6 +1489,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Mongo round trips per request against QUERY_BUDGET
+app.add_middleware(QueryBudgetMiddleware)
+
+# Sanitized sample of /api traffic for loadtest/replay.py
+traffic_log = TrafficLog()
+app.add_middleware(TrafficRecorderMiddleware, log=traffic_log)
+
+# Runs flagged or sampled requests under pyinstrument
+app.add_middleware(ProfilingMiddleware, authorize=authorize_profiling)
+
+# Outermost, so latency covers every other middleware
+app.add_middleware(MetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -1303,6 +1509,69 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def install_default_executor():
+    asyncio.get_running_loop().set_default_executor(default_executor)
+
+@app.on_event("startup")
+async def ensure_storefront_indexes():
+    await db.businesses.create_index("subdomain")
+    await db.businesses.create_index("id")
+    await db.products.create_index("business_id")
+
+@app.on_event("startup")
+async def ensure_credential_indexes():
+    await credential_store.ensure_indexes()
+
+@app.on_event("startup")
+async def start_webhook_worker():
+    await ensure_webhook_indexes(db)
+    webhook_worker.start()
+
+@app.on_event("startup")
+async def start_payment_reconciler():
+    await ensure_reconciliation_indexes(db)
+    if RECONCILE_ENABLED:
+        payment_reconciler.start()
+
+@app.on_event("startup")
+async def start_schema_migrator():
+    await schema_migrator.refresh()
+    schema_migrator.start()
+
+@app.on_event("startup")
+async def start_traffic_log():
+    if TRAFFIC_SAMPLE_RATE:
+        traffic_log.start()
+
+@app.on_event("shutdown")
+async def stop_webhook_worker():
+    await webhook_worker.stop()
+
+@app.on_event("shutdown")
+async def stop_payment_reconciler():
+    await payment_reconciler.stop()
+
+@app.on_event("shutdown")
+async def stop_schema_migrator():
+    await schema_migrator.stop()
+
+@app.on_event("shutdown")
+async def flush_storefront_snapshots():
+    await snapshot_writer.stop()
+
+@app.on_event("shutdown")
+async def flush_traffic_log():
+    traffic_log.stop()
+
+@app.on_event("shutdown")
+async def flush_traces():
+    shutdown_tracing(tracer_provider)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    client.close()
+
+@app.on_event("shutdown")
+async def shutdown_gateway_clients():
+    await close_gateway_clients()
\ No newline at end of file
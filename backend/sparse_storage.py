@@ -0,0 +1,74 @@
+"""
+Sparse document storage.
+
+Model documents are written without the fields that hold their default value:
+None for unset optional fields, empty lists, the stock colour scheme and so
+on. A new business shrinks from ~45 stored fields to the dozen it actually
+sets. Reads fill the defaults back in through the response models (fast_json,
+response_model), so API output is unchanged.
+
+Only top-level fields are left out. Embedded documents (product variants,
+social_media_links) are stored whole, defaults included: trusted-mode reads
+(fast_json.row_defaults) fill in top-level defaults only.
+
+Fields that queries filter on (ALWAYS_STORED) are written even at their
+default, since a missing field would not match {"is_active": True}.
+Raw-document readers must use .get() with the model default for anything
+else.
+"""
+from typing import Tuple, Type
+
+from pydantic import BaseModel
+
+# Filtered on by queries, or identify the document
+ALWAYS_STORED = frozenset({"id", "created_at", "is_active", "is_available", "status", "role"})
+
+
+def storage_document(instance: BaseModel) -> dict:
+    """model_dump() without default-valued top-level fields, for insert_one"""
+    stored = {
+        name for name, field in type(instance).model_fields.items()
+        if name in ALWAYS_STORED or getattr(instance, name) != field.get_default(call_default_factory=True)
+    }
+    return instance.model_dump(include=stored)
+
+
+def _prune(value):
+    """An embedded document with nothing set counts as unset"""
+    if isinstance(value, dict) and all(item is None for item in value.values()):
+        return None
+    return value
+
+
+def sparse_update(model: Type[BaseModel], changes: dict) -> Tuple[dict, dict]:
+    """Split field changes into ($set, $unset) so cleared and default values are removed
+
+    None clears an optional field. Required fields are never unset, so None
+    for them still means "unchanged".
+    """
+    to_set, to_unset = {}, {}
+    for name, value in changes.items():
+        value = _prune(value)
+        field = model.model_fields.get(name)
+        if field is None or name in ALWAYS_STORED or field.is_required() or field.default_factory:
+            if value is not None:
+                to_set[name] = value
+        elif value is None or value == field.default:
+            to_unset[name] = ""
+        else:
+            to_set[name] = value
+    return to_set, to_unset
+
+
+def default_fields(model: Type[BaseModel], doc: dict) -> dict:
+    """Changes that make a stored document sparse: {field: pruned value or None to unset}"""
+    changes = {}
+    for name, field in model.model_fields.items():
+        if name not in doc or name in ALWAYS_STORED or field.is_required() or field.default_factory:
+            continue
+        value = _prune(doc[name])
+        if value is None or value == field.default:
+            changes[name] = None
+        elif value != doc[name]:
+            changes[name] = value
+    return changes
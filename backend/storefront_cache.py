@@ -0,0 +1,60 @@
+"""
+Per-process cache of pre-serialized storefront responses.
+
+The storefront bootstrap (business, catalog and payment info for a subdomain)
+is built and JSON-encoded once, then served as bytes while the business's
+content_version still matches the version the entry was built from. Entries
+also expire after SITE_CACHE_TTL so idle subdomains do not hold memory.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+SITE_CACHE_TTL = float(os.environ.get('SITE_CACHE_TTL', '60'))
+SITE_CACHE_MAX_SIZE = int(os.environ.get('SITE_CACHE_MAX_SIZE', '1000'))
+
+
+class CachedSite:
+    """Encoded response body and the version it was built from"""
+
+    __slots__ = ('version', 'body', 'expires_at')
+
+    def __init__(self, version: int, body: bytes, expires_at: float):
+        self.version = version
+        self.body = body
+        self.expires_at = expires_at
+
+
+class SiteCache:
+    """LRU of encoded storefront payloads keyed by subdomain"""
+
+    def __init__(self, ttl: float = SITE_CACHE_TTL, max_size: int = SITE_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, CachedSite]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, subdomain: str) -> Optional[CachedSite]:
+        entry = self._entries.get(subdomain)
+        if entry is None or entry.expires_at <= time.monotonic():
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(subdomain)
+        self.stats["hits"] += 1
+        return entry
+
+    def put(self, subdomain: str, version: int, body: bytes) -> CachedSite:
+        entry = CachedSite(version, body, time.monotonic() + self.ttl)
+        self._entries[subdomain] = entry
+        self._entries.move_to_end(subdomain)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, subdomain: str):
+        if self._entries.pop(subdomain, None) is not None:
+            self.stats["invalidations"] += 1
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,177 @@
+"""
+Static storefront snapshots.
+
+When SNAPSHOT_DIR is set, every change to a business's public content
+schedules a rewrite of that subdomain's files:
+
+    {SNAPSHOT_DIR}/sites/{subdomain}.json            same body as /api/public/sites/{subdomain}
+    {SNAPSHOT_DIR}/site/{subdomain}/index.html       SNAPSHOT_HTML_TEMPLATE with the bootstrap inlined
+
+each alongside precompressed .gz and .br copies, so any static file server
+(nginx gzip_static/brotli_static, a CDN origin bucket) can answer storefront
+reads without reaching the app. The HTML variant is only written when
+SNAPSHOT_HTML_TEMPLATE points at the frontend build's index.html.
+
+Rewrites are debounced per subdomain: a burst of product edits produces one
+snapshot SNAPSHOT_DEBOUNCE seconds after the last write, and never later than
+SNAPSHOT_MAX_DELAY after the first. Files are replaced atomically.
+"""
+import asyncio
+import gzip
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import brotli
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR')
+SNAPSHOT_HTML_TEMPLATE = os.environ.get('SNAPSHOT_HTML_TEMPLATE')
+SNAPSHOT_DEBOUNCE = float(os.environ.get('SNAPSHOT_DEBOUNCE', '2'))
+SNAPSHOT_MAX_DELAY = float(os.environ.get('SNAPSHOT_MAX_DELAY', '30'))
+
+# Global the storefront reads before calling /api/public/sites
+BOOTSTRAP_GLOBAL = "__SITE_BOOTSTRAP__"
+
+# Subdomains become path components; anything else is never written
+SAFE_SUBDOMAIN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9-]*$')
+
+
+def compress_variants(body: bytes) -> Dict[str, bytes]:
+    """The body and its precompressed copies, keyed by file suffix"""
+    return {
+        "": body,
+        ".gz": gzip.compress(body, compresslevel=9, mtime=0),
+        ".br": brotli.compress(body, quality=11),
+    }
+
+
+def inline_bootstrap(template: str, body: bytes) -> bytes:
+    """Embed the bootstrap JSON in the app shell so first paint needs no API call"""
+    # "</" would end the script element early; "<\/" is the same string to JSON
+    payload = body.decode('utf-8').replace('</', '<\\/')
+    script = f'<script>window.{BOOTSTRAP_GLOBAL}={payload};</script>'
+    if '</head>' in template:
+        return template.replace('</head>', f'{script}</head>', 1).encode('utf-8')
+    return (script + template).encode('utf-8')
+
+
+def _write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _remove(path: Path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class SnapshotWriter:
+    """Debounced writer of per-subdomain snapshot files"""
+
+    def __init__(self, render: Callable[[str], Awaitable[Optional[bytes]]],
+                 directory: Optional[str] = SNAPSHOT_DIR, html_template: Optional[str] = SNAPSHOT_HTML_TEMPLATE,
+                 debounce: float = SNAPSHOT_DEBOUNCE, max_delay: float = SNAPSHOT_MAX_DELAY):
+        self.render = render
+        self.directory = Path(directory) if directory else None
+        self.html_template = html_template
+        self.debounce = debounce
+        self.max_delay = max_delay
+        # subdomain -> [first request, latest request] in loop time
+        self._pending: Dict[str, List[float]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.stats = {"scheduled": 0, "written": 0, "removed": 0, "errors": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def _paths(self, subdomain: str) -> Dict[str, Path]:
+        paths = {"json": self.directory / "sites" / f"{subdomain}.json"}
+        if self.html_template:
+            paths["html"] = self.directory / "site" / subdomain / "index.html"
+        return paths
+
+    def schedule(self, subdomain: str):
+        """Request a rewrite of a subdomain's snapshot after the debounce window"""
+        if not self.enabled:
+            return
+        self.stats["scheduled"] += 1
+        now = asyncio.get_running_loop().time()
+        if subdomain in self._pending:
+            self._pending[subdomain][1] = now
+            return
+        self._pending[subdomain] = [now, now]
+        self._tasks[subdomain] = asyncio.get_running_loop().create_task(self._debounced(subdomain))
+
+    async def _debounced(self, subdomain: str):
+        loop = asyncio.get_running_loop()
+        while True:
+            first, latest = self._pending[subdomain]
+            wait = min(latest + self.debounce, first + self.max_delay) - loop.time()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+
+        # Writes arriving while this snapshot renders schedule a fresh one
+        del self._pending[subdomain]
+        del self._tasks[subdomain]
+        try:
+            await self.write(subdomain)
+        except Exception:
+            logger.exception("Failed to write storefront snapshot for %s", subdomain)
+            self.stats["errors"] += 1
+
+    async def write(self, subdomain: str) -> bool:
+        """Render and write a subdomain's snapshot now. Returns False if the site is gone."""
+        if not SAFE_SUBDOMAIN.match(subdomain):
+            logger.warning("Not writing a snapshot for unsafe subdomain %r", subdomain)
+            return False
+        body = await self.render(subdomain)
+        paths = self._paths(subdomain)
+        if body is None:
+            for path in paths.values():
+                for suffix in ("", ".gz", ".br"):
+                    _remove(path.with_name(path.name + suffix))
+            self.stats["removed"] += 1
+            return False
+
+        files = {"json": body}
+        if "html" in paths:
+            template = Path(self.html_template).read_text(encoding='utf-8')
+            files["html"] = inline_bootstrap(template, body)
+
+        loop = asyncio.get_running_loop()
+        for kind, data in files.items():
+            # Brotli at quality 11 is slow; keep it off the event loop
+            variants = await loop.run_in_executor(None, compress_variants, data)
+            for suffix, content in variants.items():
+                path = paths[kind]
+                await loop.run_in_executor(None, _write_atomic, path.with_name(path.name + suffix), content)
+        self.stats["written"] += 1
+        return True
+
+    async def write_all(self, subdomains: List[str]) -> int:
+        written = 0
+        for subdomain in subdomains:
+            if await self.write(subdomain):
+                written += 1
+        return written
+
+    async def stop(self):
+        """Flush pending snapshots instead of dropping them"""
+        for subdomain, task in list(self._tasks.items()):
+            task.cancel()
+            self._tasks.pop(subdomain, None)
+            self._pending.pop(subdomain, None)
+            try:
+                await self.write(subdomain)
+            except Exception:
+                logger.exception("Failed to write storefront snapshot for %s", subdomain)
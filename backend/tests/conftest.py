@@ -0,0 +1,37 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from cryptography.fernet import Fernet
+
+# Make backend modules (server, payment_gateways, ...) importable from tests
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+# CredentialStore refuses to start without a real key; tests that build one
+# (directly or by importing server) get a throwaway key
+os.environ.setdefault('CREDENTIALS_ENCRYPTION_KEY', Fernet.generate_key().decode())
+
+
+@pytest.fixture
+def query_budget():
+    """check(response, expected): assert the exact Mongo round trips a request made
+
+    Reads the X-Query-Stats header, so the server under test must run with
+    QUERY_DEBUG_HEADER=true; the test is skipped otherwise.
+    """
+    from query_budget import QUERY_STATS_HEADER, parse_query_stats
+
+    def check(response, expected: int):
+        header = response.headers.get(QUERY_STATS_HEADER)
+        if header is None:
+            pytest.skip(f"Server not started with QUERY_DEBUG_HEADER=true (no {QUERY_STATS_HEADER} header)")
+        queries = parse_query_stats(header)["queries"]
+        assert queries == expected, (
+            f"{response.request.method} {response.request.url} made {queries} queries, expected {expected}"
+        )
+        return queries
+
+    return check
@@ -0,0 +1,114 @@
+"""
+Local fake payment gateway for latency tests.
+
+Implements the subset of the Razorpay Orders API used by the backend with a
+configurable artificial latency, and counts TCP connections so tests can
+check that clients keep connections alive.
+
+Run standalone to point a dev server at it:
+    python tests/fake_gateway.py --port 9100 --latency 0.3
+    RAZORPAY_API_BASE=http://127.0.0.1:9100/v1 uvicorn server:app
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeGatewayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency: float = 0.0):
+        super().__init__(address, FakeGatewayHandler)
+        self.latency = latency
+        self.connections = 0
+        self.requests = 0
+        self.orders = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+class FakeGatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server._lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _begin(self):
+        with self.server._lock:
+            self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        self._begin()
+
+        if self.path != "/v1/orders":
+            return self._send_json(404, {"error": {"description": "Not found"}})
+        if "Authorization" not in self.headers:
+            return self._send_json(401, {"error": {"description": "Authentication failed"}})
+
+        order = {
+            "id": f"order_{uuid.uuid4().hex[:14]}",
+            "entity": "order",
+            "amount": body["amount"],
+            "currency": body["currency"],
+            "receipt": body.get("receipt"),
+            "status": "created",
+        }
+        self.server.orders[order["id"]] = order
+        self._send_json(200, order)
+
+    def do_GET(self):
+        self._begin()
+        order_id = self.path.rsplit("/", 1)[-1]
+        order = self.server.orders.get(order_id)
+        if not self.path.startswith("/v1/orders/") or order is None:
+            return self._send_json(404, {"error": {"description": "Order not found"}})
+        self._send_json(200, order)
+
+
+@contextmanager
+def run_fake_gateway(latency: float = 0.0, port: int = 0):
+    """Start a fake gateway on a background thread for the duration of the block"""
+    server = FakeGatewayServer(("127.0.0.1", port), latency=latency)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake payment gateway")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to sleep per request")
+    args = parser.parse_args()
+
+    server = FakeGatewayServer(("127.0.0.1", args.port), latency=args.latency)
+    print(f"Fake gateway listening on {server.base_url} (latency {args.latency}s)")
+    server.serve_forever()
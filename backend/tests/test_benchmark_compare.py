@@ -0,0 +1,71 @@
+"""
+Benchmark Regression Gate Tests
+Tests for:
+- Baselines summarized from pytest-benchmark JSON
+- Regressions beyond the threshold failing the gate
+- New and missing benchmarks reported without failing
+"""
+import json
+
+import pytest
+
+from benchmarks.compare import compare, main, summarize
+
+
+def _run(timings: dict, cpu: str = "Test CPU") -> dict:
+    return {
+        "machine_info": {"cpu": {"brand_raw": cpu}, "python_version": "3.11.7"},
+        "benchmarks": [
+            {"name": name, "stats": {"min": seconds, "median": seconds * 1.1, "mean": seconds * 1.2, "rounds": 100}}
+            for name, seconds in timings.items()
+        ],
+    }
+
+
+class TestCompare:
+    """Baseline comparison"""
+
+    def test_within_threshold(self):
+        baseline = summarize(_run({"test_a": 1.0e-6, "test_b": 2.0e-3}))
+        current = summarize(_run({"test_a": 1.1e-6, "test_b": 1.0e-3}))
+        rows, regressed = compare(baseline, current, "min", 0.15)
+        assert regressed == []
+        assert [row[4] for row in rows] == ["ok", "faster"]
+        print("✓ Small slowdowns pass, speedups reported")
+
+    def test_regression(self):
+        baseline = summarize(_run({"test_a": 1.0e-6}))
+        current = summarize(_run({"test_a": 1.3e-6}))
+        rows, regressed = compare(baseline, current, "median", 0.15)
+        assert regressed == ["test_a"]
+        assert rows[0][3] == pytest.approx(0.3)
+        print("✓ 30% slowdown flagged")
+
+    def test_new_and_missing(self):
+        baseline = summarize(_run({"test_old": 1.0}))
+        current = summarize(_run({"test_new": 1.0}))
+        rows, regressed = compare(baseline, current, "min", 0.15)
+        assert regressed == []
+        assert {row[0]: row[4] for row in rows} == {"test_new": "new", "test_old": "missing"}
+        print("✓ New and missing benchmarks listed, not failed")
+
+
+class TestCommand:
+    """compare.py exit codes and --update"""
+
+    def test_update_then_gate(self, tmp_path, capsys):
+        baseline = tmp_path / "baseline.json"
+        run = tmp_path / "run.json"
+        run.write_text(json.dumps(_run({"test_a": 1.0e-6})))
+        assert main([str(run), "--baseline", str(baseline), "--update"]) == 0
+        assert json.loads(baseline.read_text())["benchmarks"]["test_a"]["min"] == 1.0e-6
+
+        run.write_text(json.dumps(_run({"test_a": 2.0e-6}, cpu="Other CPU")))
+        assert main([str(run), "--baseline", str(baseline)]) == 1
+        output = capsys.readouterr().out
+        assert "Warning: baseline taken on" in output and "REGRESSED" in output
+        print("✓ Gate exits 1 on regression and warns about a different machine")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
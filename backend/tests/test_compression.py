@@ -0,0 +1,124 @@
+"""
+Response Compression Tests
+Tests for:
+- Accept-Encoding negotiation with q-values
+- Compressed body cache keyed by ETag and its size bound
+- Middleware: minimum size, Vary, encoded ETags and 304 revalidation
+"""
+import asyncio
+import gzip
+
+import brotli
+import httpx
+import pytest
+from fastapi import FastAPI, Request, Response
+
+from compression import CompressedBodyCache, CompressionMiddleware, Compressor, negotiate
+from http_cache import etag_matches
+
+BODY = b'{"products": [' + b','.join(b'{"name": "Cotton shirt %d", "price": 499}' % i for i in range(200)) + b']}'
+ETAG = '"site-b1-v3"'
+
+
+def _app(compressor: Compressor) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/large")
+    async def large(request: Request):
+        if etag_matches(request, ETAG):
+            return Response(status_code=304, headers={"ETag": ETAG})
+        return Response(content=BODY, media_type="application/json", headers={"ETag": ETAG})
+
+    @app.get("/small")
+    async def small():
+        return {"status": "ok"}
+
+    app.add_middleware(CompressionMiddleware, compressor=compressor)
+    return app
+
+
+async def _get(app, path, headers):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return await http.get(path, headers=headers)
+
+
+class TestNegotiation:
+    """Encoding selection"""
+
+    def test_negotiate(self):
+        assert negotiate("gzip, deflate, br, zstd") == "br"
+        assert negotiate("gzip, deflate") == "gzip"
+        assert negotiate("gzip;q=0.5, zstd;q=0.8") == "zstd"
+        assert negotiate("br;q=0, gzip") == "gzip"
+        assert negotiate("*") == "br"
+        assert negotiate("identity") is None
+        assert negotiate("") is None
+        print("✓ Accept-Encoding negotiation")
+
+
+class TestCompressedBodyCache:
+    """Byte-bounded LRU"""
+
+    def test_evicts_to_size_bound(self):
+        cache = CompressedBodyCache(max_bytes=10)
+        cache.put(("a", "br"), b"12345")
+        cache.put(("b", "br"), b"12345")
+        cache.put(("c", "br"), b"12345")
+        assert cache.size == 10
+        assert cache.get(("a", "br")) is None
+        assert cache.get(("c", "br")) == b"12345"
+        print("✓ Compressed body cache stays within its byte bound")
+
+
+class TestCompressionMiddleware:
+    """End-to-end through an in-process app"""
+
+    @pytest.mark.parametrize("encoding,decompress", [
+        ("gzip", gzip.decompress),
+        ("br", brotli.decompress),
+    ])
+    def test_compresses_large_json(self, encoding, decompress):
+        compressor = Compressor()
+        response = asyncio.run(_get(_app(compressor), "/large", {"Accept-Encoding": encoding}))
+
+        assert response.headers["content-encoding"] == encoding
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.headers["etag"] == f'"site-b1-v3-{encoding}"'
+        assert int(response.headers["content-length"]) < len(BODY)
+        assert response.content == BODY  # httpx decodes
+        print(f"✓ {encoding} response with encoded ETag")
+
+    def test_compresses_once_per_etag(self):
+        compressor = Compressor()
+        app = _app(compressor)
+        for _ in range(3):
+            asyncio.run(_get(app, "/large", {"Accept-Encoding": "br"}))
+
+        assert compressor.stats["br"]["responses"] == 3
+        assert compressor.stats["br"]["cache_hits"] == 2
+        print("✓ ETag-versioned body compressed once")
+
+    def test_small_and_identity_untouched(self):
+        compressor = Compressor()
+        app = _app(compressor)
+        small = asyncio.run(_get(app, "/small", {"Accept-Encoding": "gzip"}))
+        identity = asyncio.run(_get(app, "/large", {"Accept-Encoding": "identity"}))
+
+        assert "content-encoding" not in small.headers
+        assert "content-encoding" not in identity.headers
+        assert identity.headers["vary"] == "Accept-Encoding"
+        assert identity.headers["etag"] == ETAG
+        print("✓ Small and identity responses pass through")
+
+    def test_revalidation_with_encoded_etag(self):
+        response = asyncio.run(_get(
+            _app(Compressor()), "/large", {"Accept-Encoding": "br", "If-None-Match": '"site-b1-v3-br"'}
+        ))
+        assert response.status_code == 304
+        assert response.headers["etag"] == '"site-b1-v3-br"'
+        print("✓ Encoded ETag revalidates with 304")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,171 @@
+"""
+Credential Store Tests
+Tests for:
+- Key loading: CREDENTIALS_ENCRYPTION_KEY, derived from JWT_SECRET, and
+  refusal to run on a missing or default JWT_SECRET
+- Encrypted round trip, and undecryptable blobs read as no secrets
+- Decrypted cache: TTL expiry and invalidation
+- Merging updates: new values set, "" and None remove, others kept
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from cryptography.fernet import Fernet
+
+from credential_store import DEFAULT_JWT_SECRET, CredentialStore, split_secrets
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return list(self.docs)
+
+
+class FakeCredentials:
+    """business_credentials with find_one calls counted"""
+
+    def __init__(self):
+        self.docs = {}
+        self.reads = 0
+
+    async def find_one(self, query, projection=None):
+        self.reads += 1
+        doc = self.docs.get(query["business_id"])
+        return dict(doc) if doc else None
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(doc) for key, doc in self.docs.items() if key in query["business_id"]["$in"]])
+
+    async def update_one(self, query, update, upsert=False):
+        doc = self.docs.setdefault(query["business_id"], {"business_id": query["business_id"]})
+        doc.update(update["$set"])
+
+
+def _store(ttl=60.0):
+    credentials = FakeCredentials()
+    return CredentialStore(SimpleNamespace(business_credentials=credentials), ttl=ttl), credentials
+
+
+class TestKeyLoading:
+    """Where the encryption key comes from"""
+
+    def test_explicit_key(self, monkeypatch):
+        key = Fernet.generate_key().decode()
+        monkeypatch.setenv("CREDENTIALS_ENCRYPTION_KEY", key)
+        encrypted = CredentialStore(None).encrypt({"stripe_secret_key": "sk_test"})
+        assert b"sk_test" in Fernet(key.encode()).decrypt(encrypted.encode())
+        print("✓ CREDENTIALS_ENCRYPTION_KEY used as the Fernet key")
+
+    def test_derived_from_jwt_secret(self, monkeypatch):
+        monkeypatch.delenv("CREDENTIALS_ENCRYPTION_KEY", raising=False)
+        monkeypatch.setenv("JWT_SECRET", "a-real-deployment-secret")
+        store = CredentialStore(None)
+        assert store._decrypt({"encrypted": store.encrypt({"a": "b"})}) == {"a": "b"}
+        print("✓ Key derived from a configured JWT_SECRET")
+
+    @pytest.mark.parametrize("jwt_secret", [None, DEFAULT_JWT_SECRET])
+    def test_refuses_default_secret(self, monkeypatch, jwt_secret):
+        monkeypatch.delenv("CREDENTIALS_ENCRYPTION_KEY", raising=False)
+        if jwt_secret is None:
+            monkeypatch.delenv("JWT_SECRET", raising=False)
+        else:
+            monkeypatch.setenv("JWT_SECRET", jwt_secret)
+        with pytest.raises(RuntimeError, match="CREDENTIALS_ENCRYPTION_KEY"):
+            CredentialStore(None)
+        print("✓ No key and no real JWT_SECRET: refuses to start")
+
+
+class TestRoundTrip:
+    """What is stored, and reading it back"""
+
+    def test_stored_encrypted(self):
+        store, credentials = _store()
+        asyncio.run(store.update("b1", {"stripe_secret_key": "sk_live_1", "phonepe_salt_key": "salt"}))
+        assert "sk_live_1" not in credentials.docs["b1"]["encrypted"]
+        assert asyncio.run(store.get("b1")) == {"stripe_secret_key": "sk_live_1", "phonepe_salt_key": "salt"}
+        assert asyncio.run(store.get_many(["b1", "b2"])) == {"b1": {"stripe_secret_key": "sk_live_1",
+                                                                   "phonepe_salt_key": "salt"}}
+        print("✓ Secrets encrypted at rest and decrypted on read")
+
+    def test_undecryptable_reads_empty(self):
+        store, credentials = _store()
+        other_key = Fernet(Fernet.generate_key())
+        credentials.docs["b1"] = {"business_id": "b1", "encrypted": other_key.encrypt(b'{"a": "b"}').decode()}
+        assert asyncio.run(store.get("b1")) == {}
+        print("✓ Blob under another key reads as no secrets")
+
+    def test_load_business_merges(self):
+        store, _ = _store()
+        asyncio.run(store.update("b1", {"razorpay_key_secret": "rzp"}))
+        business = asyncio.run(store.load_business({"id": "b1", "razorpay_key_id": "rzp_id"}))
+        assert business == {"id": "b1", "razorpay_key_id": "rzp_id", "razorpay_key_secret": "rzp"}
+        print("✓ load_business merges secrets into the document")
+
+
+class TestCache:
+    """Short-lived decrypted cache"""
+
+    def test_cached_until_ttl(self):
+        store, credentials = _store(ttl=0.05)
+        asyncio.run(store.update("b1", {"stripe_secret_key": "sk_1"}))
+        asyncio.run(store.get("b1"))
+        asyncio.run(store.get("b1"))
+        assert credentials.reads == 2  # update's own read, then one fetch for both gets
+        time.sleep(0.06)
+        asyncio.run(store.get("b1"))
+        assert credentials.reads == 3
+        print("✓ Secrets served from cache until the TTL expires")
+
+    def test_update_invalidates(self):
+        store, credentials = _store()
+        asyncio.run(store.update("b1", {"stripe_secret_key": "sk_1"}))
+        assert asyncio.run(store.get("b1")) == {"stripe_secret_key": "sk_1"}
+        asyncio.run(store.update("b1", {"stripe_secret_key": "sk_2"}))
+        assert asyncio.run(store.get("b1")) == {"stripe_secret_key": "sk_2"}
+
+        # Written behind the store's back: stale until invalidated
+        credentials.docs["b1"]["encrypted"] = store.encrypt({"stripe_secret_key": "sk_3"})
+        assert asyncio.run(store.get("b1")) == {"stripe_secret_key": "sk_2"}
+        store.invalidate("b1")
+        assert asyncio.run(store.get("b1")) == {"stripe_secret_key": "sk_3"}
+        print("✓ update and invalidate drop the cached secrets")
+
+
+class TestMerge:
+    """update merges changes into the saved secrets"""
+
+    def test_set_remove_keep(self):
+        store, _ = _store()
+        configured = asyncio.run(store.update("b1", {
+            "razorpay_key_secret": "rzp", "stripe_secret_key": "sk", "phonepe_salt_key": "salt",
+        }))
+        assert configured == ["phonepe_salt_key", "razorpay_key_secret", "stripe_secret_key"]
+
+        # "" removes a secret, unnamed secrets are kept
+        configured = asyncio.run(store.update("b1", {"stripe_secret_key": "", "razorpay_key_secret": "rzp_2"}))
+        assert configured == ["phonepe_salt_key", "razorpay_key_secret"]
+        assert asyncio.run(store.get("b1")) == {"phonepe_salt_key": "salt", "razorpay_key_secret": "rzp_2"}
+
+        configured = asyncio.run(store.update("b1", {"phonepe_salt_key": None}))
+        assert configured == ["razorpay_key_secret"]
+        print("✓ New values set, empty ones removed, the rest kept")
+
+    def test_update_business_payload(self):
+        """What update_business passes on: null fields dropped, "" kept so it removes"""
+        fields, secrets = split_secrets({"name": "Shop", "stripe_secret_key": "", "phonepe_salt_key": None})
+        assert fields == {"name": "Shop"}
+        changes = {k: v for k, v in secrets.items() if v is not None}
+        assert changes == {"stripe_secret_key": ""}
+
+        store, _ = _store()
+        asyncio.run(store.update("b1", {"stripe_secret_key": "sk", "phonepe_salt_key": "salt"}))
+        assert asyncio.run(store.update("b1", changes)) == ["phonepe_salt_key"]
+        print("✓ Cleared secret removed, omitted secret kept")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,142 @@
+"""
+Synthetic Data Generator Tests
+Tests for:
+- Zipf tenant sizes and task planning
+- Deterministic documents from the seed
+- Documents in the shape the API stores (models, schema version, payment states)
+- Batched unordered inserts
+"""
+import os
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parent.parent / '.env')
+
+# The generator builds documents with the server's models
+pytestmark = pytest.mark.skipif('MONGO_URL' not in os.environ, reason="MONGO_URL not configured")
+
+END = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(scope="module")
+def datagen():
+    from loadtest import datagen
+    return datagen
+
+
+@pytest.fixture
+def options():
+    from credential_store import CredentialStore
+    return {
+        "seed": 3, "businesses": 20, "orders": 2000, "zipf": 1.1, "max_products": 30, "days": 60, "end": END,
+        "chunk_size": 250, "batch_size": 100, "password_hash": "hash", "credential_store": CredentialStore(None),
+    }
+
+
+class FakeDatabase:
+    """Records insert_many batches per collection"""
+
+    def __init__(self):
+        self.batches = defaultdict(list)
+
+    def __getitem__(self, name):
+        database = self
+
+        class Collection:
+            def insert_many(self, documents, ordered=True):
+                assert ordered is False
+                database.batches[name].append(list(documents))
+
+        return Collection()
+
+
+class TestPlanning:
+    """Tenant sizes and tasks"""
+
+    def test_zipf_sizes(self, datagen):
+        sizes = datagen.zipf_sizes(10000, 100, 1.1)
+        assert sum(sizes) == 10000
+        assert sizes == sorted(sizes, reverse=True)
+        assert sizes[0] > 20 * sizes[-1]
+        assert datagen.zipf_sizes(100, 4, 0) == [25, 25, 25, 25]
+        print(f"✓ Zipf sizes: largest {sizes[0]}, smallest {sizes[-1]}")
+
+    def test_tasks_cover_every_order(self, datagen, options):
+        tasks = datagen.plan_tasks(options)
+        assert sum(stop - start for _, chunk, start, stop in tasks if chunk >= 0) == options["orders"]
+        assert sum(1 for task in tasks if task[1] < 0) == options["businesses"]
+        assert max(stop - start for _, _, start, stop in tasks) <= options["chunk_size"]
+        print(f"✓ {len(tasks)} tasks, chunks of at most {options['chunk_size']} orders")
+
+
+class TestDocuments:
+    """Generated documents"""
+
+    def test_deterministic(self, datagen, options):
+        first = list(datagen.task_documents((0, 1, 250, 500), options))
+        assert first == list(datagen.task_documents((0, 1, 250, 500), options))
+        assert first != list(datagen.task_documents((0, 1, 250, 500), {**options, "seed": 4}))
+        print("✓ Same seed, same documents")
+
+    def test_catalogue(self, datagen, options):
+        from schema_migrations import SCHEMA_VERSIONS
+        from server import Business, Product
+        docs = list(datagen.task_documents((0, -1, 0, 0), options))
+        counts = Counter(collection for collection, _ in docs)
+        assert counts["users"] == counts["businesses"] == 1
+        assert counts["products"] == datagen.catalogue_size(0, options["max_products"], options["zipf"])
+        business = next(doc for collection, doc in docs if collection == "businesses")
+        Business(**business)
+        assert business["schema_version"] == SCHEMA_VERSIONS["businesses"]
+        for collection, doc in docs:
+            if collection == "products":
+                assert Product(**doc).business_id == business["id"]
+        print(f"✓ Catalogue: {dict(counts)}")
+
+    def test_orders_and_payment_states(self, datagen, options):
+        from server import Order
+        docs = list(datagen.task_documents((0, 0, 0, 1000), {**options, "orders": 1000}))
+        orders = [doc for collection, doc in docs if collection == "orders"]
+        transactions = [doc for collection, doc in docs if collection == "payment_transactions"]
+        assert len(orders) == 1000
+        for order in orders:
+            parsed = Order(**order)
+            assert parsed.total_amount == sum(item.sale_price * item.quantity for item in parsed.items)
+            assert parsed.created_at < END
+        if transactions:
+            assert {t["status"] for t in transactions} == {"success", "failed", "pending"}
+            paid = {order["id"] for order in orders if order["status"] == "paid"}
+            assert paid == {t["order_id"] for t in transactions if t["status"] == "success"}
+        print(f"✓ {len(orders)} orders, transactions: {dict(Counter(t['status'] for t in transactions))}")
+
+    def test_bookings_follow_template(self, datagen, options):
+        for rank in range(options["businesses"]):
+            profile = datagen.tenant_profile(options["seed"], rank, options)
+            docs = list(datagen.activity_documents(profile, 0, 0, 100, options))
+            bookings = [doc for collection, doc in docs if collection == "bookings"]
+            if profile["template_type"] in ("retail", "grocery"):
+                assert bookings == []
+            for booking in bookings:
+                future = booking["preferred_date"] >= END.date().isoformat()
+                assert (booking["status"] == "pending") == future
+        print("✓ Bookings only for appointment templates, pending only when upcoming")
+
+
+class TestInsert:
+    """Batched inserts"""
+
+    def test_batches(self, datagen):
+        db = FakeDatabase()
+        documents = [("orders", {"id": str(i)}) for i in range(250)] + [("bookings", {"id": "b"})]
+        counts = datagen.insert_batched(db, iter(documents), batch_size=100)
+        assert counts == {"orders": 250, "bookings": 1}
+        assert [len(batch) for batch in db.batches["orders"]] == [100, 100, 50]
+        print("✓ Unordered insert_many batches of batch_size")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
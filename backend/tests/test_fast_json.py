@@ -0,0 +1,95 @@
+"""
+Fast JSON List Response Tests
+Tests for:
+- validate mode producing the same body as a response_model route
+- trusted mode filling static defaults on sparse rows
+- OpenAPI schema kept when a handler returns rows_response
+"""
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import httpx
+import orjson
+import pytest
+from fastapi import FastAPI
+from pydantic import BaseModel, Field
+
+from fast_json import dump_rows, rows_response
+
+ROWS = [
+    {"id": "p1", "name": "Cotton shirt", "price": 499.0, "sizes": ["M"], "created_at": "2025-01-15T10:30:00+00:00"},
+    {"id": "p2", "name": "Kurta", "price": 899.0, "category": "Ethnic", "created_at": "2025-01-16T08:00:00+00:00"},
+]
+
+
+class Item(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    name: str
+    price: float
+    category: Optional[str] = None
+    sizes: List[str] = []
+    is_available: bool = True
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/model", response_model=List[Item])
+    async def via_model():
+        rows = [dict(row) for row in ROWS]
+        for row in rows:
+            row["created_at"] = datetime.fromisoformat(row["created_at"])
+        return rows
+
+    @app.get("/fast", response_model=List[Item])
+    async def via_fast():
+        return rows_response(Item, [dict(row) for row in ROWS])
+
+    return app
+
+
+async def _get(app, path):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return await http.get(path)
+
+
+class TestFastJson:
+    """Fast path output and schema"""
+
+    def test_validate_matches_response_model(self):
+        app = _app()
+        slow = asyncio.run(_get(app, "/model"))
+        fast = asyncio.run(_get(app, "/fast"))
+
+        assert fast.status_code == 200
+        assert fast.headers["content-type"] == "application/json"
+        assert fast.json() == slow.json()
+        print("✓ Validate mode matches response_model output")
+
+    def test_trusted_fills_defaults(self):
+        body = orjson.loads(dump_rows(Item, [dict(row) for row in ROWS], mode="trusted"))
+
+        assert body[0]["category"] is None
+        assert body[0]["is_available"] is True
+        assert body[1]["sizes"] == []
+        assert body[1]["category"] == "Ethnic"
+        assert body[0]["created_at"] == ROWS[0]["created_at"]  # stored string passed through
+        print("✓ Trusted mode fills static defaults")
+
+    def test_validate_rejects_bad_rows(self):
+        with pytest.raises(Exception):
+            dump_rows(Item, [{"id": "p3", "name": "No price"}], mode="validate")
+        print("✓ Validate mode still validates")
+
+    def test_openapi_schema_kept(self):
+        schema = _app().openapi()["paths"]["/fast"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+        assert schema["items"] == {"$ref": "#/components/schemas/Item"}
+        print("✓ OpenAPI schema still comes from response_model")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
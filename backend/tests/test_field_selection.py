@@ -0,0 +1,95 @@
+"""
+Sparse Field Selection Tests
+Tests for:
+- ?fields= validation against the response model
+- Trimmed projection and response model, id always included
+- Public routes return only the requested fields with a distinct ETag
+"""
+import os
+from typing import List, Optional
+
+import pytest
+import requests
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from field_selection import parse_fields
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+TEST_SUBDOMAIN = "demofashion"
+
+
+class Item(BaseModel):
+    id: str
+    name: str
+    price: float
+    tags: List[str] = []
+    notes: Optional[str] = None
+
+
+class TestParseFields:
+    """Validation and trimmed schema"""
+
+    def test_no_fields_selects_everything(self):
+        selection = parse_fields(Item, None)
+        assert not selection.partial
+        assert selection.model is Item
+        assert selection.projection == {"_id": 0, "id": 1, "name": 1, "price": 1, "tags": 1, "notes": 1}
+        assert selection.etag_kind("items") == "items"
+        print("✓ Without ?fields= the full model is used")
+
+    def test_selection_trims_projection_and_model(self):
+        selection = parse_fields(Item, "price, name")
+        assert selection.fields == ("id", "name", "price")
+        assert selection.projection == {"_id": 0, "id": 1, "name": 1, "price": 1}
+        assert list(selection.model.model_fields) == ["id", "name", "price"]
+        assert selection.model.model_validate({"id": "i1", "name": "Shirt", "price": 499}).price == 499.0
+        print("✓ Selection trims projection and response model, keeps id")
+
+    def test_equivalent_selections_share_tag(self):
+        first = parse_fields(Item, "name,price")
+        second = parse_fields(Item, "price,name,id")
+        assert first.tag == second.tag
+        assert first.model is second.model
+        assert first.etag_kind("items") != parse_fields(Item, "name").etag_kind("items")
+        print("✓ Equivalent selections share one model and ETag tag")
+
+    def test_unknown_field_rejected(self):
+        with pytest.raises(HTTPException) as error:
+            parse_fields(Item, "name,password")
+        assert error.value.status_code == 400
+        assert "password" in error.value.detail
+        print("✓ Unknown fields are rejected with 400")
+
+
+class TestFieldSelectionAPI:
+    """?fields= on public routes"""
+
+    def test_public_business_fields(self):
+        response = requests.get(f"{BASE_URL}/api/public/businesses/{TEST_SUBDOMAIN}", params={"fields": "name,subdomain"})
+        assert response.status_code == 200
+        assert set(response.json()) == {"id", "name", "subdomain"}
+
+        full = requests.get(f"{BASE_URL}/api/public/businesses/{TEST_SUBDOMAIN}")
+        assert response.headers["ETag"] != full.headers["ETag"]
+        print("✓ Public business returns only the selected fields")
+
+    def test_product_grid_fields(self):
+        business = requests.get(f"{BASE_URL}/api/public/businesses/{TEST_SUBDOMAIN}", params={"fields": "id"}).json()
+        response = requests.get(
+            f"{BASE_URL}/api/businesses/{business['id']}/products", params={"fields": "name,sale_price,image_url"}
+        )
+        assert response.status_code == 200
+        for product in response.json():
+            assert set(product) == {"id", "name", "sale_price", "image_url"}
+        print(f"✓ Product grid fields for {len(response.json())} products")
+
+    def test_unknown_field_returns_400(self):
+        response = requests.get(f"{BASE_URL}/api/public/businesses/{TEST_SUBDOMAIN}", params={"fields": "user_password"})
+        assert response.status_code == 400
+        print("✓ Unknown field returns 400")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
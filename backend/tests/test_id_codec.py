@@ -0,0 +1,76 @@
+"""
+Binary UUID Id Codec Tests
+Tests for:
+- UUID strings encoded as binary subtype 4, other values left alone
+- Filters, updates and bulk operations encoded, nested ids included
+- Decoding back to the string ids the API exposes
+"""
+import uuid
+
+import bson
+import pytest
+from bson.binary import Binary, UUID_SUBTYPE
+from pymongo import UpdateOne
+
+from id_codec import decode_document, encode_document, encode_filter, encode_id, encode_update, _encode_request
+
+ORDER_ID = "0b6c5a4e-2a3b-4c5d-8e9f-0123456789ab"
+PRODUCT_ID = str(uuid.uuid4())
+
+
+def _is_binary_uuid(value) -> bool:
+    return isinstance(value, Binary) and value.subtype == UUID_SUBTYPE
+
+
+class TestEncoding:
+    """Document and query encoding"""
+
+    def test_encode_id(self):
+        assert _is_binary_uuid(encode_id(ORDER_ID))
+        assert encode_id(ORDER_ID.upper()) == ORDER_ID.upper()  # would not round-trip
+        assert encode_id("pay_Nk3f9") == "pay_Nk3f9"
+        assert encode_id(None) is None
+        print("✓ Only canonical UUID strings are encoded")
+
+    def test_document_round_trip(self):
+        order = {
+            "id": ORDER_ID, "business_id": "legacy-business", "customer_name": ORDER_ID,
+            "items": [{"product_id": PRODUCT_ID, "quantity": 2}],
+        }
+        encoded = encode_document(order)
+
+        assert _is_binary_uuid(encoded["id"])
+        assert _is_binary_uuid(encoded["items"][0]["product_id"])
+        assert encoded["business_id"] == "legacy-business"
+        assert encoded["customer_name"] == ORDER_ID  # not an id field
+        assert len(bson.encode(encoded)) < len(bson.encode(order))
+        assert decode_document(encoded) == order
+        print("✓ Documents round-trip with nested ids")
+
+    def test_filters(self):
+        query = encode_filter({
+            "id": {"$in": [ORDER_ID, "legacy"]},
+            "$or": [{"business_id": ORDER_ID}, {"subdomain": "shop"}],
+            "items.product_id": PRODUCT_ID,
+            "status": "pending",
+        })
+        assert _is_binary_uuid(query["id"]["$in"][0]) and query["id"]["$in"][1] == "legacy"
+        assert _is_binary_uuid(query["$or"][0]["business_id"])
+        assert _is_binary_uuid(query["items.product_id"])
+        assert query["status"] == "pending"
+        print("✓ Filters encode ids inside operators and dotted paths")
+
+    def test_updates_and_bulk_requests(self):
+        update = encode_update({"$set": {"order_id": ORDER_ID, "status": "paid"}, "$inc": {"attempts": 1}})
+        assert _is_binary_uuid(update["$set"]["order_id"])
+        assert update["$inc"] == {"attempts": 1}
+
+        request = UpdateOne({"id": ORDER_ID}, {"$set": {"status": "paid"}})
+        encoded = _encode_request(request)
+        assert _is_binary_uuid(encoded._filter["id"])
+        assert request._filter["id"] == ORDER_ID  # original left untouched
+        print("✓ Updates and bulk_write operations encoded")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
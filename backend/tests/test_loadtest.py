@@ -0,0 +1,102 @@
+"""
+Load-Test Harness Tests
+Tests for:
+- Nearest-rank percentiles and the per-endpoint summary
+- Virtual users driving an app and recording errors by route template
+- Scenario weight overrides
+"""
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+
+from loadtest.run import Recorder, parse_weights, percentile, run_load
+
+
+def _app():
+    app = FastAPI()
+
+    @app.get("/api/public/sites/{subdomain}")
+    async def site(subdomain: str):
+        if subdomain == "missing":
+            raise HTTPException(status_code=404, detail="Business not found")
+        return {"subdomain": subdomain}
+
+    return app
+
+
+async def browse(session):
+    tenant = session.tenant()
+    await session.request("GET", "/api/public/sites/{subdomain}", f"/api/public/sites/{tenant['subdomain']}")
+    await asyncio.sleep(0.001)
+
+
+async def _run(fixture, **options):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=_app()), base_url="http://test") as client:
+        return await run_load(client, fixture, weights={"browse": 1}, scenarios={"browse": browse}, **options)
+
+
+class TestSummary:
+    """Percentiles and rows"""
+
+    def test_nearest_rank(self):
+        values = [float(v) for v in range(1, 101)]
+        assert percentile(values, 0.50) == 50
+        assert percentile(values, 0.95) == 95
+        assert percentile(values, 0.99) == 99
+        assert percentile([7.0], 0.99) == 7
+        assert percentile([], 0.5) == 0
+        print("✓ Nearest-rank percentiles")
+
+    def test_rows_per_endpoint_and_total(self):
+        recorder = Recorder()
+        for ms in (10, 20, 30, 40):
+            recorder.record("GET /a", ms / 1000, ok=True)
+        recorder.record("POST /b", 0.5, ok=False)
+        rows = {row["endpoint"]: row for row in recorder.summary(elapsed=2)}
+        assert rows["GET /a"]["requests"] == 4 and rows["GET /a"]["rps"] == 2
+        assert rows["GET /a"]["p50_ms"] == 20 and rows["GET /a"]["p99_ms"] == 40
+        assert rows["POST /b"]["error_rate"] == 1
+        assert rows["TOTAL"]["requests"] == 5 and rows["TOTAL"]["error_rate"] == 0.2
+        print("✓ Summary rows per endpoint plus a total")
+
+
+class TestRunLoad:
+    """Virtual users"""
+
+    def test_requests_grouped_by_route(self):
+        rows = asyncio.run(_run({"tenants": [{"subdomain": "shop1"}, {"subdomain": "shop2"}]}, users=4, duration=0.3))
+        endpoints = [row["endpoint"] for row in rows]
+        assert endpoints == ["GET /api/public/sites/{subdomain}", "TOTAL"]
+        assert rows[0]["requests"] > 10 and rows[0]["errors"] == 0
+        print(f"✓ {rows[0]['requests']} requests at {rows[0]['rps']} rps, p95 {rows[0]['p95_ms']} ms")
+
+    def test_errors_counted(self):
+        rows = asyncio.run(_run({"tenants": [{"subdomain": "missing"}]}, users=2, duration=0.2))
+        assert rows[-1]["requests"] > 0 and rows[-1]["error_rate"] == 1
+        print("✓ 4xx responses counted as errors")
+
+    def test_ramp_not_measured(self):
+        rows = asyncio.run(_run({"tenants": [{"subdomain": "shop1"}]}, users=2, duration=0.2, ramp=0.2))
+        assert 0 < rows[-1]["requests"]
+        assert rows[-1]["rps"] == pytest.approx(rows[-1]["requests"] / 0.2)
+        print("✓ Rate computed over the measured window only")
+
+
+class TestWeights:
+    """--weight overrides"""
+
+    def test_override(self):
+        weights = parse_weights(["admin=0", "storefront=90"])
+        assert weights["admin"] == 0 and weights["storefront"] == 90 and weights["checkout"] > 0
+        print("✓ Weights override the defaults")
+
+    def test_unknown_scenario(self):
+        with pytest.raises(SystemExit):
+            parse_weights(["flood=1"])
+        print("✓ Unknown scenario rejected")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,137 @@
+"""
+Metrics Tests
+Tests for:
+- Prometheus text rendering of counters, gauges and histograms
+- Series capped per metric, overflow counted under "other"
+- Request latency labelled by route template, never the raw path
+- Mongo command latency and failures from CommandListener events
+- Executor queue stats
+"""
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from metrics import (
+    MONGO_COMMAND_DURATION, MONGO_COMMAND_FAILURES, REQUEST_DURATION, Counter, Histogram, InstrumentedExecutor,
+    MetricsMiddleware, MongoCommandMetrics, stats_families
+)
+
+
+def _app():
+    app = FastAPI()
+
+    @app.get("/api/public/sites/{subdomain}")
+    async def site(subdomain: str):
+        return {"subdomain": subdomain}
+
+    app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def _get(app, *paths):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        for path in paths:
+            await client.get(path)
+
+
+class TestRendering:
+    """Exposition format"""
+
+    def test_counter(self):
+        counter = Counter("orders_total", "Orders", ("status",))
+        counter.inc("paid")
+        counter.inc("paid", amount=2)
+        assert 'orders_total{status="paid"} 3' in counter.render()
+        assert "# TYPE orders_total counter" in counter.render()
+        print("✓ Counter samples rendered with labels")
+
+    def test_histogram_buckets_cumulative(self):
+        histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, "/a")
+        text = histogram.render()
+        assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{route="/a",le="1"} 2' in text
+        assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+        assert 'latency_seconds_count{route="/a"} 3' in text
+        print("✓ Histogram buckets are cumulative with +Inf, sum and count")
+
+    def test_label_values_escaped(self):
+        counter = Counter("odd_total", "Odd labels", ("value",))
+        counter.inc('a"b\\c')
+        assert 'odd_total{value="a\\"b\\\\c"} 1' in counter.render()
+        print("✓ Quotes and backslashes escaped in label values")
+
+    def test_stats_families(self):
+        text = "\n".join(stats_families("cache", "Cache", {"hits": 3, "entries": 2, "note": "x"}, counters=("hits",)))
+        assert "cache_hits_total 3" in text and "cache_entries 2" in text
+        assert "note" not in text
+        print("✓ Component stats exposed as counters and gauges")
+
+
+class TestCardinality:
+    """Bounded series"""
+
+    def test_series_capped(self):
+        counter = Counter("capped_total", "Capped", ("subdomain",), max_series=2)
+        for subdomain in ("a", "b", "c", "d"):
+            counter.inc(subdomain)
+        text = counter.render()
+        assert 'capped_total{subdomain="other"} 2' in text
+        assert text.count("capped_total{") == 3
+        print("✓ Label combinations past the cap counted under other")
+
+    def test_route_template_label(self):
+        asyncio.run(_get(_app(), "/api/public/sites/shop-one", "/api/public/sites/shop-two", "/nowhere"))
+        text = REQUEST_DURATION.render()
+        assert 'route="/api/public/sites/{subdomain}",status="200"} 2' in text
+        assert 'route="unmatched",status="404"' in text
+        assert "shop-one" not in text
+        print("✓ Requests labelled by route template, unmatched paths collapsed")
+
+
+class TestMongoCommands:
+    """CommandListener"""
+
+    def _event(self, request_id, command_name, command, duration_micros=1500):
+        return SimpleNamespace(
+            connection_id=("localhost", 27017), request_id=request_id, command_name=command_name,
+            command=command, duration_micros=duration_micros,
+        )
+
+    def test_durations_by_collection_and_command(self):
+        listener = MongoCommandMetrics()
+        listener.started(self._event(1, "find", {"find": "products", "filter": {}}))
+        listener.succeeded(self._event(1, "find", {}))
+        listener.started(self._event(2, "getMore", {"getMore": 42, "collection": "orders"}))
+        listener.succeeded(self._event(2, "getMore", {}))
+        text = MONGO_COMMAND_DURATION.render()
+        assert 'mongodb_command_duration_seconds_count{collection="products",command="find"}' in text
+        assert 'mongodb_command_duration_seconds_count{collection="orders",command="getMore"}' in text
+        print("✓ Command latency labelled by collection and command")
+
+    def test_failures_counted(self):
+        listener = MongoCommandMetrics()
+        listener.started(self._event(3, "insert", {"insert": "bookings"}))
+        listener.failed(self._event(3, "insert", {}))
+        assert 'mongodb_command_failures_total{collection="bookings",command="insert"}' in MONGO_COMMAND_FAILURES.render()
+        print("✓ Failed commands counted")
+
+
+class TestExecutor:
+    """InstrumentedExecutor"""
+
+    def test_completed_work_counted(self):
+        executor = InstrumentedExecutor(max_workers=2)
+        assert [executor.submit(sum, [i, 1]).result() for i in range(3)] == [1, 2, 3]
+        executor.shutdown()
+        assert executor.stats["completed"] == 3
+        assert executor.stats["queued"] == executor.stats["running"] == 0
+        print("✓ Executor counts completed work and drains its queue")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
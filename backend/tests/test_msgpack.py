@@ -0,0 +1,123 @@
+"""
+MessagePack Negotiation Tests
+Tests for:
+- Accept negotiation between JSON and MessagePack
+- MessagePack request bodies validated by the usual request models
+- Native (fast_json) and transcoded MessagePack responses
+- MessagePack ETag variants and 304 revalidation
+"""
+import asyncio
+from typing import List
+
+import httpx
+import msgpack
+import pytest
+from fastapi import FastAPI, Request, Response
+from pydantic import BaseModel
+
+from fast_json import rows_response
+from http_cache import etag_matches
+from msgpack_negotiation import MsgpackMiddleware, accepts_msgpack
+
+MSGPACK = {"Accept": "application/msgpack"}
+ETAG = '"orders-b1-v2"'
+
+
+class Item(BaseModel):
+    product_id: str
+    quantity: int
+
+
+class OrderIn(BaseModel):
+    customer_name: str
+    items: List[Item]
+
+
+ROWS = [{"customer_name": "Asha", "items": [{"product_id": "p1", "quantity": 2}]}]
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/api/orders")
+    async def create(order: OrderIn):
+        return {"customer_name": order.customer_name, "quantity": sum(item.quantity for item in order.items)}
+
+    @app.get("/api/orders", response_model=List[OrderIn])
+    async def list_orders(request: Request):
+        if etag_matches(request, ETAG):
+            return Response(status_code=304, headers={"ETag": ETAG})
+        return rows_response(OrderIn, ROWS, headers={"ETag": ETAG})
+
+    app.add_middleware(MsgpackMiddleware)
+    return app
+
+
+async def _request(method, path, **kwargs):
+    transport = httpx.ASGITransport(app=_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return await http.request(method, path, **kwargs)
+
+
+class TestNegotiation:
+    """Accept header handling"""
+
+    def test_accepts_msgpack(self):
+        assert accepts_msgpack("application/msgpack")
+        assert accepts_msgpack("application/x-msgpack, application/json;q=0.9")
+        assert not accepts_msgpack("application/json, text/plain, */*")
+        assert not accepts_msgpack("application/msgpack;q=0.5, application/json")
+        assert not accepts_msgpack("")
+        print("✓ Accept negotiation")
+
+
+class TestMsgpackMiddleware:
+    """End-to-end through an in-process app"""
+
+    def test_msgpack_request_body(self):
+        body = msgpack.packb({"customer_name": "Asha", "items": [{"product_id": "p1", "quantity": 3}]})
+        response = asyncio.run(_request(
+            "POST", "/api/orders", content=body, headers={"Content-Type": "application/msgpack", **MSGPACK}
+        ))
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/msgpack"
+        assert msgpack.unpackb(response.content) == {"customer_name": "Asha", "quantity": 3}
+        print("✓ MessagePack body validated, response transcoded")
+
+    def test_msgpack_body_validation_errors(self):
+        invalid = asyncio.run(_request(
+            "POST", "/api/orders", content=msgpack.packb({"items": []}), headers={"Content-Type": "application/msgpack"}
+        ))
+        garbage = asyncio.run(_request(
+            "POST", "/api/orders", content=b"\xc1", headers={"Content-Type": "application/msgpack"}
+        ))
+        assert invalid.status_code == 422
+        assert garbage.status_code == 400
+        print("✓ Invalid MessagePack bodies rejected")
+
+    def test_rows_response_native_msgpack(self):
+        response = asyncio.run(_request("GET", "/api/orders", headers=MSGPACK))
+        assert response.headers["content-type"] == "application/msgpack"
+        assert response.headers["etag"] == '"orders-b1-v2-msgpack"'
+        assert response.headers["vary"] == "Accept"
+        assert msgpack.unpackb(response.content) == ROWS
+        print("✓ fast_json rows encoded as MessagePack with their own ETag")
+
+    def test_json_unchanged(self):
+        response = asyncio.run(_request("GET", "/api/orders"))
+        assert response.headers["content-type"] == "application/json"
+        assert response.headers["etag"] == ETAG
+        assert response.json() == ROWS
+        print("✓ JSON clients unaffected")
+
+    def test_msgpack_revalidation(self):
+        response = asyncio.run(_request(
+            "GET", "/api/orders", headers={**MSGPACK, "If-None-Match": '"orders-b1-v2-msgpack"'}
+        ))
+        assert response.status_code == 304
+        assert response.headers["etag"] == '"orders-b1-v2-msgpack"'
+        print("✓ MessagePack ETag revalidates with 304")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,331 @@
+"""
+Payment Gateway Client Tests
+Tests for:
+- Razorpay calls not blocking the event loop
+- Pooled client reuse per business credentials
+- Keep-alive connections and explicit timeouts
+- Circuit breaker and bulkhead around gateway calls
+- Razorpay verify settling a payment once, and only for its own business
+Runs against the local fake gateway in tests/fake_gateway.py
+"""
+import asyncio
+import hashlib
+import hmac
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import payment_gateways
+from payment_gateways import (
+    CircuitBreaker, GatewayError, GatewayUnavailableError, PaymentGateway,
+    RazorpayClient, get_gateway, get_razorpay_client
+)
+from fake_gateway import run_fake_gateway
+
+
+class TestRazorpayClientLatency:
+    """Latency behaviour against a slow gateway"""
+
+    def test_concurrent_orders_overlap(self):
+        """10 orders against a 200ms gateway should finish in ~1 round trip, not 10"""
+        async def run(base_url):
+            client = RazorpayClient("rzp_test_key", "secret", base_url=base_url)
+            try:
+                start = time.perf_counter()
+                orders = await asyncio.gather(*(
+                    client.create_order(amount=10000, currency="INR", receipt=f"receipt_{i}")
+                    for i in range(10)
+                ))
+                return time.perf_counter() - start, orders
+            finally:
+                await client.aclose()
+
+        with run_fake_gateway(latency=0.2) as gateway:
+            elapsed, orders = asyncio.run(run(gateway.base_url))
+
+        assert len({o["id"] for o in orders}) == 10
+        assert elapsed < 1.0, f"Gateway calls serialized: {elapsed:.2f}s"
+        print(f"✓ 10 concurrent orders in {elapsed:.2f}s")
+
+    def test_event_loop_stays_responsive(self):
+        """A ticker task keeps running while a gateway call is in flight"""
+        async def run(base_url):
+            client = RazorpayClient("rzp_test_key", "secret", base_url=base_url)
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            try:
+                await client.create_order(amount=500, currency="INR", receipt="r1")
+            finally:
+                task.cancel()
+                await client.aclose()
+            return ticks
+
+        with run_fake_gateway(latency=0.3) as gateway:
+            ticks = asyncio.run(run(gateway.base_url))
+
+        assert ticks >= 10, f"Event loop was blocked (only {ticks} ticks)"
+        print(f"✓ Event loop ticked {ticks} times during gateway call")
+
+    def test_keepalive_reuses_connection(self):
+        """Sequential calls on one client share a single TCP connection"""
+        async def run(base_url):
+            client = RazorpayClient("rzp_test_key", "secret", base_url=base_url)
+            try:
+                for i in range(5):
+                    order = await client.create_order(amount=100, currency="INR", receipt=f"r{i}")
+                    await client.fetch_order(order["id"])
+            finally:
+                await client.aclose()
+
+        with run_fake_gateway() as gateway:
+            asyncio.run(run(gateway.base_url))
+            assert gateway.requests == 10
+            assert gateway.connections == 1
+        print("✓ 10 requests over 1 connection")
+
+    def test_read_timeout_raises_gateway_error(self):
+        """A gateway slower than the read timeout fails fast"""
+        async def run(base_url):
+            client = RazorpayClient("rzp_test_key", "secret", base_url=base_url, read_timeout=0.2)
+            try:
+                await client.create_order(amount=100, currency="INR", receipt="slow")
+            finally:
+                await client.aclose()
+
+        with run_fake_gateway(latency=1.0) as gateway:
+            start = time.perf_counter()
+            with pytest.raises(GatewayError):
+                asyncio.run(run(gateway.base_url))
+            elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.8
+        print(f"✓ Timed out after {elapsed:.2f}s")
+
+
+class TestRazorpayClientCache:
+    """Client pooling per credential pair"""
+
+    def test_same_credentials_share_client(self):
+        async def run():
+            a = get_razorpay_client("rzp_key_a", "secret_a")
+            b = get_razorpay_client("rzp_key_a", "secret_a")
+            c = get_razorpay_client("rzp_key_b", "secret_b")
+            await payment_gateways.close_gateway_clients()
+            return a, b, c
+
+        a, b, c = asyncio.run(run())
+        assert a is b
+        assert a is not c
+        print("✓ Clients cached per credential pair")
+
+
+class TestGatewayGuards:
+    """Circuit breaker, bulkhead and per-gateway timeout"""
+
+    def test_registry_has_all_gateways(self):
+        for name in ("razorpay", "stripe", "payu", "phonepe"):
+            assert isinstance(get_gateway(name), PaymentGateway)
+        print("✓ All four gateways registered")
+
+    def test_breaker_opens_and_fails_fast(self):
+        breaker = CircuitBreaker("Test", failure_threshold=3, reset_timeout=60)
+        for _ in range(3):
+            breaker.before_call()
+            breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(GatewayUnavailableError):
+            breaker.before_call()
+        print("✓ Breaker open after 3 failures")
+
+    def test_breaker_half_open_trial(self):
+        breaker = CircuitBreaker("Test", failure_threshold=1, reset_timeout=0)
+        breaker.before_call()
+        breaker.record_failure()
+        breaker.before_call()  # trial call allowed
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(GatewayUnavailableError):
+            breaker.before_call()  # only one trial at a time
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        print("✓ Breaker closes after successful trial")
+
+    def test_client_errors_do_not_trip_breaker(self):
+        gateway = get_gateway("razorpay")
+        gateway.breaker = CircuitBreaker("Razorpay", failure_threshold=1)
+
+        async def bad_credentials():
+            raise GatewayError("Authentication failed", status_code=401)
+
+        with pytest.raises(GatewayError):
+            asyncio.run(gateway.call(bad_credentials))
+        assert gateway.breaker.state == CircuitBreaker.CLOSED
+        print("✓ 4xx does not open the breaker")
+
+    def test_gateway_timeout_counts_as_failure(self):
+        gateway = get_gateway("razorpay")
+        gateway.breaker = CircuitBreaker("Razorpay", failure_threshold=1)
+        gateway.timeout = 0.05
+
+        async def slow():
+            await asyncio.sleep(1)
+
+        try:
+            with pytest.raises(GatewayError):
+                asyncio.run(gateway.call(slow))
+            assert gateway.breaker.state == CircuitBreaker.OPEN
+        finally:
+            gateway.timeout = gateway.default_timeout
+            gateway.breaker = CircuitBreaker("Razorpay")
+        print("✓ Timeout opens the breaker")
+
+    def test_bulkhead_rejects_when_full(self):
+        """Calls beyond the concurrency limit are rejected instead of queueing forever"""
+        gateway = get_gateway("phonepe")
+
+        async def run():
+            gateway._slots = asyncio.Semaphore(1)
+
+            async def slow():
+                await asyncio.sleep(payment_gateways.GATEWAY_QUEUE_TIMEOUT + 0.5)
+
+            first = asyncio.create_task(gateway.call(slow))
+            await asyncio.sleep(0)
+            try:
+                with pytest.raises(GatewayUnavailableError):
+                    await gateway.call(slow)
+            finally:
+                first.cancel()
+
+        try:
+            asyncio.run(run())
+        finally:
+            gateway._slots = asyncio.Semaphore(payment_gateways.GATEWAY_MAX_CONCURRENCY)
+            gateway.breaker = CircuitBreaker("PhonePe")
+        print("✓ Bulkhead full -> fail fast")
+
+    def test_cancelled_half_open_trial_frees_breaker(self):
+        gateway = get_gateway("payu")
+        gateway.breaker = CircuitBreaker("PayU", failure_threshold=1, reset_timeout=0)
+        gateway.breaker.before_call()
+        gateway.breaker.record_failure()
+
+        async def run():
+            async def hang():
+                await asyncio.sleep(10)
+
+            async def ok():
+                return "ok"
+
+            trial = asyncio.create_task(gateway.call(hang))
+            await asyncio.sleep(0.01)
+            assert gateway.breaker.state == CircuitBreaker.HALF_OPEN
+            trial.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await trial
+            # The next call gets the trial instead of failing fast forever
+            return await gateway.call(ok)
+
+        try:
+            assert asyncio.run(run()) == "ok"
+            assert gateway.breaker.state == CircuitBreaker.CLOSED
+        finally:
+            gateway._slots = asyncio.Semaphore(payment_gateways.GATEWAY_MAX_CONCURRENCY)
+            gateway.breaker = CircuitBreaker("PayU")
+        print("✓ Cancelled half-open trial lets the next call through")
+
+
+class FakeTransactions:
+    """find_one_and_update matching and updating one document atomically"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def find_one_and_update(self, query, update, projection=None):
+        await asyncio.sleep(0)  # let concurrent callers interleave between round trips
+        for doc in self.docs:
+            if all(doc.get(field) in value["$in"] if isinstance(value, dict) else doc.get(field) == value
+                   for field, value in query.items()):
+                doc.update(update["$set"])
+                return {"order_id": doc["order_id"]}
+        return None
+
+
+class FakeOrders:
+    def __init__(self):
+        self.updates = []
+
+    async def update_one(self, query, update):
+        self.updates.append((query, update))
+
+
+class FakeBusinesses:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def find_one(self, query, projection=None):
+        return next((dict(doc) for doc in self.docs if doc["subdomain"] == query["subdomain"]), None)
+
+
+class FakeCredentialStore:
+    async def load_business(self, business):
+        return {**business, "razorpay_key_secret": f"secret-{business['id']}"}
+
+
+class TestSettleTransaction:
+    """Razorpay verify route against fake collections"""
+
+    def _server(self, monkeypatch):
+        import server
+
+        db = SimpleNamespace(
+            businesses=FakeBusinesses([{"id": "b1", "subdomain": "shop-one"}, {"id": "b2", "subdomain": "shop-two"}]),
+            payment_transactions=FakeTransactions([{
+                "business_id": "b1", "order_id": "o1", "gateway": "razorpay",
+                "gateway_order_id": "order_1", "status": "pending",
+            }]),
+            orders=FakeOrders(),
+        )
+        monkeypatch.setattr(server, "db", db)
+        monkeypatch.setattr(server, "credential_store", FakeCredentialStore())
+        return server, db
+
+    @staticmethod
+    def _request(server, business_id):
+        signature = hmac.new(f"secret-{business_id}".encode(), b"order_1|pay_1", hashlib.sha256).hexdigest()
+        return server.PaymentVerifyRequest(
+            razorpay_order_id="order_1", razorpay_payment_id="pay_1", razorpay_signature=signature
+        )
+
+    def test_concurrent_verifies_settle_once(self, monkeypatch):
+        server, db = self._server(monkeypatch)
+
+        async def run():
+            return await asyncio.gather(*(
+                server.verify_razorpay_payment("shop-one", self._request(server, "b1")) for _ in range(2)
+            ))
+
+        assert all(result["status"] == "success" for result in asyncio.run(run()))
+        assert db.payment_transactions.docs[0]["status"] == "success"
+        [(query, update)] = db.orders.updates
+        assert query == {"id": "o1", "business_id": "b1"} and update["$set"]["status"] == "paid"
+        print("✓ Two concurrent verifies: one settlement, order marked paid once")
+
+    def test_other_business_cannot_settle(self, monkeypatch):
+        server, db = self._server(monkeypatch)
+        # Signed with b2's own key, but order_1 is b1's
+        asyncio.run(server.verify_razorpay_payment("shop-two", self._request(server, "b2")))
+        assert db.payment_transactions.docs[0]["status"] == "pending"
+        assert db.orders.updates == []
+        print("✓ Verify on another business's subdomain leaves the transaction alone")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
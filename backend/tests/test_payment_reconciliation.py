@@ -0,0 +1,203 @@
+"""
+Payment Reconciliation Tests
+Tests for:
+- One reconciliation run: settled, still pending, abandoned and failed checks
+- Stats accumulated across runs
+- Per-gateway rate limiting, and the reconciler counters on /metrics
+- Stale transactions that cannot be checked (unknown gateway, no credentials)
+  being abandoned instead of retried forever
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+import payment_reconciliation
+from payment_gateways import GatewayError
+from payment_reconciliation import PaymentReconciler, RateLimiter
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args):
+        return self
+
+    async def to_list(self, length):
+        return list(self.docs)
+
+
+class FakeCollection:
+    """find returning every stored document; writes recorded"""
+
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.bulk_ops = []
+        self.updates = []
+
+    def find(self, query, projection=None):
+        return FakeCursor(self.docs)
+
+    async def bulk_write(self, ops, ordered=True):
+        self.bulk_ops.extend(ops)
+        return SimpleNamespace(modified_count=len(ops))
+
+    async def update_many(self, query, update):
+        self.updates.append((query, update))
+
+
+class FakeGateway:
+    """fetch_status answering from a table of gateway order id -> outcome"""
+
+    name = "fakepay"
+
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+
+    def has_credentials(self, business):
+        return True
+
+    async def fetch_status(self, business, gateway_order_id):
+        outcome = self.outcomes[gateway_order_id]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def _transaction(id, gateway, age):
+    created = datetime.now(timezone.utc) - age
+    return {"id": id, "business_id": "b1", "order_id": f"o-{id}", "gateway": gateway,
+            "gateway_order_id": f"g-{id}", "created_at": created, "updated_at": created}
+
+
+def _db(transactions):
+    return SimpleNamespace(
+        payment_transactions=FakeCollection(transactions),
+        businesses=FakeCollection([{"id": "b1"}]),
+        orders=FakeCollection(),
+    )
+
+
+class FakeCredentialStore:
+    async def get_many(self, business_ids):
+        return {}
+
+
+def _reconciler(db):
+    return PaymentReconciler(db, FakeCredentialStore())
+
+
+class TestRunOnce:
+    """One batch of stale pending transactions"""
+
+    def test_settle_bump_abandon_and_errors(self, monkeypatch):
+        gateway = FakeGateway({
+            "g-paid": {"status": "success", "gateway_payment_id": "pay_1"},
+            "g-waiting": None,
+            "g-stale": None,
+            "g-broken": GatewayError("timed out"),
+        })
+        monkeypatch.setattr(payment_reconciliation, "get_gateway", lambda name: gateway)
+        db = _db([
+            _transaction("paid", "fakepay", timedelta(hours=1)),
+            _transaction("waiting", "fakepay", timedelta(hours=1)),
+            _transaction("stale", "fakepay", timedelta(days=2)),
+            _transaction("broken", "fakepay", timedelta(days=2)),
+        ])
+        run = asyncio.run(_reconciler(db).run_once())
+
+        assert run == {"checked": 3, "settled": 2, "abandoned": 1, "errors": 1}
+        settled = {op._filter["gateway_order_id"]: op._doc["$set"] for op in db.payment_transactions.bulk_ops}
+        assert settled["g-paid"]["status"] == "success" and settled["g-paid"]["gateway_payment_id"] == "pay_1"
+        assert settled["g-stale"]["status"] == "failed" and settled["g-stale"]["failure_reason"] == "abandoned"
+        [order_op] = db.orders.bulk_ops
+        assert order_op._filter == {"id": "o-paid", "business_id": "b1"} and order_op._doc["$set"]["status"] == "paid"
+        # A failed check is retried on a later run, never abandoned on the spot
+        [(query, update)] = db.payment_transactions.updates
+        assert query["id"] == {"$in": ["waiting", "broken"]} and "updated_at" in update["$set"]
+        print("✓ Paid settled, stale abandoned, pending and failed checks pushed back")
+
+    def test_stats_accumulate(self, monkeypatch):
+        monkeypatch.setattr(payment_reconciliation, "get_gateway", lambda name: FakeGateway({"g-a": None}))
+        reconciler = _reconciler(_db([_transaction("a", "fakepay", timedelta(hours=1))]))
+        asyncio.run(reconciler.run_once())
+        asyncio.run(reconciler.run_once())
+        assert reconciler.stats["runs"] == 2 and reconciler.stats["checked"] == 2
+        assert reconciler.stats["lag_seconds"] >= 3600
+        print("✓ Counts and lag kept across runs")
+
+    def test_nothing_pending(self):
+        reconciler = _reconciler(_db([]))
+        assert asyncio.run(reconciler.run_once()) == {"checked": 0, "settled": 0, "abandoned": 0, "errors": 0}
+        assert reconciler.stats["lag_seconds"] == 0
+        print("✓ Empty scan is a no-op")
+
+    def test_rate_limited_checks_counted(self, monkeypatch):
+        monkeypatch.setattr(payment_reconciliation, "RECONCILE_RATE_PER_SECOND", 20)
+        transactions = [_transaction(str(i), "fakepay", timedelta(hours=1)) for i in range(25)]
+        gateway = FakeGateway({t["gateway_order_id"]: None for t in transactions})
+        monkeypatch.setattr(payment_reconciliation, "get_gateway", lambda name: gateway)
+        reconciler = _reconciler(_db(transactions))
+        asyncio.run(reconciler.run_once())
+        # 20 from the initial burst, the other 5 waited for a token
+        assert reconciler.stats["checked"] == 25 and reconciler.stats["rate_limited"] == 5
+        print("✓ Checks held back by the rate limiter counted")
+
+
+class TestRateLimiter:
+    """Token bucket"""
+
+    def test_paces_after_burst(self):
+        async def acquire(limiter, count):
+            for _ in range(count):
+                await limiter.acquire()
+
+        started = time.monotonic()
+        asyncio.run(acquire(RateLimiter(50), 60))
+        # 50 from the initial burst, the other 10 at 50 per second
+        assert time.monotonic() - started >= 0.18
+        print("✓ Calls paced to the configured rate after the burst")
+
+
+class TestMetrics:
+    """Reconciler stats on /metrics"""
+
+    def test_counters_exported(self):
+        import server
+
+        server.payment_reconciler.stats.update(checked=7, settled=3, abandoned=1, rate_limited=2)
+        text = server.REGISTRY.render()
+        for line in ("payment_reconciliation_checked_total 7", "payment_reconciliation_settled_total 3",
+                     "payment_reconciliation_abandoned_total 1", "payment_reconciliation_rate_limited_total 2",
+                     "# TYPE payment_reconciliation_lag_seconds gauge"):
+            assert line in text
+        assert "payment_reconciliation_last_run_at" not in text
+        print("✓ Checked, settled, abandoned and rate-limited counts exported")
+
+
+class TestUncheckableTransactions:
+    """Gateway or credentials gone"""
+
+    def test_stale_ones_abandoned(self):
+        db = _db([
+            _transaction("old", "razorpay", timedelta(days=2)),
+            _transaction("recent", "razorpay", timedelta(hours=1)),
+            _transaction("defunct", "no-such-gateway", timedelta(days=2)),
+        ])  # b1 has no Razorpay keys
+        run = asyncio.run(_reconciler(db).run_once())
+
+        assert run == {"checked": 0, "settled": 2, "abandoned": 2, "errors": 3}
+        settled = {op._filter["gateway_order_id"]: op._doc["$set"] for op in db.payment_transactions.bulk_ops}
+        assert set(settled) == {"g-old", "g-defunct"}
+        assert all(update["status"] == "failed" and update["failure_reason"] == "abandoned"
+                   for update in settled.values())
+        [(query, _)] = db.payment_transactions.updates
+        assert query["id"] == {"$in": ["recent"]}
+        print("✓ Uncheckable transactions abandoned once stale, recent ones left pending")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,307 @@
+"""
+Payment Webhook Tests
+Tests for:
+- Stripe and PhonePe webhook routes exist and reject unsigned payloads
+- PhonePe checksum verification helper
+- Stripe signature verification: valid, tampered and stale
+- WebhookWorker: duplicate events dropped at ingest, batch apply, deferral of
+  events that arrive before their transaction, retry and replay after a crash
+- WebhookWorker settling only the transactions of the event's business
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+import os
+from pymongo.errors import DuplicateKeyError
+
+from payment_webhooks import (
+    WebhookSignatureError, WebhookWorker, parse_phonepe_event, parse_stripe_event, verify_phonepe_signature,
+    verify_stripe_signature
+)
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+TEST_SUBDOMAIN = "demofashion"
+
+
+class TestWebhookRoutes:
+    """Webhook endpoints reject payloads that are not signed"""
+
+    def test_stripe_webhook_rejects_missing_signature(self):
+        response = requests.post(f"{BASE_URL}/api/webhook/stripe", data=b'{"id": "evt_test"}')
+        assert response.status_code == 400
+        print(f"✓ Stripe webhook without signature rejected: {response.json()['detail']}")
+
+    def test_phonepe_webhook_unknown_business(self):
+        response = requests.post(
+            f"{BASE_URL}/api/webhook/phonepe/nonexistent-subdomain-xyz",
+            json={"response": "e30="},
+            headers={"X-VERIFY": "0###1"}
+        )
+        assert response.status_code == 404
+        print("✓ PhonePe webhook for unknown business returns 404")
+
+
+class TestWebhookParsing:
+    """Signature helpers and event normalization"""
+
+    def test_phonepe_checksum(self):
+        response_b64 = base64.b64encode(json.dumps({
+            "success": True,
+            "code": "PAYMENT_SUCCESS",
+            "data": {"merchantTransactionId": "MT1", "transactionId": "T1"}
+        }).encode()).decode()
+        x_verify = hashlib.sha256((response_b64 + "salt").encode()).hexdigest() + "###1"
+
+        verify_phonepe_signature(response_b64, x_verify, "salt")
+        with pytest.raises(WebhookSignatureError):
+            verify_phonepe_signature(response_b64, x_verify, "other-salt")
+
+        event = parse_phonepe_event(response_b64)
+        assert event["event_id"] == "MT1:PAYMENT_SUCCESS"
+        assert event["status"] == "success"
+        print("✓ PhonePe checksum verified and event parsed")
+
+    def test_stripe_event_status(self):
+        payload = json.dumps({
+            "id": "evt_1",
+            "type": "checkout.session.completed",
+            "data": {"object": {"id": "cs_1", "payment_status": "paid", "payment_intent": "pi_1"}}
+        }).encode()
+        event = parse_stripe_event(payload)
+        assert event["gateway_order_id"] == "cs_1"
+        assert event["status"] == "success"
+        print("✓ Stripe checkout.session.completed maps to success")
+
+    def test_stripe_signature(self):
+        payload = b'{"id": "evt_1", "type": "checkout.session.completed"}'
+
+        def header(body, timestamp):
+            signature = hmac.new(b"whsec_test", f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+            return f"t={timestamp},v1={signature}"
+
+        now = int(time.time())
+        verify_stripe_signature(payload, header(payload, now), "whsec_test")
+        with pytest.raises(WebhookSignatureError, match="Invalid"):
+            verify_stripe_signature(payload.replace(b"evt_1", b"evt_2"), header(payload, now), "whsec_test")
+        with pytest.raises(WebhookSignatureError, match="tolerance"):
+            verify_stripe_signature(payload, header(payload, now - 600), "whsec_test", tolerance=300)
+        with pytest.raises(WebhookSignatureError, match="Missing"):
+            verify_stripe_signature(payload, None, "whsec_test")
+        print("✓ Stripe signature accepted, tampered payload and stale timestamp rejected")
+
+
+def _matches(doc, query):
+    for field, condition in query.items():
+        value = doc.get(field)
+        if isinstance(condition, dict):
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+            if "$lt" in condition and not value < condition["$lt"]:
+                return False
+            if "$gte" in condition and not value >= condition["$gte"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _update(doc, update):
+    doc.update(update.get("$set", {}))
+    for field, amount in update.get("$inc", {}).items():
+        doc[field] = doc.get(field, 0) + amount
+    for field in update.get("$unset", {}):
+        doc.pop(field, None)
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs.sort(key=lambda doc: doc[field], reverse=direction < 0)
+        return self
+
+    async def to_list(self, length):
+        return self.docs[:length] if length else self.docs
+
+
+class FakeCollection:
+    """Just enough of a Motor collection for the webhook worker"""
+
+    def __init__(self, docs=(), unique=None):
+        self.docs = [dict(doc) for doc in docs]
+        self.unique = unique
+
+    async def insert_one(self, doc):
+        if self.unique and any(all(d.get(f) == doc.get(f) for f in self.unique) for d in self.docs):
+            raise DuplicateKeyError("duplicate key")
+        self.docs.append(dict(doc))
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(doc) for doc in self.docs if _matches(doc, query)])
+
+    async def update_many(self, query, update):
+        matched = [doc for doc in self.docs if _matches(doc, query)]
+        for doc in matched:
+            _update(doc, update)
+        return SimpleNamespace(modified_count=len(matched))
+
+    async def bulk_write(self, ops, ordered=True):
+        modified = 0
+        for op in ops:
+            doc = next((doc for doc in self.docs if _matches(doc, op._filter)), None)
+            if doc is not None:
+                _update(doc, op._doc)
+                modified += 1
+        return SimpleNamespace(modified_count=modified)
+
+
+def _db(transactions=(), orders=()):
+    return SimpleNamespace(
+        payment_webhook_events=FakeCollection(unique=("gateway", "event_id")),
+        payment_transactions=FakeCollection(transactions),
+        orders=FakeCollection(orders),
+    )
+
+
+def _transaction(business_id, gateway, gateway_order_id, status="pending"):
+    return {"id": f"t-{gateway_order_id}", "business_id": business_id, "order_id": f"o-{gateway_order_id}",
+            "gateway": gateway, "gateway_order_id": gateway_order_id, "status": status}
+
+
+def _event(event_id, gateway_order_id, status="success"):
+    return {"event_id": event_id, "event_type": "test", "gateway_order_id": gateway_order_id,
+            "gateway_payment_id": f"pay-{gateway_order_id}", "status": status}
+
+
+def _worker(db):
+    return WebhookWorker(db, batch_size=10)
+
+
+class TestWebhookWorker:
+    """Ingest and batch apply against fake collections"""
+
+    def test_duplicate_event_dropped(self):
+        db = _db()
+        worker = _worker(db)
+
+        async def run():
+            first = await worker.ingest("stripe", _event("evt_1", "cs_1"), b"{}")
+            again = await worker.ingest("stripe", _event("evt_1", "cs_1"), b"{}")
+            # Same id from another gateway is a different event
+            other = await worker.ingest("phonepe", _event("evt_1", "cs_1"), b"{}", business_id="b1")
+            return first, again, other
+
+        assert asyncio.run(run()) == (True, False, True)
+        assert len(db.payment_webhook_events.docs) == 2
+        print("✓ Provider retry of the same event dropped at insert")
+
+    def test_batch_applied(self):
+        db = _db(
+            [_transaction("b1", "stripe", "cs_1"), _transaction("b2", "stripe", "cs_2"),
+             _transaction("b1", "stripe", "cs_3", status="success")],
+            [{"id": "o-cs_1", "business_id": "b1", "status": "pending"},
+             {"id": "o-cs_2", "business_id": "b2", "status": "pending"}],
+        )
+        worker = _worker(db)
+
+        async def run():
+            await worker.ingest("stripe", _event("evt_1", "cs_1"), b"{}")
+            await worker.ingest("stripe", _event("evt_2", "cs_2", status="failed"), b"{}")
+            # A late failure cannot undo a settled payment
+            await worker.ingest("stripe", _event("evt_3", "cs_3", status="failed"), b"{}")
+            # Not actionable: marked processed without touching anything
+            await worker.ingest("stripe", _event("evt_4", "cs_1", status=None), b"{}")
+            return await worker.process_batch()
+
+        assert asyncio.run(run()) == 4
+        status = {t["gateway_order_id"]: t["status"] for t in db.payment_transactions.docs}
+        assert status == {"cs_1": "success", "cs_2": "failed", "cs_3": "success"}
+        assert {o["id"]: o["status"] for o in db.orders.docs} == {"o-cs_1": "paid", "o-cs_2": "pending"}
+        assert db.orders.docs[0]["payment_id"] == "pay-cs_1"
+        assert all(e["processed_at"] for e in db.payment_webhook_events.docs)
+        print("✓ Batch settles transactions and marks paid orders")
+
+    def test_event_before_transaction_deferred(self):
+        db = _db()
+        worker = _worker(db)
+
+        async def run():
+            await worker.ingest("stripe", _event("evt_1", "cs_1"), b"{}")
+            assert await worker.process_batch() == 0
+            [event] = db.payment_webhook_events.docs
+            assert event["processed_at"] is None and event["attempts"] == 1
+            assert event["last_error"] == "Transaction not found"
+
+            db.payment_transactions.docs.append(_transaction("b1", "stripe", "cs_1"))
+            return await worker.process_batch()
+
+        assert asyncio.run(run()) == 1
+        assert db.payment_transactions.docs[0]["status"] == "success"
+        print("✓ Event racing its transaction retried and applied once it exists")
+
+    def test_retry_and_replay_after_crash(self, monkeypatch):
+        db = _db([_transaction("b1", "stripe", "cs_1")], [{"id": "o-cs_1", "business_id": "b1", "status": "pending"}])
+        worker = _worker(db)
+        bulk_write = db.orders.bulk_write
+
+        async def crash(ops, ordered=True):
+            raise RuntimeError("connection reset")
+
+        async def run():
+            await worker.ingest("stripe", _event("evt_1", "cs_1"), b"{}")
+            # Transaction settled, then the order write fails
+            monkeypatch.setattr(db.orders, "bulk_write", crash)
+            with pytest.raises(RuntimeError):
+                await worker.process_batch()
+            [event] = db.payment_webhook_events.docs
+            assert event["processed_at"] is None and event["attempts"] == 1
+            assert event["last_error"] == "connection reset"
+
+            # The retry finds the transaction already settled and finishes the order
+            monkeypatch.setattr(db.orders, "bulk_write", bulk_write)
+            assert await worker.process_batch() == 1
+            assert db.orders.docs[0]["status"] == "paid"
+
+            # Replaying the stored event re-applies it without side effects
+            assert await worker.replay(gateway="stripe") == 1
+            assert event["processed_at"] is None and event["attempts"] == 0 and "last_error" not in event
+            return await worker.process_batch()
+
+        assert asyncio.run(run()) == 1
+        assert db.payment_transactions.docs[0]["status"] == "success" and db.orders.docs[0]["status"] == "paid"
+        print("✓ Crashed batch retried, replay is idempotent")
+
+    def test_other_business_transaction_rejected(self):
+        db = _db(
+            [_transaction("b1", "phonepe", "MT1"), _transaction("b2", "phonepe", "MT2")],
+            [{"id": "o-MT1", "business_id": "b1", "status": "pending"},
+             {"id": "o-MT2", "business_id": "b2", "status": "pending"}],
+        )
+        worker = WebhookWorker(db)
+
+        async def run():
+            # b1's salt key signed both callbacks; MT2 is b2's transaction
+            await worker.ingest("phonepe", _event("MT1:PAYMENT_SUCCESS", "MT1"), b"{}", business_id="b1")
+            await worker.ingest("phonepe", _event("MT2:PAYMENT_SUCCESS", "MT2"), b"{}", business_id="b1")
+            return await worker.process_batch()
+
+        assert asyncio.run(run()) == 2
+        status = {t["gateway_order_id"]: t["status"] for t in db.payment_transactions.docs}
+        assert status == {"MT1": "success", "MT2": "pending"}
+        assert [o["status"] for o in db.orders.docs] == ["paid", "pending"]
+        rejected = next(e for e in db.payment_webhook_events.docs if e["gateway_order_id"] == "MT2")
+        assert rejected["processed_at"] and rejected["last_error"] == "Transaction belongs to another business"
+        print("✓ Event signed by one business cannot settle another's transaction")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,115 @@
+"""
+Request Profiling Tests
+Tests for:
+- X-Profile header / ?profile= flag parsing
+- Flags ignored unless the request is authorized
+- HTML and speedscope reports replacing the response
+- Stored reports, sampling and directory rotation
+"""
+import asyncio
+import json
+import os
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from profiling import ProfilingMiddleware, list_profiles, read_profile, requested_mode, rotate
+
+
+def _scope(headers=(), query=b""):
+    return {"type": "http", "method": "GET", "headers": list(headers), "query_string": query}
+
+
+def _app(directory, authorized=True, **options):
+    app = FastAPI()
+
+    @app.get("/api/public/sites/{subdomain}")
+    async def site(subdomain: str):
+        await asyncio.sleep(0.002)
+        return {"subdomain": subdomain}
+
+    async def authorize(headers):
+        return authorized
+
+    app.add_middleware(ProfilingMiddleware, authorize=authorize, directory=directory, **options)
+    return app
+
+
+async def _get(app, path, headers=None):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await client.get(path, headers=headers)
+
+
+class TestRequestedMode:
+    """Flag parsing"""
+
+    def test_header_and_query_flag(self):
+        assert requested_mode(_scope([(b"x-profile", b"store")])) == "store"
+        assert requested_mode(_scope(query=b"profile=1")) == "html"
+        assert requested_mode(_scope(query=b"profile=speedscope&fields=id")) == "speedscope"
+        print("✓ Header and query flag select the mode")
+
+    def test_absent_or_unknown(self):
+        assert requested_mode(_scope()) is None
+        assert requested_mode(_scope([(b"x-profile", b"flamegraph-please")])) is None
+        print("✓ No flag or an unknown mode means no profiling")
+
+
+class TestProfilingMiddleware:
+    """Single-request profiles"""
+
+    def test_html_report_replaces_response(self, tmp_path):
+        response = asyncio.run(_get(_app(tmp_path), "/api/public/sites/demo?profile=1"))
+        assert response.headers["content-type"].startswith("text/html")
+        assert response.headers["x-profiled-status"] == "200"
+        assert "pyinstrument" in response.text.lower()
+        print(f"✓ HTML report returned ({len(response.text)} bytes)")
+
+    def test_speedscope_report(self, tmp_path):
+        response = asyncio.run(_get(_app(tmp_path), "/api/public/sites/demo", {"X-Profile": "speedscope"}))
+        assert "speedscope" in json.loads(response.text)["$schema"]
+        print("✓ Speedscope flame graph returned")
+
+    def test_unauthorized_flag_ignored(self, tmp_path):
+        response = asyncio.run(_get(_app(tmp_path, authorized=False), "/api/public/sites/demo?profile=1"))
+        assert response.json() == {"subdomain": "demo"}
+        print("✓ Unauthorized profile flag ignored")
+
+    def test_stored_report(self, tmp_path):
+        response = asyncio.run(_get(_app(tmp_path), "/api/public/sites/demo", {"X-Profile": "store"}))
+        assert response.json() == {"subdomain": "demo"}
+        profile_id = response.headers["x-profile-id"]
+        assert "api_public_sites_subdomain" in profile_id  # route template, not the subdomain
+        assert [p["id"] for p in list_profiles(tmp_path)] == [profile_id]
+        assert "pyinstrument" in read_profile(profile_id, tmp_path).lower()
+        print(f"✓ Report stored as {profile_id}")
+
+    def test_sampling_and_rotation(self, tmp_path):
+        app = _app(tmp_path, authorized=False, sample_rate=1.0, max_files=2)
+        for _ in range(4):
+            assert asyncio.run(_get(app, "/api/public/sites/demo")).status_code == 200
+        assert len(list_profiles(tmp_path)) == 2
+        print("✓ Sampled requests stored, oldest rotated out")
+
+
+class TestProfileFiles:
+    """Report directory"""
+
+    def test_rotate_keeps_newest(self, tmp_path):
+        for index in range(3):
+            path = tmp_path / f"{index}-GET-route.html"
+            path.write_text("x")
+            os.utime(path, (time.time() + index, time.time() + index))
+        rotate(tmp_path, 1)
+        assert [p.name for p in tmp_path.iterdir()] == ["2-GET-route.html"]
+        print("✓ Rotation keeps the newest reports")
+
+    def test_read_rejects_other_paths(self, tmp_path):
+        assert read_profile("../server.py", tmp_path) is None
+        print("✓ Only report names are read")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,176 @@
+"""
+Query Budget Tests
+Tests for:
+- Mongo commands counted per request through the ContextVar
+- Budget and N+1 warnings, X-Query-Stats debug header
+- Exact query counts per endpoint (server run with QUERY_DEBUG_HEADER=true)
+"""
+import asyncio
+import logging
+import os
+import uuid
+from types import SimpleNamespace
+
+import httpx
+import pytest
+import requests
+from fastapi import FastAPI
+
+from query_budget import QUERY_STATS_HEADER, QueryBudgetMiddleware, QueryCounter, parse_query_stats, track_queries
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+listener = QueryCounter()
+
+
+def _command(name: str, collection: str, request_id: int = 1):
+    command = {name: collection, "filter": {"id": "x"}}
+    started = SimpleNamespace(command_name=name, command=command, request_id=request_id)
+    succeeded = SimpleNamespace(command_name=name, reply={"ok": 1, "cursor": {"firstBatch": []}}, request_id=request_id)
+    listener.started(started)
+    listener.succeeded(succeeded)
+
+
+def _app(queries: int, **middleware_options):
+    app = FastAPI()
+
+    @app.get("/api/items/{item_id}")
+    async def item(item_id: str):
+        for request_id in range(queries):
+            _command("find", "products", request_id)
+        return {"id": item_id}
+
+    app.add_middleware(QueryBudgetMiddleware, **middleware_options)
+    return app
+
+
+async def _get(app, path: str):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await client.get(path)
+
+
+class TestQueryCounting:
+    """Listener and ContextVar"""
+
+    def test_commands_counted_inside_block(self):
+        with track_queries() as stats:
+            _command("find", "products")
+            _command("insert", "orders")
+        assert stats.queries == 2
+        assert stats.bytes_sent > 0 and stats.bytes_received > 0
+        print(f"✓ Counted {stats.header()}")
+
+    def test_commands_outside_request_ignored(self):
+        with track_queries() as stats:
+            pass
+        _command("find", "products")
+        assert stats.queries == 0 and stats.closed
+        print("✓ Commands after the request are not counted")
+
+    def test_repeated_commands_flagged(self):
+        with track_queries() as stats:
+            for request_id in range(5):
+                _command("find", "products", request_id)
+            _command("find", "businesses")
+        assert stats.repeated(threshold=5) == {"products.find": 5}
+        print("✓ Repeated command flagged as possible N+1")
+
+    def test_parse_header(self):
+        assert parse_query_stats("queries=3, bytes-sent=40, bytes-received=90") == {
+            "queries": 3, "bytes_sent": 40, "bytes_received": 90
+        }
+        print("✓ X-Query-Stats parsed")
+
+
+class TestQueryBudgetMiddleware:
+    """Per-request tracking"""
+
+    def test_debug_header(self, query_budget):
+        response = asyncio.run(_get(_app(3, debug_header=True), "/api/items/a"))
+        assert query_budget(response, 3) == 3
+        print("✓ Debug header carries the request's query count")
+
+    def test_header_off_by_default(self):
+        response = asyncio.run(_get(_app(1, debug_header=False), "/api/items/a"))
+        assert QUERY_STATS_HEADER not in response.headers
+        print("✓ No debug header unless enabled")
+
+    def test_budget_warning(self, caplog):
+        with caplog.at_level(logging.WARNING, logger="query_budget"):
+            asyncio.run(_get(_app(3, budget=2, debug_header=False), "/api/items/a"))
+        assert "Query budget exceeded on GET /api/items/{item_id}" in caplog.text
+        print("✓ Over-budget request logged with its route template")
+
+    def test_n_plus_one_warning(self, caplog):
+        with caplog.at_level(logging.WARNING, logger="query_budget"):
+            asyncio.run(_get(_app(6, budget=100, debug_header=False), "/api/items/a"))
+        assert "Possible N+1 on GET /api/items/{item_id}: products.find x6" in caplog.text
+        print("✓ Repeated queries logged as possible N+1")
+
+
+class TestEndpointQueryCounts:
+    """Exact round trips per endpoint; update deliberately when a handler changes"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        response = requests.post(f"{BASE_URL}/api/auth/signup", json={
+            "name": "TEST_Query Budget",
+            "email": f"TEST_queries_{uuid.uuid4().hex[:8]}@example.com",
+            "password": "testpass123"
+        })
+        self.signup = response
+        self.headers = {"Authorization": f"Bearer {response.json()['token']}"}
+        self.subdomain = f"testq{uuid.uuid4().hex[:8]}"
+        self.business = requests.post(f"{BASE_URL}/api/businesses", headers=self.headers, json={
+            "name": "TEST_Query Shop", "description": "Query counts", "subdomain": self.subdomain,
+            "whatsapp_number": "+911234567890", "category": "Fashion", "template_type": "retail"
+        })
+        self.business_id = self.business.json()["id"]
+        self.products = [
+            requests.post(f"{BASE_URL}/api/businesses/{self.business_id}/products", headers=self.headers, json={
+                "name": f"TEST_Product {i}", "description": "Query counts", "mrp": 500, "sale_price": 400
+            })
+            for i in range(3)
+        ]
+
+    def test_health(self, query_budget):
+        query_budget(requests.get(f"{BASE_URL}/api/health"), 0)
+        print("✓ Health: 0 queries")
+
+    def test_signup_and_me(self, query_budget):
+        query_budget(self.signup, 2)
+        query_budget(requests.get(f"{BASE_URL}/api/auth/me", headers=self.headers), 1)
+        print("✓ Signup: 2 queries, me: 1")
+
+    def test_create_product(self, query_budget):
+        query_budget(self.products[0], 3)
+        print("✓ Create product: 3 queries")
+
+    def test_product_list(self, query_budget):
+        query_budget(requests.get(f"{BASE_URL}/api/businesses/{self.business_id}/products"), 2)
+        print("✓ Product list: 2 queries")
+
+    def test_create_order_independent_of_item_count(self, query_budget):
+        items = [{"product_id": product.json()["id"], "quantity": 1} for product in self.products]
+        response = requests.post(f"{BASE_URL}/api/businesses/{self.business_id}/orders", json={
+            "customer_name": "TEST_Customer", "customer_phone": "+919876543210", "items": items
+        })
+        assert response.status_code == 200
+        query_budget(response, 3)
+        print(f"✓ Order with {len(items)} items: 3 queries")
+
+    def test_site_revalidation(self, query_budget):
+        site = requests.get(f"{BASE_URL}/api/public/sites/{self.subdomain}")
+        response = requests.get(f"{BASE_URL}/api/public/sites/{self.subdomain}",
+                                headers={"If-None-Match": site.headers["ETag"]})
+        assert response.status_code == 304
+        query_budget(response, 1)
+        print("✓ Site revalidation: 1 query")
+
+    def test_analytics(self, query_budget):
+        query_budget(requests.get(f"{BASE_URL}/api/businesses/{self.business_id}/analytics", headers=self.headers), 8)
+        print("✓ Analytics: 8 queries")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
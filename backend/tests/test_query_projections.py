@@ -0,0 +1,128 @@
+"""
+Query Projection Tests
+Tests for:
+- Projections cover every field of the response models
+- Bytes read from MongoDB per endpoint, with projections vs whole documents
+
+Runs the app in-process against the database in MONGO_URL / DB_NAME (seeded
+with the demofashion business) so the MongoDB replies can be measured.
+"""
+import asyncio
+import os
+from pathlib import Path
+
+import bson
+import httpx
+import pytest
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+load_dotenv(Path(__file__).parent.parent / '.env')
+
+pytestmark = pytest.mark.skipif('MONGO_URL' not in os.environ, reason="MONGO_URL not configured")
+
+TEST_SUBDOMAIN = "demofashion"
+
+
+class ReplySizeListener(monitoring.CommandListener):
+    """Adds up the BSON size of every command reply"""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.bytes += len(bson.encode(event.reply))
+
+    def failed(self, event):
+        pass
+
+
+async def _measure(server, requests_):
+    """Send each (method, path, body) request and return {path: bytes read from MongoDB}"""
+    listener = ReplySizeListener()
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], event_listeners=[listener])
+    server.db = client[os.environ['DB_NAME']]
+
+    results = {}
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        for method, path, body in requests_:
+            listener.bytes = 0
+            response = await http.request(method, path, json=body)
+            assert response.status_code == 200, f"{path}: {response.status_code}"
+            results[path] = listener.bytes
+    client.close()
+    return results
+
+
+class TestProjectionRegistry:
+    """Model-derived projections stay in sync with the response models"""
+
+    def test_model_projections_cover_response_models(self):
+        import server
+
+        for key, model in [("business.public", server.Business), ("product.public", server.Product),
+                           ("booking.public", server.Booking), ("order.public", server.Order),
+                           ("user.session", server.User)]:
+            projection = server.PROJECTIONS[key]
+            assert projection["_id"] == 0
+            missing = [name for name in model.model_fields if name not in projection]
+            assert not missing, f"{key} is missing {missing}"
+        print("✓ Response model projections cover every model field")
+
+    def test_no_projection_fetches_secrets(self):
+        import server
+        from credential_store import SECRET_FIELDS
+
+        for key, projection in server.PROJECTIONS.items():
+            assert not set(SECRET_FIELDS) & set(projection), f"{key} fetches secrets"
+        assert "password" not in server.PROJECTIONS["user.session"]
+        print("✓ No projection fetches credentials or password hashes")
+
+
+class TestProjectionBytes:
+    """Projected queries read no more from MongoDB than whole-document queries"""
+
+    def test_bytes_per_endpoint(self, monkeypatch):
+        import server
+
+        business = asyncio.run(_business_id())
+        requests_ = [
+            ("GET", f"/api/public/businesses/{TEST_SUBDOMAIN}", None),
+            ("GET", f"/api/public/businesses/{TEST_SUBDOMAIN}/payment-info", None),
+            ("POST", f"/api/public/businesses/{TEST_SUBDOMAIN}/calculate-delivery",
+             {"customer_latitude": 19.0760, "customer_longitude": 72.8777}),
+            ("GET", f"/api/businesses/{business}/products", None),
+        ]
+
+        # _measure swaps in a monitored database; restore the original afterwards
+        monkeypatch.setattr(server, "db", server.db)
+        projected = asyncio.run(_measure(server, requests_))
+        for key in list(server.PROJECTIONS):
+            monkeypatch.setitem(server.PROJECTIONS, key, {"_id": 0})
+        unprojected = asyncio.run(_measure(server, requests_))
+
+        for path, size in projected.items():
+            saved = unprojected[path] - size
+            print(f"  {path}: {size} bytes (whole documents {unprojected[path]}, saved {saved})")
+            assert size <= unprojected[path]
+        print("✓ Projections never read more than whole documents")
+
+
+async def _business_id():
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    business = await client[os.environ['DB_NAME']].businesses.find_one(
+        {"subdomain": TEST_SUBDOMAIN}, {"_id": 0, "id": 1}
+    )
+    client.close()
+    if not business:
+        pytest.skip(f"{TEST_SUBDOMAIN} business not seeded")
+    return business['id']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,175 @@
+"""
+Schema Migration Tests
+Tests for:
+- Upgrade steps bringing legacy documents to the current schema_version
+- In-memory upgrades for handlers reading collections still migrating
+- Lazy upgrades folded into a handler's own update
+- Sorted reads upgrading the documents they read first
+"""
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from schema_migrations import (
+    SCHEMA_VERSIONS, SchemaMigrator, outdated_filter, split_changes, upgrade_changes, upgrade_document, versioned
+)
+
+LEGACY_PRODUCT = {
+    "id": "p1", "business_id": "b1", "name": "Kurta", "description": "Cotton",
+    "price": 499.0, "created_at": "2024-03-01T10:00:00+00:00",
+}
+
+
+class FakeCollection:
+    """find_one returning one stored document, enough for upgrade_ops"""
+
+    def __init__(self, doc):
+        self.doc = doc
+
+    async def find_one(self, query, projection=None):
+        return dict(self.doc)
+
+
+class TestUpgradeSteps:
+    """Legacy to current shape"""
+
+    def test_legacy_product_upgraded(self):
+        changes = upgrade_changes("products", LEGACY_PRODUCT)
+        assert changes["mrp"] == changes["sale_price"] == 499.0
+        assert changes["price"] is None
+        assert changes["created_at"] == datetime(2024, 3, 1, 10, tzinfo=timezone.utc)
+        assert changes["schema_version"] == SCHEMA_VERSIONS["products"]
+        print("✓ Legacy price split into mrp and sale_price, created_at parsed")
+
+    def test_naive_date_string_taken_as_utc(self):
+        changes = upgrade_changes("orders", {"id": "o1", "created_at": "2024-03-01T10:00:00"})
+        assert changes["created_at"].tzinfo is not None
+        print("✓ Naive ISO strings read as UTC")
+
+    def test_embedded_defaults_restored(self):
+        product = {"id": "p1", "mrp": 10.0, "sale_price": 8.0, "schema_version": 2,
+                   "variants": [{"name": "Small"}, {"name": "Large", "price_adjustment": 5.0}]}
+        assert upgrade_changes("products", product)["variants"] == [
+            {"price_adjustment": 0.0, "name": "Small"}, {"name": "Large", "price_adjustment": 5.0}
+        ]
+        business = {"id": "b1", "schema_version": 2, "social_media_links": {"instagram": "demo"}}
+        links = upgrade_changes("businesses", business)["social_media_links"]
+        assert links["instagram"] == "demo" and links["youtube"] is None and len(links) == 6
+        assert upgrade_changes("businesses", {"id": "b2", "schema_version": 2}) == {"schema_version": 3}
+        print("✓ Defaults left out of variants and social links written back")
+
+    def test_current_document_unchanged(self):
+        doc = versioned("products", {"id": "p1", "mrp": 10.0, "sale_price": 8.0})
+        assert upgrade_changes("products", doc) == {}
+        assert upgrade_document("products", doc) is doc
+        print("✓ Current documents need no changes")
+
+    def test_upgrade_document_drops_removed_fields(self):
+        upgraded = upgrade_document("products", LEGACY_PRODUCT)
+        assert "price" not in upgraded
+        assert upgraded["mrp"] == 499.0 and upgraded["name"] == "Kurta"
+        assert LEGACY_PRODUCT["price"] == 499.0  # input untouched
+        print("✓ In-memory upgrade returns the current shape")
+
+    def test_split_changes(self):
+        to_set, to_unset = split_changes(upgrade_changes("products", LEGACY_PRODUCT))
+        assert "price" not in to_set and to_unset == {"price": ""}
+        print("✓ Removed fields become $unset")
+
+    def test_outdated_filter_matches_unversioned(self):
+        assert outdated_filter("users") == {"schema_version": {"$not": {"$gte": SCHEMA_VERSIONS["users"]}}}
+        print("✓ Outdated filter covers documents without schema_version")
+
+
+class TestLazyUpgrade:
+    """Read-modify-write handlers"""
+
+    def test_upgrade_folded_into_update(self):
+        migrator = SchemaMigrator({"products": FakeCollection(LEGACY_PRODUCT)})
+        update_ops = {"$set": {"sale_price": 449.0, "discount_percentage": 10.02}}
+        merged = asyncio.run(migrator.upgrade_ops("products", {"id": "p1"}, update_ops))
+        assert merged["$set"]["sale_price"] == 449.0  # the handler's value wins
+        assert merged["$set"]["mrp"] == 499.0
+        assert merged["$set"]["schema_version"] == SCHEMA_VERSIONS["products"]
+        assert merged["$unset"] == {"price": ""}
+        print("✓ Upgrade merged into the handler's update")
+
+    def test_no_field_both_set_and_unset(self):
+        migrator = SchemaMigrator({"products": FakeCollection(LEGACY_PRODUCT)})
+        update_ops = {"$set": {"name": "Shirt"}, "$unset": {"mrp": ""}}
+        merged = asyncio.run(migrator.upgrade_ops("products", {"id": "p1"}, update_ops))
+        assert "mrp" not in merged["$set"]
+        assert not set(merged["$set"]) & set(merged["$unset"])
+        print("✓ Fields the handler writes are left to the handler")
+
+    def test_current_collection_skips_lookup(self):
+        migrator = SchemaMigrator({})
+        migrator.current.add("products")
+        update_ops = {"$set": {"name": "Shirt"}}
+        assert asyncio.run(migrator.upgrade_ops("products", {"id": "p1"}, update_ops)) is update_ops
+        print("✓ Fully migrated collections skip the upgrade read")
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs
+
+
+class FakeOrders:
+    """find on business_id and outdated_filter, bulk_write applying $set"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.finds = 0
+
+    def _outdated(self, doc):
+        return doc.get("schema_version", 1) < SCHEMA_VERSIONS["orders"]
+
+    def find(self, query):
+        self.finds += 1
+        docs = [dict(doc) for doc in self.docs if doc["business_id"] == query["business_id"] and self._outdated(doc)]
+        return FakeCursor(docs)
+
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            for doc in self.docs:
+                if doc["_id"] == op._filter["_id"] and self._outdated(doc):
+                    doc.update(op._doc["$set"])
+
+
+class TestSortedReads:
+    """Reads sorting on a field the migration changes type of"""
+
+    def test_tenant_upgraded_before_sort(self):
+        orders = FakeOrders([
+            {"_id": 1, "business_id": "b1", "created_at": "2024-03-01T10:00:00+00:00"},
+            {"_id": 2, "business_id": "b1", "created_at": datetime(2024, 2, 1, tzinfo=timezone.utc),
+             "schema_version": SCHEMA_VERSIONS["orders"]},
+            {"_id": 3, "business_id": "b1", "created_at": "2024-01-01T10:00:00+00:00"},
+            {"_id": 4, "business_id": "b2", "created_at": "2024-01-01T10:00:00+00:00"},
+        ])
+        migrator = SchemaMigrator({"orders": orders})
+        assert asyncio.run(migrator.upgrade_matching("orders", {"business_id": "b1"})) == 2
+
+        b1 = [doc for doc in orders.docs if doc["business_id"] == "b1"]
+        assert all(isinstance(doc["created_at"], datetime) for doc in b1)
+        newest_first = sorted(b1, key=lambda doc: doc["created_at"], reverse=True)
+        assert [doc["_id"] for doc in newest_first] == [1, 2, 3]
+        assert isinstance(orders.docs[3]["created_at"], str)  # other tenants left to the migrator
+        print("✓ One tenant's orders share a created_at type before the sorted read")
+
+    def test_complete_collection_skips_lookup(self):
+        orders = FakeOrders([])
+        migrator = SchemaMigrator({"orders": orders})
+        migrator.current.add("orders")
+        assert asyncio.run(migrator.upgrade_matching("orders", {"business_id": "b1"})) == 0
+        assert orders.finds == 0
+        print("✓ No extra query once the migration is complete")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,113 @@
+"""
+Sparse Storage Tests
+Tests for:
+- Documents written without default-valued fields, queried fields kept
+- Updates split into $set and $unset for cleared and default values
+- Compaction changes for documents stored in full
+- Embedded documents stored whole, so trusted reads match validated ones
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import orjson
+import pytest
+from pydantic import BaseModel, Field
+
+from fast_json import dump_row
+from sparse_storage import default_fields, sparse_update, storage_document
+
+
+class Links(BaseModel):
+    instagram: Optional[str] = None
+    facebook: Optional[str] = None
+
+
+class Variant(BaseModel):
+    name: str
+    price_adjustment: float = 0.0
+
+
+class Shop(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    name: str
+    address: Optional[str] = None
+    tags: List[str] = []
+    primary_color: str = "#2563eb"
+    social_media_links: Optional[Links] = None
+    variants: List[Variant] = []
+    is_active: bool = True
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class TestStorageDocument:
+    """Writes"""
+
+    def test_defaults_omitted(self):
+        doc = storage_document(Shop(name="Demo", tags=["new"]))
+        assert set(doc) == {"id", "name", "tags", "is_active", "created_at"}
+        assert doc["is_active"] is True  # filtered on, so always stored
+        print("✓ Default-valued fields omitted, queried fields kept")
+
+    def test_round_trip_through_model(self):
+        shop = Shop(name="Demo", social_media_links=Links(instagram="demo"))
+        assert Shop.model_validate(storage_document(shop)) == shop
+        print("✓ Reads fill defaults back in")
+
+    def test_embedded_defaults_kept(self):
+        shop = Shop(name="Demo", social_media_links=Links(instagram="demo"),
+                    variants=[Variant(name="Small"), Variant(name="Large", price_adjustment=50.0)])
+        doc = storage_document(shop)
+        assert doc["variants"] == [
+            {"name": "Small", "price_adjustment": 0.0}, {"name": "Large", "price_adjustment": 50.0}
+        ]
+        assert doc["social_media_links"] == {"instagram": "demo", "facebook": None}
+
+        trusted = orjson.loads(dump_row(Shop, doc, mode="trusted"))
+        validated = orjson.loads(dump_row(Shop, doc, mode="validated"))
+        for name in ("variants", "social_media_links", "tags", "address"):
+            assert trusted[name] == validated[name]
+        print("✓ Zero price_adjustment survives a trusted read")
+
+
+class TestSparseUpdate:
+    """Updates"""
+
+    def test_cleared_and_default_values_unset(self):
+        to_set, to_unset = sparse_update(Shop, {
+            "address": None,
+            "primary_color": "#2563eb",
+            "tags": ["sale"],
+            "name": None,  # required: None leaves it unchanged
+            "is_active": True,
+            "social_media_links": {"instagram": None, "facebook": None},
+        })
+        assert to_set == {"tags": ["sale"], "is_active": True}
+        assert set(to_unset) == {"address", "primary_color", "social_media_links"}
+        print("✓ Cleared and default values become $unset")
+
+    def test_embedded_documents_written_whole(self):
+        to_set, _ = sparse_update(Shop, {
+            "social_media_links": {"instagram": "demo", "facebook": None},
+            "variants": [{"name": "Small", "price_adjustment": 0.0}],
+        })
+        assert to_set == {
+            "social_media_links": {"instagram": "demo", "facebook": None},
+            "variants": [{"name": "Small", "price_adjustment": 0.0}],
+        }
+        print("✓ Embedded documents keep their default entries")
+
+
+class TestCompaction:
+    """Existing full documents"""
+
+    def test_default_fields(self):
+        full = Shop(name="Demo", social_media_links=Links(instagram="demo")).model_dump()
+        changes = default_fields(Shop, full)
+        assert changes == {"address": None, "tags": None, "primary_color": None, "variants": None}
+        assert default_fields(Shop, storage_document(Shop(name="Demo"))) == {}
+        print("✓ Compaction removes defaults and is idempotent")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
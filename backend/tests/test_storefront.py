@@ -0,0 +1,199 @@
+"""
+Storefront Bootstrap Tests
+Tests for:
+- /public/sites/{subdomain} returns business, catalog and payment info in one response
+- Owner-only fields are not exposed
+- Site cache expiry, invalidation and size bound
+- ETag / If-None-Match revalidation on public routes
+- Static snapshot files, precompression and debouncing
+"""
+import asyncio
+import gzip
+import time
+
+import brotli
+
+import pytest
+import requests
+import os
+
+from http_cache import content_etag, etag_matches
+from storefront_cache import SiteCache
+from storefront_snapshots import SnapshotWriter, inline_bootstrap
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+TEST_SUBDOMAIN = "demofashion"
+
+
+class TestSiteBootstrapAPI:
+    """Combined storefront endpoint"""
+
+    def test_site_bootstrap(self):
+        response = requests.get(f"{BASE_URL}/api/public/sites/{TEST_SUBDOMAIN}")
+        assert response.status_code == 200
+        data = response.json()
+
+        assert data["business"]["subdomain"] == TEST_SUBDOMAIN
+        assert isinstance(data["version"], int)
+        assert "payment_enabled" in data["payment_info"]
+        for category in data["categories"]:
+            assert all(product["is_available"] for product in category["products"])
+        print(f"✓ Site bootstrap: {len(data['categories'])} categories, version {data['version']}")
+
+    def test_site_bootstrap_hides_owner_fields(self):
+        response = requests.get(f"{BASE_URL}/api/public/sites/{TEST_SUBDOMAIN}")
+        assert response.status_code == 200
+        business = response.json()["business"]
+        assert "user_id" not in business
+        assert "configured_secrets" not in business
+        print("✓ Site bootstrap omits owner-only business fields")
+
+    def test_site_bootstrap_matches_products_route(self):
+        site = requests.get(f"{BASE_URL}/api/public/sites/{TEST_SUBDOMAIN}").json()
+        products = requests.get(f"{BASE_URL}/api/businesses/{site['business']['id']}/products").json()
+
+        bootstrap_ids = {p["id"] for c in site["categories"] for p in c["products"]}
+        available_ids = {p["id"] for p in products if p["is_available"]}
+        assert bootstrap_ids == available_ids
+        print(f"✓ Site bootstrap lists all {len(bootstrap_ids)} available products")
+
+    def test_site_bootstrap_unknown_subdomain(self):
+        response = requests.get(f"{BASE_URL}/api/public/sites/nonexistent-subdomain-xyz")
+        assert response.status_code == 404
+        print("✓ Unknown subdomain returns 404")
+
+
+class TestConditionalGet:
+    """Public routes carry version ETags and answer revalidations with 304"""
+
+    @pytest.mark.parametrize("path", [
+        f"/api/public/sites/{TEST_SUBDOMAIN}",
+        f"/api/public/businesses/{TEST_SUBDOMAIN}",
+        f"/api/public/businesses/{TEST_SUBDOMAIN}/payment-info",
+    ])
+    def test_revalidation(self, path):
+        response = requests.get(f"{BASE_URL}{path}")
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        assert response.headers["Surrogate-Key"].startswith("business-")
+        assert "public" in response.headers["Cache-Control"]
+
+        revalidated = requests.get(f"{BASE_URL}{path}", headers={"If-None-Match": etag})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["ETag"] == etag
+        assert not revalidated.content
+        print(f"✓ {path} revalidates with 304")
+
+    def test_stale_etag_gets_full_response(self):
+        response = requests.get(
+            f"{BASE_URL}/api/public/sites/{TEST_SUBDOMAIN}", headers={"If-None-Match": '"site-stale-v0"'}
+        )
+        assert response.status_code == 200
+        assert response.headers["ETag"] != '"site-stale-v0"'
+        print("✓ Stale ETag receives the current representation")
+
+    def test_etag_matching(self):
+        class FakeRequest:
+            def __init__(self, header):
+                self.headers = {"if-none-match": header} if header else {}
+
+        etag = content_etag("site", "b1", 3)
+        assert etag_matches(FakeRequest(etag), etag)
+        assert etag_matches(FakeRequest(f'"other", W/{etag}'), etag)
+        assert etag_matches(FakeRequest("*"), etag)
+        assert not etag_matches(FakeRequest(content_etag("site", "b1", 2)), etag)
+        assert not etag_matches(FakeRequest(None), etag)
+        print("✓ If-None-Match parsing")
+
+
+class TestSiteCache:
+    """Per-process cache of encoded storefront payloads"""
+
+    def test_hit_and_invalidate(self):
+        cache = SiteCache(ttl=60, max_size=10)
+        cache.put("shop", 1, b"{}")
+        assert cache.get("shop").body == b"{}"
+
+        cache.invalidate("shop")
+        assert cache.get("shop") is None
+        assert cache.stats == {"hits": 1, "misses": 1, "invalidations": 1}
+        print("✓ Site cache hit and invalidation")
+
+    def test_expiry(self):
+        cache = SiteCache(ttl=0.05, max_size=10)
+        cache.put("shop", 1, b"{}")
+        time.sleep(0.1)
+        assert cache.get("shop") is None
+        print("✓ Site cache entries expire after the TTL")
+
+    def test_evicts_least_recently_used(self):
+        cache = SiteCache(ttl=60, max_size=2)
+        cache.put("a", 1, b"a")
+        cache.put("b", 1, b"b")
+        cache.get("a")
+        cache.put("c", 1, b"c")
+
+        assert len(cache) == 2
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        print("✓ Site cache evicts the least recently used subdomain")
+
+
+class TestSnapshots:
+    """Debounced static snapshot files"""
+
+    def test_burst_of_writes_produces_one_snapshot(self, tmp_path):
+        renders = []
+
+        async def render(subdomain):
+            renders.append(subdomain)
+            return b'{"version": %d}' % len(renders)
+
+        async def scenario():
+            writer = SnapshotWriter(render, directory=str(tmp_path), html_template=None, debounce=0.1, max_delay=1)
+            for _ in range(5):
+                writer.schedule("shop")
+                await asyncio.sleep(0.02)
+            await asyncio.sleep(0.3)
+            return writer
+
+        writer = asyncio.run(scenario())
+        assert renders == ["shop"]
+        assert writer.stats["written"] == 1
+
+        path = tmp_path / "sites" / "shop.json"
+        body = path.read_bytes()
+        assert gzip.decompress((tmp_path / "sites" / "shop.json.gz").read_bytes()) == body
+        assert brotli.decompress((tmp_path / "sites" / "shop.json.br").read_bytes()) == body
+        print("✓ Five writes within the debounce window produce one precompressed snapshot")
+
+    def test_removed_site_deletes_files(self, tmp_path):
+        async def render(subdomain):
+            return None
+
+        (tmp_path / "sites").mkdir()
+        (tmp_path / "sites" / "shop.json").write_bytes(b"{}")
+        writer = SnapshotWriter(render, directory=str(tmp_path), html_template=None)
+        assert asyncio.run(writer.write("shop")) is False
+        assert not (tmp_path / "sites" / "shop.json").exists()
+        print("✓ Snapshot removed when the site is gone")
+
+    def test_unsafe_subdomain_is_not_written(self, tmp_path):
+        async def render(subdomain):
+            return b"{}"
+
+        writer = SnapshotWriter(render, directory=str(tmp_path / "snap"), html_template=None)
+        assert asyncio.run(writer.write("../escape")) is False
+        assert not any(tmp_path.rglob("*.json"))
+        print("✓ Unsafe subdomains never become paths")
+
+    def test_inline_bootstrap_escapes_script_end(self):
+        html = inline_bootstrap("<html><head></head><body></body></html>", b'{"d": "</script>"}').decode()
+        assert html.count("</script>") == 1
+        assert "window.__SITE_BOOTSTRAP__=" in html
+        print("✓ Inlined bootstrap cannot close its script element")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
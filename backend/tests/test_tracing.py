@@ -0,0 +1,97 @@
+"""
+Tracing Tests
+Tests for:
+- Route spans named after the route template
+- W3C traceparent continued from the caller
+- Sampling ratio for new traces
+- File exporter writing one JSON span per line
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from tracing import build_tracer_provider, instrument_app
+
+TRACEPARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+def _app(provider):
+    app = FastAPI()
+
+    @app.get("/api/public/sites/{subdomain}")
+    async def site(subdomain: str):
+        return {"subdomain": subdomain}
+
+    instrument_app(app, provider)
+    return app
+
+
+async def _get(app, path, headers=None):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await client.get(path, headers=headers)
+
+
+class TestRouteSpans:
+    """FastAPI instrumentation"""
+
+    def test_span_per_route_template(self):
+        exporter = InMemorySpanExporter()
+        app = _app(build_tracer_provider(span_exporter=exporter))
+        asyncio.run(_get(app, "/api/public/sites/demo"))
+        names = [span.name for span in exporter.get_finished_spans()]
+        assert names == ["GET /api/public/sites/{subdomain}"]
+        print(f"✓ Route span: {names[0]}")
+
+    def test_traceparent_continued(self):
+        exporter = InMemorySpanExporter()
+        app = _app(build_tracer_provider(span_exporter=exporter))
+        asyncio.run(_get(app, "/api/public/sites/demo", {"traceparent": TRACEPARENT}))
+        span = exporter.get_finished_spans()[0]
+        assert format(span.context.trace_id, "032x") == "0af7651916cd43dd8448eb211c80319c"
+        assert format(span.parent.span_id, "016x") == "b7ad6b7169203331"
+        print("✓ Incoming traceparent continues the caller's trace")
+
+    def test_tracing_off_by_default(self):
+        assert build_tracer_provider(exporter="none") is None
+        print("✓ No provider when TRACING_EXPORTER=none")
+
+
+class TestSampling:
+    """TRACING_SAMPLE_RATIO"""
+
+    def test_unsampled_new_traces_dropped(self):
+        exporter = InMemorySpanExporter()
+        app = _app(build_tracer_provider(sample_ratio=0.0, span_exporter=exporter))
+        asyncio.run(_get(app, "/api/public/sites/demo"))
+        assert exporter.get_finished_spans() == ()
+        print("✓ Ratio 0 records no new traces")
+
+    def test_sampled_parent_followed(self):
+        exporter = InMemorySpanExporter()
+        app = _app(build_tracer_provider(sample_ratio=0.0, span_exporter=exporter))
+        asyncio.run(_get(app, "/api/public/sites/demo", {"traceparent": TRACEPARENT}))
+        assert len(exporter.get_finished_spans()) == 1
+        print("✓ A sampled caller's decision is followed")
+
+
+class TestFileExporter:
+    """TRACING_EXPORTER=file"""
+
+    def test_json_lines(self, tmp_path):
+        path = tmp_path / "traces.jsonl"
+        provider = build_tracer_provider(exporter="file", file_path=str(path))
+        asyncio.run(_get(_app(provider), "/api/public/sites/demo"))
+        provider.force_flush()
+        spans = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [span["name"] for span in spans] == ["GET /api/public/sites/{subdomain}"]
+        assert spans[0]["attributes"]["http.route"] == "/api/public/sites/{subdomain}"
+        provider.shutdown()
+        print("✓ Spans written as JSON lines")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
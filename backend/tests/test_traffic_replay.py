@@ -0,0 +1,260 @@
+"""
+Traffic Record-and-Replay Tests
+Tests for:
+- Body shapes and sanitized traffic lines (hashed params, no values)
+- Sampling, excluded routes and log rotation
+- Reading logs and mapping recorded tenants onto a fixture
+- Replaying on the recorded schedule and comparing result files
+"""
+import asyncio
+import json
+import random
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request, Response
+
+from loadtest.replay import ReplayState, TenantMap, build_request, compare, load_traffic, replay
+from msgpack_negotiation import MsgpackMiddleware, packb
+from traffic_recorder import TrafficLog, TrafficRecorderMiddleware, body_shape, hash_param
+
+SALT = "test-salt"
+
+FIXTURE = {
+    "admin_token": "admin-token",
+    "tenants": [
+        {"subdomain": "big", "business_id": "b-big", "token": "owner-big", "product_ids": ["p1", "p2", "p3"]},
+        {"subdomain": "small", "business_id": "b-small", "token": "owner-small", "product_ids": ["p9"]},
+    ],
+}
+
+
+def _app(log: TrafficLog, msgpack: bool = False, **options):
+    app = FastAPI()
+
+    @app.get("/api/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/api/public/sites/{subdomain}")
+    async def site(subdomain: str, request: Request):
+        etag = f'"{subdomain}-1"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content=json.dumps({"subdomain": subdomain}), media_type="application/json", headers={"ETag": etag})
+
+    @app.post("/api/businesses/{business_id}/orders")
+    async def create_order(business_id: str, request: Request):
+        order = await request.json()
+        return {"id": f"order-{len(order['items'])}", "total_amount": 100, "customer_name": order["customer_name"],
+                "customer_phone": order["customer_phone"]}
+
+    if msgpack:
+        # Inside the recorder, as in server.py
+        app.add_middleware(MsgpackMiddleware)
+    app.add_middleware(TrafficRecorderMiddleware, log=log, **options)
+    return app
+
+
+def _record(tmp_path, requests, **options):
+    log = TrafficLog(tmp_path / "traffic.ndjson", max_bytes=options.pop("max_bytes", 10 ** 6), backups=5)
+    app = _app(
+        log, msgpack=options.pop("msgpack", False), sample_rate=options.pop("sample_rate", 1.0), salt=SALT, **options
+    )
+
+    async def send_all():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            for method, url, kwargs in requests:
+                await client.request(method, url, **kwargs)
+
+    log.start()
+    asyncio.run(send_all())
+    log.stop()
+    return sorted(tmp_path.glob("traffic.ndjson*"))
+
+
+ORDER = {
+    "customer_name": "Asha Rao",
+    "customer_phone": "+919876543210",
+    "items": [{"product_id": "p1", "quantity": 2}, {"product_id": "p2", "quantity": 1}],
+}
+
+
+class TestRecording:
+    """Traffic lines"""
+
+    def test_body_shape(self):
+        shape = body_shape({"name": "x", "paid": True, "total": 1.5, "note": None, "items": [{"qty": 1}], "tags": []})
+        assert shape == {"name": "string", "paid": "bool", "total": "number", "note": "null",
+                         "items": [1, {"qty": "number"}], "tags": []}
+        print("✓ Shapes keep names, types and list lengths")
+
+    def test_sanitized_line(self, tmp_path):
+        paths = _record(tmp_path, [
+            ("POST", "/api/businesses/b-secret/orders?fields=id&coupon=FESTIVE50",
+             {"json": ORDER, "headers": {"Authorization": "Bearer abc.def"}}),
+        ])
+        text = paths[0].read_text()
+        for value in ("b-secret", "Asha", "9876543210", "FESTIVE50", "abc.def"):
+            assert value not in text
+        entry = json.loads(text)
+        assert entry["route"] == "/api/businesses/{business_id}/orders"
+        assert entry["params"] == {"business_id": hash_param("b-secret", SALT)}
+        assert entry["query"] == {"fields": "id", "coupon": None}
+        assert entry["auth"] is True and entry["status"] == 200 and entry["duration_ms"] > 0
+        assert entry["body"]["items"] == [2, {"product_id": "string", "quantity": "number"}]
+        print("✓ Line holds route, hashed params and body shape, no values")
+
+    def test_msgpack_body_behind_msgpack_middleware(self, tmp_path):
+        paths = _record(tmp_path, [
+            ("POST", "/api/businesses/b1/orders",
+             {"content": packb(ORDER), "headers": {"Content-Type": "application/msgpack"}}),
+            ("POST", "/api/businesses/b1/orders", {"json": ORDER}),
+        ], msgpack=True)
+        packed, plain = [json.loads(line) for line in paths[0].read_text().splitlines()]
+        assert packed["status"] == 200 and packed["content_type"] == "msgpack"
+        assert plain["content_type"] == "json"
+        assert packed["body"] == plain["body"] == body_shape(ORDER)
+        print("✓ MessagePack bodies shaped from the client's Content-Type, not the rewritten one")
+
+    def test_salt_required(self, tmp_path):
+        log = TrafficLog(tmp_path / "traffic.ndjson")
+        with pytest.raises(ValueError):
+            TrafficRecorderMiddleware(FastAPI(), log=log, sample_rate=0.1, salt="")
+        TrafficRecorderMiddleware(FastAPI(), log=log, sample_rate=0, salt="")
+        assert hash_param("shop1", "a") != hash_param("shop1", "b") != hash_param("shop1", "")
+        print("✓ Recording refuses an empty salt")
+
+    def test_excluded_and_unsampled(self, tmp_path):
+        paths = _record(tmp_path, [("GET", "/api/health", {}), ("GET", "/api/nowhere", {})])
+        assert not paths or not paths[0].read_text()
+        assert not _record(tmp_path / "off", [("GET", "/api/public/sites/demo", {})], sample_rate=0)
+        print("✓ Health checks, unmatched routes and unsampled requests not recorded")
+
+    def test_large_body_truncated(self, tmp_path):
+        paths = _record(tmp_path, [("POST", "/api/businesses/b1/orders", {"json": ORDER})], max_body=10)
+        assert json.loads(paths[0].read_text())["body"] == "truncated"
+        print("✓ Bodies over the limit recorded as truncated")
+
+    def test_rotation(self, tmp_path):
+        paths = _record(tmp_path, [("GET", f"/api/public/sites/shop{i}", {}) for i in range(40)], max_bytes=2000)
+        assert len(paths) > 1
+        assert len(load_traffic(paths)) == sum(len(path.read_text().splitlines()) for path in paths)
+        print(f"✓ Log rotated over {len(paths)} files")
+
+
+class TestLoading:
+    """Reading logs and mapping tenants"""
+
+    def test_partial_lines_and_window(self, tmp_path):
+        path = tmp_path / "traffic.ndjson"
+        lines = [json.dumps({"ts": ts, "method": "GET", "route": "/r", "params": {}}) for ts in (3.0, 1.0, 2.0)]
+        path.write_text("\n".join(lines) + '\n{"ts": 4.0, "meth')
+        assert [entry["ts"] for entry in load_traffic([path])] == [1.0, 2.0, 3.0]
+        assert [entry["ts"] for entry in load_traffic([path], start=2.0, end=3.0)] == [2.0]
+        print("✓ Cut-off lines skipped, entries sorted and windowed")
+
+    def test_busiest_tenant_gets_biggest_fixture_tenant(self):
+        entries = [{"params": {"subdomain": "aaa"}}] + [{"params": {"subdomain": "bbb"}}] * 3
+        tenants = TenantMap(entries, FIXTURE)
+        assert tenants.tenant({"subdomain": "bbb"})["subdomain"] == "big"
+        assert tenants.tenant({"subdomain": "aaa"})["subdomain"] == "small"
+        assert tenants.product(FIXTURE["tenants"][0], "ff") in FIXTURE["tenants"][0]["product_ids"]
+        print("✓ Recorded tenants mapped by popularity")
+
+    def test_build_request(self):
+        entries = [
+            {"method": "GET", "route": "/api/public/sites/{subdomain}", "params": {"subdomain": "aaa"},
+             "query": {"fields": "id", "profile": None}, "auth": False, "msgpack": True, "conditional": True},
+            {"method": "DELETE", "route": "/api/businesses/{business_id}/products/{product_id}",
+             "params": {"business_id": "aaa", "product_id": "ff"}},
+            {"method": "PUT", "route": "/api/admin/users/{user_id}/role", "params": {"user_id": "ccc"}},
+            {"method": "GET", "route": "/api/admin/stats", "params": {}, "auth": True},
+        ]
+        tenants, state, rng = TenantMap(entries, FIXTURE), ReplayState(), random.Random(1)
+        state.etags["/api/public/sites/big"] = '"big-1"'
+
+        (method, route, url, kwargs), _ = build_request(entries[0], tenants, state, rng, "admin-token")
+        assert url == "/api/public/sites/big" and kwargs["params"] == {"fields": "id"}
+        assert kwargs["headers"] == {"Accept": "application/msgpack", "If-None-Match": '"big-1"'}
+        assert build_request(entries[1], tenants, state, rng, "admin-token") == (None, "unsafe")
+        assert build_request(entries[2], tenants, state, rng, "admin-token") == (None, "unsafe")
+        (_, _, _, kwargs), _ = build_request(entries[3], tenants, state, rng, "admin-token")
+        assert kwargs["headers"]["Authorization"] == "Bearer admin-token"
+        print("✓ Requests rebuilt against the fixture; destructive routes skipped")
+
+
+class TestReplay:
+    """Schedule and comparison"""
+
+    def test_replay_recorded_traffic(self, tmp_path):
+        requests = [("GET", "/api/public/sites/shop1", {}), ("POST", "/api/businesses/b1/orders", {"json": ORDER})] * 5
+        entries = load_traffic(_record(tmp_path, requests))
+        # Spread the recorded requests over one second
+        for index, entry in enumerate(entries):
+            entry["ts"] = 1000.0 + index / 10
+
+        async def run():
+            log = TrafficLog(tmp_path / "replayed.ndjson")
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=_app(log)), base_url="http://test") as client:
+                return await replay(client, entries, FIXTURE, speed=10)
+
+        started = time.perf_counter()
+        results = asyncio.run(run())
+        elapsed = time.perf_counter() - started
+        rows = {row["endpoint"]: row for row in results["endpoints"]}
+        assert results["replayed"] == 10 and not results["skipped"]
+        assert rows["POST /api/businesses/{business_id}/orders"]["requests"] == 5
+        assert rows["TOTAL"]["errors"] == 0
+        assert {row["endpoint"] for row in results["recorded"]} == set(rows)
+        assert 0.09 <= elapsed < 1.0
+        print(f"✓ 1 s of traffic replayed at 10x in {elapsed:.2f} s")
+
+    def test_msgpack_and_unreadable_responses(self):
+        def order_entry(ts, msgpack):
+            return {"ts": ts, "method": "POST", "route": "/api/businesses/{business_id}/orders",
+                    "params": {"business_id": "aaa"}, "msgpack": msgpack, "body": body_shape(ORDER),
+                    "status": 200, "duration_ms": 2.0}
+
+        payment = {"ts": 1000.2, "method": "POST", "route": "/api/public/businesses/{subdomain}/payments/razorpay/create",
+                   "params": {"subdomain": "bbb"}, "body": {}, "status": 200, "duration_ms": 3.0}
+        entries = [order_entry(1000.0, msgpack=True), order_entry(1000.1, msgpack=False), payment]
+        payments = []
+
+        def handler(request):
+            if request.url.path.endswith("/orders"):
+                order = {"id": "order-1", "total_amount": 100, "customer_name": "c", "customer_phone": "p"}
+                if request.headers.get("accept") == "application/msgpack":
+                    return httpx.Response(200, content=packb(order), headers={"content-type": "application/msgpack"})
+                return httpx.Response(200, content=b"<html>proxy error</html>", headers={"content-type": "application/json"})
+            payments.append(json.loads(request.content))
+            return httpx.Response(200, json={"order_id": "order_rzp_1"})
+
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+                return await replay(client, entries, FIXTURE, speed=10)
+
+        results = asyncio.run(run())
+        assert results["replayed"] == 3
+        assert results["unreadable"] == {"POST /api/businesses/{business_id}/orders": 1}
+        assert [body["order_id"] for body in payments] == ["order-1"]
+        print("✓ MessagePack responses decoded; an unreadable one counted without ending the replay")
+
+    def test_compare(self):
+        def results(p95_site, p95_orders, orders=50):
+            return {"endpoints": [
+                {"endpoint": "GET /api/public/sites/{subdomain}", "requests": 100, "p95_ms": p95_site},
+                {"endpoint": "POST /api/businesses/{business_id}/orders", "requests": orders, "p95_ms": p95_orders},
+            ]}
+
+        rows, regressed = compare(results(10, 20), results(15, 21), "p95_ms", 0.2, 20)
+        assert regressed == ["GET /api/public/sites/{subdomain}"]
+        assert [row[4] for row in rows] == ["REGRESSED", "ok"]
+        _, regressed = compare(results(10, 20, orders=5), results(10, 80, orders=5), "p95_ms", 0.2, 20)
+        assert regressed == []
+        print("✓ p95 regressions flagged, thin endpoints ignored")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,119 @@
+"""
+OpenTelemetry tracing.
+
+TRACING_EXPORTER turns tracing on:
+
+- "none" (default): nothing is instrumented; the spans handlers open go to
+  the API's no-op tracer
+- "otlp": spans are batched to an OTLP/HTTP collector, by default
+  http://localhost:4318 (OTEL_EXPORTER_OTLP_ENDPOINT overrides it)
+- "file": one JSON span per line appended to TRACING_FILE, for tests and
+  local runs without a collector
+- "console": spans printed to stdout
+
+When on, every FastAPI route gets a server span named after its template,
+every Mongo command a client span (pymongo's CommandListener; Motor runs
+commands with the request's context, so they nest under it), and every
+outbound httpx request a client span. Gateway adapters add a span around each
+provider call (PaymentGateway.call), which also covers SDKs that do not use
+httpx. Incoming W3C traceparent headers continue the caller's trace, and
+outbound gateway requests carry it on.
+
+TRACING_SAMPLE_RATIO (0..1, default 1) samples new traces; a sampled
+caller's decision is always followed.
+"""
+import json
+import os
+from typing import Optional
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor, SpanExporter
+)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+TRACING_EXPORTER = os.environ.get('TRACING_EXPORTER', 'none')
+TRACING_FILE = os.environ.get('TRACING_FILE', 'traces.jsonl')
+TRACING_SAMPLE_RATIO = float(os.environ.get('TRACING_SAMPLE_RATIO', '1'))
+TRACING_SERVICE_NAME = os.environ.get('TRACING_SERVICE_NAME', 'waconnect-api')
+
+# Scraped or polled constantly; their spans would drown the rest
+TRACING_EXCLUDED_URLS = os.environ.get('TRACING_EXCLUDED_URLS', 'metrics,api/health')
+
+
+def file_exporter(path: str) -> SpanExporter:
+    """ConsoleSpanExporter writing compact JSON lines to a file"""
+    return ConsoleSpanExporter(
+        out=open(path, 'a', encoding='utf-8'),
+        formatter=lambda span: json.dumps(json.loads(span.to_json())) + "\n",
+    )
+
+
+def build_tracer_provider(
+    exporter: str = TRACING_EXPORTER,
+    sample_ratio: float = TRACING_SAMPLE_RATIO,
+    file_path: str = TRACING_FILE,
+    span_exporter: Optional[SpanExporter] = None,
+) -> Optional[TracerProvider]:
+    """Provider for the configured exporter, or None when tracing is off
+
+    span_exporter overrides the exporter (tests pass an in-memory one).
+    """
+    if span_exporter is None and exporter == "none":
+        return None
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": TRACING_SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio)),
+    )
+    if span_exporter is not None:
+        provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+    elif exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    elif exporter == "file":
+        provider.add_span_processor(BatchSpanProcessor(file_exporter(file_path)))
+    elif exporter == "console":
+        provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter()))
+    else:
+        raise ValueError(f"Unknown TRACING_EXPORTER {exporter!r}")
+    return provider
+
+
+def configure_tracing() -> Optional[TracerProvider]:
+    """Install the global provider and instrument pymongo and httpx
+
+    Call before creating the Mongo client: pymongo only attaches globally
+    registered listeners to clients created afterwards.
+    """
+    provider = build_tracer_provider()
+    if provider is None:
+        return None
+
+    from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+    from opentelemetry.instrumentation.pymongo import PymongoInstrumentor
+
+    trace.set_tracer_provider(provider)
+    PymongoInstrumentor().instrument(tracer_provider=provider)
+    HTTPXClientInstrumentor().instrument(tracer_provider=provider)
+    return provider
+
+
+def instrument_app(app, provider: Optional[TracerProvider]):
+    """Server spans for every route of a FastAPI app"""
+    if provider is None:
+        return
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    FastAPIInstrumentor.instrument_app(
+        app, tracer_provider=provider, excluded_urls=TRACING_EXCLUDED_URLS,
+        # Per-message ASGI receive/send spans add nothing the route span doesn't show
+        exclude_spans=["receive", "send"],
+    )
+
+
+def shutdown_tracing(provider: Optional[TracerProvider]):
+    """Flush batched spans on shutdown"""
+    if provider is not None:
+        provider.shutdown()
@@ -0,0 +1,255 @@
+"""
+Production traffic recording for replay (loadtest/replay.py).
+
+TRAFFIC_SAMPLE_RATE > 0 records that fraction of /api requests as one JSON
+line each in TRAFFIC_LOG, which rotates at TRAFFIC_LOG_MAX_BYTES keeping
+TRAFFIC_LOG_BACKUPS old files (traffic.ndjson.1, .2, ...). A line holds what
+replay needs to reproduce the request's cost, never its content:
+
+    {"ts": 1760000000.123, "method": "POST",
+     "route": "/api/businesses/{business_id}/orders",
+     "params": {"business_id": "4f0c2a9d1b7e"}, "query": {"fields": "id,name"},
+     "auth": false, "msgpack": false, "conditional": false,
+     "body": {"customer_name": "string", "items": [3, {"product_id": "string", "quantity": "number"}]},
+     "body_bytes": 213, "status": 200, "duration_ms": 18.4, "response_bytes": 512, "sample_rate": 0.1}
+
+- route is the matched template; unmatched requests are not recorded
+- path parameters are replaced by a salted hash, so replay can tell
+  tenants and products apart and keep their popularity without learning
+  which they were. Subdomains are public, so an unsalted hash could be
+  reversed by hashing every known subdomain: recording refuses to start
+  (ValueError) unless TRAFFIC_SALT is set. Use a random secret that never
+  travels with the logs, the same on every worker. Replay only needs hashes
+  to be consistent within the window it replays, so the salt can be rotated
+  between windows
+- query values are kept only for TRAFFIC_QUERY_VALUES keys (default
+  "fields"); other keys are recorded with a null value
+- JSON and MessagePack bodies are reduced to their shape: field names, value
+  types and list lengths (with the first item's shape). Bodies larger than
+  TRAFFIC_MAX_BODY bytes are recorded as "truncated"
+- auth and conditional record only whether an Authorization or
+  If-None-Match header was sent
+
+Lines are written by a background thread (logging's QueueListener), so a
+recorded request costs the event loop a JSON encode and a queue put. Requests
+that are not sampled cost one random() call.
+"""
+import hashlib
+import logging
+import os
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from queue import SimpleQueue
+from typing import Optional
+from urllib.parse import parse_qsl
+
+import orjson
+from starlette.datastructures import Headers
+
+from metrics import route_label
+from msgpack_negotiation import MSGPACK_TYPES, accepts_msgpack, unpackb
+
+logger = logging.getLogger(__name__)
+
+TRAFFIC_SAMPLE_RATE = float(os.environ.get('TRAFFIC_SAMPLE_RATE', '0'))
+TRAFFIC_LOG = Path(os.environ.get('TRAFFIC_LOG', '/tmp/waconnect-traffic/traffic.ndjson'))
+TRAFFIC_LOG_MAX_BYTES = int(os.environ.get('TRAFFIC_LOG_MAX_BYTES', str(100 * 1024 * 1024)))
+TRAFFIC_LOG_BACKUPS = int(os.environ.get('TRAFFIC_LOG_BACKUPS', '5'))
+TRAFFIC_MAX_BODY = int(os.environ.get('TRAFFIC_MAX_BODY', str(64 * 1024)))
+TRAFFIC_SALT = os.environ.get('TRAFFIC_SALT', '')
+TRAFFIC_QUERY_VALUES = frozenset(os.environ.get('TRAFFIC_QUERY_VALUES', 'fields').split(','))
+
+# Polled constantly, and cheap; they would crowd out the traffic worth replaying
+TRAFFIC_EXCLUDED_PATHS = frozenset({"/api/health"})
+
+# Deeper or wider bodies are cut off in their shape
+SHAPE_MAX_DEPTH = 6
+SHAPE_MAX_KEYS = 100
+
+
+def hash_param(value: str, salt: str = TRAFFIC_SALT) -> str:
+    return hashlib.sha256(f"{salt}{value}".encode()).hexdigest()[:12]
+
+
+def body_shape(value, depth: int = 0):
+    """Field names, value types and list lengths of a decoded body, no values"""
+    if depth >= SHAPE_MAX_DEPTH:
+        return "..."
+    if isinstance(value, dict):
+        return {str(key): body_shape(item, depth + 1) for key, item in list(value.items())[:SHAPE_MAX_KEYS]}
+    if isinstance(value, list):
+        return [len(value), body_shape(value[0], depth + 1)] if value else []
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    if value is None:
+        return "null"
+    return "string"
+
+
+def _decode_body(content_type: str, body: bytes):
+    media_type = content_type.split(';', 1)[0].strip().lower()
+    if media_type in MSGPACK_TYPES:
+        return "msgpack", unpackb(body)
+    if media_type == "application/json" or media_type.endswith("+json"):
+        return "json", orjson.loads(body)
+    return media_type or None, None
+
+
+def describe_request(scope, headers: Headers, body: bytes, truncated: bool, salt: str = TRAFFIC_SALT) -> dict:
+    """The sanitized part of a traffic line
+
+    headers are the request headers as the client sent them: middleware inside
+    the recorder may rewrite scope["headers"] (MsgpackMiddleware turns
+    MessagePack bodies into JSON), while body is the raw body received.
+    """
+    query = {}
+    for key, value in parse_qsl(scope.get("query_string", b"").decode('latin-1'), keep_blank_values=True):
+        query[key] = value if key in TRAFFIC_QUERY_VALUES else None
+
+    entry = {
+        "method": scope["method"],
+        "route": route_label(scope),
+        "params": {name: hash_param(str(value), salt) for name, value in scope.get("path_params", {}).items()},
+        "query": query,
+        "auth": "authorization" in headers,
+        "msgpack": accepts_msgpack(headers.get("accept", "")),
+        "conditional": "if-none-match" in headers,
+        "content_type": None,
+        "body": None,
+        "body_bytes": len(body),
+    }
+    if truncated:
+        entry["body"] = "truncated"
+    elif body:
+        try:
+            entry["content_type"], decoded = _decode_body(headers.get("content-type", ""), body)
+            entry["body"] = body_shape(decoded) if decoded is not None else None
+        except Exception:
+            entry["body"] = "undecodable"
+    return entry
+
+
+class TrafficLog:
+    """Rotating NDJSON file written from a background thread"""
+
+    def __init__(
+        self,
+        path: Path = TRAFFIC_LOG,
+        max_bytes: int = TRAFFIC_LOG_MAX_BYTES,
+        backups: int = TRAFFIC_LOG_BACKUPS,
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue = SimpleQueue()
+        # Not registered with logging, so lines never reach the root logger's handlers
+        self._logger = logging.Logger("traffic")
+        self._logger.addHandler(QueueHandler(self._queue))
+        self._listener: Optional[QueueListener] = None
+
+    @property
+    def running(self) -> bool:
+        return self._listener is not None
+
+    def start(self):
+        if self._listener is not None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(
+            self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding='utf-8', delay=True
+        )
+        self._listener = QueueListener(self._queue, handler)
+        self._listener.start()
+
+    def stop(self):
+        """Write out queued lines and close the file"""
+        if self._listener is None:
+            return
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
+        self._listener = None
+
+    def write(self, entry: dict):
+        if self._listener is not None:
+            self._logger.info(orjson.dumps(entry).decode())
+
+
+class TrafficRecorderMiddleware:
+    """ASGI middleware writing a sample of /api requests to a TrafficLog"""
+
+    def __init__(
+        self, app,
+        log: TrafficLog,
+        sample_rate: float = TRAFFIC_SAMPLE_RATE,
+        max_body: int = TRAFFIC_MAX_BODY,
+        salt: str = TRAFFIC_SALT,
+    ):
+        if sample_rate and not salt:
+            raise ValueError("TRAFFIC_SALT must be set to record traffic (TRAFFIC_SAMPLE_RATE > 0)")
+        self.app = app
+        self.log = log
+        self.sample_rate = sample_rate
+        self.max_body = max_body
+        self.salt = salt
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not self.sample_rate
+            or random.random() >= self.sample_rate
+            or not scope["path"].startswith("/api/")
+            or scope["path"] in TRAFFIC_EXCLUDED_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        body = bytearray()
+        truncated = False
+        status = 500
+        response_bytes = 0
+
+        async def receive_and_keep():
+            nonlocal truncated
+            message = await receive()
+            if message["type"] == "http.request" and not truncated:
+                chunk = message.get("body", b"")
+                if len(body) + len(chunk) > self.max_body:
+                    truncated = True
+                    body.clear()
+                else:
+                    body.extend(chunk)
+            return message
+
+        async def send_and_measure(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        # Copied before the app runs: inner middleware rewrites scope["headers"] in place
+        headers = Headers(raw=list(scope["headers"]))
+        ts = time.time()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive_and_keep, send_and_measure)
+        finally:
+            duration = time.perf_counter() - started
+            if "route" in scope:
+                try:
+                    entry = {"ts": round(ts, 3), **describe_request(scope, headers, bytes(body), truncated, self.salt)}
+                    entry.update({
+                        "status": status,
+                        "duration_ms": round(duration * 1000, 2),
+                        "response_bytes": response_bytes,
+                        "sample_rate": self.sample_rate,
+                    })
+                    self.log.write(entry)
+                except Exception:
+                    logger.exception("Failed to record traffic for %s", route_label(scope))
@@ -20,7 +20,7 @@ const BookingsPage = () => {
     try {
       const [bookingsRes, businessRes] = await Promise.all([
         api.get(`/businesses/${businessId}/bookings`),
-        api.get(`/businesses/${businessId}`)
+        api.get(`/businesses/${businessId}`, { params: { fields: 'id,name' } })
       ]);
       setBookings(bookingsRes.data);
       setBusiness(businessRes.data);
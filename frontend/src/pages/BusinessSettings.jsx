@@ -105,6 +105,12 @@ const BusinessSettings = () => {
     setShowSecrets(prev => ({ ...prev, [field]: !prev[field] }));
   };
 
+  // Saved secrets are never sent back by the API, only their names
+  const hasSecret = (field) => Boolean(business[field]) || (business.configured_secrets || []).includes(field);
+
+  const secretPlaceholder = (field, placeholder) =>
+    hasSecret(field) ? 'Saved (enter a new value to replace)' : placeholder;
+
   const detectCurrentLocation = () => {
     if (!navigator.geolocation) {
       toast.error('Geolocation is not supported by your browser');
@@ -300,7 +306,7 @@ const BusinessSettings = () => {
                     id="apiKey"
                     data-testid="api-key-input"
                     type="password"
-                    placeholder="Enter your WhatsApp API key"
+                    placeholder={secretPlaceholder('whatsapp_api_key', 'Enter your WhatsApp API key')}
                     value={business.whatsapp_api_key || ''}
                     onChange={(e) => setBusiness({...business, whatsapp_api_key: e.target.value})}
                     className="mt-2"
@@ -682,7 +688,7 @@ const BusinessSettings = () => {
                         id="razorpayKeySecret"
                         data-testid="razorpay-key-secret-input"
                         type={showSecrets.razorpay ? 'text' : 'password'}
-                        placeholder="Enter your key secret"
+                        placeholder={secretPlaceholder('razorpay_key_secret', 'Enter your key secret')}
                         value={business.razorpay_key_secret || ''}
                         onChange={(e) => setBusiness({...business, razorpay_key_secret: e.target.value})}
                         className="flex-1"
@@ -725,7 +731,7 @@ const BusinessSettings = () => {
                         id="stripeSecretKey"
                         data-testid="stripe-secret-key-input"
                         type={showSecrets.stripe ? 'text' : 'password'}
-                        placeholder="sk_test_..."
+                        placeholder={secretPlaceholder('stripe_secret_key', 'sk_test_...')}
                         value={business.stripe_secret_key || ''}
                         onChange={(e) => setBusiness({...business, stripe_secret_key: e.target.value})}
                         className="flex-1"
@@ -768,7 +774,7 @@ const BusinessSettings = () => {
                         id="payuMerchantSalt"
                         data-testid="payu-merchant-salt-input"
                         type={showSecrets.payu ? 'text' : 'password'}
-                        placeholder="Enter merchant salt"
+                        placeholder={secretPlaceholder('payu_merchant_salt', 'Enter merchant salt')}
                         value={business.payu_merchant_salt || ''}
                         onChange={(e) => setBusiness({...business, payu_merchant_salt: e.target.value})}
                         className="flex-1"
@@ -811,7 +817,7 @@ const BusinessSettings = () => {
                         id="phonepeSaltKey"
                         data-testid="phonepe-salt-key-input"
                         type={showSecrets.phonepe ? 'text' : 'password'}
-                        placeholder="Enter salt key"
+                        placeholder={secretPlaceholder('phonepe_salt_key', 'Enter salt key')}
                         value={business.phonepe_salt_key || ''}
                         onChange={(e) => setBusiness({...business, phonepe_salt_key: e.target.value})}
                         className="flex-1"
@@ -841,10 +847,10 @@ const BusinessSettings = () => {
             {business.payment_gateway && (
               <div className="mt-4 p-3 bg-blue-50 rounded-lg border border-blue-100">
                 <p className="text-sm text-blue-800">
-                  <strong>Status:</strong> {business.payment_gateway === 'razorpay' && business.razorpay_key_id && business.razorpay_key_secret ? '✅ Razorpay configured' :
-                    business.payment_gateway === 'stripe' && business.stripe_secret_key ? '✅ Stripe configured' :
-                    business.payment_gateway === 'payu' && business.payu_merchant_key && business.payu_merchant_salt ? '✅ PayU configured' :
-                    business.payment_gateway === 'phonepe' && business.phonepe_merchant_id && business.phonepe_salt_key ? '✅ PhonePe configured' :
+                  <strong>Status:</strong> {business.payment_gateway === 'razorpay' && business.razorpay_key_id && hasSecret('razorpay_key_secret') ? '✅ Razorpay configured' :
+                    business.payment_gateway === 'stripe' && hasSecret('stripe_secret_key') ? '✅ Stripe configured' :
+                    business.payment_gateway === 'payu' && business.payu_merchant_key && hasSecret('payu_merchant_salt') ? '✅ PayU configured' :
+                    business.payment_gateway === 'phonepe' && business.phonepe_merchant_id && hasSecret('phonepe_salt_key') ? '✅ PhonePe configured' :
                     '⚠️ Please complete the configuration above'}
                 </p>
               </div>
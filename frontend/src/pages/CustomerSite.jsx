@@ -24,13 +24,13 @@ const CustomerSite = () => {
 
   const fetchData = async () => {
     try {
-      const businessRes = await axios.get(`${API_BASE}/public/businesses/${subdomain}`);
-      setBusiness(businessRes.data);
-      
-      if (businessRes.data.id) {
-        const prodsRes = await axios.get(`${API_BASE}/businesses/${businessRes.data.id}/products`);
-        setProducts(prodsRes.data.filter(p => p.is_available));
-      }
+      // Static snapshots inline the bootstrap; otherwise fetch it in one round trip
+      const preloaded = window.__SITE_BOOTSTRAP__;
+      const data = preloaded && preloaded.business.subdomain === subdomain
+        ? preloaded
+        : (await axios.get(`${API_BASE}/public/sites/${subdomain}`)).data;
+      setBusiness(data.business);
+      setProducts(data.categories.flatMap(category => category.products));
     } catch (error) {
       toast.error('Business not found');
     } finally {
@@ -25,18 +25,13 @@ const CustomerSite = () => {
 
   const fetchData = async () => {
     try {
-      const [businessRes, productsRes] = await Promise.all([
-        axios.get(`${API_BASE}/public/businesses/${subdomain}`),
-        axios.get(`${API_BASE}/businesses/${subdomain}/products`).catch(() => ({ data: [] }))
-      ]);
-      
-      setBusiness(businessRes.data);
-      
-      // Fetch products using business ID
-      if (businessRes.data.id) {
-        const prodsRes = await axios.get(`${API_BASE}/businesses/${businessRes.data.id}/products`);
-        setProducts(prodsRes.data.filter(p => p.is_available));
-      }
+      // Static snapshots inline the bootstrap; otherwise fetch it in one round trip
+      const preloaded = window.__SITE_BOOTSTRAP__;
+      const data = preloaded && preloaded.business.subdomain === subdomain
+        ? preloaded
+        : (await axios.get(`${API_BASE}/public/sites/${subdomain}`)).data;
+      setBusiness(data.business);
+      setProducts(data.categories.flatMap(category => category.products));
     } catch (error) {
       toast.error('Business not found');
     } finally {
@@ -128,18 +123,13 @@ const CustomerSite = () => {
 
   const fetchData = async () => {
     try {
-      const [businessRes, productsRes] = await Promise.all([
-        axios.get(`${API_BASE}/public/businesses/${subdomain}`),
-        axios.get(`${API_BASE}/businesses/${subdomain}/products`).catch(() => ({ data: [] }))
-      ]);
-      
-      setBusiness(businessRes.data);
-      
-      // Fetch products using business ID
-      if (businessRes.data.id) {
-        const prodsRes = await axios.get(`${API_BASE}/businesses/${businessRes.data.id}/products`);
-        setProducts(prodsRes.data.filter(p => p.is_available));
-      }
+      // Static snapshots inline the bootstrap; otherwise fetch it in one round trip
+      const preloaded = window.__SITE_BOOTSTRAP__;
+      const data = preloaded && preloaded.business.subdomain === subdomain
+        ? preloaded
+        : (await axios.get(`${API_BASE}/public/sites/${subdomain}`)).data;
+      setBusiness(data.business);
+      setProducts(data.categories.flatMap(category => category.products));
     } catch (error) {
       toast.error('Business not found');
     } finally {
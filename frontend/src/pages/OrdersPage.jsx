@@ -20,7 +20,7 @@ const OrdersPage = () => {
     try {
       const [ordersRes, businessRes] = await Promise.all([
         api.get(`/businesses/${businessId}/orders`),
-        api.get(`/businesses/${businessId}`)
+        api.get(`/businesses/${businessId}`, { params: { fields: 'id,name' } })
       ]);
       setOrders(ordersRes.data);
       setBusiness(businessRes.data);